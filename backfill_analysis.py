@@ -0,0 +1,110 @@
+# backfill_analysis.py
+"""
+Script untuk backfill hasil analisis pada scan yang sudah diimport
+
+Runs YOLO detection in batches over every primary scan of a session (or all
+sessions), then - unless --detect-only is given - runs the remaining missing
+analysis steps (Otsu, classification, quantification) per scan.
+
+Usage:
+    python backfill_analysis.py --session NSY --detect-only
+    python backfill_analysis.py --session NSY --batch-size 16 --overwrite
+    python backfill_analysis.py            # all sessions, full backfill
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from core.config.paths import SPECT_DATA_PATH, get_session_spect_path, extract_study_date_from_dicom
+from features.dicom_import.logic.directory_scanner import scan_spect_directory_new_structure
+
+
+def collect_scans(session_code: str = None):
+    """[(dicom_path, patient_id, session_code)] for every primary scan."""
+    root = get_session_spect_path(session_code) if session_code else SPECT_DATA_PATH
+    session_map = scan_spect_directory_new_structure(root)
+
+    scans = []
+    for session, patients in session_map.items():
+        for patient_id, files in patients.items():
+            for dicom_path in sorted(files):
+                scans.append((dicom_path, patient_id, session))
+    return scans
+
+
+def backfill(session_code: str = None, detect_only: bool = False,
+             batch_size: int = None, overwrite: bool = False) -> bool:
+    """
+    Backfill detection (and optionally the other analysis steps)
+
+    Returns:
+        True if every scan was processed successfully
+    """
+    from features.spect_viewer.logic.box_detection import detect_dicoms_batch
+
+    print("🔄 Analysis Backfill")
+    print("=" * 50)
+    print(f"Session: {session_code or 'ALL'}")
+    print(f"Mode: {'DETECT ONLY' if detect_only else 'FULL (missing steps)'}")
+    print()
+
+    scans = collect_scans(session_code)
+    if not scans:
+        print("⚠️  No primary scans found")
+        return True
+
+    # Step 1: batched YOLO detection over every scan
+    t0 = time.perf_counter()
+    detection = detect_dicoms_batch(scans, batch_size=batch_size, overwrite=overwrite)
+    elapsed = time.perf_counter() - t0
+    n_views = 2 * len(scans)
+    print(f"\n📊 Detection: {len(scans)} scans in {elapsed:.1f}s "
+          f"(~{n_views / max(elapsed, 1e-9):.1f} frames/s incl. loading and XML)")
+
+    failed = [path for path, views in detection.items() if not any(views.values())]
+    if detect_only:
+        for path in failed:
+            print(f"  ❌ {path}")
+        print(f"{'✅' if not failed else '⚠️ '} {len(scans) - len(failed)}/{len(scans)} scans have detection XML")
+        return not failed
+
+    # Step 2: remaining steps per scan (YOLO is already done and will be skipped)
+    from features.spect_viewer.logic.processing_wrapper import run_missing_analysis_steps
+
+    ok = 0
+    for idx, (dicom_path, patient_id, _) in enumerate(scans, 1):
+        print(f"\n## [{idx}/{len(scans)}] {dicom_path.name}")
+        try:
+            result = run_missing_analysis_steps(dicom_path, patient_id, extract_study_date_from_dicom(dicom_path))
+            if result.get("success"):
+                ok += 1
+            else:
+                print(f"  ❌ Steps run: {result.get('steps_run')}")
+        except Exception as e:
+            print(f"  ❌ Backfill failed: {e}")
+
+    print(f"\n{'✅' if ok == len(scans) else '⚠️ '} {ok}/{len(scans)} scans complete")
+    return ok == len(scans)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill analysis results for imported scans")
+    parser.add_argument("--session", type=str, default=None,
+                        help="Session code (default: all sessions)")
+    parser.add_argument("--detect-only", action="store_true",
+                        help="Only run batched YOLO detection")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Images per YOLO call (default: YOLO_BATCH_SIZE)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Re-run detection even if the XML already exists")
+
+    args = parser.parse_args()
+    success = backfill(args.session, args.detect_only, args.batch_size, args.overwrite)
+    sys.exit(0 if success else 1)
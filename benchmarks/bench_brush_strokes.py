@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# benchmarks/bench_brush_strokes.py
+"""
+Benchmark: brush engine (features.spect_viewer.logic.brush_engine) vs the
+editors' original per-dab painting.
+
+The original canvas painted a dab with a Python loop over the disk, merged
+its 13 binary layers back into the label map and re-colourized the whole
+frame on every mouse event. The engine stamps a cached disk by slicing into
+the label map and colours only the dirty rectangle.
+
+Checks, on a synthetic 1024x256 frame:
+
+- paint    : the same dabs on an empty mask give the same label map
+- erase    : erasing the same dabs gives the same label map
+- render   : the dirty-rectangle RGBA equals the same rectangle of the
+             original full-frame colourization (show-all and single-label)
+
+then prints the time per mouse event for both.
+
+Usage:
+    python benchmarks/bench_brush_strokes.py [--events 300] [--radius 6] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from features.spect_viewer.logic.brush_engine import LabelBrush, palette_lut, render_rgba
+from features.spect_viewer.logic.colorizer import _PALETTE, label_mask_to_rgb
+
+
+# ----------------------------------------------------------------------------- legacy reference
+
+class LegacyLayers:
+    """_Canvas painting before the brush engine (kept verbatim, Qt parts dropped)."""
+
+    def __init__(self, mask: np.ndarray):
+        self._mask_arr = mask.astype(np.uint8)
+        self._img_height, self._img_width = mask.shape
+        self._layers = {lbl: (self._mask_arr == lbl).astype(np.uint8)
+                        for lbl in range(len(_PALETTE))}
+        self._bg_alpha = 0.0
+
+    def apply_brush(self, x, y, brush_sz, cur_label, eraser):
+        x = max(0, min(self._img_width - 1, int(x + 0.5)))
+        y = max(0, min(self._img_height - 1, int(y + 0.5)))
+        h, w = self._mask_arr.shape
+        if brush_sz == 1:
+            targets = [(x, y)]
+        else:
+            targets = []
+            radius = brush_sz
+            for dy in range(-radius, radius + 1):
+                for dx in range(-radius, radius + 1):
+                    if dx*dx + dy*dy <= radius*radius:
+                        px, py = x + dx, y + dy
+                        if 0 <= px < w and 0 <= py < h:
+                            targets.append((px, py))
+        lay = self._layers[cur_label]
+        for px, py in targets:
+            if eraser:
+                lay[py, px] = 0
+            else:
+                lay[py, px] = 1
+        self.rebuild_combined()
+
+    def rebuild_combined(self):
+        combined = np.zeros_like(self._mask_arr)
+        for lbl in range(len(_PALETTE)):
+            layer = self._layers[lbl]
+            combined[layer == 1] = lbl
+        self._mask_arr = combined
+
+    def mask_to_rgba(self, *, show_all: bool, label: int) -> np.ndarray:
+        rgb = label_mask_to_rgb(self._mask_arr)
+        h, w, _ = rgb.shape
+        if show_all:
+            alpha = np.full((h, w), 255, np.uint8)
+            alpha[self._mask_arr == 0] = int(self._bg_alpha * 255)
+        else:
+            sel = (self._layers[label] == 1)
+            rgb[sel] = np.array(_PALETTE[label], dtype=np.uint8)
+            alpha = np.zeros((h, w), np.uint8)
+            alpha[sel] = 255
+        return np.dstack([rgb, alpha])
+
+
+# ----------------------------------------------------------------------------- helpers
+
+def make_path(rng: np.random.Generator, n_events: int, radius: int, height: int = 1024, width: int = 256):
+    """A wandering mouse path whose steps stay within the dab spacing (no interpolation needed)."""
+    spacing = max(1, radius // 2)
+    points = [(int(rng.integers(0, width)), int(rng.integers(0, height)))]
+    for _ in range(n_events - 1):
+        x, y = points[-1]
+        dx, dy = rng.integers(-spacing, spacing + 1, size=2)
+        points.append((int(np.clip(x + dx, 0, width - 1)), int(np.clip(y + dy, 0, height - 1))))
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the editor brush engine")
+    parser.add_argument("--events", type=int, default=300, help="Mouse events per stroke")
+    parser.add_argument("--radius", type=int, default=6, help="Brush radius in pixels")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    height, width, label = 1024, 256, 4
+    points = make_path(rng, args.events, args.radius, height, width)
+    lut = palette_lut(_PALETTE)
+    ok = True
+
+    # --- paint then erase on an empty mask: legacy (full re-colourize per event) vs engine (dirty rect)
+    legacy = LegacyLayers(np.zeros((height, width), np.uint8))
+    labels = np.zeros((height, width), np.uint8)
+    brush = LabelBrush(labels)
+    for eraser, name in ((False, "paint"), (True, "erase")):
+        eraser_points = points if not eraser else points[:len(points) // 2]
+
+        t0 = time.perf_counter()
+        for x, y in eraser_points:
+            legacy.apply_brush(x, y, args.radius, label, eraser)
+            legacy.mask_to_rgba(show_all=False, label=label)
+        legacy_s = (time.perf_counter() - t0) / len(eraser_points)
+
+        rect_ok = True
+        t0 = time.perf_counter()
+        x, y = eraser_points[0]
+        rects = [brush.begin(x, y, args.radius, label, erase=eraser)]
+        for x, y in eraser_points[1:]:
+            rects.append(brush.move_to(x, y))
+        for rect in rects:
+            if rect is not None:  # the canvas skips events that touched nothing
+                render_rgba(labels, rect, lut, show_all=False, current_label=label)
+        engine_s = (time.perf_counter() - t0) / len(eraser_points)
+        stroke_rect = brush.end()
+
+        same = np.array_equal(legacy._mask_arr, labels)
+        ok &= same
+        print(f"{'✅' if same else '❌'} {name:<6}: label maps identical"
+              f"   legacy {legacy_s * 1000:7.2f} ms/event | engine {engine_s * 1000:6.3f} ms/event"
+              f" ({legacy_s / max(engine_s, 1e-9):.0f}x)")
+
+        for show_all in (False, True):
+            x0, y0, x1, y1 = stroke_rect
+            full = legacy.mask_to_rgba(show_all=show_all, label=label)[y0:y1, x0:x1]
+            part = render_rgba(labels, stroke_rect, lut, show_all=show_all, current_label=label)
+            rect_ok &= np.array_equal(full, part)
+        ok &= rect_ok
+        print(f"{'✅' if rect_ok else '❌'} {name:<6}: dirty-rect render matches the full-frame colourization")
+
+    # --- fast strokes: far-apart samples are joined by interpolated dabs
+    labels[:] = 0
+    brush.begin(10, 10, args.radius, label)
+    brush.move_to(width - 10, height - 10)
+    brush.end()
+    ys = np.nonzero(labels.any(axis=1))[0]
+    continuous = ys.size == ys[-1] - ys[0] + 1
+    ok &= continuous
+    print(f"{'✅' if continuous else '❌'} fast stroke: continuous over rows {ys[0]}..{ys[-1]}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# benchmarks/bench_bsi_quantification.py
+"""
+Micro-benchmark: BSI quantification kernel (per-ID masks vs single bincount).
+
+Compares the original colour decoders (one ``np.all(image == color)`` pass per
+colour) and ``calculate_BSI`` (boolean masks per segment ID) with the
+packed-RGB lookup + joint ``np.bincount`` kernel in ``quantification_wrapper``.
+The JSON produced by both paths must be identical.
+
+Usage:
+    python benchmarks/bench_bsi_quantification.py [--studies 10] [--repeat 3] [--seed 0]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from features.spect_viewer.logic.quantification_wrapper import (
+    DICT_SEGMENT_ID,
+    DICT_SEGMENT_COLOR,
+    _decode_colors,
+    _SEGMENT_COLOR_LUT,
+    _CLASSIFICATION_COLOR_LUT,
+    calculate_BSI,
+)
+
+HOTSPOT_COLORS = {1: (255, 241, 188), 2: (255, 0, 0)}
+
+
+# ----------------------------------------------------------------------------- legacy reference
+
+def legacy_segment_ids(image_rgb):
+    id_array = np.zeros(image_rgb.shape[:2], dtype=np.uint8)
+    for segment_id, rgb_color in DICT_SEGMENT_COLOR.items():
+        mask = np.all(image_rgb == rgb_color, axis=-1)
+        id_array[mask] = segment_id
+    return id_array
+
+
+def legacy_hotspot_ids(image_rgb):
+    hotspot_array = np.zeros(image_rgb.shape[:2], dtype=np.uint8)
+    hotspot_array[np.all(image_rgb == [255, 0, 0], axis=-1)] = 2
+    hotspot_array[np.all(image_rgb == [255, 241, 188], axis=-1)] = 1
+    return hotspot_array
+
+
+def legacy_calculate_BSI(image_segment_anterior, image_segment_posterior, image_hotspot_anterior, image_hotspot_posterior):
+    result = {}
+    for segment_id in DICT_SEGMENT_ID:
+        mask_anterior = image_segment_anterior == segment_id
+        mask_posterior = image_segment_posterior == segment_id
+        count_segment = np.sum(mask_anterior) + np.sum(mask_posterior)
+        count_hotspot_normal = np.sum(image_hotspot_anterior[mask_anterior] == 1) + np.sum(image_hotspot_posterior[mask_posterior] == 1)
+        count_hotspot_abnormal = np.sum(image_hotspot_anterior[mask_anterior] == 2) + np.sum(image_hotspot_posterior[mask_posterior] == 2)
+        result[DICT_SEGMENT_ID[segment_id]] = {
+            "total_segment_pixels": int(count_segment),
+            "hotspot_normal": int(count_hotspot_normal),
+            "percentage_normal": float(count_hotspot_normal) / count_segment if count_segment else 0.0,
+            "hotspot_abnormal": int(count_hotspot_abnormal),
+            "percentage_abnormal": float(count_hotspot_abnormal) / count_segment if count_segment else 0.0,
+        }
+    return result
+
+
+# ----------------------------------------------------------------------------- synthetic data
+
+def make_view(rng, height=1024, width=256):
+    """Colored segmentation + classification mask (RGB) for one view"""
+    labels = rng.integers(0, len(DICT_SEGMENT_COLOR), size=(height // 8, width // 8))
+    labels = np.kron(labels, np.ones((8, 8), dtype=labels.dtype))
+    palette = np.array([DICT_SEGMENT_COLOR[i] for i in range(len(DICT_SEGMENT_COLOR))], dtype=np.uint8)
+    segment_rgb = palette[labels]
+    # a few anti-aliased / unknown colours
+    noise = rng.random((height, width)) < 0.01
+    segment_rgb[noise] = rng.integers(0, 256, size=(int(noise.sum()), 3), dtype=np.uint8)
+
+    hotspot_rgb = np.zeros((height, width, 3), dtype=np.uint8)
+    hot = rng.random((height, width))
+    hotspot_rgb[hot < 0.05] = HOTSPOT_COLORS[2]
+    hotspot_rgb[(hot >= 0.05) & (hot < 0.12)] = HOTSPOT_COLORS[1]
+    return segment_rgb, hotspot_rgb
+
+
+def legacy_study(views):
+    ids = [(legacy_segment_ids(seg), legacy_hotspot_ids(hot)) for seg, hot in views]
+    return legacy_calculate_BSI(ids[0][0], ids[1][0], ids[0][1], ids[1][1])
+
+
+def kernel_study(views):
+    # the loaders read BGR through cv2; feed the same layout here
+    ids = [(_decode_colors(seg[..., ::-1], _SEGMENT_COLOR_LUT), _decode_colors(hot[..., ::-1], _CLASSIFICATION_COLOR_LUT))
+           for seg, hot in views]
+    return calculate_BSI(ids[0][0], ids[1][0], ids[0][1], ids[1][1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BSI quantification")
+    parser.add_argument("--studies", type=int, default=10, help="Studies in the synthetic patient history")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    history = [[make_view(rng), make_view(rng)] for _ in range(args.studies)]
+
+    for idx, views in enumerate(history):
+        if json.dumps(legacy_study(views)) != json.dumps(kernel_study(views)):
+            print(f"❌ Study {idx}: BSI JSON differs")
+            sys.exit(1)
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for views in history:
+                fn(views)
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    legacy_time = best_of(legacy_study)
+    kernel_time = best_of(kernel_study)
+
+    print(f"✅ {args.studies} studies (2 views, 1024x256): BSI JSON identical")
+    print(f"  legacy  : {legacy_time * 1000:8.2f} ms for the whole history")
+    print(f"  bincount: {kernel_time * 1000:8.2f} ms for the whole history")
+    print(f"  speedup : {legacy_time / max(kernel_time, 1e-9):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# benchmarks/bench_edit_history.py
+"""
+Benchmark: delta undo/redo (features.spect_viewer.logic.edit_history) vs the
+editors' original full-layer snapshots.
+
+Replays a synthetic editing session on a 1024x256 segmentation mask (random
+strokes on random labels, paint and erase) and checks:
+
+- undo-all : undoing every stroke, label by label, restores the original mask
+- redo-all : redoing them all gives the edited mask back
+- overlap  : undoing one layer's stroke keeps a later stroke of another layer
+             that painted over it
+- patches  : the per-dab before-patches give the same delta as a full-frame
+             copy taken at stroke start
+
+then prints the history memory and the undo time of both approaches (the
+original kept one H×W copy per stroke plus one per label at start-up, and
+rebuilt the full frame on every undo).
+
+Usage:
+    python benchmarks/bench_edit_history.py [--strokes 200] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from features.spect_viewer.logic.brush_engine import LabelBrush
+from features.spect_viewer.logic.edit_history import EditHistory, StrokeDelta, StrokeRecorder
+
+N_LABELS = 13
+MAX_HISTORY = 50
+
+
+def record_stroke(labels, brush, recorder, history, rng, label, erase, stats=None):
+    """
+    One stroke of 10-40 mouse events, recorded the way _Canvas does it; True if it changed anything.
+
+    With ``stats``, also checks the delta against one built from a full-frame copy.
+    """
+    full_before = labels.copy() if stats is not None else None
+    h, w = labels.shape
+    x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+    recorder.reset()
+    brush.begin(x, y, int(rng.integers(1, 10)), label, erase=erase)
+    for _ in range(int(rng.integers(10, 40))):
+        x = int(np.clip(x + rng.integers(-6, 7), 0, w - 1))
+        y = int(np.clip(y + rng.integers(-6, 7), 0, h - 1))
+        brush.move_to(x, y)
+    rect = brush.end()
+    if stats is not None:
+        stats["patch_bytes"] = max(stats.get("patch_bytes", 0), recorder.nbytes)
+    delta = recorder.finish(label, rect)
+    if stats is not None:
+        x0, y0, x1, y1 = rect
+        reference = StrokeDelta.from_patches(label, rect, full_before[y0:y1, x0:x1], labels[y0:y1, x0:x1])
+        same = (delta is None) == (reference is None) and (delta is None or (
+            np.array_equal(delta._changed, reference._changed)
+            and np.array_equal(delta._before, reference._before)
+            and np.array_equal(delta._after, reference._after)))
+        stats["patches_ok"] = stats.get("patches_ok", True) and same
+    if delta is not None:
+        history.push(delta)
+    return delta is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the delta undo/redo history")
+    parser.add_argument("--strokes", type=int, default=200, help="Strokes in the editing session")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    height, width = 1024, 256
+    original = rng.integers(0, N_LABELS, (height // 16, width // 16)).astype(np.uint8)
+    original = np.kron(original, np.ones((16, 16), np.uint8))       # blocky, mask-like
+    labels = original.copy()
+    recorder = StrokeRecorder(labels)
+    brush = LabelBrush(labels, before_dab=recorder.capture)
+    history = EditHistory(max_per_label=args.strokes)               # keep everything for the round trip
+    ok = True
+
+    stats = {}
+    stroke_labels = []
+    for _ in range(args.strokes):
+        label = int(rng.integers(1, N_LABELS))
+        if record_stroke(labels, brush, recorder, history, rng, label, erase=rng.random() < 0.25, stats=stats):
+            stroke_labels.append(label)
+    edited = labels.copy()
+
+    ok &= stats["patches_ok"]
+    print(f"{'✅' if stats['patches_ok'] else '❌'} patches: per-dab before-patches match a full-frame copy"
+          f"   (largest stroke {stats['patch_bytes'] / 1024:.1f} KiB vs {labels.nbytes / 1024:.0f} KiB frame)")
+
+    # --- memory: deltas vs the original snapshots (13 start-up layers + one per stroke, 50 per label)
+    per_label = np.bincount(stroke_labels, minlength=N_LABELS)
+    legacy_bytes = (N_LABELS + int(np.minimum(per_label, MAX_HISTORY).sum())) * height * width
+    print(f"history memory: deltas {history.nbytes / 1024:8.1f} KiB | full snapshots {legacy_bytes / 1024:8.1f} KiB"
+          f" ({legacy_bytes / max(history.nbytes, 1):.0f}x)")
+
+    # --- undo-all / redo-all in reverse stroke order
+    t0 = time.perf_counter()
+    for label in reversed(stroke_labels):
+        delta = history.undo(label)
+        if delta is not None:
+            delta.apply(labels, undo=True)
+    undo_s = (time.perf_counter() - t0) / len(stroke_labels)
+    same = np.array_equal(labels, original)
+    ok &= same
+    print(f"{'✅' if same else '❌'} undo-all restores the original mask   ({undo_s * 1e6:6.1f} µs per undo)")
+
+    for label in stroke_labels:
+        delta = history.redo(label)
+        if delta is not None:
+            delta.apply(labels, undo=False)
+    same = np.array_equal(labels, edited)
+    ok &= same
+    print(f"{'✅' if same else '❌'} redo-all restores the edited mask")
+
+    # Legacy undo: swap in a full layer copy and rebuild the combined mask from 13 layers
+    layers = {lbl: (labels == lbl).astype(np.uint8) for lbl in range(N_LABELS)}
+    t0 = time.perf_counter()
+    for label in stroke_labels[:50]:
+        layers[label] = layers[label].copy()
+        combined = np.zeros_like(labels)
+        for lbl in range(N_LABELS):
+            combined[layers[lbl] == 1] = lbl
+    legacy_undo_s = (time.perf_counter() - t0) / 50
+    print(f"   legacy undo (layer copy + rebuild, before redraw): {legacy_undo_s * 1e6:8.1f} µs")
+
+    # --- overlap: stroke on label 3, then label 5 over it; undoing label 3 must keep label 5
+    labels = np.zeros((64, 64), np.uint8)
+    recorder, history = StrokeRecorder(labels), EditHistory()
+    brush = LabelBrush(labels, before_dab=recorder.capture)
+    for label, cx in ((3, 20), (5, 30)):
+        recorder.reset()
+        brush.begin(cx, 32, 12, label)
+        history.push(recorder.finish(label, brush.end()))
+    with_five = labels == 5
+    history.undo(3).apply(labels, undo=True)
+    same = np.array_equal(labels == 5, with_five) and not (labels == 3).any()
+    ok &= same
+    print(f"{'✅' if same else '❌'} overlap: undoing one layer keeps the later stroke of another")
+
+    # --- memory cap: oldest deltas are evicted across labels
+    capped = EditHistory(max_bytes=64 * 1024)
+    labels = original.copy()
+    recorder = StrokeRecorder(labels)
+    brush = LabelBrush(labels, before_dab=recorder.capture)
+    for label in stroke_labels:
+        record_stroke(labels, brush, recorder, capped, rng, label, erase=False)
+    within = capped.nbytes <= capped.max_bytes
+    ok &= within
+    print(f"{'✅' if within else '❌'} memory cap: {capped.nbytes / 1024:.1f} KiB kept of a {capped.max_bytes / 1024:.0f} KiB cap")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
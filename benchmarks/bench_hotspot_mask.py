@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# benchmarks/bench_hotspot_mask.py
+"""
+Benchmark: Otsu hotspot mask engine (per-pixel loops vs vectorized).
+
+Runs the legacy per-pixel implementation of ``create_hotspot_mask`` and the
+vectorized engine in ``hotspot_processor`` on synthetic whole-body frames
+(1024x256, 30+ boxes), checks that mask / overlay / pure images are
+byte-identical, and prints the timings.
+
+It also checks the in-memory frame path (``compute_hotspot_arrays`` on a raw
+uint16 frame) against the old route through a temporary PNG file
+(normalize, save, ``create_hotspot_mask`` re-reading it).
+
+Usage:
+    python benchmarks/bench_hotspot_mask.py [--frames 5] [--boxes 32] [--seed 0]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from skimage.morphology import binary_dilation, disk
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from features.spect_viewer.logic.hotspot_processor import (
+    build_hotspot_mask,
+    colorize_hotspot_mask,
+    blend_hotspot_overlay,
+    compute_hotspot_arrays,
+    create_hotspot_mask,
+)
+
+LABELS = ["Abnormal", "Normal", "Unknown"]
+
+
+# ----------------------------------------------------------------------------- legacy reference
+
+def legacy_threshold_otsu(grayscale_matrix: np.ndarray, nbins: int = 256) -> float:
+    """Original loop-based Otsu (kept verbatim as the reference)."""
+    hist, bin_edges = np.histogram(grayscale_matrix.flatten(), bins=nbins, range=(0, 256))
+    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    total_pixels = grayscale_matrix.size
+    cumsum_hist = np.cumsum(hist)
+    cumsum_weighted = np.cumsum(hist * bin_centers)
+
+    variances = []
+    for i in range(1, len(hist)):
+        w0 = cumsum_hist[i-1] / total_pixels
+        w1 = 1 - w0
+        if w0 == 0 or w1 == 0:
+            variances.append(0)
+            continue
+        mu0 = cumsum_weighted[i-1] / cumsum_hist[i-1] if cumsum_hist[i-1] > 0 else 0
+        mu1 = (cumsum_weighted[-1] - cumsum_weighted[i-1]) / (total_pixels - cumsum_hist[i-1]) if (total_pixels - cumsum_hist[i-1]) > 0 else 0
+        variance = w0 * w1 * (mu0 - mu1) ** 2
+        variances.append(variance)
+
+    optimal_idx = np.argmax(variances)
+    return bin_centers[optimal_idx]
+
+
+def legacy_hotspot_arrays(gray_array: np.ndarray, rgb_array: np.ndarray, bounding_boxes):
+    """Original per-pixel mask / hole fill / blend loops (without file I/O)."""
+    height, width = gray_array.shape
+    mask = np.zeros((height, width), dtype=np.uint8)
+
+    for x_min, y_min, x_max, y_max, label in bounding_boxes:
+        x_min = max(0, min(x_min, width - 1))
+        y_min = max(0, min(y_min, height - 1))
+        x_max = max(x_min + 1, min(x_max, width))
+        y_max = max(y_min + 1, min(y_max, height))
+
+        grayscale_matrix = gray_array[y_min:y_max, x_min:x_max]
+        if grayscale_matrix.size == 0:
+            continue
+
+        otsu_thresh = legacy_threshold_otsu(grayscale_matrix, nbins=10)
+        dilated_mask = binary_dilation(grayscale_matrix > otsu_thresh, disk(1))
+
+        if label.lower() in ['abnormal', 'hotspot', 'positive']:
+            mask_value = 255
+        elif label.lower() in ['normal', 'negative']:
+            mask_value = 128
+        else:
+            mask_value = 64
+
+        for x in range(x_min, x_max):
+            for y in range(y_min, y_max):
+                mask_x = x - x_min
+                mask_y = y - y_min
+                if mask_y < dilated_mask.shape[0] and mask_x < dilated_mask.shape[1]:
+                    if dilated_mask[mask_y, mask_x]:
+                        mask[y, x] = mask_value
+
+        for x in range(max(1, x_min), min(width - 1, x_max)):
+            for y in range(max(1, y_min), min(height - 1, y_max)):
+                neighbors = [(x-1, y), (x+1, y), (x, y-1), (x, y+1)]
+                matching_neighbors = 0
+                for nx, ny in neighbors:
+                    if 0 <= nx < width and 0 <= ny < height:
+                        if mask[ny, nx] == mask_value:
+                            matching_neighbors += 1
+                if matching_neighbors >= 3:
+                    mask[y, x] = mask_value
+
+    pure_colored_array = np.zeros((height, width, 3), dtype=np.uint8)
+    pure_colored_array[mask == 64] = [255, 241, 188]
+    pure_colored_array[mask == 128] = [255, 241, 188]
+    pure_colored_array[mask == 255] = [255, 0, 0]
+
+    overlayed_array = rgb_array.copy()
+    for x_min, y_min, x_max, y_max, label in bounding_boxes:
+        x_min = max(0, min(x_min, width - 1))
+        y_min = max(0, min(y_min, height - 1))
+        x_max = max(x_min + 1, min(x_max, width))
+        y_max = max(y_min + 1, min(y_max, height))
+
+        if label.lower() in ['abnormal', 'hotspot', 'positive']:
+            overlay_color = np.array([255, 0, 0])
+        elif label.lower() in ['normal', 'negative']:
+            overlay_color = np.array([255, 241, 188])
+        else:
+            overlay_color = np.array([0, 255, 0])
+
+        for y in range(y_min, y_max):
+            for x in range(x_min, x_max):
+                if mask[y, x] > 0:
+                    alpha = 0.5
+                    overlayed_array[y, x] = (
+                        alpha * overlay_color +
+                        (1 - alpha) * overlayed_array[y, x]
+                    ).astype(np.uint8)
+
+    return mask, overlayed_array, pure_colored_array
+
+
+def vectorized_hotspot_arrays(gray_array: np.ndarray, rgb_array: np.ndarray, bounding_boxes):
+    """New engine, same outputs as ``legacy_hotspot_arrays``."""
+    mask = build_hotspot_mask(gray_array, bounding_boxes)
+    return mask, blend_hotspot_overlay(rgb_array, mask, bounding_boxes), colorize_hotspot_mask(mask)
+
+
+def temp_png_hotspot_arrays(frame: np.ndarray, bounding_boxes, temp_dir: Path):
+    """Old process_frame_with_xml route: normalize, write a temp PNG, re-read it."""
+    frame_norm = ((frame - frame.min()) / (frame.max() - frame.min()) * 255).astype(np.uint8)
+    temp_path = temp_dir / "temp_P1_ant.png"
+    Image.fromarray(frame_norm).save(temp_path)
+    mask, overlayed, pure = create_hotspot_mask(str(temp_path), bounding_boxes, "P1", "ant")
+    temp_path.unlink(missing_ok=True)
+    return mask, np.array(overlayed), np.array(pure)
+
+
+# ----------------------------------------------------------------------------- synthetic data
+
+def make_frame(rng: np.random.Generator, n_boxes: int, height: int = 1024, width: int = 256):
+    """Synthetic bone-scan-like frame plus random (partly overlapping / out of bounds) boxes."""
+    gray = rng.poisson(20, size=(height, width)).astype(np.float32)
+    boxes = []
+    for _ in range(n_boxes):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        r = rng.integers(3, 12)
+        yy, xx = np.ogrid[:height, :width]
+        gray += 150 * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2.0 * r * r))
+        half_w, half_h = rng.integers(4, 24), rng.integers(4, 24)
+        boxes.append((int(cx - half_w), int(cy - half_h), int(cx + half_w), int(cy + half_h),
+                      str(rng.choice(LABELS))))
+    gray = np.clip(gray, 0, 255).astype(np.uint8)
+    rgb = np.repeat(gray[..., None], 3, axis=2)
+    return gray, rgb, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Otsu hotspot mask engine")
+    parser.add_argument("--frames", type=int, default=5, help="Number of synthetic frames")
+    parser.add_argument("--boxes", type=int, default=32, help="Bounding boxes per frame")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    frames = [make_frame(rng, args.boxes) for _ in range(args.frames)]
+
+    legacy_time = vectorized_time = 0.0
+    for idx, (gray, rgb, boxes) in enumerate(frames):
+        t0 = time.perf_counter()
+        legacy = legacy_hotspot_arrays(gray, rgb, boxes)
+        t1 = time.perf_counter()
+        vectorized = vectorized_hotspot_arrays(gray, rgb, boxes)
+        t2 = time.perf_counter()
+        legacy_time += t1 - t0
+        vectorized_time += t2 - t1
+
+        for name, old, new in zip(("mask", "overlay", "pure"), legacy, vectorized):
+            if old.tobytes() != new.tobytes():
+                print(f"❌ Frame {idx}: {name} differs ({int(np.count_nonzero(old != new))} values)")
+                sys.exit(1)
+
+    n = len(frames)
+    print(f"✅ {n} frames x {args.boxes} boxes: mask, overlay and pure images byte-identical")
+    print(f"  legacy     : {legacy_time / n * 1000:8.2f} ms/frame")
+    print(f"  vectorized : {vectorized_time / n * 1000:8.2f} ms/frame")
+    print(f"  speedup    : {legacy_time / max(vectorized_time, 1e-9):8.1f}x")
+
+    # Raw DICOM-like frames: temp PNG round trip vs in memory
+    png_time = memory_time = 0.0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for idx, (gray, _, boxes) in enumerate(frames):
+            raw = gray.astype(np.uint16) * 7 + rng.integers(0, 7, size=gray.shape, dtype=np.uint16)
+            t0 = time.perf_counter()
+            old_arrays = temp_png_hotspot_arrays(raw, boxes, Path(temp_dir))
+            t1 = time.perf_counter()
+            new_arrays = compute_hotspot_arrays(raw, boxes)
+            t2 = time.perf_counter()
+            png_time += t1 - t0
+            memory_time += t2 - t1
+
+            for name, old, new in zip(("mask", "blended", "pure"), old_arrays, new_arrays):
+                if old.tobytes() != new.tobytes():
+                    print(f"❌ Raw frame {idx}: {name} differs ({int(np.count_nonzero(old != new))} values)")
+                    sys.exit(1)
+
+    print(f"✅ {n} raw frames: in-memory arrays identical to the temp-PNG route")
+    print(f"  temp PNG   : {png_time / n * 1000:8.2f} ms/frame")
+    print(f"  in memory  : {memory_time / n * 1000:8.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
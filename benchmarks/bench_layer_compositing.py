@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# benchmarks/bench_layer_compositing.py
+"""
+Benchmark: timeline layer compositing (legacy float blender vs premultiplied compositor).
+
+Builds synthetic 2-5 layer stacks (grayscale Original + transparent
+segmentation / hotspot / bbox overlays) at 1024x256 and at 4x zoom
+(4096x1024) and times, per full stack flattened onto white:
+
+- legacy      : apply_opacity_to_image + pairwise float32 blend per layer
+                + Image.alpha_composite onto white (the old timeline path)
+- pil         : PIL's C alpha_composite chain (opacity applied to alpha first)
+- compositor  : core.utils.compositor.LayerCompositor (premultiplied layers
+                cached, one fused pass, reused buffers)
+
+and reports the max per-pixel difference of each method against legacy.
+
+Usage:
+    python benchmarks/bench_layer_compositing.py [--repeats 20] [--scales 1 4] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.utils.compositor import LayerCompositor
+
+LAYER_NAMES = ["Original", "Segmentation", "Hotspot", "HotspotBBox", "Extra"]
+OPACITIES = {"Original": 1.0, "Segmentation": 0.7, "Hotspot": 0.8, "HotspotBBox": 1.0, "Extra": 0.5}
+
+
+# ----------------------------------------------------------------------------- legacy reference
+
+def legacy_apply_opacity(image: Image.Image, opacity: float) -> Image.Image:
+    data = np.array(image.copy())
+    data[:, :, 3] = (data[:, :, 3] * opacity).astype(np.uint8)
+    return Image.fromarray(data, 'RGBA')
+
+
+def legacy_blend(base_layer: Image.Image, overlay_layer: Image.Image, overlay_opacity: float = 1.0) -> Image.Image:
+    """Original blend_layers_with_transparency (kept verbatim as the reference)."""
+    base_data = np.array(base_layer, dtype=np.float32)
+    overlay_data = np.array(overlay_layer, dtype=np.float32)
+    overlay_data[:, :, 3] *= overlay_opacity
+    base_alpha = base_data[:, :, 3] / 255.0
+    overlay_alpha = overlay_data[:, :, 3] / 255.0
+    combined_alpha = overlay_alpha + base_alpha * (1.0 - overlay_alpha)
+    combined_alpha_safe = np.where(combined_alpha == 0, 1.0, combined_alpha)
+    result_rgb = np.zeros_like(base_data[:, :, :3])
+    for i in range(3):
+        result_rgb[:, :, i] = (
+            overlay_data[:, :, i] * overlay_alpha +
+            base_data[:, :, i] * base_alpha * (1.0 - overlay_alpha)
+        ) / combined_alpha_safe
+    result_data = np.zeros_like(base_data)
+    result_data[:, :, :3] = result_rgb
+    result_data[:, :, 3] = combined_alpha * 255.0
+    result_data = np.clip(result_data, 0, 255).astype(np.uint8)
+    return Image.fromarray(result_data, 'RGBA')
+
+
+def legacy_composite(stack, opacities) -> np.ndarray:
+    """Old timeline path: opacity per layer, pairwise blends, flatten onto white."""
+    layers = [legacy_apply_opacity(img, op) if op < 1.0 else img for img, op in zip(stack, opacities)]
+    result = layers[0].copy()
+    for overlay in layers[1:]:
+        result = legacy_blend(result, overlay.copy(), 1.0)
+    background = Image.new('RGB', result.size, (255, 255, 255)).convert('RGBA')
+    return np.asarray(Image.alpha_composite(background, result).convert('RGB'))
+
+
+def pil_composite(stack, opacities) -> np.ndarray:
+    """PIL C alpha_composite chain onto white."""
+    result = Image.new('RGBA', stack[0].size, (255, 255, 255, 255))
+    for img, op in zip(stack, opacities):
+        if op < 1.0:
+            alpha = img.getchannel('A').point(lambda a, op=op: int(a * op))
+            img = img.copy()
+            img.putalpha(alpha)
+        result = Image.alpha_composite(result, img)
+    return np.asarray(result.convert('RGB'))
+
+
+# ----------------------------------------------------------------------------- synthetic layers
+
+def make_layers(rng, scale: int):
+    height, width = 1024 * scale, 256 * scale
+    yy, xx = np.mgrid[0:height, 0:width]
+
+    body = np.exp(-((xx - width / 2) / (width / 5)) ** 2) * 200
+    original = np.clip(body + rng.normal(0, 10, body.shape), 0, 255).astype(np.uint8)
+    layers = [Image.fromarray(original).convert('RGBA')]
+
+    for _ in range(len(LAYER_NAMES) - 1):
+        rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        for _ in range(rng.integers(5, 15)):
+            cy, cx = rng.integers(0, height), rng.integers(0, width)
+            r = rng.integers(5, 40) * scale
+            blob = (yy - cy) ** 2 + (xx - cx) ** 2 < r ** 2
+            rgba[blob, :3] = rng.integers(1, 256, 3)
+            rgba[blob, 3] = 255
+        layers.append(Image.fromarray(rgba, 'RGBA'))
+    return layers
+
+
+def timed(fn, repeats):
+    fn()  # warm-up (also fills the compositor cache)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - t0) / repeats * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark timeline layer compositing")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per case")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4], help="Zoom factors (1 = 1024x256)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    all_ok = True
+
+    for scale in args.scales:
+        layers = make_layers(rng, scale)
+        print(f"\n{1024 * scale}x{256 * scale}")
+        print(f"  {'layers':<7} {'legacy ms':>10} {'pil ms':>8} {'compositor ms':>14} {'speedup':>8} {'max diff':>9}")
+
+        for n_layers in range(2, len(LAYER_NAMES) + 1):
+            stack = layers[:n_layers]
+            opacities = [OPACITIES[name] for name in LAYER_NAMES[:n_layers]]
+            compositor = LayerCompositor()
+
+            legacy_ms, reference = timed(lambda: legacy_composite(stack, opacities), args.repeats)
+            pil_ms, pil_result = timed(lambda: pil_composite(stack, opacities), args.repeats)
+            comp_ms, comp_result = timed(lambda: compositor.composite(stack, opacities), args.repeats)
+
+            diff = max(
+                int(np.abs(comp_result.astype(np.int16) - reference).max()),
+                int(np.abs(pil_result.astype(np.int16) - reference).max()),
+            )
+            ok = diff <= 3  # legacy truncates at every step, the compositor rounds once
+            all_ok &= ok
+            print(f"  {'✅' if ok else '❌'} {n_layers:<4} {legacy_ms:10.2f} {pil_ms:8.2f} {comp_ms:14.2f} "
+                  f"{legacy_ms / max(comp_ms, 1e-9):7.1f}x {diff:9d}")
+
+    print(f"\n{'✅ All methods agree with legacy' if all_ok else '❌ Difference above tolerance'}")
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# benchmarks/bench_otsu_threshold.py
+"""
+Benchmark: shared Otsu kernels (core.utils.otsu) vs the two per-box originals.
+
+Times, on synthetic hotspot boxes (uint8 crops of bone-scan-like frames):
+
+- hist     : otsu_threshold_hist / otsu_thresholds_hist (one batched pass
+             over all boxes) against hotspot_processor's histogram Otsu
+- stepped  : otsu_threshold_stepped / otsu_thresholds_stepped against the
+             threshold sweep of models/hotspot_detection/algorithm_otsu_filling
+             (step 10, as the pipeline calls it, and a fine float step on
+             normalized boxes)
+
+The originals are the verbatim references of tests/test_otsu.py, which
+checks that all thresholds are identical.
+
+Usage:
+    python benchmarks/bench_otsu_threshold.py [--boxes 500] [--repeats 3] [--seed 0]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.utils.otsu import (
+    gather_box_values,
+    otsu_threshold_hist,
+    otsu_threshold_stepped,
+    otsu_thresholds_hist,
+    otsu_thresholds_stepped,
+)
+from tests.test_otsu import legacy_threshold_otsu, legacy_threshold_otsu_impl
+
+
+# ----------------------------------------------------------------------------- synthetic data
+
+def make_boxes(rng: np.random.Generator, n_boxes: int, height: int = 1024, width: int = 256):
+    """A bone-scan-like uint8 frame plus hotspot boxes, with a few degenerate ones mixed in."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    frame = rng.poisson(20, size=(height, width)).astype(np.float32)
+    boxes = []
+    for i in range(n_boxes):
+        cx, cy = int(rng.integers(10, width - 10)), int(rng.integers(10, height - 10))
+        r = rng.uniform(2, 10)
+        frame += rng.uniform(40, 230) * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2.0 * r * r))
+        half_w, half_h = int(rng.integers(1, 20)), int(rng.integers(1, 20))
+        boxes.append((max(cx - half_w, 0), max(cy - half_h, 0),
+                      min(cx + half_w, width), min(cy + half_h, height)))
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    # Degenerate boxes: flat, single pixel, near-black and near-white (uint8 wrap-around in the sweep)
+    frame[0:8, 0:8] = 77
+    frame[8:16, 0:8] = rng.integers(0, 6, size=(8, 8))
+    frame[16:24, 0:8] = rng.integers(250, 256, size=(8, 8))
+    boxes += [(0, 0, 8, 8), (0, 0, 1, 1), (0, 8, 8, 16), (0, 16, 8, 24)]
+    return frame, boxes
+
+
+def timed(fn, repeats):
+    """Best wall-clock time of ``repeats`` calls."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the shared Otsu kernels")
+    parser.add_argument("--boxes", type=int, default=500, help="Hotspot boxes")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    frame, boxes = make_boxes(rng, args.boxes)
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    values, offsets = gather_box_values(frame, boxes)
+
+    # --- histogram Otsu (hotspot_processor, nbins=10 and 256)
+    for nbins in (10, 256):
+        legacy_s = timed(lambda: [legacy_threshold_otsu_impl(c, nbins) for c in crops], args.repeats)
+        single_s = timed(lambda: [otsu_threshold_hist(c, nbins) for c in crops], args.repeats)
+        batch_s = timed(lambda: otsu_thresholds_hist(values, offsets, nbins), args.repeats)
+        print(f"hist nbins={nbins:<3}         : legacy {legacy_s * 1000:7.1f} ms | per box {single_s * 1000:7.1f} ms"
+              f" | batched {batch_s * 1000:7.1f} ms ({legacy_s / max(batch_s, 1e-9):.0f}x)")
+
+    # --- threshold sweep (algorithm_otsu_filling): step 10 on uint8, fine step on normalized floats
+    normalized = [c.astype(np.float32) / 255.0 for c in crops]
+    for label, boxes_in, step in (("uint8, step 10", crops, 10), ("float, step 0.01", normalized, 0.01)):
+        flat_values = np.concatenate([b.ravel() for b in boxes_in])
+        legacy_s = timed(lambda: [legacy_threshold_otsu(b, step) for b in boxes_in], 1)
+        single_s = timed(lambda: [otsu_threshold_stepped(b, step) for b in boxes_in], args.repeats)
+        batch_s = timed(lambda: otsu_thresholds_stepped(flat_values, offsets, step), args.repeats)
+        print(f"stepped {label:<16}: legacy {legacy_s * 1000:7.1f} ms | per box {single_s * 1000:7.1f} ms"
+              f" | batched {batch_s * 1000:7.1f} ms ({legacy_s / max(batch_s, 1e-9):.0f}x)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
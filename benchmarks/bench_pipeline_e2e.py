@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+# benchmarks/bench_pipeline_e2e.py
+"""
+Benchmark: end-to-end import pipeline on synthetic bone-scan studies.
+
+Generates reproducible two-frame (Anterior / Posterior) 1024x256 uint16
+bone-scan DICOMs - body outline, Poisson noise and planted Gaussian
+hotspots - for a few synthetic patients, imports them into a throwaway
+``data/SPECT/<session>/<patient>`` tree with the ImportScheduler and times
+every stage from the pipeline trace (core.tracing):
+
+- import.*            : read, copy, segmentation, write, detection (YOLO),
+                        otsu, classification, quantification (BSI), record
+- segmentation / detection / otsu / classification / bsi spans inside them
+- viewer.*            : timeline-side loading of each imported study - header
+                        open, frame decode, layer PNG loading (with the black
+                        -> transparent pass) and LayerCompositor compositing
+
+Models whose weights or packages are missing are replaced by stubs with the
+real input/output contract (nnU-Net -> banded body-threshold labels, YOLO ->
+blob boxes around the planted hotspots, XGBoost/radiomics -> box-label
+predictions), so the surrounding I/O and the Otsu / BSI code are still
+measured. ``--stub-models`` forces the stubs, which keeps results comparable
+between machines with and without the weights. Stubs are patched into this
+process, so the inference worker is disabled and the CPU stages run
+in-process (cpu_workers=0) whenever one of them is stubbed.
+
+Results are written as JSON (config, stubs, wall time, studies/minute and
+per-stage count / mean / p50..p99 / max / total); ``--baseline`` compares a
+run against a stored result and exits 1 when a stage's p50 regressed by more
+than ``--tolerance``.
+
+Usage:
+    python benchmarks/bench_pipeline_e2e.py [--studies 8] [--patients 4] [--seed 0]
+    python benchmarks/bench_pipeline_e2e.py --stub-models --save-baseline benchmarks/baseline_e2e.json
+    python benchmarks/bench_pipeline_e2e.py --stub-models --baseline benchmarks/baseline_e2e.json --output run.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+# Stubs only exist in this process
+os.environ["INFERENCE_WORKER_ENABLED"] = "false"
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+BENCHMARK_NAME = "pipeline_e2e"
+RESULT_VERSION = 1
+VIEWS = ("Anterior", "Posterior")
+MIN_REGRESSION_DELTA_S = 0.005   # ignore p50 changes smaller than this (timer noise)
+
+
+# ----------------------------------------------------------------------------- synthetic studies
+
+def make_view(rng, hotspots, height=1024, width=256):
+    """Whole-body-like frame: dim body outline, Poisson noise and the given hotspots."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    body = np.exp(-((xx - width / 2) / (width / 5)) ** 2) * 40
+    body *= (yy > 40) & (yy < height - 30)
+    frame = rng.poisson(body + 2).astype(np.float32)
+    for cy, cx, sigma, amplitude in hotspots:
+        frame += amplitude * np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * sigma ** 2))
+    return np.clip(frame, 0, 65535).astype(np.uint16)
+
+
+def plant_hotspots(rng, height=1024, width=256):
+    """2-6 hotspots (cy, cx, sigma, amplitude); amplitudes above 180 read as abnormal."""
+    return [
+        (int(rng.integers(100, height - 100)), int(rng.integers(60, width - 60)),
+         float(rng.uniform(4, 10)), float(rng.uniform(120, 260)))
+        for _ in range(rng.integers(2, 7))
+    ]
+
+
+def write_study_dicom(path: Path, patient_id: str, study_date: str, frames: np.ndarray) -> Path:
+    """Two-frame NM DICOM in the layout the scanner exports."""
+    import pydicom
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+    meta = FileMetaDataset()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.20"  # NM Image Storage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+
+    ds = FileDataset(str(path), {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.PatientID = patient_id
+    ds.PatientName = f"Bench^{patient_id}"
+    ds.StudyDate = study_date
+    ds.Modality = "NM"
+    ds.NumberOfFrames = frames.shape[0]
+    ds.Rows, ds.Columns = frames.shape[1:]
+    ds.PixelSpacing = [2.4, 2.4]
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = frames.astype(np.uint16).tobytes()
+    ds.save_as(path, enforce_file_format=True)
+    return path
+
+
+def generate_studies(out_dir: Path, n_studies: int, n_patients: int, seed: int):
+    """
+    Write the synthetic source DICOMs.
+
+    Returns:
+        ({dicom_path: view_assignments}, planted hotspot count)
+    """
+    rng = np.random.default_rng(seed)
+    assignments = {}
+    planted = 0
+    for i in range(n_studies):
+        patient_id = f"BENCH{i % n_patients:03d}"
+        # Follow-up studies of a patient are three months apart
+        study_date = f"{2024 + (i // n_patients) // 4}{3 * ((i // n_patients) % 4) + 1:02d}15"
+        views = []
+        for _ in VIEWS:
+            hotspots = plant_hotspots(rng)
+            planted += len(hotspots)
+            views.append(make_view(rng, hotspots))
+        path = write_study_dicom(out_dir / f"{patient_id}_{study_date}.dcm", patient_id, study_date, np.stack(views))
+        assignments[path] = {index: view for index, view in enumerate(VIEWS)}
+    return assignments, planted
+
+
+# ----------------------------------------------------------------------------- model stubs
+
+def stub_label_mask(frame: np.ndarray) -> np.ndarray:
+    """Segmentation stand-in: smoothed body threshold split into 12 vertical bands (labels 1-12)."""
+    from scipy import ndimage
+
+    smooth = ndimage.uniform_filter(frame.astype(np.float32), size=9)
+    body = smooth > 8
+    bands = np.minimum(np.arange(frame.shape[0]) * 12 // frame.shape[0], 11) + 1
+    return (body * bands[:, None]).astype(np.uint8)
+
+
+def stub_predict_bone_masks(frames, *, batch_size=None, num_threads=None, use_cache=True, profile=None):
+    from features.spect_viewer.logic.segmenter import SegmentationResult
+    return [SegmentationResult(stub_label_mask(np.asarray(frame))) for frame in frames]
+
+
+def stub_segment_frame(image, *, use_cache=True, profile=None):
+    return stub_predict_bone_masks([image])[0]
+
+
+def stub_detections(frame: np.ndarray):
+    """YOLO stand-in: one box per bright blob, labelled by its peak like the planted amplitudes."""
+    from scipy import ndimage
+
+    image = np.asarray(frame, dtype=np.float32)
+    if image.ndim == 3:
+        image = image[..., 0] if image.shape[-1] in (3, 4) else image[0]
+    smooth = ndimage.gaussian_filter(image, 2)
+    labels, count = ndimage.label(smooth > 90)
+    detections = []
+    for index, region in enumerate(ndimage.find_objects(labels), 1):
+        if region is None:
+            continue
+        peak = float(smooth[region][labels[region] == index].max())
+        abnormal = peak > 180
+        y, x = region
+        detections.append({
+            "label": "Abnormal" if abnormal else "Normal",
+            "class_id": 0 if abnormal else 1,
+            "confidence": min(0.99, peak / 300.0),
+            "bbox": [float(max(x.start - 3, 0)), float(max(y.start - 3, 0)),
+                     float(min(x.stop + 3, image.shape[1])), float(min(y.stop + 3, image.shape[0]))],
+        })
+    return detections
+
+
+def stub_inference_detection_batch(frames, batch_size=None):
+    return [stub_detections(frame) for frame in frames]
+
+
+def stub_run_classification_inference(raw_path, segment_path, hotspot_path, xml_path):
+    """Classification stand-in: the box label is the prediction, hotspot pixels inside the box the area."""
+    from PIL import Image
+    from features.spect_viewer.logic import classification_wrapper
+
+    boxes = classification_wrapper.load_xml_bounding_boxes(Path(xml_path))
+    if not boxes:
+        return [], None
+    hotspot = np.asarray(Image.open(hotspot_path).convert("L")) > 0
+    mask = np.zeros(hotspot.shape + (3,), dtype=np.uint8)
+
+    results = []
+    for box in boxes:
+        xmin, ymin, xmax, ymax = box["xmin"], box["ymin"], box["xmax"], box["ymax"]
+        ys, xs = np.nonzero(hotspot[ymin:ymax, xmin:xmax])
+        coordinates = np.stack([ys + ymin, xs + xmin], axis=1).astype(np.int32)
+        abnormal = box["label"].lower() == "abnormal"
+        mask[coordinates[:, 0], coordinates[:, 1]] = [255, 0, 0] if abnormal else [255, 241, 188]
+        box_pixels = max(1, (ymax - ymin) * (xmax - xmin))
+        results.append({
+            "bounding_box": {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax},
+            "coordinates": coordinates,
+            "segment": "Unknown",
+            "prediction": "Abnormal" if abnormal else "Normal",
+            "probability_abnormal": 0.9 if abnormal else 0.1,
+            "probability_normal": 0.1 if abnormal else 0.9,
+            "area_measurements": {
+                "hotspot_pixels": int(len(coordinates)),
+                "hotspot_mm2": float(len(coordinates)) * 2.4 * 2.4,
+                "segment_pixels": box_pixels,
+                "segment_mm2": box_pixels * 2.4 * 2.4,
+                "ratio_pixels": len(coordinates) / box_pixels,
+                "ratio_mm2": len(coordinates) / box_pixels,
+            },
+            "raw_features": {},
+        })
+    return results, mask
+
+
+def segmentation_available() -> bool:
+    try:
+        from features.spect_viewer.logic.segmenter import load_bone_model
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_bone_model()
+        return True
+    except Exception:
+        return False
+
+
+def detection_available() -> bool:
+    from core.config.paths import YOLO_MODEL_PATH
+    try:
+        import ultralytics  # noqa: F401
+    except ImportError:
+        return False
+    return YOLO_MODEL_PATH.exists()
+
+
+def classification_available() -> bool:
+    from core.config.paths import CLASSIFICATION_MODEL_PATH
+    try:
+        import radiomics  # noqa: F401
+        import xgboost  # noqa: F401
+    except ImportError:
+        return False
+    return (CLASSIFICATION_MODEL_PATH / "model_classification_hs_xgboost_250724.pkl").exists()
+
+
+def install_stubs(force: bool) -> dict:
+    """Patch stubs in for every model that cannot run here; returns {stage: stubbed}."""
+    stubs = {
+        "segmentation": force or not segmentation_available(),
+        "detection": force or not detection_available(),
+        "classification": force or not classification_available(),
+    }
+
+    if stubs["segmentation"]:
+        from features.spect_viewer.logic import segmenter
+        segmenter.predict_bone_masks = stub_predict_bone_masks
+        segmenter.segment_frame = stub_segment_frame
+
+    if stubs["detection"]:
+        try:
+            import ultralytics  # noqa: F401
+        except ImportError:
+            # box_detection imports YOLO at module level; the stub never constructs it
+            sys.modules["ultralytics"] = types.SimpleNamespace(YOLO=object)
+        from features.spect_viewer.logic import box_detection
+        box_detection.inference_detection_batch = stub_inference_detection_batch
+
+    if stubs["classification"]:
+        from features.spect_viewer.logic import classification_wrapper
+        classification_wrapper.run_classification_inference = stub_run_classification_inference
+
+    return stubs
+
+
+# ----------------------------------------------------------------------------- viewer side
+
+def time_viewer_loading(dicom_paths):
+    """Load every imported study the way the scan timeline does, inside viewer.* spans."""
+    from core.config.paths import get_segmentation_files_with_edited
+    from core.tracing import span, trace_study
+    from core.utils.compositor import LayerCompositor
+    from core.utils.image_converter import load_image_with_transparency
+    from features.dicom_import.logic.lazy_scan import get_pixel_cache, open_scan
+    from PIL import Image
+
+    compositor = LayerCompositor()
+    get_pixel_cache().clear()
+    opacities = {"Original": 1.0, "Segmentation": 0.7, "Hotspot": 0.8}
+
+    for dicom_path in dicom_paths:
+        with trace_study(dicom_path.stem):
+            with span("viewer.open_scan"):
+                scan = open_scan(dicom_path)
+            with span("viewer.decode"):
+                frames = {view: scan["frames"][view] for view in VIEWS}
+
+            for view in VIEWS:
+                with span("viewer.load_layers", view=view):
+                    arr = frames[view]
+                    normalized = ((arr - arr.min()) / max(1, np.ptp(arr)) * 255).astype(np.uint8)
+                    layers = {"Original": Image.fromarray(normalized).convert("RGBA")}
+                    seg_files = get_segmentation_files_with_edited(dicom_path.parent, dicom_path.stem, view)
+                    seg_png = seg_files["png_colored_edited"] if seg_files["png_colored_edited"].exists() else seg_files["png_colored"]
+                    mask_png = dicom_path.parent / f"{dicom_path.stem}_{view.lower()}_classification_mask.png"
+                    for name, path in (("Segmentation", seg_png), ("Hotspot", mask_png)):
+                        if path.exists():
+                            layers[name] = load_image_with_transparency(path, make_transparent=True)
+
+                with span("viewer.composite", layers=len(layers)):
+                    compositor.composite(list(layers.values()), [opacities[name] for name in layers])
+
+
+# ----------------------------------------------------------------------------- results
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def compare_to_baseline(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print per-stage p50 ratios against the baseline; False if any stage regressed."""
+    if baseline.get("stubs") != result["stubs"]:
+        print(f"⚠️  Baseline stubs {baseline.get('stubs')} differ from this run {result['stubs']}")
+    if baseline.get("config", {}).get("studies") != result["config"]["studies"]:
+        print(f"⚠️  Baseline used {baseline.get('config', {}).get('studies')} studies, this run {result['config']['studies']}")
+
+    ok = True
+    print(f"\n{'stage':<32}{'base p50':>12}{'p50':>12}{'ratio':>9}")
+    for name, stats in sorted(result["stages"].items()):
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            print(f"{name[:31]:<32}{'-':>12}{stats['p50'] * 1000:>10.1f}ms{'new':>9}")
+            continue
+        ratio = stats["p50"] / max(base["p50"], 1e-9)
+        regressed = ratio > 1.0 + tolerance and stats["p50"] - base["p50"] > MIN_REGRESSION_DELTA_S
+        ok &= not regressed
+        print(f"{name[:31]:<32}{base['p50'] * 1000:>10.1f}ms{stats['p50'] * 1000:>10.1f}ms"
+              f"{ratio:>8.2f}x{'  ❌' if regressed else ''}")
+
+    for name in sorted(set(baseline.get("stages", {})) - set(result["stages"])):
+        print(f"{name[:31]:<32}{'(missing in this run)':>33}")
+
+    wall_ratio = result["wall_seconds"] / max(baseline.get("wall_seconds", 0.0), 1e-9)
+    print(f"\nWall: {baseline.get('wall_seconds', 0.0):.2f}s -> {result['wall_seconds']:.2f}s ({wall_ratio:.2f}x)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end import pipeline benchmark on synthetic studies")
+    parser.add_argument("--studies", type=int, default=8, help="Synthetic studies to import")
+    parser.add_argument("--patients", type=int, default=4, help="Synthetic patients the studies are spread over")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--session", default="BENCH_E2E", help="Throwaway session code under data/SPECT")
+    parser.add_argument("--concurrency", type=int, default=1, help="Studies imported at once")
+    parser.add_argument("--cpu-workers", type=int, default=0,
+                        help="Processes for Otsu/classification (forced to 0 when classification is stubbed)")
+    parser.add_argument("--stub-models", action="store_true", help="Use the model stubs even where weights exist")
+    parser.add_argument("--output", type=Path, help="Write the result JSON here")
+    parser.add_argument("--save-baseline", type=Path, help="Also store the result as a baseline")
+    parser.add_argument("--baseline", type=Path, help="Compare against this stored result")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown per stage (0.25 = +25%%)")
+    parser.add_argument("--keep", action="store_true", help="Keep the session folder and the trace")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log output")
+    args = parser.parse_args()
+
+    from core.config.paths import get_session_spect_path
+    from core.tracing import enable_tracing, disable_tracing, format_summary, read_trace, summarize
+
+    session_dir = get_session_spect_path(args.session)
+    if session_dir.exists():
+        print(f"❌ {session_dir} already exists - pick another --session or remove it")
+        return 1
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_e2e_"))
+    source_dir = work_dir / "source"
+    source_dir.mkdir()
+
+    print(f"Generating {args.studies} synthetic studies ({args.patients} patients, seed {args.seed})...")
+    assignments, planted = generate_studies(source_dir, args.studies, args.patients, args.seed)
+
+    stubs = install_stubs(args.stub_models)
+    cpu_workers = 0 if stubs["classification"] else args.cpu_workers
+    print(f"Stubbed models: {[stage for stage, stubbed in stubs.items() if stubbed] or 'none'}")
+
+    # Keep the developer's study index out of it
+    from features.dicom_import.logic import study_index
+    study_index._study_index = study_index.StudyIndex(work_dir / "study_index.sqlite3")
+
+    from features.dicom_import.logic.import_scheduler import ImportScheduler
+
+    trace_path = enable_tracing(work_dir / "trace.jsonl")
+    exit_code = 0
+    try:
+        print(f"Importing into {session_dir} (concurrency {args.concurrency}, cpu workers {cpu_workers})...")
+        scheduler = ImportScheduler(args.session, max_concurrent=args.concurrency, cpu_workers=cpu_workers)
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        t0 = time.perf_counter()
+        with quiet:
+            summary = scheduler.run(assignments)
+        wall = time.perf_counter() - t0
+
+        if summary.failed:
+            for src, error in summary.failed.items():
+                print(f"❌ {src.name}: {error}")
+            exit_code = 1
+
+        with (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())):
+            time_viewer_loading(summary.results)
+        disable_tracing()
+
+        stages = summarize(read_trace(trace_path))
+        print(f"\n{format_summary(stages)}\n")
+
+        result = {
+            "benchmark": BENCHMARK_NAME,
+            "version": RESULT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "machine": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                "studies": args.studies,
+                "patients": args.patients,
+                "seed": args.seed,
+                "concurrency": args.concurrency,
+                "cpu_workers": cpu_workers,
+                "frame_shape": [1024, 256],
+                "planted_hotspots": planted,
+            },
+            "stubs": stubs,
+            "imported": len(summary.results),
+            "failed": len(summary.failed),
+            "wall_seconds": wall,
+            "studies_per_minute": 60.0 * len(summary.results) / max(wall, 1e-9),
+            "stages": stages,
+        }
+        print(f"✅ {len(summary.results)}/{args.studies} studies in {wall:.2f}s "
+              f"({result['studies_per_minute']:.1f} studies/min)")
+
+        for path in (args.output, args.save_baseline):
+            if path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(json.dumps(result, indent=2), encoding="utf-8")
+                print(f"✅ Result written: {path}")
+
+        if args.baseline:
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+            if compare_to_baseline(result, baseline, args.tolerance):
+                print(f"✅ No stage slower than baseline by more than {args.tolerance:.0%}")
+            else:
+                print(f"❌ Regression against {args.baseline}")
+                exit_code = 1
+    finally:
+        disable_tracing()
+        if args.keep:
+            print(f"Kept: {session_dir} and {work_dir}")
+        else:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
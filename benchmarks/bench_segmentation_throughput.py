@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# benchmarks/bench_segmentation_throughput.py
+"""
+Throughput benchmark: per-frame vs batched nnU-Net bone segmentation.
+
+Runs the real bone model (checkpoint under models/segmentation_2) on synthetic
+SPECT-like frames, first one frame per call (``segment_frame``) and then with
+``predict_bone_masks`` at several batch sizes. The cache is bypassed so every
+frame goes through the network. Reports frames/sec and checks that batched
+masks match the per-frame masks.
+
+Usage:
+    python benchmarks/bench_segmentation_throughput.py [--frames 16] [--batch-sizes 1 2 4 8] [--threads 4] [--cpu]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def make_frame(rng, height=1024, width=256):
+    """Whole-body-like frame: dim body outline plus a few bright hotspots."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    body = np.exp(-((xx - width / 2) / (width / 5)) ** 2) * 40
+    frame = rng.poisson(body + 2).astype(np.float32)
+    for _ in range(rng.integers(2, 6)):
+        cy, cx = rng.integers(100, height - 100), rng.integers(60, width - 60)
+        frame += 200 * np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * rng.uniform(4, 12) ** 2))
+    return frame.astype(np.uint16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched bone segmentation")
+    parser.add_argument("--frames", type=int, default=16, help="Synthetic frames to segment")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8], help="Batch sizes to test")
+    parser.add_argument("--threads", type=int, default=0, help="torch CPU threads (0 = default)")
+    parser.add_argument("--cpu", action="store_true", help="Hide CUDA devices (measure CPU throughput)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    if args.cpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    try:
+        from features.spect_viewer.logic.segmenter import (
+            load_bone_model,
+            predict_bone_masks,
+            segment_frame,
+            _set_torch_threads,
+        )
+        model = load_bone_model()
+    except Exception as e:
+        print(f"❌ Segmentation model unavailable: {e}")
+        sys.exit(1)
+
+    _set_torch_threads(args.threads)
+    rng = np.random.default_rng(args.seed)
+    frames = [make_frame(rng) for _ in range(args.frames)]
+
+    # Warm-up (first forward pass allocates buffers / picks kernels)
+    segment_frame(frames[0], use_cache=False)
+
+    t0 = time.perf_counter()
+    reference = [segment_frame(f, use_cache=False).label_mask for f in frames]
+    serial_time = time.perf_counter() - t0
+
+    print(f"Device: {model.device}, frames: {args.frames} (1024x256)")
+    print(f"  per-frame       : {args.frames / serial_time:7.2f} frames/s")
+
+    for batch_size in args.batch_sizes:
+        t0 = time.perf_counter()
+        results = predict_bone_masks(frames, batch_size=batch_size, use_cache=False)
+        elapsed = time.perf_counter() - t0
+
+        agreement = np.mean([np.mean(r.label_mask == ref) for r, ref in zip(results, reference)])
+        status = "✅" if agreement > 0.999 else "❌"
+        print(f"  {status} batch {batch_size:<3}     : {args.frames / elapsed:7.2f} frames/s "
+              f"(x{serial_time / max(elapsed, 1e-9):.2f}, pixel agreement {agreement:.5f})")
+
+
+if __name__ == "__main__":
+    main()
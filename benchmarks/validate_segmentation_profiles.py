@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# benchmarks/validate_segmentation_profiles.py
+"""
+Validation harness: speed and Dice of each nnU-Net predictor profile.
+
+Segments the same frames with every profile in ``PREDICTOR_PROFILES`` (cache
+bypassed) and reports frames/sec plus Dice against the "accurate" profile,
+so a faster profile can be chosen knowing what it costs in agreement.
+
+Frames come from the given DICOM files/folders (Anterior + Posterior views),
+or from synthetic frames when no path is given.
+
+Usage:
+    python benchmarks/validate_segmentation_profiles.py [paths ...] [--limit 20] [--batch-size 4] [--cpu]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from bench_segmentation_throughput import make_frame
+
+
+def dice_per_label(pred: np.ndarray, ref: np.ndarray) -> dict:
+    """Dice for every foreground label present in either mask."""
+    scores = {}
+    for label in np.union1d(np.unique(pred), np.unique(ref)):
+        if label == 0:
+            continue
+        p, r = pred == label, ref == label
+        denom = p.sum() + r.sum()
+        scores[int(label)] = 2.0 * np.logical_and(p, r).sum() / denom if denom else 1.0
+    return scores
+
+
+def load_frames(paths, limit):
+    """Anterior/Posterior frames of primary DICOMs under the given paths."""
+    from features.dicom_import.logic.dicom_loader import load_frames_and_metadata
+
+    files = []
+    for p in map(Path, paths):
+        files.extend(sorted(p.rglob("*.dcm")) if p.is_dir() else [p])
+
+    frames = []
+    for f in files:
+        try:
+            views, _ = load_frames_and_metadata(str(f))
+        except Exception as e:
+            print(f"⚠️  Skipping {f.name}: {e}")
+            continue
+        frames.extend(views[v] for v in ("Anterior", "Posterior") if v in views)
+        if len(frames) >= limit:
+            break
+    return frames[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare segmentation predictor profiles")
+    parser.add_argument("paths", nargs="*", help="DICOM files or folders (default: synthetic frames)")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of frames")
+    parser.add_argument("--batch-size", type=int, default=4, help="Frames per forward pass")
+    parser.add_argument("--cpu", action="store_true", help="Hide CUDA devices (measure CPU speed)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic frames")
+    args = parser.parse_args()
+
+    if args.cpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    try:
+        from features.spect_viewer.logic.segmenter import PREDICTOR_PROFILES, predict_bone_masks, load_bone_model
+        load_bone_model()
+    except Exception as e:
+        print(f"❌ Segmentation model unavailable: {e}")
+        sys.exit(1)
+
+    if args.paths:
+        frames = load_frames(args.paths, args.limit)
+    else:
+        rng = np.random.default_rng(args.seed)
+        frames = [make_frame(rng) for _ in range(args.limit)]
+    if not frames:
+        print("❌ No frames to segment")
+        sys.exit(1)
+
+    # Warm-up so the first profile is not charged for lazy initialisation
+    predict_bone_masks(frames[:1], use_cache=False, profile="accurate")
+
+    masks, speed = {}, {}
+    for name in PREDICTOR_PROFILES:
+        t0 = time.perf_counter()
+        results = predict_bone_masks(frames, batch_size=args.batch_size, use_cache=False, profile=name)
+        speed[name] = len(frames) / (time.perf_counter() - t0)
+        masks[name] = [r.label_mask for r in results]
+
+    print(f"\n{len(frames)} frame(s), batch size {args.batch_size}")
+    print(f"{'profile':<10} {'dtype':<9} {'frames/s':>9} {'speedup':>8} {'mean Dice':>10} {'min Dice':>9}")
+    for name in PREDICTOR_PROFILES:
+        per_frame = [dice_per_label(m, ref) for m, ref in zip(masks[name], masks["accurate"])]
+        means = [np.mean(list(d.values())) if d else 1.0 for d in per_frame]
+        print(f"{name:<10} {PREDICTOR_PROFILES[name]['dtype']:<9} {speed[name]:9.2f} {speed[name] / speed['accurate']:7.2f}x "
+              f"{np.mean(means):10.4f} {np.min(means):9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,6 @@ import os
 from dotenv import load_dotenv
 from typing import Optional
 import pydicom
-from ultralytics import YOLO
-import cv2
-import matplotlib.pyplot as plt
 
 # Load environment variables
 load_dotenv()
@@ -54,6 +51,20 @@ REPORTS_PATH = OUTPUT_ROOT / "reports"
 CACHE_ROOT = PROJECT_ROOT / ".cache"
 IMAGE_CACHE_PATH = CACHE_ROOT / "images"
 MODEL_CACHE_PATH = CACHE_ROOT / "models"
+SEGMENTATION_CACHE_PATH = CACHE_ROOT / "segmentation"
+SEGMENTATION_CACHE_ENABLED = os.getenv("SEGMENTATION_CACHE_ENABLED", "true").lower() == "true"
+SEGMENTATION_BATCH_SIZE = int(os.getenv("SEGMENTATION_BATCH_SIZE", "4"))
+SEGMENTATION_NUM_THREADS = int(os.getenv("SEGMENTATION_NUM_THREADS", "0"))  # 0 = torch default
+SEGMENTATION_PROFILE = os.getenv("SEGMENTATION_PROFILE", "accurate").lower()  # accurate | balanced | fast
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "8"))
+TIMELINE_LAYER_CACHE_MB = int(os.getenv("TIMELINE_LAYER_CACHE_MB", "256"))  # decoded timeline layers
+SCAN_PIXEL_CACHE_MB = int(os.getenv("SCAN_PIXEL_CACHE_MB", "512"))  # decoded DICOM frames in the viewer
+STUDY_INDEX_PATH = CACHE_ROOT / "study_index.sqlite3"
+STUDY_INDEX_ENABLED = os.getenv("STUDY_INDEX_ENABLED", "true").lower() == "true"  # false = scan DICOM headers every time
+HEADER_SCAN_WORKERS = int(os.getenv("HEADER_SCAN_WORKERS", "8"))  # parallel DICOM header reads (raise on network shares)
+IMPORT_MAX_CONCURRENT = int(os.getenv("IMPORT_MAX_CONCURRENT", "4"))  # studies imported at the same time
+IMPORT_CPU_WORKERS = int(os.getenv("IMPORT_CPU_WORKERS", "4"))  # processes for Otsu / classification, one radiomics task each (0 = inference worker)
+PIPELINE_TRACE_ENABLED = os.getenv("PIPELINE_TRACE", "false").lower() == "true"  # stage spans -> PIPELINE_TRACE_PATH
 
 # Temp paths
 TEMP_IMAGES_PATH = TEMP_ROOT / "images"
@@ -63,6 +74,7 @@ TEMP_PROCESSING_PATH = TEMP_ROOT / "processing"
 APP_LOG_PATH = LOGS_ROOT / "app.log"
 ERROR_LOG_PATH = LOGS_ROOT / "error.log"
 DEBUG_LOG_PATH = LOGS_ROOT / "debug.log"
+PIPELINE_TRACE_PATH = Path(os.getenv("PIPELINE_TRACE_PATH", str(LOGS_ROOT / "pipeline_trace.jsonl")))
 
 # Asset paths (icons, images, etc)
 ASSETS_ROOT = PROJECT_ROOT / "assets"
@@ -111,7 +123,7 @@ def ensure_directories():
         DATA_ROOT, PET_DATA_PATH, SPECT_DATA_PATH, DICOM_DATA_PATH,
         MODELS_ROOT, HOTSPOT_MODEL_PATH, SEGMENTATION_MODEL_PATH, CLASSIFICATION_MODEL_PATH,
         OUTPUT_ROOT, RESULTS_PATH, EXPORTS_PATH, REPORTS_PATH,
-        CACHE_ROOT, IMAGE_CACHE_PATH, MODEL_CACHE_PATH,
+        CACHE_ROOT, IMAGE_CACHE_PATH, MODEL_CACHE_PATH, SEGMENTATION_CACHE_PATH,
         TEMP_ROOT, TEMP_IMAGES_PATH, TEMP_PROCESSING_PATH,
         LOGS_ROOT, ASSETS_ROOT, ICONS_PATH, IMAGES_PATH
     ]
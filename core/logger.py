@@ -1,12 +1,37 @@
 # backend/log.py
+import threading
+from contextlib import contextmanager
 
 _log_callback = None
 
+# Per-thread sink, so concurrent imports each get their own log lines
+_local = threading.local()
+
 def set_log_callback(cb):
     global _log_callback
     _log_callback = cb
 
-def _log(msg: str):
-    print("[LOG]", msg)
+def get_log_sink():
+    """Sink installed on the calling thread by log_to(), or None."""
+    return getattr(_local, "sink", None)
+
+@contextmanager
+def log_to(sink):
+    """Also pass every _log line written by this thread to sink while the block runs."""
+    previous = get_log_sink()
+    _local.sink = sink
+    try:
+        yield
+    finally:
+        _local.sink = previous
+
+def forward_log(msg: str, sink=None):
+    """Deliver a line already printed by another process to the callbacks."""
     if _log_callback:
         _log_callback(msg)
+    if sink:
+        sink(msg)
+
+def _log(msg: str):
+    print("[LOG]", msg)
+    forward_log(msg, get_log_sink())
@@ -0,0 +1,267 @@
+# core/tracing.py - Lightweight span tracing for the analysis pipeline
+"""
+Stage-level timing spans.
+
+Pipeline stages are wrapped in ``span(name)`` (or decorated with ``@traced``);
+while tracing is enabled every finished span is appended to a JSONL trace
+file, one object per line::
+
+    {"name": "import.write", "study": "P1_20240105", "ts": 1718000000.123,
+     "dur": 0.412, "pid": 1234, "tid": 5678, "thread": "import_0",
+     "parent": "import.study", "error": null, "attrs": {...}}
+
+``ts`` is the wall-clock start (epoch seconds), ``dur`` the duration in
+seconds. ``study`` is the per-study ID set with ``trace_study`` on the
+current thread; it follows jobs into the inference worker and the import
+scheduler's CPU processes, which append to the same file.
+
+Tracing is off unless ``PIPELINE_TRACE=true`` (or ``enable_tracing()``);
+a disabled span costs one flag check. ``trace_report.py`` turns a trace into
+per-stage percentiles or a Chrome trace (chrome://tracing, Perfetto).
+
+Usage:
+    with trace_study("P1_20240105"):
+        with span("import.copy", files=2):
+            ...
+
+    @traced("bsi.calculate")
+    def calculate_BSI(...): ...
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core.config.paths import PIPELINE_TRACE_ENABLED, PIPELINE_TRACE_PATH
+
+PERCENTILES = (50, 90, 95, 99)
+
+_enabled = PIPELINE_TRACE_ENABLED
+_trace_path = Path(PIPELINE_TRACE_PATH)
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+# ------------------------------------------------------------------ switches
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable_tracing(path: Optional[Path] = None) -> Path:
+    """
+    Start recording spans (also in processes started from now on).
+
+    Returns:
+        The trace file spans are appended to
+    """
+    global _enabled, _trace_path
+    if path is not None:
+        _trace_path = Path(path)
+    _enabled = True
+    # Spawned workers read these at import
+    os.environ["PIPELINE_TRACE"] = "true"
+    os.environ["PIPELINE_TRACE_PATH"] = str(_trace_path)
+    return _trace_path
+
+
+def disable_tracing() -> None:
+    global _enabled
+    _enabled = False
+    os.environ["PIPELINE_TRACE"] = "false"
+
+
+# ------------------------------------------------------------------ study ID
+def current_study() -> Optional[str]:
+    return getattr(_local, "study", None)
+
+
+def set_trace_study(study_id: Optional[str]) -> None:
+    """Rename the current thread's study (e.g. once the DICOM has been read)."""
+    _local.study = study_id
+
+
+@contextmanager
+def trace_study(study_id: Optional[str]):
+    """Attribute the spans of this thread to study_id while the block runs."""
+    previous = current_study()
+    _local.study = study_id
+    try:
+        yield
+    finally:
+        _local.study = previous
+
+
+# ------------------------------------------------------------------ spans
+def _stack() -> List[str]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _write(record: Dict) -> None:
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _write_lock:
+            _trace_path.parent.mkdir(parents=True, exist_ok=True)
+            # One write per line in append mode: processes can share the file
+            with open(_trace_path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"[TRACE WARN] Could not write trace: {e}")
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as one span (no-op while tracing is disabled)."""
+    if not _enabled:
+        yield
+        return
+
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    ts = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        dur = time.perf_counter() - t0
+        stack.pop()
+        thread = threading.current_thread()
+        # The study is read at the end, so a span that discovers it is attributed too
+        _write({
+            "name": name,
+            "study": current_study(),
+            "ts": ts,
+            "dur": dur,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "thread": thread.name,
+            "parent": parent,
+            "error": error,
+            "attrs": attrs,
+        })
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run the function inside span(name or module.function)."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------------------------------------------------------ reading
+def read_trace(path: Optional[Path] = None) -> List[Dict]:
+    """All span records of a trace file (unparseable lines are skipped)."""
+    records = []
+    with open(path or _trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an ascending list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(records: Iterable[Dict]) -> Dict[str, Dict[str, float]]:
+    """
+    Per-span-name statistics.
+
+    Returns:
+        {name: {"count", "studies", "errors", "total", "mean", "max", "p50", "p90", ...}} in seconds
+    """
+    durations: Dict[str, List[float]] = {}
+    studies: Dict[str, set] = {}
+    errors: Dict[str, int] = {}
+    for record in records:
+        name = record.get("name")
+        durations.setdefault(name, []).append(float(record.get("dur", 0.0)))
+        studies.setdefault(name, set()).add(record.get("study"))
+        errors[name] = errors.get(name, 0) + (1 if record.get("error") else 0)
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        stats = {
+            "count": len(values),
+            "studies": len(studies[name] - {None}),
+            "errors": errors[name],
+            "total": sum(values),
+            "mean": sum(values) / len(values),
+            "max": values[-1],
+        }
+        for pct in PERCENTILES:
+            stats[f"p{pct}"] = _percentile(values, pct)
+        summary[name] = stats
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """Fixed-width table of summarize() output, slowest total first (times in ms)."""
+    pct_cols = "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    lines = [f"{'stage':<32}{'count':>7}{'studies':>9}{'mean':>10}{pct_cols}{'max':>10}{'total s':>10}"]
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        pcts = "".join(f"{stats[f'p{p}'] * 1000:>10.1f}" for p in PERCENTILES)
+        lines.append(
+            f"{name[:31]:<32}{stats['count']:>7}{stats['studies']:>9}{stats['mean'] * 1000:>10.1f}"
+            f"{pcts}{stats['max'] * 1000:>10.1f}{stats['total']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def export_chrome_trace(records: Iterable[Dict], out_path: Path) -> Path:
+    """Write records in the Chrome trace-event format (complete "X" events)."""
+    events = []
+    for record in records:
+        args = {"study": record.get("study"), "parent": record.get("parent")}
+        if record.get("error"):
+            args["error"] = record["error"]
+        args.update(record.get("attrs") or {})
+        events.append({
+            "name": record.get("name"),
+            "cat": str(record.get("name", "")).split(".", 1)[0],
+            "ph": "X",
+            "ts": float(record.get("ts", 0.0)) * 1e6,
+            "dur": float(record.get("dur", 0.0)) * 1e6,
+            "pid": record.get("pid", 0),
+            "tid": record.get("tid", 0),
+            "args": args,
+        })
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    return out_path
@@ -0,0 +1,196 @@
+# core/utils/compositor.py - Premultiplied-alpha layer compositor
+"""
+Fast N-layer "over" compositing for the viewer overlays.
+
+Layers are converted once to planar premultiplied RGBA (PIL's C
+``RGBA -> RGBa`` conversion) and the whole stack is combined in a single pass
+over a float32 accumulator: in premultiplied space "over" is the same expression for colour
+and alpha,
+
+    acc = src * opacity + acc * (1 - src_alpha * opacity)
+
+so there is no per-channel loop, no straight-alpha division per layer and no
+separate "flatten onto white" step - the background is just the initial
+accumulator value.
+
+``composite_layers`` is stateless. ``LayerCompositor`` additionally caches the
+premultiplied form of each layer image and reuses its work / output buffers,
+which is what the timeline uses while an opacity slider is being dragged.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+LayerInput = Union[Image.Image, np.ndarray]
+Background = Optional[Tuple[int, int, int]]
+
+WHITE = (255, 255, 255)
+
+
+def to_premultiplied(image: LayerInput, size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Convert a layer to planar premultiplied uint8 RGBA.
+
+    Args:
+        image: PIL Image (any mode) or HxWx4 straight-alpha uint8 array
+        size: Optional (width, height) to resize to (LANCZOS, like the legacy blender)
+
+    Returns:
+        4xHxW uint8 array (R, G, B, A planes) with colour already multiplied by
+        alpha. Planar layout keeps every per-layer operation a contiguous pass.
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image, 'RGBA')
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    if size is not None and image.size != tuple(size):
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return np.ascontiguousarray(np.asarray(image.convert('RGBa')).transpose(2, 0, 1))
+
+
+def _init_accumulator(acc: np.ndarray, background: Background) -> None:
+    """Transparent: 4 zeroed planes. Opaque background: 3 colour planes (alpha stays 255)."""
+    if background is None:
+        acc.fill(0.0)
+    else:
+        for channel, value in enumerate(background):
+            acc[channel].fill(value)
+
+
+def _composite_into(acc: np.ndarray, scratch: np.ndarray, scaled: np.ndarray,
+                    layers: Sequence[np.ndarray], opacities: Sequence[float]) -> None:
+    """Fold planar premultiplied layers (bottom to top) into the float32 accumulator in place."""
+    channels = acc.shape[0]
+    for layer, opacity in zip(layers, opacities):
+        opacity = float(min(max(opacity, 0.0), 1.0))
+        if opacity <= 0.0:
+            continue
+
+        # scratch = 1 - alpha * opacity   (HxW, broadcast over the planes)
+        np.multiply(layer[3], np.float32(-opacity / 255.0), out=scratch)
+        scratch += 1.0
+        acc *= scratch
+
+        if opacity >= 1.0:
+            acc += layer[:channels]
+        else:
+            np.multiply(layer[:channels], np.float32(opacity), out=scaled)
+            acc += scaled
+
+
+def _finish(acc: np.ndarray, planes: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    """Round the accumulator to uint8 planes and interleave them into an HxWxC output."""
+    acc += 0.5  # round half up on the cast below
+    np.copyto(planes, acc, casting='unsafe')
+    if out is None:
+        out = np.empty(planes.shape[1:] + (planes.shape[0],), dtype=np.uint8)
+    np.copyto(out, planes.transpose(1, 2, 0))
+    return out
+
+
+def composite_layers(layers: Sequence[LayerInput],
+                     opacities: Sequence[float],
+                     background: Background = WHITE,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Composite layers bottom-to-top with per-layer opacity.
+
+    Args:
+        layers: Layer images (PIL or straight-alpha RGBA arrays); the first
+            one defines the output size, others are resized to match
+        opacities: Opacity (0.0-1.0) per layer
+        background: RGB background, or None for a transparent one
+        out: Optional uint8 output buffer (HxWx3, or HxWx4 when background is None)
+
+    Returns:
+        HxWx3 uint8 RGB array flattened onto the background, or - with
+        background=None - an HxWx4 *premultiplied* RGBA array (see to_straight_rgba)
+    """
+    if not layers:
+        raise ValueError("No layers to composite")
+
+    first = to_premultiplied(layers[0])
+    size = (first.shape[2], first.shape[1])
+    premultiplied = [first] + [to_premultiplied(layer, size) for layer in layers[1:]]
+
+    planes_shape = (4 if background is None else 3,) + first.shape[1:]
+    acc = np.empty(planes_shape, dtype=np.float32)
+    scratch = np.empty(first.shape[1:], dtype=np.float32)
+    scaled = np.empty(planes_shape, dtype=np.float32)
+    planes = np.empty(planes_shape, dtype=np.uint8)
+    _init_accumulator(acc, background)
+    _composite_into(acc, scratch, scaled, premultiplied, opacities)
+    return _finish(acc, planes, out)
+
+
+def to_straight_rgba(premultiplied: np.ndarray) -> Image.Image:
+    """Premultiplied HxWx4 uint8 array -> straight-alpha RGBA PIL Image."""
+    return Image.fromarray(premultiplied, 'RGBa').convert('RGBA')
+
+
+class LayerCompositor:
+    """
+    Reusable compositor: caches premultiplied layers and reuses buffers.
+
+    Layers are cached by image identity (the image is referenced by the cache,
+    so its id cannot be reused while cached) - callers must treat layer images
+    as immutable, which the timeline's decoded-layer cache already requires.
+    The returned array is an internal buffer, overwritten by the next call with
+    the same output shape; copy it (e.g. into a QPixmap) before compositing again.
+    """
+
+    def __init__(self, max_cached_layers: int = 64):
+        self.max_cached_layers = max_cached_layers
+        self._premultiplied: "OrderedDict[Tuple[int, Tuple[int, int]], Tuple[LayerInput, np.ndarray]]" = OrderedDict()
+        self._buffers: Dict[Tuple[Tuple[int, ...], bool], Tuple[np.ndarray, ...]] = {}
+
+    def premultiplied(self, image: LayerInput, size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Cached to_premultiplied()"""
+        key = (id(image), tuple(size) if size is not None else None)
+        entry = self._premultiplied.get(key)
+        if entry is not None and entry[0] is image:
+            self._premultiplied.move_to_end(key)
+            return entry[1]
+
+        array = to_premultiplied(image, size)
+        self._premultiplied[key] = (image, array)
+        while len(self._premultiplied) > self.max_cached_layers:
+            self._premultiplied.popitem(last=False)
+        return array
+
+    def _work_buffers(self, shape: Tuple[int, ...], transparent: bool):
+        key = (shape, transparent)
+        if key not in self._buffers:
+            planes_shape = (4 if transparent else 3,) + shape[1:]
+            self._buffers[key] = (
+                np.empty(planes_shape, dtype=np.float32),               # accumulator
+                np.empty(shape[1:], dtype=np.float32),                  # 1 - alpha * opacity
+                np.empty(planes_shape, dtype=np.float32),               # layer * opacity
+                np.empty(planes_shape, dtype=np.uint8),                 # rounded planes
+                np.empty(shape[1:] + planes_shape[:1], dtype=np.uint8), # interleaved output
+            )
+        return self._buffers[key]
+
+    def composite(self, layers: Sequence[LayerInput],
+                  opacities: Sequence[float],
+                  background: Background = WHITE) -> np.ndarray:
+        """Same as composite_layers(), using cached layers and the internal buffers."""
+        if not layers:
+            raise ValueError("No layers to composite")
+
+        first = self.premultiplied(layers[0])
+        size = (first.shape[2], first.shape[1])
+        premultiplied = [first] + [self.premultiplied(layer, size) for layer in layers[1:]]
+
+        acc, scratch, scaled, planes, out = self._work_buffers(first.shape, background is None)
+        _init_accumulator(acc, background)
+        _composite_into(acc, scratch, scaled, premultiplied, opacities)
+        return _finish(acc, planes, out)
+
+    def clear(self) -> None:
+        self._premultiplied.clear()
+        self._buffers.clear()
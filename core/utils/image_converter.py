@@ -5,6 +5,8 @@ from PIL import Image
 from pathlib import Path
 from typing import Union, Tuple, Optional
 
+from .compositor import composite_layers, to_straight_rgba
+
 
 def load_frames_and_metadata_matrix(path: str):
     """
@@ -123,9 +125,8 @@ def apply_opacity_to_image(image: Image.Image, opacity: float) -> Image.Image:
     if image.mode != 'RGBA':
         image = image.convert('RGBA')
     
-    # Create a copy to avoid modifying the original
-    image_copy = image.copy()
-    data = np.array(image_copy)
+    # np.array already copies, the original is left untouched
+    data = np.array(image)
     
     # Apply opacity to alpha channel
     data[:, :, 3] = (data[:, :, 3] * opacity).astype(np.uint8)
@@ -147,49 +148,9 @@ def blend_layers_with_transparency(base_layer: Image.Image,
     Returns:
         Blended PIL Image
     """
-    # Ensure both images are RGBA
-    if base_layer.mode != 'RGBA':
-        base_layer = base_layer.convert('RGBA')
-    if overlay_layer.mode != 'RGBA':
-        overlay_layer = overlay_layer.convert('RGBA')
-    
-    # Resize overlay to match base if needed
-    if overlay_layer.size != base_layer.size:
-        overlay_layer = overlay_layer.resize(base_layer.size, Image.Resampling.LANCZOS)
-    
-    # Convert to numpy arrays
-    base_data = np.array(base_layer, dtype=np.float32)
-    overlay_data = np.array(overlay_layer, dtype=np.float32)
-    
-    # Apply global opacity to overlay
-    overlay_data[:, :, 3] *= overlay_opacity
-    
-    # Get alpha channels
-    base_alpha = base_data[:, :, 3] / 255.0
-    overlay_alpha = overlay_data[:, :, 3] / 255.0
-    
-    # Calculate combined alpha (Porter-Duff "over" operation)
-    combined_alpha = overlay_alpha + base_alpha * (1.0 - overlay_alpha)
-    
-    # Avoid division by zero
-    combined_alpha_safe = np.where(combined_alpha == 0, 1.0, combined_alpha)
-    
-    # Blend RGB channels
-    result_rgb = np.zeros_like(base_data[:, :, :3])
-    for i in range(3):  # RGB channels
-        result_rgb[:, :, i] = (
-            overlay_data[:, :, i] * overlay_alpha + 
-            base_data[:, :, i] * base_alpha * (1.0 - overlay_alpha)
-        ) / combined_alpha_safe
-    
-    # Combine result
-    result_data = np.zeros_like(base_data)
-    result_data[:, :, :3] = result_rgb
-    result_data[:, :, 3] = combined_alpha * 255.0
-    
-    # Convert back to PIL Image
-    result_data = np.clip(result_data, 0, 255).astype(np.uint8)
-    return Image.fromarray(result_data, 'RGBA')
+    # Single premultiplied "over" pass (see core.utils.compositor)
+    result = composite_layers([base_layer, overlay_layer], [1.0, overlay_opacity], background=None)
+    return to_straight_rgba(result)
 
 
 def create_composite_image(layers: dict, 
@@ -212,44 +173,28 @@ def create_composite_image(layers: dict,
     if layer_opacities is None:
         layer_opacities = {"Original": 1.0, "Segmentation": 0.7, "Hotspot": 0.8}
     
-    # Find the first available layer as base
-    base_layer = None
-    for layer_name in layer_order:
-        if layer_name in layers and layers[layer_name] is not None:
-            base_layer = layers[layer_name].copy()
-            if base_layer.mode != 'RGBA':
-                base_layer = base_layer.convert('RGBA')
-            break
-    
-    if base_layer is None:
-        # No layers available, return a blank image
-        return Image.new('RGBA', (512, 512), (0, 0, 0, 0))
-    
-    # Start with the base layer
-    result = base_layer
-    base_layer_processed = False
-    
-    # Composite remaining layers on top
+    # Collect available layers bottom-to-top
+    stack, opacities = [], []
     for layer_name in layer_order:
         if layer_name not in layers or layers[layer_name] is None:
             continue
-            
-        # Skip if this was our base layer
-        if not base_layer_processed:
-            base_layer_processed = True
-            continue
         
-        overlay = layers[layer_name].copy()
-        opacity = layer_opacities.get(layer_name, 1.0)
+        layer = layers[layer_name]
         
-        # Apply transparency to non-Original layers
-        if layer_name in ["Segmentation", "Hotspot"]:
-            overlay = make_black_transparent(overlay)
+        # Apply transparency to non-Original overlay layers (the base is kept as-is)
+        if stack and layer_name in ["Segmentation", "Hotspot"]:
+            layer = make_black_transparent(layer)
         
-        # Blend with current result
-        result = blend_layers_with_transparency(result, overlay, opacity)
+        stack.append(layer)
+        # The base layer is copied at full opacity, like the pairwise blend did
+        opacities.append(layer_opacities.get(layer_name, 1.0) if len(stack) > 1 else 1.0)
+    
+    if not stack:
+        # No layers available, return a blank image
+        return Image.new('RGBA', (512, 512), (0, 0, 0, 0))
     
-    return result
+    # Composite all layers in one premultiplied pass
+    return to_straight_rgba(composite_layers(stack, opacities, background=None))
 
 
 def get_layer_preview(layer_name: str, 
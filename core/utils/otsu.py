@@ -0,0 +1,180 @@
+# core/utils/otsu.py - Shared Otsu threshold kernels
+"""
+Otsu thresholds for the hotspot boxes, computed from cumulative sums.
+
+Every candidate split's between-class variance ``w0 * w1 * (mu0 - mu1)**2``
+follows from running pixel counts and running sums, so all candidates are
+scored in one pass instead of re-filtering the pixels per candidate. Two
+flavours exist, matching the two pipelines that use them:
+
+* ``otsu_threshold_hist`` - histogram Otsu (``hotspot_processor``): ``nbins``
+  bins over ``value_range``, O(pixels + nbins); returns the bin centre of the
+  best split.
+* ``otsu_threshold_stepped`` - threshold sweep of
+  ``models/hotspot_detection/algorithm_otsu_filling``: candidates
+  ``arange(min + step, max - step, step)``, pixels ``< t`` vs ``>= t``, lowest
+  within-class variance (= highest between-class variance) wins,
+  O(pixels log pixels + candidates).
+
+Both accept many boxes at once in a ragged layout: the pixels of all boxes
+concatenated into one 1-D ``values`` array and ``offsets`` (length
+``n_boxes + 1``) marking where each box starts and ends - see
+``gather_box_values``. The histogram kernel then scores every box in one
+vectorized pass.
+
+Usage:
+    t = otsu_threshold_hist(gray[y0:y1, x0:x1], nbins=10)
+    values, offsets = gather_box_values(gray, [(x0, y0, x1, y1), ...])
+    ts = otsu_thresholds_hist(values, offsets, nbins=10)
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# ------------------------------------------------------------------ ragged layout
+def gather_box_values(image: np.ndarray,
+                      boxes: Iterable[Sequence[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ragged layout of the pixels inside boxes.
+
+    Args:
+        image: 2-D image
+        boxes: (x_min, y_min, x_max, y_max, ...) boxes, already clamped to the image
+
+    Returns:
+        (values, offsets): the row-major pixels of every box concatenated, and
+        the start of each box in ``values`` plus the total length at the end
+    """
+    crops = [image[int(box[1]):int(box[3]), int(box[0]):int(box[2])].ravel() for box in boxes]
+    offsets = np.zeros(len(crops) + 1, dtype=np.intp)
+    if crops:
+        np.cumsum([crop.size for crop in crops], out=offsets[1:])
+        values = np.concatenate(crops)
+    else:
+        values = np.empty(0, dtype=image.dtype)
+    return values, offsets
+
+
+# ------------------------------------------------------------------ histogram Otsu
+def _uniform_bin_indices(values: np.ndarray, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bin of every value in ``edges`` exactly as np.histogram assigns it.
+
+    Returns:
+        (indices, keep): bin index of the kept values and the in-range mask
+    """
+    nbins = len(edges) - 1
+    first, last = edges[0], edges[-1]
+    keep = (values >= first) & (values <= last)
+    kept = values[keep].astype(np.float64, copy=False)
+
+    indices = ((kept - first) / (last - first) * nbins).astype(np.intp)
+    indices[indices == nbins] -= 1
+    # Rounding at the edges is corrected against the edges themselves
+    indices[kept < edges[indices]] -= 1
+    indices[(kept >= edges[indices + 1]) & (indices != nbins - 1)] += 1
+    return indices, keep
+
+
+def _best_splits(hist: np.ndarray, bin_centers: np.ndarray) -> np.ndarray:
+    """Index of the best split for each histogram row (rows: boxes, columns: bins)."""
+    total_pixels = hist.sum(axis=-1, keepdims=True)
+    cumsum_hist = np.cumsum(hist, axis=-1)
+    cumsum_weighted = np.cumsum(hist * bin_centers, axis=-1)
+
+    # Between-class variance for every split i = 1..nbins-1 (uses cumulative sums up to i-1)
+    below = cumsum_hist[..., :-1]
+    above = total_pixels - below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w0 = below / total_pixels
+        w1 = 1 - w0
+        mu0 = cumsum_weighted[..., :-1] / below
+        mu1 = (cumsum_weighted[..., -1:] - cumsum_weighted[..., :-1]) / above
+        variances = w0 * w1 * (mu0 - mu1) ** 2
+
+    # Empty classes have zero variance
+    variances[(w0 == 0) | (w1 == 0) | ~np.isfinite(variances)] = 0
+    return np.argmax(variances, axis=-1)
+
+
+def otsu_thresholds_hist(values: np.ndarray, offsets: np.ndarray, nbins: int = 256,
+                         value_range: Tuple[float, float] = (0, 256)) -> np.ndarray:
+    """
+    Histogram Otsu threshold of every box of a ragged layout, in one pass.
+
+    Args:
+        values: Concatenated box pixels (see gather_box_values)
+        offsets: Box boundaries in ``values`` (length n_boxes + 1)
+        nbins: Histogram bins over ``value_range``
+        value_range: Histogram range (pixels outside it are ignored)
+
+    Returns:
+        float64 array with the bin centre of each box's best split
+    """
+    offsets = np.asarray(offsets, dtype=np.intp)
+    n_boxes = len(offsets) - 1
+    edges = np.linspace(value_range[0], value_range[1], nbins + 1)
+    bin_centers = (edges[:-1] + edges[1:]) / 2
+    if n_boxes <= 0:
+        return np.empty(0, dtype=np.float64)
+
+    values = np.asarray(values).ravel()
+    box_ids = np.repeat(np.arange(n_boxes), np.diff(offsets))
+    indices, keep = _uniform_bin_indices(values, edges)
+    hist = np.bincount(box_ids[keep] * nbins + indices, minlength=n_boxes * nbins)
+    return bin_centers[_best_splits(hist.reshape(n_boxes, nbins), bin_centers)]
+
+
+def otsu_threshold_hist(image: np.ndarray, nbins: int = 256,
+                        value_range: Tuple[float, float] = (0, 256)) -> float:
+    """Histogram Otsu threshold of one image or box (see otsu_thresholds_hist)."""
+    values = np.asarray(image).ravel()
+    return float(otsu_thresholds_hist(values, np.array([0, values.size]), nbins, value_range)[0])
+
+
+# ------------------------------------------------------------------ threshold sweep
+def otsu_threshold_stepped(image: np.ndarray, step: float = 0.01) -> Optional[float]:
+    """
+    Threshold from the sweep ``arange(min + step, max - step, step)``.
+
+    Pixels ``< t`` form the background, ``>= t`` the foreground; the first
+    candidate with the lowest within-class variance wins.
+
+    Returns:
+        The threshold, -1 when the sweep has no candidates, None for a
+        constant image
+    """
+    values = np.sort(np.asarray(image, dtype=np.float64).ravel())
+    lo, hi = values[0], values[-1]
+    if lo == hi:
+        return None
+
+    # Same candidates as the reference sweep, in the image's own dtype - uint8
+    # boxes near 0 / 255 wrap around there too, and must here as well
+    image = np.asarray(image)
+    with np.errstate(over='ignore'):
+        thresholds = np.arange(np.min(image) + step, np.max(image) - step, step)
+    if thresholds.size == 0:
+        return -1
+
+    # Within-class variance = total variance - between-class variance; with the
+    # pixels centred on their mean the between-class term is s0**2 * n / (n0 * n1)
+    n = values.size
+    centred = values - values.mean()
+    prefix = np.concatenate(([0.0], np.cumsum(centred)))
+    below = np.searchsorted(values, thresholds, side='left')
+    above = n - below
+    s0 = prefix[below]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = np.where((below > 0) & (above > 0), s0 * s0 * n / (below * above), 0.0)
+    return thresholds[int(np.argmax(between))]
+
+
+def otsu_thresholds_stepped(values: np.ndarray, offsets: np.ndarray, step: float = 0.01) -> list:
+    """otsu_threshold_stepped() of every box of a ragged layout (None / -1 as there)."""
+    values = np.asarray(values).ravel()
+    return [otsu_threshold_stepped(values[start:end], step) if end > start else None
+            for start, end in zip(offsets[:-1], offsets[1:])]
@@ -124,14 +124,35 @@ def load_frames_and_metadata_with_assignments(
         metadata_dict: Patient and study information
     """
     ds = pydicom.dcmread(Path(path))
+    return frames_from_dataset(ds, view_assignments), build_scan_metadata(ds)
+
+
+def frames_from_dataset(ds, view_assignments: Optional[Dict[int, str]] = None) -> Dict[str, np.ndarray]:
+    """{view_name: frame} of an already read dataset (decodes its pixel data)"""
     arr = ds.pixel_array
     if arr.ndim == 2:
         arr = arr[np.newaxis, ...]
 
+    labels = frame_view_labels(ds, arr.shape[0], view_assignments)
+    return {lbl: arr[i] for i, lbl in enumerate(labels)}
+
+
+def frame_view_labels(ds, n_frames: int, view_assignments: Optional[Dict[int, str]] = None) -> list[str]:
+    """
+    View label per frame (header only - no pixel data needed)
+
+    Args:
+        ds: pydicom dataset (may be read with stop_before_pixels)
+        n_frames: Number of frames in the pixel data
+        view_assignments: Optional dict {frame_index: view_name}
+
+    Returns:
+        Labels in frame order, Anterior/Posterior enforced where possible
+    """
     # Use user assignments if provided, otherwise auto-detect
     if view_assignments:
         labels = []
-        for i in range(arr.shape[0]):
+        for i in range(n_frames):
             if i in view_assignments:
                 labels.append(view_assignments[i])
             else:
@@ -156,9 +177,11 @@ def load_frames_and_metadata_with_assignments(
             normalized_labels.append(label)
             print(f"   ⚠️  Non-standard view name: {label}")
     
-    frames = {lbl: arr[i] for i, lbl in enumerate(normalized_labels)}
+    return normalized_labels
 
-    # Enhanced metadata extraction with study date
+
+def build_scan_metadata(ds) -> dict:
+    """Patient / study metadata of a dataset (header only), study_date normalised to YYYYMMDD"""
     meta = {
         "patient_id":    getattr(ds, "PatientID", ""),
         "patient_name":  str(getattr(ds, "PatientName", "")),
@@ -191,7 +214,7 @@ def load_frames_and_metadata_with_assignments(
         from datetime import datetime
         meta["study_date"] = datetime.now().strftime("%Y%m%d")
     
-    return frames, meta
+    return meta
 
 
 def load_frames_and_metadata(path: str) -> Tuple[Dict[str, np.ndarray], dict]:
@@ -372,24 +395,7 @@ def extract_study_date_from_dicom(dicom_path: Path) -> str:
     """
     try:
         ds = pydicom.dcmread(dicom_path, stop_before_pixels=True)
-        study_date = getattr(ds, 'StudyDate', None)
-        
-        if study_date:
-            # Ensure it's in YYYYMMDD format
-            study_date = str(study_date).replace('-', '').replace('/', '')
-            if len(study_date) == 8 and study_date.isdigit():
-                return study_date
-        
-        # Fallback: use SeriesDate
-        series_date = getattr(ds, 'SeriesDate', None)
-        if series_date:
-            series_date = str(series_date).replace('-', '').replace('/', '')
-            if len(series_date) == 8 and series_date.isdigit():
-                return series_date
-        
-        # Final fallback: current date
-        from datetime import datetime
-        return datetime.now().strftime("%Y%m%d")
+        return study_date_from_dataset(ds)
         
     except Exception as e:
         print(f"Warning: Could not extract study date from {dicom_path}: {e}")
@@ -397,6 +403,28 @@ def extract_study_date_from_dicom(dicom_path: Path) -> str:
         return datetime.now().strftime("%Y%m%d")
 
 
+def study_date_from_dataset(ds) -> str:
+    """Same rules as extract_study_date_from_dicom, for an already read dataset"""
+    study_date = getattr(ds, 'StudyDate', None)
+    
+    if study_date:
+        # Ensure it's in YYYYMMDD format
+        study_date = str(study_date).replace('-', '').replace('/', '')
+        if len(study_date) == 8 and study_date.isdigit():
+            return study_date
+    
+    # Fallback: use SeriesDate
+    series_date = getattr(ds, 'SeriesDate', None)
+    if series_date:
+        series_date = str(series_date).replace('-', '').replace('/', '')
+        if len(series_date) == 8 and series_date.isdigit():
+            return series_date
+    
+    # Final fallback: current date
+    from datetime import datetime
+    return datetime.now().strftime("%Y%m%d")
+
+
 def extract_all_dicom_metadata(dicom_path: Path) -> dict:
     """
     Extract comprehensive metadata from DICOM file including study date
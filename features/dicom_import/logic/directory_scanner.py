@@ -12,13 +12,18 @@ OLD Structure: data/SPECT/[patient_id]_[session_code]/files...
    agar overlay & SC-DICOM buatan kita (Modality=OT atau
    SOP Class UID = SecondaryCapture) tidak dianggap sebagai scan baru.
 """
+import sqlite3
 from pathlib import Path
-from typing  import Dict, List, Tuple
-
-import pydicom
+from typing  import Callable, Dict, List, Tuple
 
 # Use centralized path configuration
-from core.config.paths import SPECT_DATA_PATH, get_patient_spect_path, get_session_spect_path
+from core.config.paths import (
+    SPECT_DATA_PATH,
+    STUDY_INDEX_ENABLED,
+    get_patient_spect_path,
+    get_session_spect_path,
+)
+from .header_scanner import ScanProgress, is_derived_filename, scan_headers
 
 _UID_SC = "1.2.840.10008.5.1.4.1.1.7"          # Secondary Capture Image Storage
 
@@ -87,21 +92,26 @@ def _extract_session_patient_from_path(dicom_path: Path) -> Tuple[str, str]:
 
 # ---------------------------------------------------------------- main scanning functions
 
-def scan_dicom_directory(directory: Path) -> Dict[str, List[Path]]:
+def _candidate_dicoms(directory: Path, pattern: str = "**/*.dcm") -> List[Path]:
+    """*.dcm files below directory, minus our derived SC-DICOMs (skipped by name, never opened)"""
+    dicoms = list(directory.glob(pattern))
+    candidates = [p for p in dicoms if not is_derived_filename(p)]
+    print(f"Ditemukan {len(dicoms)} file DICOM di '{directory}' "
+          f"({len(dicoms) - len(candidates)} turunan dilewati)")
+    return candidates
+
+def scan_dicom_directory(directory: Path,
+                         progress_cb: Callable[[ScanProgress], None] = None) -> Dict[str, List[Path]]:
     """
     Scan directory with OLD structure compatibility
     Returns: {PatientID: [file_paths]}
     """
     patient_map: Dict[str, List[Path]] = {}
 
-    dicoms = list(directory.glob("**/*.dcm"))
-    print(f"Ditemukan {len(dicoms)} file DICOM di '{directory}'")
-
-    for p in dicoms:
-        try:
-            ds = pydicom.dcmread(p, stop_before_pixels=True)
-        except Exception as e:
-            print(f"[WARN] Tidak bisa baca {p}: {e}")
+    for result in scan_headers(_candidate_dicoms(directory), progress_cb=progress_cb):
+        ds = result.dataset
+        if ds is None:
+            print(f"[WARN] Tidak bisa baca {result.path}: {result.error}")
             continue
 
         if not _is_primary(ds):
@@ -111,34 +121,35 @@ def scan_dicom_directory(directory: Path) -> Dict[str, List[Path]]:
         if not pid:
             continue
 
-        patient_map.setdefault(pid, []).append(p)
+        patient_map.setdefault(pid, []).append(result.path)
+
+    for files in patient_map.values():
+        files.sort()  # results arrive in completion order
 
     total_scans = sum(len(v) for v in patient_map.values())
     print(f"Ditemukan {len(patient_map)} ID pasien (total {total_scans} scan primer).")
     return patient_map
 
-def scan_spect_directory_new_structure(directory: Path = None) -> Dict[str, Dict[str, List[Path]]]:
-    """
-    Scan SPECT directory with NEW structure
-    Returns: {SessionCode: {PatientID: [file_paths]}}
-    """
-    if directory is None:
-        directory = SPECT_DATA_PATH
-    
+def _load_study_index():
+    """Study index, or None when disabled / unavailable (callers then read headers)."""
+    if not STUDY_INDEX_ENABLED:
+        return None
+    try:
+        from .study_index import get_study_index
+        return get_study_index()
+    except sqlite3.Error as e:
+        print(f"[STUDY INDEX WARN] Index unavailable, scanning headers instead: {e}")
+        return None
+
+def _scan_headers_new_structure(directory: Path,
+                                progress_cb: Callable[[ScanProgress], None] = None) -> Dict[str, Dict[str, List[Path]]]:
+    """Read the header of every non-derived *.dcm below directory (no index)"""
     session_patient_map: Dict[str, Dict[str, List[Path]]] = {}
-    
-    if not directory.exists():
-        print(f"Directory tidak ditemukan: {directory}")
-        return session_patient_map
-
-    dicoms = list(directory.glob("**/*.dcm"))
-    print(f"Ditemukan {len(dicoms)} file DICOM di '{directory}'")
 
-    for p in dicoms:
-        try:
-            ds = pydicom.dcmread(p, stop_before_pixels=True)
-        except Exception as e:
-            print(f"[WARN] Tidak bisa baca {p}: {e}")
+    for result in scan_headers(_candidate_dicoms(directory), progress_cb=progress_cb):
+        ds, p = result.dataset, result.path
+        if ds is None:
+            print(f"[WARN] Tidak bisa baca {p}: {result.error}")
             continue
 
         if not _is_primary(ds):
@@ -163,6 +174,40 @@ def scan_spect_directory_new_structure(directory: Path = None) -> Dict[str, Dict
         
         session_patient_map[session_code][final_patient_id].append(p)
 
+    for patients in session_patient_map.values():
+        for files in patients.values():
+            files.sort()  # results arrive in completion order
+
+    return session_patient_map
+
+def scan_spect_directory_new_structure(directory: Path = None,
+                                       progress_cb: Callable[[ScanProgress], None] = None) -> Dict[str, Dict[str, List[Path]]]:
+    """
+    Scan SPECT directory with NEW structure
+    Returns: {SessionCode: {PatientID: [file_paths]}}
+
+    Answered from the study index (only new / changed files are read);
+    falls back to reading every header when the index is disabled.
+    progress_cb receives a ScanProgress while headers are being read.
+    """
+    if directory is None:
+        directory = SPECT_DATA_PATH
+    
+    session_patient_map: Dict[str, Dict[str, List[Path]]] = {}
+    
+    if not directory.exists():
+        print(f"Directory tidak ditemukan: {directory}")
+        return session_patient_map
+
+    index = _load_study_index()
+    if index is not None:
+        stats = index.refresh(directory, progress_cb=progress_cb)
+        print(f"[STUDY INDEX] {stats['dirs']} folders checked, {stats['changed_dirs']} changed, "
+              f"{stats['read']} headers read, {stats['removed']} removed ({stats['seconds'] * 1000:.0f} ms)")
+        session_patient_map = index.session_patient_map(directory)
+    else:
+        session_patient_map = _scan_headers_new_structure(directory, progress_cb)
+
     # Print summary
     total_sessions = len(session_patient_map)
     total_patients = sum(len(patients) for patients in session_patient_map.values())
@@ -191,27 +236,26 @@ def get_session_patients(session_code: str) -> Dict[str, List[Path]]:
         return {}
     
     patient_map: Dict[str, List[Path]] = {}
+
+    index = _load_study_index()
+    if index is not None:
+        index.refresh(session_path)
+        for patient_dir in session_path.iterdir():
+            if patient_dir.is_dir():
+                patient_files = index.directory_files(patient_dir, primary_only=True)
+                if patient_files:
+                    patient_map[patient_dir.name] = patient_files
+        return patient_map
     
-    # Scan each patient directory in the session
-    for patient_dir in session_path.iterdir():
-        if not patient_dir.is_dir():
-            continue
-            
-        patient_id = patient_dir.name
-        patient_files = []
-        
-        # Find all DICOM files for this patient
-        for dicom_file in patient_dir.glob("*.dcm"):
-            try:
-                ds = pydicom.dcmread(dicom_file, stop_before_pixels=True)
-                if _is_primary(ds):
-                    patient_files.append(dicom_file)
-            except Exception as e:
-                print(f"[WARN] Tidak bisa baca {dicom_file}: {e}")
-                continue
-        
-        if patient_files:
-            patient_map[patient_id] = patient_files
+    # One parallel pass over the DICOM files of every patient directory in the session
+    for result in scan_headers(_candidate_dicoms(session_path, "*/*.dcm")):
+        if result.dataset is None:
+            print(f"[WARN] Tidak bisa baca {result.path}: {result.error}")
+        elif _is_primary(result.dataset):
+            patient_map.setdefault(result.path.parent.name, []).append(result.path)
+
+    for files in patient_map.values():
+        files.sort()  # results arrive in completion order
     
     return patient_map
 
@@ -266,19 +310,21 @@ def get_patient_dicom_files(session_code: str, patient_id: str, primary_only: bo
     
     if not patient_path.exists():
         return []
+
+    index = _load_study_index()
+    if index is not None:
+        index.refresh(patient_path, recursive=False)
+        return index.directory_files(patient_path, primary_only=primary_only)
     
+    if not primary_only:
+        return sorted(patient_path.glob("*.dcm"))
+
     dicom_files = []
-    for dicom_file in patient_path.glob("*.dcm"):
-        try:
-            if primary_only:
-                ds = pydicom.dcmread(dicom_file, stop_before_pixels=True)
-                if _is_primary(ds):
-                    dicom_files.append(dicom_file)
-            else:
-                dicom_files.append(dicom_file)
-        except Exception as e:
-            print(f"[WARN] Tidak bisa baca {dicom_file}: {e}")
-            continue
+    for result in scan_headers(_candidate_dicoms(patient_path, "*.dcm")):
+        if result.dataset is None:
+            print(f"[WARN] Tidak bisa baca {result.path}: {result.error}")
+        elif _is_primary(result.dataset):
+            dicom_files.append(result.path)
     
     return sorted(dicom_files)
 
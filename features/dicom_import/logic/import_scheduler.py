@@ -0,0 +1,390 @@
+# features/dicom_import/logic/import_scheduler.py - Pipelined multi-study import
+"""
+Concurrent import of a batch of studies.
+
+Each study runs the same stages as ``_process_one_with_assignments``, but up
+to ``IMPORT_MAX_CONCURRENT`` studies are in flight at once, so the stages of
+different studies overlap:
+
+* I/O stages (read, copy + original PNGs, overlay/PNG/SC-DICOM writes,
+  manifest/index, cloud upload) run on the study's own thread;
+* model stages (segmentation, YOLO) go to the shared inference worker, which
+  queues them; segmentation requests of studies arriving together are merged
+  into one ``segment_batch`` job;
+* CPU stages (Otsu, classification with its radiomics features) run in a
+  process pool of ``IMPORT_CPU_WORKERS`` processes. Each of them extracts
+  radiomics features sequentially (no nested feature pool), so
+  ``IMPORT_CPU_WORKERS`` alone bounds the CPU stage concurrency.
+
+Process budget of an import: the GUI/main process with up to
+``IMPORT_MAX_CONCURRENT`` study threads, the inference worker, and
+``IMPORT_CPU_WORKERS`` CPU processes. Only with ``IMPORT_CPU_WORKERS=0`` do
+the CPU stages run in the inference worker, which then uses its own
+radiomics pool of ``CLASSIFICATION_FEATURE_WORKERS`` processes instead.
+
+Studies of the same patient are never processed at the same time (they share
+output files). Progress is reported as ``ImportEvent`` objects, delivered on
+the thread that called ``run()``; log lines written while a study is
+processed - also inside the inference worker and the process pool - arrive
+as ``"log"`` events of that study. The run ends with a per-stage wall-clock
+summary.
+
+Usage:
+    scheduler = ImportScheduler(session_code, event_cb=print)
+    summary = scheduler.run({path: view_assignments, ...})
+    print(summary.format())
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.config.paths import IMPORT_CPU_WORKERS, IMPORT_MAX_CONCURRENT
+from core.gui.ui_constants import truncate_text
+from core.logger import _log, forward_log, get_log_sink, log_to
+from core.tracing import current_study, set_trace_study, span, trace_study
+from features.spect_viewer.logic.inference_worker import run_inference_job, run_job_captured
+from . import input_data
+from .study_context import StudyContext, load_study_context
+
+# Order of the per-study stages (also the order of the summary)
+IMPORT_STAGES = (
+    "read",
+    "copy",
+    "segmentation",
+    "write",
+    "detection",
+    "otsu",
+    "classification",
+    "quantification",
+    "record",
+    "upload",
+)
+
+SEGMENTATION_BATCH_WAIT_S = 0.05  # how long a segmentation request waits for company
+
+
+def _init_cpu_worker() -> None:
+    """CPU pool initializer: no nested radiomics pool (read when classification is first imported)."""
+    os.environ["CLASSIFICATION_FEATURE_WORKERS"] = "1"
+
+
+@dataclass
+class ImportEvent:
+    index: int                 # 1-based position of the study in the batch
+    total: int
+    path: Path
+    kind: str                  # started | stage_started | stage_finished | log | finished | failed
+    stage: str = ""
+    message: str = ""
+    elapsed: float = 0.0       # stage_finished: stage time; finished/failed: study time
+
+
+@dataclass
+class ImportSummary:
+    results: List[Path] = field(default_factory=list)          # imported DICOMs, in batch order
+    failed: Dict[Path, str] = field(default_factory=dict)      # source path -> error
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    max_concurrent: int = 1
+    cpu_workers: int = 0
+
+    def format(self) -> str:
+        studies = len(self.results) + len(self.failed)
+        lines = [
+            f"[IMPORT] {studies} studies in {self.wall_seconds:.1f}s "
+            f"({self.max_concurrent} concurrent, {self.cpu_workers} CPU workers, {len(self.failed)} failed)"
+        ]
+        for stage in IMPORT_STAGES:
+            seconds = self.stage_seconds.get(stage, 0.0)
+            lines.append(f"[IMPORT]   {stage:<15} {seconds:8.2f}s  ({seconds / max(studies, 1):.2f}s/study)")
+        return "\n".join(lines)
+
+
+class _SegmentationBatcher:
+    """
+    Merges the segmentation requests of concurrent studies into one
+    ``segment_batch`` job: a batch is sent once ``max_images`` views are
+    waiting or ``wait_s`` after the first request, whichever comes first.
+    """
+
+    def __init__(self, profile: Optional[str], max_images: int, wait_s: float = SEGMENTATION_BATCH_WAIT_S):
+        self.profile = profile
+        self.max_images = max(1, max_images)
+        self.wait_s = wait_s
+        self._pending: List[tuple] = []    # (images, future)
+        self._count = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def segment(self, images: List[np.ndarray]) -> List[object]:
+        """SegmentationResult per image (blocks until its batch has run)."""
+        future: Future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((images, future))
+            self._count += len(images)
+            if self._count >= self.max_images:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.wait_s, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._run(batch)
+        return future.result()
+
+    def _take(self) -> List[tuple]:
+        # Called with the lock held
+        batch, self._pending, self._count = self._pending, [], 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: List[tuple]) -> None:
+        images = [image for request, _ in batch for image in request]
+        try:
+            results = iter(run_inference_job("segment_batch", images, profile=self.profile))
+            for request, future in batch:
+                future.set_result([next(results) for _ in request])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+class ImportScheduler:
+    """Imports a batch of studies with overlapping stages (see module docstring)."""
+
+    def __init__(self,
+                 session_code: str,
+                 *,
+                 segmentation_profile: Optional[str] = None,
+                 max_concurrent: Optional[int] = None,
+                 cpu_workers: Optional[int] = None,
+                 event_cb: Optional[Callable[[ImportEvent], None]] = None):
+        """
+        Args:
+            session_code: Session code (decides the destination folders)
+            segmentation_profile: Predictor profile ("accurate" | "balanced" | "fast")
+            max_concurrent: Studies in flight at once (default IMPORT_MAX_CONCURRENT)
+            cpu_workers: Processes for the CPU stages; 0 runs them through the
+                inference worker like the serial import (default IMPORT_CPU_WORKERS)
+            event_cb: Receives every ImportEvent, on the thread calling run()
+        """
+        self.session_code = session_code
+        self.segmentation_profile = segmentation_profile
+        self.max_concurrent = max(1, max_concurrent or IMPORT_MAX_CONCURRENT)
+        self.cpu_workers = IMPORT_CPU_WORKERS if cpu_workers is None else max(0, cpu_workers)
+        self.event_cb = event_cb
+
+        self._events: "queue.Queue[ImportEvent]" = queue.Queue()
+        self._total = 0
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._segmenter: Optional[_SegmentationBatcher] = None
+        self._stage_seconds: Dict[str, float] = {}
+        self._patient_locks: Dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------- public
+    def run(self, file_view_assignments: Dict[Path, Optional[Dict[int, str]]]) -> ImportSummary:
+        """
+        Import every study and wait for all of them.
+
+        Args:
+            file_view_assignments: {file_path: {frame_index: view_name} or None}
+
+        Returns:
+            ImportSummary; failures are reported there (and as "failed" events),
+            never raised
+        """
+        items = [(Path(p), views) for p, views in file_view_assignments.items()]
+        self._total = len(items)
+        self._stage_seconds = {stage: 0.0 for stage in IMPORT_STAGES}
+        summary = ImportSummary(max_concurrent=min(self.max_concurrent, max(self._total, 1)))
+        if not items:
+            return summary
+
+        # Two views per study: one batch can hold every study in flight
+        self._segmenter = _SegmentationBatcher(self.segmentation_profile, 2 * summary.max_concurrent)
+        self._start_cpu_pool()
+        summary.cpu_workers = self.cpu_workers if self._cpu_pool else 0
+
+        t0 = time.perf_counter()
+        outcomes: Dict[int, object] = {}
+        try:
+            with ThreadPoolExecutor(max_workers=summary.max_concurrent, thread_name_prefix="import") as studies:
+                for index, (src, views) in enumerate(items, 1):
+                    studies.submit(self._import_study, index, src, views)
+
+                # Deliver events here until every study has reported its outcome
+                while len(outcomes) < self._total:
+                    event = self._events.get()
+                    if event.kind == "finished":
+                        outcomes[event.index] = Path(event.message)
+                    elif event.kind == "failed":
+                        outcomes[event.index] = event.message
+                    if self.event_cb:
+                        self.event_cb(event)
+        finally:
+            self._stop_cpu_pool()
+
+        for index, (src, _) in enumerate(items, 1):
+            outcome = outcomes[index]
+            if isinstance(outcome, Path):
+                summary.results.append(outcome)
+            else:
+                summary.failed[src] = outcome
+        summary.stage_seconds = dict(self._stage_seconds)
+        summary.wall_seconds = time.perf_counter() - t0
+        print(summary.format())
+        return summary
+
+    # -------------------------------------------------------------- one study
+    def _import_study(self, index: int, src: Path, view_assignments: Optional[Dict[int, str]]) -> None:
+        """Run every stage of one study (on an import thread); always ends with finished/failed."""
+        t0 = time.perf_counter()
+        self._emit(index, src, "started")
+
+        with log_to(lambda msg: self._emit(index, src, "log", message=msg)), \
+                trace_study(src.stem), span("import.study", session=self.session_code):
+            try:
+                _log(f"\n## Processing file {index}/{self._total}: {truncate_text(src.name, 30)}")
+                _log(f"\n=== Processing {truncate_text(src.name, 40)} ===")
+
+                with self._stage(index, src, "read"):
+                    _log("  >> Reading DICOM...")
+                    context = load_study_context(src, self.session_code, view_assignments)
+                    set_trace_study(context.filename_stem)
+
+                # Studies of one patient write the same patient-level files
+                with self._patient_lock(context.patient_folder):
+                    dest_path = self._run_stages(index, src, context, view_assignments)
+
+                _log(f"## File {index}/{self._total} completed successfully")
+            except Exception as e:
+                _log(f"[ERROR] File {index}/{self._total} failed: {str(e)[:100]}...")
+                print(f"[FULL ERROR] {src} failed: {e}\n{traceback.format_exc()}")
+                self._emit(index, src, "failed", message=str(e), elapsed=time.perf_counter() - t0)
+                return
+
+        self._emit(index, src, "finished", message=str(dest_path), elapsed=time.perf_counter() - t0)
+
+    def _run_stages(self, index: int, src: Path, context: StudyContext,
+                    view_assignments: Optional[Dict[int, str]]) -> Path:
+        input_data._log_study_header(context, view_assignments)
+
+        with self._stage(index, src, "copy"):
+            input_data._copy_to_patient_folder(context)
+            input_data._check_required_views(context)
+            png_files = input_data._save_original_pngs(context)
+
+        with self._stage(index, src, "segmentation"):
+            segmentations = self._segment(context)
+
+        with self._stage(index, src, "write"):
+            saved = input_data._write_segmentation_outputs(context, segmentations, self.segmentation_profile)
+        # Overlays are written; the decoded dataset is not needed any more
+        context.dataset = None
+
+        with self._stage(index, src, "detection"):
+            input_data._run_detection(context)
+        with self._stage(index, src, "otsu"):
+            input_data._run_otsu(context, self._run_cpu_job)
+        with self._stage(index, src, "classification"):
+            input_data._run_classification(context, self._run_cpu_job)
+        with self._stage(index, src, "quantification"):
+            input_data._run_quantification(context)
+        with self._stage(index, src, "record"):
+            input_data._record_study(context)
+        with self._stage(index, src, "upload"):
+            uploaded = input_data._upload_original_pngs(context, png_files)
+
+        input_data._log_study_summary(context, len(png_files) + len(saved), uploaded)
+        return context.dicom_path
+
+    def _segment(self, context: StudyContext) -> Optional[Dict[str, object]]:
+        """Batched segmentation of the Anterior/Posterior views (None = segment per view)."""
+        views = [view for view in ("Anterior", "Posterior") if view in context.frames]
+        try:
+            results = self._segmenter.segment([context.frames[view] for view in views])
+        except Exception as e:
+            _log(f"[WARN] Batch segmentation failed, falling back to per-view: {e}")
+            return None
+        return dict(zip(views, results))
+
+    # -------------------------------------------------------------- CPU stages
+    def _start_cpu_pool(self) -> None:
+        self._cpu_pool = None
+        if self.cpu_workers <= 0:
+            return
+        try:
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=min(self.cpu_workers, self._total),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_cpu_worker,
+            )
+        except Exception as e:
+            print(f"[IMPORT WARN] CPU process pool unavailable, using the inference worker: {e}")
+
+    def _stop_cpu_pool(self) -> None:
+        pool, self._cpu_pool = self._cpu_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run_cpu_job(self, kind: str, *args):
+        """Run a CPU-bound job in the process pool (inference worker as fallback)."""
+        pool = self._cpu_pool
+        if pool is not None:
+            try:
+                result, lines = pool.submit(run_job_captured, kind, args, None, current_study()).result()
+            except BrokenProcessPool as e:
+                print(f"[IMPORT WARN] CPU process pool broke, using the inference worker: {e}")
+                self._cpu_pool = None
+            else:
+                # Already printed by the child; only the sinks still need them
+                for line in lines:
+                    forward_log(line, get_log_sink())
+                return result
+        return run_inference_job(kind, *args)
+
+    # -------------------------------------------------------------- helpers
+    def _emit(self, index: int, src: Path, kind: str, **fields) -> None:
+        self._events.put(ImportEvent(index, self._total, src, kind, **fields))
+
+    @contextmanager
+    def _stage(self, index: int, src: Path, stage: str):
+        self._emit(index, src, "stage_started", stage=stage)
+        t0 = time.perf_counter()
+        try:
+            with span(f"import.{stage}"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self._stage_seconds[stage] += elapsed
+            self._emit(index, src, "stage_finished", stage=stage, elapsed=elapsed)
+
+    def _patient_lock(self, patient_folder: Path) -> threading.Lock:
+        with self._lock:
+            return self._patient_locks.setdefault(Path(patient_folder), threading.Lock())
@@ -3,7 +3,6 @@ from __future__ import annotations
 from pathlib import Path
 from shutil import copy2
 from typing import Callable, Sequence, List, Dict, Optional
-import traceback
 
 import numpy as np
 from PIL import Image
@@ -15,20 +14,18 @@ from pydicom.uid import (
     generate_uid,
 )
 
-from .dicom_loader import load_frames_and_metadata_with_assignments
-from features.spect_viewer.logic.segmenter import predict_bone_mask
-from core.logger import _log
+from .study_context import StudyContext, load_study_context
+from features.spect_viewer.logic.inference_worker import run_inference_job
+from features.spect_viewer.logic.segmenter import get_segmentation_profile
+from core.logger import _log, log_to
+from core.tracing import set_trace_study, span, trace_study
 from core.gui.ui_constants import truncate_text
 
 # Use new directory structure from paths.py with study date support
 from core.config.paths import (
-    get_patient_spect_path, 
     get_session_spect_path,
-    SPECT_DATA_PATH,
     is_cloud_enabled,
-    extract_study_date_from_dicom,
-    generate_filename_stem,
-    get_dicom_output_path
+    STUDY_INDEX_ENABLED,
 )
 
 # Import cloud storage
@@ -164,60 +161,39 @@ def _upload_original_png_to_cloud(png_path: Path, session_code: str, patient_id:
         _log(f"     [WARN] PNG upload failed: {e}")
         return False
 
-# ---------------------------------------------------------------- core
-def _process_one_with_assignments(
-    src: Path, 
-    session_code: str,
-    view_assignments: Optional[Dict[int, str]] = None
-) -> Path:
-    """
-    Process single DICOM with view assignments
-    
-    Args:
-        src: Source DICOM path
-        session_code: Session code
-        view_assignments: Dict {frame_index: view_name} atau None untuk auto-detect
-    """
-    _log(f"\n=== Processing {truncate_text(src.name, 40)} ===")
+# ---------------------------------------------------------------- stages
+# Each stage works on the StudyContext; _process_one_with_assignments runs
+# them in order for one study, ImportScheduler overlaps them across studies.
+def _log_study_header(context: StudyContext, view_assignments: Optional[Dict[int, str]]) -> None:
+    _log(f"  Patient ID: {context.patient_id}")
+    _log(f"  Study Date: {context.study_date}")
 
-    # Read patient info and study date
-    _log("  >> Reading DICOM metadata...")
-    ds_temp = pydicom.dcmread(src, stop_before_pixels=True)
-    pid = str(ds_temp.PatientID)
-    study_date = extract_study_date_from_dicom(src)
-    
-    _log(f"  Patient ID: {pid}")
-    _log(f"  Study Date: {study_date}")
-    
     if view_assignments:
         _log(f"  View assignments: {view_assignments}")
     else:
         _log("  Using auto-detection for views")
-    
-    # Generate filename stem with study date
-    filename_stem = generate_filename_stem(pid, study_date)
-    _log(f"  Filename stem: {filename_stem}")
-    
-    dest_dir = get_patient_spect_path(pid, session_code)
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create destination path with new naming convention
-    dest_path = get_dicom_output_path(pid, session_code, study_date)
-    
-    # STEP 1: Copy file to destination with new name (LOCAL ONLY)
+
+    _log(f"  Filename stem: {context.filename_stem}")
+
+
+def _copy_to_patient_folder(context: StudyContext) -> None:
+    """Copy the source DICOM to its destination name (LOCAL ONLY)."""
+    context.patient_folder.mkdir(parents=True, exist_ok=True)
+    src, dest_path = context.source_path, context.dicom_path
+
     if src.resolve() != dest_path.resolve():
         _log(f"  >> Copying to patient directory with new name...")
         copy2(src, dest_path)
     _log(f"  Copied → {truncate_text(str(dest_path), 60)}")
 
-    # Load DICOM for processing with view assignments
-    _log("  >> Loading DICOM frames with view assignments...")
-    ds = pydicom.dcmread(dest_path)
-    
-    if session_code not in str(ds.PatientID):
-        ds.PatientID = f"{pid}_{session_code}"
+    # The dataset read once is the one that gets the overlays and is saved to dest_path
+    ds = context.dataset
+    if context.session_code not in str(ds.PatientID):
+        ds.PatientID = f"{context.patient_id}_{context.session_code}"
 
-    frames, _ = load_frames_and_metadata_with_assignments(dest_path, view_assignments)
+
+def _check_required_views(context: StudyContext) -> None:
+    frames = context.frames
     _log(f"  Frames detected: {list(frames.keys())}")
 
     # ✅ VALIDATE THAT WE HAVE ANTERIOR AND POSTERIOR
@@ -227,23 +203,43 @@ def _process_one_with_assignments(
         _log(f"  [ERROR] {error_msg}")
         raise ValueError(error_msg)
 
-    overlay_group = 0x6000
-    saved: List[str] = []
-    png_files_to_upload: List[Path] = []
 
-    # STEP 2: SAVE ORIGINAL FRAMES AS PNG (FOR CLASSIFICATION)
+def _save_original_pngs(context: StudyContext) -> List[Path]:
+    """Save the Anterior/Posterior frames as PNG (for classification); returns the files to upload."""
     _log("  >> Saving original frames for classification...")
-    for view_name, frame in frames.items():
+    png_files: List[Path] = []
+    for view_name, frame in context.frames.items():
         if view_name in ["Anterior", "Posterior"]:
             view_tag = view_name.lower()
-            original_png_path = dest_dir / f"{filename_stem}_{view_tag}_original.png"
+            original_png_path = context.patient_folder / f"{context.filename_stem}_{view_tag}_original.png"
             _save_original_frame_png(frame, original_png_path)
-            saved.append(f"{filename_stem}_{view_tag}_original.png")
-            png_files_to_upload.append(original_png_path)
+            png_files.append(original_png_path)
         else:
             _log(f"  [WARN] Skipping non-standard view: {view_name}")
+    return png_files
+
+
+def _write_segmentation_outputs(
+    context: StudyContext,
+    segmentations: Optional[Dict[str, object]] = None,
+    segmentation_profile: Optional[str] = None
+) -> List[str]:
+    """
+    Overlays, mask/colored PNGs and SC-DICOMs per view, then the final DICOM.
+
+    Views missing from ``segmentations`` are segmented here, one at a time.
+
+    Returns:
+        Names of the files written
+    """
+    ds = context.dataset
+    frames = context.frames
+    dest_dir = context.patient_folder
+    filename_stem = context.filename_stem
+
+    overlay_group = 0x6000
+    saved: List[str] = []
 
-    # STEP 3: SEGMENTATION PROCESSING
     for view_idx, (view, img) in enumerate(frames.items(), 1):
         if view not in ["Anterior", "Posterior"]:
             _log(f"  [WARN] Skipping segmentation for non-standard view: {view}")
@@ -255,10 +251,15 @@ def _process_one_with_assignments(
         try:
             # Segmentation
             _log(f"     Segmenting bone mask...")
-            mask = predict_bone_mask(img, to_rgb=False)
+            seg = (segmentations or {}).get(view)
+            if seg is None:
+                seg = run_inference_job("segment_frame", img, profile=segmentation_profile)
+            if seg.from_cache:
+                _log(f"     Reusing cached segmentation")
+            mask = seg.label_mask
             
             _log(f"     Generating colored overlay...")
-            rgb = predict_bone_mask(img, to_rgb=True)
+            rgb = seg.rgb
             
             _log(f"     Segmentation completed for {view_name}")
 
@@ -279,8 +280,8 @@ def _process_one_with_assignments(
         mask_png_path = dest_dir / f"{filename_stem}_{view_tag}_mask.png"
         colored_png_path = dest_dir / f"{filename_stem}_{view_tag}_colored.png"
         
-        Image.fromarray((mask > 0).astype(np.uint8) * 255, mode="L").save(mask_png_path)
-        Image.fromarray(rgb.astype(np.uint8), mode="RGB").save(colored_png_path)
+        Image.fromarray(seg.binary_mask, mode="L").save(mask_png_path)
+        Image.fromarray(rgb, mode="RGB").save(colored_png_path)
         
         saved += [f"{filename_stem}_{view_tag}_mask.png", f"{filename_stem}_{view_tag}_colored.png"]
 
@@ -290,7 +291,7 @@ def _process_one_with_assignments(
             mask_dcm_path = dest_dir / f"{filename_stem}_{view_tag}_mask.dcm"
             colored_dcm_path = dest_dir / f"{filename_stem}_{view_tag}_colored.dcm"
             
-            _save_secondary_capture(ds, (mask > 0).astype(np.uint8) * 255,
+            _save_secondary_capture(ds, seg.binary_mask,
                                     mask_dcm_path, descr=f"{view} Mask")
             _save_secondary_capture(ds, rgb, colored_dcm_path, descr=f"{view} RGB")
             
@@ -304,13 +305,14 @@ def _process_one_with_assignments(
     ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
     ds.is_little_endian = True
     ds.is_implicit_VR = False
-    ds.save_as(dest_path, write_like_original=False)
+    ds.save_as(context.dicom_path, write_like_original=False)
+    return saved
 
-    # STEP 4: YOLO DETECTION
+
+def _run_detection(context: StudyContext) -> None:
     _log("  >> Running YOLO hotspot detection...")
     try:
-        from features.spect_viewer.logic.processing_wrapper import run_yolo_detection_for_patient
-        yolo_result = run_yolo_detection_for_patient(dest_path, pid)
+        yolo_result = run_inference_job("detect_study", context)
         if yolo_result:
             _log(f"     YOLO detection completed - XML files created")
         else:
@@ -318,11 +320,11 @@ def _process_one_with_assignments(
     except Exception as e:
         _log(f"     [WARN] YOLO detection failed: {e}")
 
-    # STEP 5: OTSU HOTSPOT PROCESSING
+
+def _run_otsu(context: StudyContext, run_job: Callable = run_inference_job) -> None:
     _log("  >> Running Otsu hotspot processing...")
     try:
-        from features.spect_viewer.logic.processing_wrapper import run_hotspot_processing_in_process
-        hotspot_result = run_hotspot_processing_in_process(dest_path, pid)
+        hotspot_result = run_job("hotspot_study", context)
         if hotspot_result:
             _log(f"     Otsu processing completed - hotspot PNG files created")
         else:
@@ -330,11 +332,12 @@ def _process_one_with_assignments(
     except Exception as e:
         _log(f"     [WARN] Otsu hotspot processing failed: {e}")
 
-    # STEP 6: CLASSIFICATION
+
+def _run_classification(context: StudyContext, run_job: Callable = run_inference_job) -> None:
     _log("  >> Running hotspot classification inference...")
     try:
-        from features.spect_viewer.logic.processing_wrapper import run_classification_for_patient
-        classification_result = run_classification_for_patient(dest_path, pid, study_date)
+        classification_result = run_job("classify_patient", context.dicom_path,
+                                         context.patient_id, context.study_date)
         if classification_result:
             _log(f"     Classification completed - Normal/Abnormal results saved")
         else:
@@ -342,11 +345,13 @@ def _process_one_with_assignments(
     except Exception as e:
         _log(f"     [WARN] Classification failed: {e}")
 
-    # STEP 7: QUANTIFICATION
+
+def _run_quantification(context: StudyContext) -> None:
     _log("  >> Running BSI quantification with classification masks...")
     try:
         from features.spect_viewer.logic.quantification_wrapper import run_quantification_for_patient
-        quantification_result = run_quantification_for_patient(dest_path, pid, study_date)
+        quantification_result = run_quantification_for_patient(
+            context.dicom_path, context.patient_id, context.study_date)
         if quantification_result:
             _log(f"     BSI quantification completed - results saved")
         else:
@@ -354,25 +359,114 @@ def _process_one_with_assignments(
     except Exception as e:
         _log(f"     [WARN] BSI quantification failed: {e}")
 
-    # STEP 8: UPLOAD ORIGINAL PNG FILES TO CLOUD
+
+def _record_study(context: StudyContext) -> None:
+    """Update the artifact manifest and the study index for the imported study."""
+    dest_path = context.dicom_path
+
+    # Record what every stage read and wrote, so later edits only re-run stale stages
+    try:
+        from features.spect_viewer.logic.artifact_manifest import STAGES, get_manifest
+        manifest = get_manifest(dest_path, context.patient_id, context.study_date)
+        recorded = []
+        for stage in STAGES:
+            if all(p.exists() for p in manifest.required_outputs(stage).values()):
+                manifest.record(stage, save=False)
+                recorded.append(stage)
+        manifest.save()
+        _log(f"     Artifact manifest updated: {', '.join(recorded) or 'no complete stages'}")
+    except Exception as e:
+        _log(f"     [WARN] Could not update artifact manifest: {e}")
+
+    # Index the new study now so the next patient listing does not have to read its headers
+    if STUDY_INDEX_ENABLED:
+        try:
+            from .study_index import get_study_index
+            get_study_index().record_import([dest_path])
+        except Exception as e:
+            _log(f"     [WARN] Could not update study index: {e}")
+
+
+def _upload_original_pngs(context: StudyContext, png_files: List[Path]) -> int:
+    """UPLOAD ORIGINAL PNG FILES TO CLOUD; returns how many were uploaded."""
     _log("  >> Uploading original PNG files to cloud...")
     uploaded_count = 0
-    for png_path in png_files_to_upload:
-        if _upload_original_png_to_cloud(png_path, session_code, pid):
+    for png_path in png_files:
+        if _upload_original_png_to_cloud(png_path, context.session_code, context.patient_id):
             uploaded_count += 1
     
     if uploaded_count > 0:
         _log(f"     ✅ Uploaded {uploaded_count} original PNG files to cloud")
     else:
         _log(f"     ⚠️  No files uploaded to cloud (cloud storage unavailable)")
-    
+    return uploaded_count
+
+
+def _log_study_summary(context: StudyContext, saved_count: int, uploaded_count: int) -> None:
     _log(f"  DICOM processing completed")
-    _log(f"  Files saved locally: {len(saved)} items")
+    _log(f"  Files saved locally: {saved_count} items")
     _log(f"  Cloud upload: {uploaded_count} original PNG files only")
-    _log(f"  Views processed: {list(frames.keys())}")
+    _log(f"  Views processed: {list(context.frames.keys())}")
     _log(f"  Enforced naming: ANTERIOR/POSTERIOR only")
+
+
+# ---------------------------------------------------------------- core
+def _process_one_with_assignments(
+    src: Path, 
+    session_code: str,
+    view_assignments: Optional[Dict[int, str]] = None,
+    segmentations: Optional[Dict[str, object]] = None,
+    segmentation_profile: Optional[str] = None,
+    context: Optional[StudyContext] = None
+) -> Path:
+    """
+    Process single DICOM with view assignments (every stage in order)
+    
+    Args:
+        src: Source DICOM path
+        session_code: Session code
+        view_assignments: Dict {frame_index: view_name} atau None untuk auto-detect
+        segmentations: Optional {view_name: SegmentationResult} segmented beforehand
+        segmentation_profile: Predictor profile ("accurate" | "balanced" | "fast")
+        context: Optional StudyContext (read here otherwise); every stage
+            works from it instead of re-reading the file
+    """
+    _log(f"\n=== Processing {truncate_text(src.name, 40)} ===")
+
+    # Span names match ImportScheduler's stages, so serial and concurrent traces compare
+    with trace_study(src.stem), span("import.study", session=session_code):
+        # Read and decode the DICOM once: metadata, study date, frames and the dataset for overlays
+        with span("import.read"):
+            if context is None:
+                _log("  >> Reading DICOM...")
+                context = load_study_context(src, session_code, view_assignments)
+            set_trace_study(context.filename_stem)
+
+        _log_study_header(context, view_assignments)
+        with span("import.copy"):
+            _copy_to_patient_folder(context)
+            _check_required_views(context)
+            png_files_to_upload = _save_original_pngs(context)
+
+        with span("import.write"):
+            saved = _write_segmentation_outputs(context, segmentations, segmentation_profile)
+
+        with span("import.detection"):
+            _run_detection(context)
+        with span("import.otsu"):
+            _run_otsu(context)
+        with span("import.classification"):
+            _run_classification(context)
+        with span("import.quantification"):
+            _run_quantification(context)
+        with span("import.record"):
+            _record_study(context)
+        with span("import.upload"):
+            uploaded_count = _upload_original_pngs(context, png_files_to_upload)
+
+    _log_study_summary(context, len(png_files_to_upload) + len(saved), uploaded_count)
     
-    return dest_path
+    return context.dicom_path
 
 
 def _process_one(src: Path, session_code: str) -> Path:
@@ -383,23 +477,77 @@ def _process_one(src: Path, session_code: str) -> Path:
 
 
 # ---------------------------------------------------------------- batch processing
+def _run_import_batch(
+    file_view_assignments: Dict[Path, Optional[Dict[int, str]]],
+    *,
+    session_code: str,
+    segmentation_profile: str,
+    progress_cb: Callable[[int, int, str], None] | None,
+    log_cb: Callable[[str], None] | None,
+    header: Sequence[str],
+    footer: Sequence[str]
+) -> List[Path]:
+    """
+    Run the import scheduler and turn its events into the GUI callbacks.
+
+    Callbacks are called from this (the calling) thread only.
+    """
+    from .import_scheduler import ImportScheduler
+
+    def _display(msg: str) -> None:
+        if log_cb:
+            log_cb(truncate_text(msg, 100) if len(msg) > 100 else msg)
+
+    completed = 0
+
+    def _on_event(event) -> None:
+        nonlocal completed
+        if event.kind == "log":
+            _display(event.message)
+        elif event.kind in ("finished", "failed"):
+            completed += 1
+            if progress_cb:
+                progress_cb(completed, event.total, str(event.path))
+
+    with log_to(_display):
+        for line in header:
+            _log(line)
+
+        scheduler = ImportScheduler(
+            session_code,
+            segmentation_profile=segmentation_profile,
+            event_cb=_on_event,
+        )
+        summary = scheduler.run(file_view_assignments)
+
+        for line in footer:
+            _log(line)
+
+    return summary.results
+
+
 def process_files_with_assignments(
     file_view_assignments: Dict[Path, Dict[int, str]],
     *,
     data_root: str | Path | None = None,
     progress_cb: Callable[[int, int, str], None] | None = None,
     log_cb: Callable[[str], None] | None = None,
-    session_code: str | None = None 
+    session_code: str | None = None,
+    segmentation_profile: str | None = None
 ) -> List[Path]:
     """
     Process multiple DICOM files WITH user-assigned views
     
+    Studies are imported concurrently by ImportScheduler (IMPORT_MAX_CONCURRENT
+    at a time); progress_cb reports files in completion order.
+
     Args:
         file_view_assignments: Dict {file_path: {frame_index: view_name}}
         data_root: Root data directory
         progress_cb: Progress callback
         log_cb: Log callback
         session_code: Session code (required)
+        segmentation_profile: Predictor profile for this batch (defaults to the session profile)
         
     Returns:
         List of processed file paths
@@ -407,6 +555,7 @@ def process_files_with_assignments(
     
     if not session_code:
         raise ValueError("session_code is required for new directory structure")
+    segmentation_profile = segmentation_profile or get_segmentation_profile()
     
     # Validate all assignments
     for file_path, view_assignments in file_view_assignments.items():
@@ -422,48 +571,29 @@ def process_files_with_assignments(
         session_root = get_session_spect_path(session_code)
     
     session_root.mkdir(parents=True, exist_ok=True)
-    
-    # Proxy _log for frontend
-    orig_log = _log
-    def _proxy(msg: str) -> None:
-        orig_log(msg)
-        if log_cb:
-            display_msg = truncate_text(msg, 100) if len(msg) > 100 else msg
-            log_cb(display_msg)
-    globals()["_log"] = _proxy
-
-    paths = list(file_view_assignments.keys())
-    out: List[Path] = []
-    total = len(paths)
-    
-    _log(f"## Starting batch import with view assignments: {total} file(s)")
-    _log(f"## Session code: {session_code}")
-    _log(f"## Target directory: data/SPECT/{session_code}/[patient_id]/")
-    _log(f"## ENFORCED NAMING: Anterior/Posterior views only")
-    _log(f"## Processing workflow: Copy → Original PNG → Segmentation → YOLO → Otsu → Classification → Quantification → Upload PNG")
-
-    for i, file_path in enumerate(paths, 1):
-        try:
-            _log(f"\n## Processing file {i}/{total}: {truncate_text(file_path.name, 30)}")
-            view_assignments = file_view_assignments[file_path]
-            result = _process_one_with_assignments(file_path, session_code, view_assignments)
-            out.append(result)
-            _log(f"## File {i}/{total} completed successfully")
-        except Exception as e:
-            error_msg = f"File {i}/{total} failed: {str(e)[:100]}..."
-            _log(f"[ERROR] {error_msg}")
-            print(f"[FULL ERROR] {file_path} failed: {e}\n{traceback.format_exc()}")
-        finally:
-            if progress_cb:
-                progress_cb(i, total, str(file_path))
 
-    _log("## Batch import process completed")
-    _log("## ENFORCED VIEW NAMING: All files processed with Anterior/Posterior views")
-    _log("## Local processing completed. Original PNG files uploaded to cloud.")
-    _log("## All files use study date naming convention with proper view names.")
-    
-    globals()["_log"] = orig_log
-    return out
+    total = len(file_view_assignments)
+    return _run_import_batch(
+        file_view_assignments,
+        session_code=session_code,
+        segmentation_profile=segmentation_profile,
+        progress_cb=progress_cb,
+        log_cb=log_cb,
+        header=[
+            f"## Starting batch import with view assignments: {total} file(s)",
+            f"## Session code: {session_code}",
+            f"## Segmentation profile: {segmentation_profile}",
+            f"## Target directory: data/SPECT/{session_code}/[patient_id]/",
+            f"## ENFORCED NAMING: Anterior/Posterior views only",
+            f"## Processing workflow: Copy → Original PNG → Segmentation → YOLO → Otsu → Classification → Quantification → Upload PNG",
+        ],
+        footer=[
+            "## Batch import process completed",
+            "## ENFORCED VIEW NAMING: All files processed with Anterior/Posterior views",
+            "## Local processing completed. Original PNG files uploaded to cloud.",
+            "## All files use study date naming convention with proper view names.",
+        ],
+    )
 
 
 def process_files(
@@ -472,7 +602,8 @@ def process_files(
     data_root: str | Path | None = None,
     progress_cb: Callable[[int, int, str], None] | None = None,
     log_cb: Callable[[str], None] | None = None,
-    session_code: str | None = None 
+    session_code: str | None = None,
+    segmentation_profile: str | None = None
 ) -> List[Path]:
     """
     Backward compatibility - process with auto-detection only
@@ -483,6 +614,7 @@ def process_files(
         progress_cb: Progress callback
         log_cb: Log callback  
         session_code: Session code (required)
+        segmentation_profile: Predictor profile for this batch (defaults to the session profile)
         
     Returns:
         List of processed file paths
@@ -490,6 +622,7 @@ def process_files(
     
     if not session_code:
         raise ValueError("session_code is required for new directory structure")
+    segmentation_profile = segmentation_profile or get_segmentation_profile()
     
     # Convert to file_view_assignments format with None (auto-detect)
     file_view_assignments = {Path(p): None for p in paths}
@@ -501,46 +634,29 @@ def process_files(
         session_root = get_session_spect_path(session_code)
     
     session_root.mkdir(parents=True, exist_ok=True)
-    
-    # Proxy _log for frontend
-    orig_log = _log
-    def _proxy(msg: str) -> None:
-        orig_log(msg)
-        if log_cb:
-            display_msg = truncate_text(msg, 100) if len(msg) > 100 else msg
-            log_cb(display_msg)
-    globals()["_log"] = _proxy
 
-    out: List[Path] = []
-    total = len(paths)
-    
-    _log(f"## Starting batch import with AUTO-DETECTION: {total} file(s)")
-    _log(f"## Session code: {session_code}")
-    _log(f"## Target directory: data/SPECT/{session_code}/[patient_id]/")
-    _log(f"## AUTO-DETECTION: System will detect Anterior/Posterior views")
-    _log(f"## Processing workflow: Copy → Original PNG → Segmentation → YOLO → Otsu → Classification → Quantification → Upload PNG")
-
-    for i, p in enumerate(paths, 1):
-        try:
-            _log(f"\n## Processing file {i}/{total}: {truncate_text(p.name, 30)}")
-            result = _process_one_with_assignments(Path(p), session_code, None)
-            out.append(result)
-            _log(f"## File {i}/{total} completed successfully")
-        except Exception as e:
-            error_msg = f"File {i}/{total} failed: {str(e)[:100]}..."
-            _log(f"[ERROR] {error_msg}")
-            print(f"[FULL ERROR] {p} failed: {e}\n{traceback.format_exc()}")
-        finally:
-            if progress_cb:
-                progress_cb(i, total, str(p))
-
-    _log("## Batch import process completed")
-    _log("## AUTO-DETECTION completed. Check logs for any view assignment issues.")
-    _log("## Local processing completed. Original PNG files uploaded to cloud.")
-    _log("## All files use study date naming convention.")
-    
-    globals()["_log"] = orig_log
-    return out
+    total = len(file_view_assignments)
+    return _run_import_batch(
+        file_view_assignments,
+        session_code=session_code,
+        segmentation_profile=segmentation_profile,
+        progress_cb=progress_cb,
+        log_cb=log_cb,
+        header=[
+            f"## Starting batch import with AUTO-DETECTION: {total} file(s)",
+            f"## Session code: {session_code}",
+            f"## Segmentation profile: {segmentation_profile}",
+            f"## Target directory: data/SPECT/{session_code}/[patient_id]/",
+            f"## AUTO-DETECTION: System will detect Anterior/Posterior views",
+            f"## Processing workflow: Copy → Original PNG → Segmentation → YOLO → Otsu → Classification → Quantification → Upload PNG",
+        ],
+        footer=[
+            "## Batch import process completed",
+            "## AUTO-DETECTION completed. Check logs for any view assignment issues.",
+            "## Local processing completed. Original PNG files uploaded to cloud.",
+            "## All files use study date naming convention.",
+        ],
+    )
 
 
 # ---------------------------------------------------------------- migration helper
@@ -0,0 +1,180 @@
+# features/dicom_import/logic/lazy_scan.py - Header-first scan objects for the viewer
+"""
+Lazy scan loading for the SPECT viewer.
+
+``open_scan`` reads only the DICOM header (``stop_before_pixels``) and returns
+the usual viewer scan dict ``{"meta", "frames", "path"}``. ``frames`` is a
+``LazyFrames`` mapping: its keys (view labels) and frame shape come from the
+header, the pixel data is decoded on first frame access - or earlier, in the
+background, via ``prefetch_scans``.
+
+Decoded pixels live in a process-wide ``PixelCache`` bounded by
+``SCAN_PIXEL_CACHE_MB``; an evicted scan is simply decoded again on its next
+access, so the viewer's patient cache can keep headers for every patient of a
+long reading session without holding every frame in memory.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pydicom
+
+from core.config.paths import SCAN_PIXEL_CACHE_MB
+from .dicom_loader import build_scan_metadata, frame_view_labels
+
+
+class PixelCache:
+    """Byte-bounded LRU of decoded pixel arrays, keyed by file path."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._arrays: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            arr = self._arrays.get(key)
+            if arr is not None:
+                self._arrays.move_to_end(key)
+            return arr
+
+    def put(self, key: str, arr: np.ndarray) -> None:
+        with self._lock:
+            old = self._arrays.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._arrays[key] = arr
+            self._bytes += arr.nbytes
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._arrays) > 1:
+                _, evicted = self._arrays.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            old = self._arrays.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._arrays.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+
+_pixel_cache: Optional[PixelCache] = None
+
+
+def get_pixel_cache() -> PixelCache:
+    """Process-wide decoded-pixel cache shared by every lazy scan."""
+    global _pixel_cache
+    if _pixel_cache is None:
+        _pixel_cache = PixelCache(SCAN_PIXEL_CACHE_MB * 1024 * 1024)
+    return _pixel_cache
+
+
+class LazyFrames(Mapping):
+    """
+    ``{view_name: frame}`` mapping that decodes the pixel data on first access.
+
+    Membership, iteration, ``len`` and ``frame_shape`` only use the header.
+    """
+
+    def __init__(self, path: Path, header: pydicom.Dataset, cache: PixelCache = None):
+        self.path = Path(path)
+        self.header = header
+        self._cache = cache or get_pixel_cache()
+        self._lock = threading.Lock()
+
+        n_frames = int(getattr(header, "NumberOfFrames", 1) or 1)
+        labels = frame_view_labels(header, n_frames)
+        # Later duplicates win, like the eager {label: arr[i]} dict
+        self._index: Dict[str, int] = {label: i for i, label in enumerate(labels)}
+
+    @property
+    def frame_shape(self) -> Tuple[int, int]:
+        """(rows, columns) of every frame, from the header."""
+        return int(self.header.Rows), int(self.header.Columns)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._cache.get(str(self.path)) is not None
+
+    def load(self) -> np.ndarray:
+        """Decoded (N, H, W) pixel array, from cache or decoded now (thread-safe)."""
+        key = str(self.path)
+        arr = self._cache.get(key)
+        if arr is not None:
+            return arr
+
+        with self._lock:
+            # Another thread may have decoded it while we waited
+            arr = self._cache.get(key)
+            if arr is None:
+                # Only the pixel data is read; the header dataset stays lean
+                arr = pydicom.pixels.pixel_array(self.path)
+                if arr.ndim == 2:
+                    arr = arr[np.newaxis, ...]
+                self._cache.put(key, arr)
+            return arr
+
+    def __getitem__(self, view: str) -> np.ndarray:
+        if view not in self._index:
+            raise KeyError(view)
+        return self.load()[self._index[view]]
+
+    def __contains__(self, view) -> bool:
+        return view in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"LazyFrames({self.path.name}, views={list(self._index)}, loaded={self.is_loaded})"
+
+
+def open_scan(dicom_path: Path) -> Dict:
+    """
+    Viewer scan dict for a DICOM, reading only its header.
+
+    Returns:
+        {"meta": metadata, "frames": LazyFrames, "path": Path}
+    """
+    dicom_path = Path(dicom_path)
+    header = pydicom.dcmread(dicom_path, stop_before_pixels=True)
+    return {
+        "meta": build_scan_metadata(header),
+        "frames": LazyFrames(dicom_path, header),
+        "path": dicom_path,
+    }
+
+
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+
+
+def prefetch_scans(scans: List[Dict]) -> List[Future]:
+    """Decode the pixel data of lazy scans in a background thread (in the given order)."""
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        _prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-prefetch")
+
+    futures = []
+    for scan in scans:
+        frames = scan.get("frames")
+        if isinstance(frames, LazyFrames) and not frames.is_loaded:
+            futures.append(_prefetch_executor.submit(frames.load))
+    return futures
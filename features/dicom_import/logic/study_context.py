@@ -0,0 +1,77 @@
+# features/dicom_import/logic/study_context.py - One decoded study shared by every import stage
+"""
+In-memory context of one study during import.
+
+The source DICOM is read and decoded exactly once; patient ID, study date,
+destination path and the view frames are derived from that single read and
+handed to every pipeline stage (segmentation, YOLO, Otsu, classification,
+quantification) instead of each stage re-reading the file.
+
+The full ``pydicom`` dataset (needed for overlays and the Secondary Captures)
+stays in the importing process: it is dropped when the context is pickled for
+the inference worker, which only needs the frames and the naming fields.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pydicom
+
+from core.config.paths import generate_filename_stem, get_dicom_output_path
+from .dicom_loader import build_scan_metadata, frames_from_dataset, study_date_from_dataset
+
+
+@dataclass
+class StudyContext:
+    source_path: Path
+    dicom_path: Path                       # destination: data/SPECT/[session]/[patient]/[stem].dcm
+    session_code: str
+    patient_id: str
+    study_date: str
+    frames: Dict[str, np.ndarray]          # {view_name: frame}, view assignments applied
+    meta: Dict
+    dataset: Optional[pydicom.Dataset] = field(default=None, repr=False)
+
+    @property
+    def filename_stem(self) -> str:
+        return generate_filename_stem(self.patient_id, self.study_date)
+
+    @property
+    def patient_folder(self) -> Path:
+        return self.dicom_path.parent
+
+    def __getstate__(self):
+        # The dataset (with its raw PixelData) stays in the importing process
+        state = self.__dict__.copy()
+        state["dataset"] = None
+        return state
+
+
+def load_study_context(src: Path, session_code: str,
+                       view_assignments: Optional[Dict[int, str]] = None) -> StudyContext:
+    """
+    Read and decode a source DICOM once.
+
+    Args:
+        src: Source DICOM path
+        session_code: Session code (decides the destination folder)
+        view_assignments: Dict {frame_index: view_name} or None for auto-detection
+    """
+    src = Path(src)
+    ds = pydicom.dcmread(src)
+    pid = str(ds.PatientID)
+    study_date = study_date_from_dataset(ds)
+
+    return StudyContext(
+        source_path=src,
+        dicom_path=get_dicom_output_path(pid, session_code, study_date),
+        session_code=session_code,
+        patient_id=pid,
+        study_date=study_date,
+        frames=frames_from_dataset(ds, view_assignments),
+        meta=build_scan_metadata(ds),
+        dataset=ds,
+    )
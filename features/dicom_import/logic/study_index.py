@@ -0,0 +1,354 @@
+# features/dicom_import/logic/study_index.py - Persistent SQLite index of the SPECT archive
+"""
+On-disk index of every ``*.dcm`` under ``data/SPECT`` so that patient
+listings do not need a recursive glob plus a ``dcmread`` of every file (most
+of which are our own mask / colored Secondary Captures) on each login.
+
+Per file the index stores session, patient, DICOM PatientID, study date,
+the primary flag (``_is_primary``) and the file's (mtime, size); per primary
+study it stores which analysis stages have all of their outputs on disk.
+
+Updates are incremental:
+
+* ``refresh(root)`` stats every directory below ``root``; only directories
+  whose mtime changed (a file was added, removed or renamed) are listed file
+  by file, and only files whose (mtime, size) changed are opened again - in
+  parallel via ``header_scanner``, derived ``*_mask.dcm`` / ``*_colored.dcm``
+  captures by name only.
+* ``record_import(dicom_path)`` re-indexes a study folder right after the
+  import pipeline wrote it, so the next listing does not have to find it.
+
+A file rewritten in place keeps its directory mtime; ``refresh(root,
+force=True)`` re-checks every file for that case.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config.paths import STUDY_INDEX_PATH, generate_filename_stem
+from features.spect_viewer.logic.artifact_manifest import STAGES, required_output_paths
+from .directory_scanner import _extract_session_patient_from_path, _is_primary
+from .header_scanner import HeaderResult, ScanProgress, is_derived_filename, scan_headers
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    dir      TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path             TEXT PRIMARY KEY,
+    dir              TEXT NOT NULL,
+    session_code     TEXT NOT NULL,
+    patient_id       TEXT NOT NULL,
+    dicom_patient_id TEXT NOT NULL,
+    study_date       TEXT NOT NULL,
+    is_primary       INTEGER NOT NULL,
+    mtime_ns         INTEGER NOT NULL,
+    size             INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_patient ON files(session_code, patient_id);
+CREATE TABLE IF NOT EXISTS artifacts (
+    path    TEXT NOT NULL,
+    stage   TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    PRIMARY KEY (path, stage)
+);
+"""
+
+
+def _normalized_date(value) -> str:
+    value = str(value or "").replace('-', '').replace('/', '')
+    return value if len(value) == 8 and value.isdigit() else ""
+
+
+def _study_date(ds) -> str:
+    """StudyDate, else SeriesDate, as YYYYMMDD - "" when neither is usable (no "today" fallback)."""
+    return _normalized_date(ds.get("StudyDate")) or _normalized_date(ds.get("SeriesDate"))
+
+
+class StudyIndex:
+    """SQLite-backed index of DICOM files, primary studies and their artifacts."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Import runs in a worker thread; every access goes through the lock
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is not None and row[0] == str(SCHEMA_VERSION):
+                return
+            # Unknown / old layout: the index is only a cache of the file system, rebuild it
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM artifacts")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # -------------------------------------------------------------- helpers
+    @staticmethod
+    def _key(path: Path) -> str:
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _under(column: str, root: str) -> Tuple[str, tuple]:
+        """SQL condition selecting ``root`` itself and everything below it."""
+        prefix = root.rstrip(os.sep) + os.sep
+        return f"({column} = ? OR substr({column}, 1, ?) = ?)", (root, len(prefix), prefix)
+
+    def _forget_dir(self, directory: str) -> int:
+        removed = self._conn.execute("SELECT COUNT(*) FROM files WHERE dir = ?", (directory,)).fetchone()[0]
+        self._conn.execute("DELETE FROM artifacts WHERE path IN (SELECT path FROM files WHERE dir = ?)", (directory,))
+        self._conn.execute("DELETE FROM files WHERE dir = ?", (directory,))
+        self._conn.execute("DELETE FROM dirs WHERE dir = ?", (directory,))
+        return removed
+
+    @staticmethod
+    def _file_record(path: str, st: os.stat_result, result: Optional[HeaderResult]) -> tuple:
+        """Row for the files table; result None = derived filename, not opened."""
+        session_code, path_patient_id = _extract_session_patient_from_path(Path(path))
+        row_start = (path, os.path.dirname(path), session_code)
+        row_end = (st.st_mtime_ns, st.st_size)
+
+        if result is None or result.dataset is None:
+            if result is not None:
+                # Indexed as non-primary, so the file is not re-read until it changes
+                print(f"[WARN] Tidak bisa baca {path}: {result.error}")
+            return row_start + (path_patient_id, "", "", 0) + row_end
+
+        ds = result.dataset
+        pid = str(ds.get("PatientID", "") or "")
+        patient_id = path_patient_id if path_patient_id != "UNKNOWN" else pid
+        return row_start + (patient_id, pid, _study_date(ds), int(_is_primary(ds))) + row_end
+
+    def _plan_directory(self, directory: str, entries: List[os.DirEntry]) -> Tuple[set, Dict[str, os.stat_result], List[str], List[str]]:
+        """Compare a listing with the index: (names, {dcm path: stat}, changed paths, removed paths)."""
+        known = {
+            path: (mtime, size)
+            for path, mtime, size in self._conn.execute(
+                "SELECT path, mtime_ns, size FROM files WHERE dir = ?", (directory,))
+        }
+
+        names = set()
+        current: Dict[str, os.stat_result] = {}
+        changed = []
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                names.add(entry.name)
+                if not entry.name.lower().endswith(".dcm"):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            current[entry.path] = st
+            if known.get(entry.path) != (st.st_mtime_ns, st.st_size):
+                changed.append(entry.path)
+
+        removed = [path for path in known if path not in current]
+        return names, current, changed, removed
+
+    def _apply_directory(self, directory: str, mtime_ns: int, plan, records: Dict[str, tuple]) -> None:
+        """Write one planned directory: changed files, removals, artifact presence, dir mtime."""
+        names, _, changed, removed = plan
+        self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               [records[path] for path in changed])
+        self._conn.executemany("DELETE FROM artifacts WHERE path = ?", [(path,) for path in removed])
+        self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+        # Artifact presence comes from the listing we already have - no extra stats
+        primaries = self._conn.execute(
+            "SELECT path, patient_id, study_date FROM files WHERE dir = ? AND is_primary = 1", (directory,)
+        ).fetchall()
+        folder = Path(directory)
+        for path, patient_id, study_date in primaries:
+            if not study_date:
+                continue
+            stem = generate_filename_stem(patient_id, study_date)
+            self._conn.executemany("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?)", [
+                (path, stage, int(all(p.name in names for p in required_output_paths(folder, stem, stage).values())))
+                for stage in STAGES
+            ])
+
+        self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (directory, mtime_ns))
+
+    # -------------------------------------------------------------- updates
+    def refresh(self, root: Path, recursive: bool = True, force: bool = False,
+                progress_cb: Callable[[ScanProgress], None] = None) -> Dict[str, float]:
+        """
+        Bring the index up to date for ``root`` (and, by default, everything below it).
+
+        Args:
+            root: Directory to re-check
+            recursive: Also walk sub-directories (False = just ``root``, like ``glob("*.dcm")``)
+            force: Re-check every file even where the directory mtime is unchanged
+            progress_cb: Forwarded to scan_headers while new / changed headers are read
+
+        Returns:
+            Counters: dirs, changed_dirs, read (headers opened), removed, seconds
+        """
+        t0 = time.perf_counter()
+        root_key = self._key(root)
+        stats = {"dirs": 0, "changed_dirs": 0, "read": 0, "removed": 0}
+
+        with self._lock, self._conn:
+            if recursive:
+                condition, params = self._under("dir", root_key)
+                known = dict(self._conn.execute(f"SELECT dir, mtime_ns FROM dirs WHERE {condition}", params))
+            else:
+                known = dict(self._conn.execute("SELECT dir, mtime_ns FROM dirs WHERE dir = ?", (root_key,)))
+
+            # 1. Walk: list only what is needed, collect every changed file of every changed dir
+            plans = []
+            visited = set()
+            stack = [root_key]
+            while stack:
+                directory = stack.pop()
+                try:
+                    # stat before listing: a file added in between bumps the mtime again
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                    with os.scandir(directory) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                visited.add(directory)
+                stats["dirs"] += 1
+
+                if recursive:
+                    stack.extend(e.path for e in entries if e.is_dir(follow_symlinks=False))
+
+                if force or known.get(directory) != mtime_ns:
+                    plans.append((directory, mtime_ns, self._plan_directory(directory, entries)))
+
+            # 2. Read the changed headers in parallel (derived SC files by name only)
+            records: Dict[str, tuple] = {}
+            to_read = []
+            for _, _, (_, current, changed, _) in plans:
+                for path in changed:
+                    if is_derived_filename(path):
+                        records[path] = self._file_record(path, current[path], None)
+                    else:
+                        to_read.append((path, current[path]))
+            stat_by_path = dict(to_read)
+            stats["read"] = len(to_read)
+            for result in scan_headers([path for path, _ in to_read], progress_cb=progress_cb):
+                records[result.path] = self._file_record(result.path, stat_by_path[result.path], result)
+
+            # 3. Write
+            for directory, mtime_ns, plan in plans:
+                self._apply_directory(directory, mtime_ns, plan, records)
+                stats["changed_dirs"] += 1
+                stats["removed"] += len(plan[3])
+
+            # Directories that disappeared since the last refresh
+            if recursive:
+                condition, params = self._under("dir", root_key)
+                indexed = {row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT dir FROM files WHERE {condition}", params)}
+                stale = (indexed | set(known)) - visited
+            else:
+                stale = {root_key} - visited
+            for directory in stale:
+                stats["removed"] += self._forget_dir(directory)
+
+        stats["seconds"] = time.perf_counter() - t0
+        return stats
+
+    def record_import(self, dicom_paths: Iterable[Path]) -> None:
+        """Re-index the study folders the import pipeline just wrote."""
+        for directory in {Path(self._key(p)).parent for p in dicom_paths}:
+            self.refresh(directory, recursive=False, force=True)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM dirs")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM artifacts")
+
+    # -------------------------------------------------------------- queries
+    def session_patient_map(self, root: Path) -> Dict[str, Dict[str, List[Path]]]:
+        """{SessionCode: {PatientID: [primary scans]}} below ``root`` (as last refreshed)."""
+        condition, params = self._under("dir", self._key(root))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path, session_code, patient_id FROM files "
+                f"WHERE {condition} AND is_primary = 1 AND dicom_patient_id != '' ORDER BY path",
+                params,
+            ).fetchall()
+
+        session_patient_map: Dict[str, Dict[str, List[Path]]] = {}
+        for path, session_code, patient_id in rows:
+            session_patient_map.setdefault(session_code, {}).setdefault(patient_id, []).append(Path(path))
+        return session_patient_map
+
+    def directory_files(self, directory: Path, primary_only: bool = True) -> List[Path]:
+        """Sorted ``*.dcm`` files directly inside ``directory``."""
+        query = "SELECT path FROM files WHERE dir = ?" + (" AND is_primary = 1" if primary_only else "")
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY path", (self._key(directory),)).fetchall()
+        return [Path(row[0]) for row in rows]
+
+    def study_status(self, dicom_path: Path) -> Dict[str, bool]:
+        """{stage: all outputs present} for a primary study ({} if not indexed or undated)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, present FROM artifacts WHERE path = ?", (self._key(dicom_path),)
+            ).fetchall()
+        present = dict(rows)
+        return {stage: bool(present[stage]) for stage in STAGES if stage in present}
+
+    def patient_studies(self, session_code: str, patient_id: str) -> List[Dict]:
+        """Primary studies of a patient with study date and artifact status, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, study_date FROM files "
+                "WHERE session_code = ? AND patient_id = ? AND is_primary = 1 ORDER BY study_date, path",
+                (session_code, patient_id),
+            ).fetchall()
+        return [
+            {"path": Path(path), "study_date": study_date, "status": self.study_status(Path(path))}
+            for path, study_date in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files, primaries = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(is_primary), 0) FROM files").fetchone()
+            dirs = self._conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+        return {"files": files, "primary": primaries, "dirs": dirs}
+
+
+_study_index: Optional[StudyIndex] = None
+_study_index_lock = threading.Lock()
+
+
+def get_study_index() -> StudyIndex:
+    """Process-wide study index at ``STUDY_INDEX_PATH``."""
+    global _study_index
+    with _study_index_lock:
+        if _study_index is None:
+            _study_index = StudyIndex(STUDY_INDEX_PATH)
+        return _study_index
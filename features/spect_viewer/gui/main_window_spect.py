@@ -12,7 +12,6 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QDialog, QApplication, QLabel, QFileDialog, QMessageBox
 )
 from PySide6.QtGui import QCloseEvent, QShortcut, QKeySequence
-import multiprocessing
 
 # Import NEW config paths and session management
 from core.config.paths import (
@@ -23,6 +22,7 @@ from core.config.paths import (
     extract_study_date_from_dicom
 )
 from core.config.sessions import get_current_session
+from core.tracing import span, traced
 
 # Import NEW directory scanner for new structure
 from features.dicom_import.logic.directory_scanner import (
@@ -35,11 +35,13 @@ from features.dicom_import.logic.directory_scanner import (
 from .frame_selector import FrameSelector
 
 # ===== TAMBAHKAN IMPORT LOADING DIALOG =====
-from core.gui.loading_dialog import SPECTLoadingDialog
+from core.gui.loading_dialog import LoadingDialog, SPECTLoadingDialog
 # ===========================================
 from features.spect_viewer.logic.processing_wrapper import run_yolo_detection_for_patient, run_hotspot_processing_in_process
 from features.dicom_import.logic.dicom_loader import load_frames_and_metadata, extract_study_date_from_dicom
+from features.dicom_import.logic.lazy_scan import open_scan, prefetch_scans
 from features.spect_viewer.logic.hotspot_processor import HotspotProcessor
+from features.spect_viewer.logic.inference_worker import get_inference_worker
 from core.utils.image_converter import load_frames_and_metadata_matrix
 
 # Import the new dialog
@@ -55,6 +57,7 @@ from core.gui.ui_constants import (
 from core.gui.searchable_combobox import SearchableComboBox
 from core.gui.patient_info_bar import PatientInfoBar
 from .scan_timeline import ScanTimelineWidget  # UPDATED: Use modular timeline widget
+from .reanalysis_manager import ReanalysisManager
 
 # ✅ FIXED: Import BSISidePanel instead of SidePanel
 from .side_panel import BSISidePanel
@@ -78,17 +81,21 @@ class MainWindowSpect(QMainWindow):
         self.setWindowTitle(f"Hotspot Analyzer - Session: {session_code or 'Unknown'}")
         self.resize(1600, 900)
         self.session_code = session_code
-        self.pool = multiprocessing.Pool(processes=1)
+        # Shared warm inference worker (models stay loaded between jobs)
+        self.inference_worker = get_inference_worker()
         self.data_root = data_root
         print(f"[DEBUG] session_code in MainWindow = {self.session_code}")
 
         # NEW: Store session-patient mapping from new structure
         self._session_patients_map: Dict[str, List[str]] = {}
-        self._loaded: Dict[str, List[Dict]] = {}
+        self._loaded: Dict[str, List[Dict]] = {}  # headers + lazy frames; pixels live in the bounded pixel cache
         self.scan_buttons: List[QPushButton] = []
         
         # ✅ NEW: BSI integration
         self.bsi_integration = get_bsi_integration()
+        
+        # Background (re-)analysis after editor saves, off the GUI thread
+        self.reanalysis = ReanalysisManager(parent=self)
 
         self._build_ui()
         self._scan_folder()
@@ -355,6 +362,14 @@ class MainWindowSpect(QMainWindow):
         # FIXED: Connect timeline scan selection signal to sync with scan buttons
         self.timeline_widget.scan_selected.connect(self._on_timeline_scan_selected)
         
+        # Editor saves re-run the stale stages in the background; progress streams to the timeline
+        self.timeline_widget.edits_saved.connect(self._on_editor_saved)
+        self.timeline_widget.analysis_cancel_requested.connect(self.reanalysis.cancel)
+        self.reanalysis.job_queued.connect(self._on_reanalysis_queued)
+        self.reanalysis.job_progress.connect(self._on_reanalysis_progress)
+        self.reanalysis.step_finished.connect(self._on_reanalysis_step_finished)
+        self.reanalysis.job_finished.connect(self._on_reanalysis_finished)
+        
         main_splitter.addWidget(self.timeline_widget)
 
         # ✅ FIXED: RIGHT PANEL: BSI Side Panel instead of old SidePanel
@@ -563,7 +578,7 @@ class MainWindowSpect(QMainWindow):
             
             # Get patient ID from path or scan data
             patient_id = patient_folder.name
-            study_date = extract_study_date_from_dicom(dicom_path)
+            study_date = scan_data.get("meta", {}).get("study_date") or extract_study_date_from_dicom(dicom_path)
             
             # Load BSI data
             self.bsi_panel.load_patient_data(patient_folder, patient_id, study_date)
@@ -705,10 +720,9 @@ class MainWindowSpect(QMainWindow):
     
     def closeEvent(self, event: QCloseEvent):
         print("[DEBUG] Membersihkan sumber daya di MainWindow (SPECT)...")
-        print("[DEBUG] Menutup process pool...")
-        self.pool.close()
-        self.pool.join()
-        print("[DEBUG] Process pool ditutup.")
+        if hasattr(self, 'reanalysis'):
+            self.reanalysis.shutdown()
+        # The inference worker is shared with import and stopped at interpreter exit
         if hasattr(self, 'timeline_widget') and hasattr(self.timeline_widget, 'cleanup'):
             self.timeline_widget.cleanup()
         if hasattr(self, 'bsi_panel') and hasattr(self.bsi_panel, 'cleanup'):
@@ -741,7 +755,7 @@ class MainWindowSpect(QMainWindow):
             for scan_data in scans:
                 try:
                     dicom_path = scan_data["path"]
-                    study_date = extract_study_date_from_dicom(dicom_path)
+                    study_date = scan_data["meta"]["study_date"]
                     filename_stem = generate_filename_stem(patient_id, study_date)
                     
                     hotspot_ant = dicom_path.parent / f"{filename_stem}_ant_hotspot_colored.png"
@@ -761,33 +775,74 @@ class MainWindowSpect(QMainWindow):
             
             print(f"[DEBUG] Creating {len(missing_hotspot_files)} missing hotspot files...")
             
-            # Show loading dialog only if we need to process
-            loading_dialog = SPECTLoadingDialog("Creating missing hotspot files...", parent=self)
-            loading_dialog.show()
-            QApplication.processEvents()
-
-            hotspot_jobs = []
-            for dicom_file in missing_hotspot_files:
-                job = self.pool.apply_async(
-                    run_hotspot_processing_in_process, 
-                    args=(dicom_file, patient_id)
-                )
-                hotspot_jobs.append(job)
+            # Processed in the background; each finished scan shows up in the timeline right away
+            worker = self.inference_worker
             
-            # Wait for processing to complete
-            for job in hotspot_jobs:
-                job.get(timeout=180)
-
-            loading_dialog.close()
-            print("[DEBUG] Missing hotspot files created. Refreshing timeline...")
+            def create_missing(progress, step_done, should_cancel):
+                hotspot_jobs = [(dicom_file, worker.submit("hotspot", dicom_file, patient_id))
+                                for dicom_file in missing_hotspot_files]
+                steps_run = []
+                for i, (dicom_file, job) in enumerate(hotspot_jobs):
+                    if should_cancel():
+                        return {"success": False, "steps_run": steps_run}
+                    progress(i, len(hotspot_jobs), f"Creating hotspot files ({dicom_file.stem})...")
+                    try:
+                        job.result(timeout=180)
+                        ok = True
+                    except Exception as e:
+                        print(f"[ERROR] Hotspot processing failed for {dicom_file.name}: {e}")
+                        ok = False
+                    steps_run.append((f"hotspot {dicom_file.stem}", ok))
+                    step_done(f"hotspot {dicom_file.stem}", ok)
+                progress(len(hotspot_jobs), len(hotspot_jobs), "Missing hotspot files created")
+                return {"success": all(ok for _, ok in steps_run), "steps_run": steps_run}
             
-            # Refresh timeline to load the newly created files
-            self.timeline_widget.refresh_current_view()
+            self.reanalysis.submit(f"hotspot_{cache_key}", "Creating missing hotspot files", create_missing)
 
         except Exception as e:
             print(f"[ERROR] Failed to run on-demand hotspot processing: {e}")
-            if 'loading_dialog' in locals() and loading_dialog:
-                loading_dialog.close()
+
+    # ------------------------------------------------------ background re-analysis
+    def _on_editor_saved(self, scan: Dict, editor: str):
+        """Re-run the analysis stages the saved edits made stale, in the background"""
+        try:
+            dicom_path = Path(scan["path"])
+            patient_id = dicom_path.parent.name
+            study_date = scan.get("meta", {}).get("study_date") or extract_study_date_from_dicom(dicom_path)
+            self.reanalysis.request_reanalysis(dicom_path, patient_id, study_date, reason=f"{editor} edited")
+        except Exception as e:
+            print(f"[ERROR] Could not schedule re-analysis: {e}")
+
+    def _on_reanalysis_queued(self, key: str, title: str):
+        self.timeline_widget.set_analysis_status(f"<b>{title}</b><br>Queued...")
+
+    def _on_reanalysis_progress(self, key: str, current: int, total: int, message: str):
+        step = f" ({current + 1}/{total})" if current < total else ""
+        self.timeline_widget.set_analysis_status(f"<b>{key}</b><br>{message}{step}")
+
+    def _on_reanalysis_step_finished(self, key: str, step_name: str, success: bool):
+        """Partial results: show each stage's outputs as soon as it wrote them"""
+        print(f"[REANALYSIS] {key}: {step_name} {'done' if success else 'failed'}")
+        self.timeline_widget.refresh_current_view()
+        if step_name in ("classification", "quantification"):
+            self._on_timeline_scan_selected(self.timeline_widget.active_scan_index)  # reload BSI panel
+
+    def _on_reanalysis_finished(self, key: str, results: Dict):
+        if results.get("cancelled"):
+            message = f"<b>{key}</b><br>Analysis cancelled"
+        elif results.get("success"):
+            ran = [name for name, _ in results.get("steps_run", [])]
+            message = f"<b>{key}</b><br>Up to date" + (f" (re-ran: {', '.join(ran)})" if ran else "")
+        else:
+            message = f"<b>{key}</b><br>⚠️ Analysis failed: {results.get('error') or 'see log'}"
+        self.timeline_widget.set_analysis_status(message, busy=False)
+        
+        # Keep the last message for a moment, unless another job reports in the meantime
+        QTimer.singleShot(5000, self._clear_reanalysis_status)
+
+    def _clear_reanalysis_status(self):
+        if not self.reanalysis.active_keys():
+            self.timeline_widget.set_analysis_status("", busy=False)
 
     def _show_import_dialog(self) -> None:
         """Show the updated import dialog"""
@@ -822,8 +877,25 @@ class MainWindowSpect(QMainWindow):
         id_combo = self.patient_bar.id_combo
         id_combo.clear()
         
-        # Use NEW directory scanner for new structure
-        all_sessions_map = scan_spect_directory_new_structure(SPECT_DATA_PATH)
+        # Use NEW directory scanner for new structure. The dialog only appears
+        # when headers actually have to be read (first index build, new imports)
+        scan_dialog = None
+
+        def _on_scan_progress(progress) -> None:
+            nonlocal scan_dialog
+            if scan_dialog is None:
+                scan_dialog = LoadingDialog("Scanning SPECT Data", "Reading DICOM headers...", parent=self)
+                scan_dialog.show()
+            scan_dialog.set_message(f"Reading DICOM headers {progress.done}/{progress.total}\n"
+                                    f"({progress.files_per_sec:.0f} files/s)")
+            scan_dialog.set_progress(progress.done * 100 // max(progress.total, 1))
+            QApplication.processEvents()
+
+        try:
+            all_sessions_map = scan_spect_directory_new_structure(SPECT_DATA_PATH, progress_cb=_on_scan_progress)
+        finally:
+            if scan_dialog is not None:
+                scan_dialog.close()
         print(f"[DEBUG] Found {len(all_sessions_map)} total sessions: {list(all_sessions_map.keys())}")
         
         # FIXED: Only use current session if specified
@@ -899,6 +971,7 @@ class MainWindowSpect(QMainWindow):
             print(f"[DEBUG] Original text: '{txt}'")
             return
     
+    @traced("gui.load_patient")
     def _load_patient(self, patient_id: str, session_code: str) -> None:
         """Load patient data using new directory structure - SIMPLIFIED without AI processing"""
         print(f"[DEBUG] Loading patient: {patient_id} from session: {session_code}")
@@ -927,7 +1000,8 @@ class MainWindowSpect(QMainWindow):
             QApplication.processEvents()
 
             # Get patient DICOM files using new structure
-            dicom_files = get_patient_dicom_files(session_code, patient_id, primary_only=True)
+            with span("gui.list_studies", patient=patient_id, session=session_code):
+                dicom_files = get_patient_dicom_files(session_code, patient_id, primary_only=True)
             print(f"[DEBUG] Found {len(dicom_files)} DICOM files for patient {patient_id}")
             
             # ❌ NO MORE YOLO DETECTION - IT'S ALREADY DONE DURING IMPORT
@@ -937,8 +1011,9 @@ class MainWindowSpect(QMainWindow):
 
             for dicom_file in dicom_files:
                 try:
-                    frames, meta = load_frames_and_metadata(dicom_file)
-                    scan_data = {"meta": meta, "frames": frames, "path": dicom_file}
+                    # Header only - pixel data is decoded on first access / by the prefetcher
+                    with span("gui.open_scan", file=dicom_file.name):
+                        scan_data = open_scan(dicom_file)
                     
                     # ✅ ALL PROCESSING ALREADY DONE DURING IMPORT
                     # Just add placeholders for hotspot data - will be loaded when needed
@@ -964,7 +1039,7 @@ class MainWindowSpect(QMainWindow):
             # Get study date for file checking (for debug info)
             for scan_data in processed_scans:
                 try:
-                    study_date = extract_study_date_from_dicom(scan_data["path"])
+                    study_date = scan_data["meta"]["study_date"]
                     filename_stem = generate_filename_stem(patient_id, study_date)
                     print(f"[DEBUG] Scan files for {filename_stem}:")
                     
@@ -990,6 +1065,8 @@ class MainWindowSpect(QMainWindow):
             if scans:
                 print(f"[DEBUG] Saving {len(scans)} scans to cache for {cache_key}")
                 self._loaded[cache_key] = scans
+                # Decode pixels in the background, newest study first (shown first in the side panel)
+                prefetch_scans(list(reversed(scans)))
             else:
                 print(f"[WARN] No scans processed for {cache_key}. Cache not saved.")
 
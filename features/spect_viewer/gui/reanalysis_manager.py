@@ -0,0 +1,247 @@
+# features/spect_viewer/gui/reanalysis_manager.py - Background (re-)analysis jobs for the SPECT viewer
+"""
+Runs analysis work off the GUI thread and reports back through Qt signals.
+
+Jobs run on a private single-thread QThreadPool (the models are heavy; two
+studies at once only makes both slower) and are keyed by study
+(``{patient_id}_{study_date}``):
+
+- request_reanalysis() re-runs the stale stages of a study after an editor
+  save. run_missing_analysis_steps and the artifact manifest decide which
+  stages the edited files invalidate, e.g. an edited segmentation re-runs
+  classification and quantification only.
+- submit() runs any other background work with the same progress and cancel
+  plumbing (e.g. creating missing hotspot files).
+
+Repeated saves are coalesced: a request waits COALESCE_MS before it is
+queued, a queued job absorbs further requests (it reads the files when it
+starts), and a request for a study that is already running schedules exactly
+one follow-up run. Cancelling is cooperative - a running job stops before its
+next stage.
+
+Usage:
+    manager = ReanalysisManager(parent=self)
+    manager.job_progress.connect(on_progress)        # (key, current, total, message)
+    manager.step_finished.connect(on_step)           # (key, step_name, success)
+    manager.job_finished.connect(on_done)            # (key, results dict)
+    key = manager.request_reanalysis(dicom_path, patient_id, study_date)
+    manager.cancel(key)
+"""
+from __future__ import annotations
+
+import threading
+import traceback
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal, Slot
+
+from core.config.paths import extract_study_date_from_dicom, generate_filename_stem
+from core.tracing import span, trace_study
+
+# Quiet period after a save before its re-analysis is queued (ms)
+COALESCE_MS = 750
+
+# work(progress, step_done, should_cancel) -> results dict
+JobWork = Callable[[Callable[[int, int, str], None], Callable[[str, bool], None], Callable[[], bool]], Dict]
+
+
+class _JobSignals(QObject):
+    """Signals of one job; emitted from the pool thread, delivered queued to the manager."""
+    started = Signal(str)
+    progress = Signal(str, int, int, str)
+    step_finished = Signal(str, str, bool)
+    finished = Signal(str, object)
+
+
+class _Job(QRunnable):
+    """One unit of background work for a study."""
+
+    def __init__(self, key: str, title: str, work: JobWork):
+        super().__init__()
+        self.setAutoDelete(False)   # the manager keeps it until it finished
+        self.key = key
+        self.title = title
+        self.work = work
+        self.signals = _JobSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        key = self.key
+        self.signals.started.emit(key)
+        try:
+            with trace_study(key), span("reanalysis.job", title=self.title):
+                results = self.work(
+                    lambda current, total, message: self.signals.progress.emit(key, current, total, message),
+                    lambda step_name, success: self.signals.step_finished.emit(key, step_name, success),
+                    self._cancel.is_set,
+                ) or {}
+        except Exception as e:
+            print(f"[REANALYSIS ERROR] {self.title} failed: {e}")
+            traceback.print_exc()
+            results = {"success": False, "error": str(e)}
+        if self.cancelled:
+            results["cancelled"] = True
+        self.signals.finished.emit(key, results)
+
+
+def _reanalysis_work(dicom_path: Path, patient_id: str, study_date: str,
+                     progress, step_done, should_cancel) -> Dict:
+    from features.spect_viewer.logic.processing_wrapper import run_missing_analysis_steps
+    return run_missing_analysis_steps(dicom_path, patient_id, study_date,
+                                      progress_callback=progress,
+                                      step_callback=step_done,
+                                      should_cancel=should_cancel)
+
+
+class ReanalysisManager(QObject):
+    """Queue of background analysis jobs, one per study at a time (see module docstring)."""
+
+    job_queued = Signal(str, str)               # key, title
+    job_started = Signal(str, str)              # key, title
+    job_progress = Signal(str, int, int, str)   # key, current, total, message
+    step_finished = Signal(str, str, bool)      # key, step name, success
+    job_finished = Signal(str, object)          # key, results dict ("cancelled" set when cancelled)
+
+    def __init__(self, parent=None, coalesce_ms: int = COALESCE_MS):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._coalesce_ms = coalesce_ms
+
+        self._waiting: Dict[str, Tuple[str, JobWork]] = {}     # in the coalescing window
+        self._timers: Dict[str, QTimer] = {}
+        self._queued: Dict[str, _Job] = {}                     # in the pool, not started
+        self._running: Dict[str, _Job] = {}
+        self._followups: Dict[str, Tuple[str, JobWork]] = {}   # run again once the current job ends
+        # The finished signal can arrive before run() has returned, so the last
+        # finished job stays referenced until the (single) pool thread moves on
+        self._retired: Optional[_Job] = None
+
+    # -------------------------------------------------------------- public API
+    def request_reanalysis(self, dicom_path: Path, patient_id: str, study_date: Optional[str] = None,
+                           reason: str = "") -> str:
+        """
+        Re-run the stale analysis stages of a study in the background.
+
+        Returns:
+            The study key used in the signals
+        """
+        dicom_path = Path(dicom_path)
+        study_date = study_date or extract_study_date_from_dicom(dicom_path)
+        key = generate_filename_stem(patient_id, study_date)
+        print(f"[REANALYSIS] Requested for {key}" + (f" ({reason})" if reason else ""))
+        work = partial(_reanalysis_work, dicom_path, patient_id, study_date)
+        self._schedule(key, f"Re-analysis {key}", work, self._coalesce_ms)
+        return key
+
+    def submit(self, key: str, title: str, work: JobWork) -> str:
+        """Run ``work(progress, step_done, should_cancel)`` in the background right away."""
+        self._schedule(key, title, work, 0)
+        return key
+
+    def cancel(self, key: Optional[str] = None) -> None:
+        """Cancel the jobs of a study (all studies when key is None)."""
+        keys = [key] if key is not None else self.active_keys()
+        for k in keys:
+            self._followups.pop(k, None)
+            timer = self._timers.pop(k, None)
+            if timer is not None:
+                timer.stop()
+                timer.deleteLater()
+            if self._waiting.pop(k, None) is not None:
+                self.job_finished.emit(k, {"success": False, "cancelled": True})
+
+            job = self._queued.get(k)
+            if job is not None:
+                if self._pool.tryTake(job):
+                    del self._queued[k]
+                    self.job_finished.emit(k, {"success": False, "cancelled": True})
+                else:
+                    job.cancel()    # already picked up by the pool thread
+
+            job = self._running.get(k)
+            if job is not None:
+                print(f"[REANALYSIS] Cancelling {job.title} (stops before its next stage)")
+                job.cancel()
+
+    def is_active(self, key: str) -> bool:
+        return key in self._waiting or key in self._queued or key in self._running
+
+    def active_keys(self) -> List[str]:
+        return list(dict.fromkeys([*self._waiting, *self._queued, *self._running]))
+
+    def shutdown(self) -> None:
+        """Cancel everything; a running stage still finishes its current step."""
+        self.cancel()
+
+    # -------------------------------------------------------------- scheduling
+    def _schedule(self, key: str, title: str, work: JobWork, delay_ms: int) -> None:
+        if key in self._queued:
+            print(f"[REANALYSIS] {key} already queued - request coalesced")
+            return
+        if key in self._running:
+            print(f"[REANALYSIS] {key} is running - one follow-up run scheduled")
+            self._followups[key] = (title, work)
+            return
+
+        self._waiting[key] = (title, work)
+        if delay_ms <= 0:
+            self._start(key)
+            return
+
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(partial(self._start, key))
+            self._timers[key] = timer
+        timer.start(delay_ms)   # restarting the timer coalesces saves in quick succession
+
+    def _start(self, key: str) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.deleteLater()
+        entry = self._waiting.pop(key, None)
+        if entry is None:
+            return
+
+        title, work = entry
+        job = _Job(key, title, work)
+        job.signals.started.connect(self._on_job_started)
+        job.signals.progress.connect(self.job_progress)
+        job.signals.step_finished.connect(self.step_finished)
+        job.signals.finished.connect(self._on_job_finished)
+        self._queued[key] = job
+        self.job_queued.emit(key, title)
+        self._pool.start(job)
+
+    @Slot(str)
+    def _on_job_started(self, key: str) -> None:
+        job = self._queued.pop(key, None)
+        if job is None:
+            return
+        self._running[key] = job
+        self.job_started.emit(key, job.title)
+
+    @Slot(str, object)
+    def _on_job_finished(self, key: str, results: Dict) -> None:
+        self._queued.pop(key, None)
+        job = self._running.pop(key, None)
+        self._retired = job
+        title = job.title if job is not None else key
+        status = "cancelled" if results.get("cancelled") else ("done" if results.get("success") else "failed")
+        print(f"[REANALYSIS] {title} {status}")
+        self.job_finished.emit(key, results)
+
+        followup = self._followups.pop(key, None)
+        if followup is not None and not results.get("cancelled"):
+            self._schedule(key, *followup, 0)
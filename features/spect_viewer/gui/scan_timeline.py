@@ -8,7 +8,7 @@ import json
 
 import numpy as np
 from PIL import Image
-from PySide6.QtCore import Qt, Signal, QEvent
+from PySide6.QtCore import Qt, Signal, QEvent, QTimer, QCoreApplication
 from PySide6.QtGui import QPixmap, QImage, QKeySequence, QShortcut, QWheelEvent
 from PySide6.QtWidgets import (
     QWidget, QHBoxLayout, QVBoxLayout, QLabel, QScrollArea,
@@ -27,15 +27,16 @@ from core.config.paths import (
 from core.utils.image_converter import (
     make_black_transparent,
     load_image_with_transparency,
-    create_composite_image,
-    get_layer_preview,
-    apply_opacity_to_image
+    get_layer_preview
 )
+from core.utils.compositor import LayerCompositor
+from core.tracing import traced
 
 # Import for patient/session extraction from path
 from features.dicom_import.logic.dicom_loader import extract_patient_info_from_path
 
 from .segmentation_editor_dialog import SegmentationEditorDialog
+from .timeline_cards import TimelineCard, CardFactory
 from .hotspot_editor_dialog import HotspotEditorDialog
 from pydicom import dcmread
 
@@ -49,6 +50,13 @@ from core.gui.ui_constants import (
 # Import BSI integration
 from features.spect_viewer.logic.bsi_timeline_integration import get_bsi_integration
 
+# Decoded layer cache (opacity / selection changes recomposite from memory)
+from features.spect_viewer.logic.layer_cache import get_layer_cache
+
+
+# Cards further than this many viewport widths off-screen release their pixmap
+CARD_RELEASE_VIEWPORTS = 2
+
 
 # --------------------------- helpers -----------------------------------------
 def _array_to_pixmap(arr: np.ndarray, width: int) -> QPixmap:
@@ -104,6 +112,8 @@ class ScanTimelineWidget(QWidget):
     """
     # Signals
     scan_selected = Signal(int)  # Emit scan index when selected
+    edits_saved = Signal(object, str)  # scan dict, editor ("segmentation" / "hotspot") - outputs may be stale
+    analysis_cancel_requested = Signal()
     
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
@@ -130,6 +140,17 @@ class ScanTimelineWidget(QWidget):
         # ✅ NEW: BSI integration
         self.bsi_integration = get_bsi_integration()
         
+        # Decoded layers shared across rebuilds, composited in premultiplied form
+        self._layer_cache = get_layer_cache()
+        self._compositor = LayerCompositor()
+        
+        # Retained cards (one per scan, updated in place)
+        self._cards: List[TimelineCard] = []
+        self._placeholder = None
+        self._placeholder_message: Optional[str] = ""
+        self._render_generation = 0
+        self._render_pending = False
+        
         self._build_ui()
         self._setup_keyboard_shortcuts()
 
@@ -187,6 +208,11 @@ class ScanTimelineWidget(QWidget):
         self.timeline_layout = QHBoxLayout(self.container)
         self.timeline_layout.setAlignment(Qt.AlignLeft)
         self.scroll_area.setWidget(self.container)
+        
+        # Cards are rendered lazily as they scroll into view
+        self.scroll_area.horizontalScrollBar().valueChanged.connect(self._schedule_render)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self._schedule_render)
+        self.scroll_area.viewport().installEventFilter(self)
 
     def _setup_keyboard_shortcuts(self):
         """✅ NEW: Setup keyboard shortcuts for zoom control"""
@@ -310,6 +336,40 @@ class ScanTimelineWidget(QWidget):
         """)
         layout.addWidget(self.scan_info_label)
         
+        # Background re-analysis status (hidden while idle)
+        self.analysis_status = QWidget()
+        analysis_layout = QVBoxLayout(self.analysis_status)
+        analysis_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.analysis_status_label = QLabel("")
+        self.analysis_status_label.setWordWrap(True)
+        self.analysis_status_label.setStyleSheet("""
+            QLabel {
+                font-size: 10px;
+                color: #0c5460;
+                padding: 6px;
+                background: #d1ecf1;
+                border: 1px solid #bee5eb;
+                border-radius: 3px;
+                margin-top: 6px;
+            }
+        """)
+        analysis_layout.addWidget(self.analysis_status_label)
+        
+        self.analysis_cancel_btn = QPushButton("Cancel Analysis")
+        self.analysis_cancel_btn.setStyleSheet(GRAY_BUTTON_STYLE + """
+            QPushButton {
+                font-size: 11px;
+                padding: 4px 8px;
+                margin: 2px 0px;
+            }
+        """)
+        self.analysis_cancel_btn.clicked.connect(self.analysis_cancel_requested)
+        analysis_layout.addWidget(self.analysis_cancel_btn)
+        
+        self.analysis_status.hide()
+        layout.addWidget(self.analysis_status)
+        
         # ✅ NEW: Zoom controls and shortcuts info
         zoom_group = QWidget()
         zoom_layout = QVBoxLayout(zoom_group)
@@ -484,6 +544,7 @@ class ScanTimelineWidget(QWidget):
         self._scans_cache = updated_scans
         self.active_scan_index = active_index
         self._zoom_factor = 1.0
+        self._sync_cards()
         self._rebuild()
         self._update_scan_info_display()
         self._update_edit_button_states()
@@ -529,10 +590,16 @@ class ScanTimelineWidget(QWidget):
         return layer in self._active_layers
 
     def refresh_current_view(self):
-        """Refresh current view - rebuild the timeline display"""
+        """Refresh current view - re-check every card against the files on disk"""
         print("[DEBUG] Refreshing current timeline view...")
         self._rebuild()
 
+    def set_analysis_status(self, message: str, busy: bool = True):
+        """Show background re-analysis progress below the scan info (empty message hides it)"""
+        self.analysis_status_label.setText(message)
+        self.analysis_cancel_btn.setVisible(busy)
+        self.analysis_status.setVisible(bool(message))
+
     def get_active_layers(self) -> list:
         """Get list of currently active layers"""
         return self._active_layers.copy()
@@ -555,110 +622,154 @@ class ScanTimelineWidget(QWidget):
 
     # ------------------------------------------------------ rebuild
     def _clear(self):
+        """Remove all layout items; retained cards stay parented to the container"""
         while self.timeline_layout.count():
-            w = self.timeline_layout.takeAt(0).widget()
-            if w: 
-                w.deleteLater()
+            self.timeline_layout.takeAt(0)
+        if self._placeholder is not None:
+            self._placeholder.deleteLater()
+            self._placeholder = None
 
-    def _rebuild(self):
-        """✅ FIXED: Rebuild with proper view handling"""
-        print(f"[DEBUG] Rebuilding timeline for view: {self.current_view}")
-        self._clear()
+    def _sync_cards(self):
+        """Create one TimelineCard per scan, reusing existing cards for the same DICOM path"""
+        existing = {}
+        for card in self._cards:
+            existing.setdefault(str(card.scan_data["path"]), []).append(card)
         
-        if not self._scans_cache:
-            placeholder = QLabel("No scans available")
-            placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("""
-                QLabel {
-                    color: #6c757d;
-                    font-size: 14px;
-                    padding: 40px;
-                    background: #f8f9fa;
-                    border: 2px dashed #dee2e6;
-                    border-radius: 8px;
-                }
-            """)
-            self.timeline_layout.addWidget(placeholder)
-            return
-
         w = int(self.card_width * self._zoom_factor)
+        cards = []
+        for i, scan in enumerate(self._scans_cache):
+            reusable = existing.get(str(scan["path"]))
+            if reusable:
+                card = reusable.pop(0)
+                card.update_scan(scan, i)
+            else:
+                card = CardFactory.create_scan_card(scan, i, w, self._on_scan_selected)
+            cards.append(card)
         
-        # Show cards based on active layers
-        if not self._active_layers:
-            # No layers selected - show placeholder
-            placeholder = QLabel("No layers selected\nPlease select layers to display")
-            placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("""
-                QLabel {
-                    color: #6c757d;
-                    font-size: 14px;
-                    padding: 40px;
-                    background: #f8f9fa;
-                    border: 2px dashed #dee2e6;
-                    border-radius: 8px;
-                }
-            """)
-            self.timeline_layout.addWidget(placeholder)
+        for leftover in existing.values():
+            for card in leftover:
+                card.deleteLater()
+        
+        self._cards = cards
+        self._placeholder_message = ""  # force relayout
+
+    def _relayout(self, placeholder_message: Optional[str]):
+        """Lay out either the retained cards or a placeholder message"""
+        self._clear()
+        self._placeholder_message = placeholder_message
+        
+        if placeholder_message:
+            for card in self._cards:
+                card.hide()
+            self._placeholder = CardFactory.create_placeholder_card(placeholder_message)
+            self.timeline_layout.addWidget(self._placeholder)
         else:
-            # Show scans with active layers
-            for i, scan in enumerate(self._scans_cache):
-                card = self._make_layered_card(scan, w, i)
+            for card in self._cards:
                 self.timeline_layout.addWidget(card)
-                print(f"[DEBUG] Created card {i} for view {self.current_view}")
-
+                card.show()
+        
         self.timeline_layout.addStretch()
 
-    # ------------------------------------------------------ card builders
-    def _make_header(self, scan: Dict, idx: int) -> QHBoxLayout:
-        """✅ FIXED: Header with BSI information"""
-        meta = scan["meta"]
-        date_raw = meta.get("study_date", "")
-        try:   
-            hdr = datetime.strptime(date_raw, "%Y%m%d").strftime("%b %d, %Y")
-        except ValueError: 
-            hdr = "Unknown"
-        
-        # ✅ NEW: Include BSI in header
-        bsi_text = ""
-        if meta.get("has_bsi", False):
-            bsi_score = meta.get("bsi_score", 0.0)
-            bsi_text = f"<br><small>BSI: {bsi_score:.1f}%</small>"
+    @traced("gui.timeline_rebuild")
+    def _rebuild(self):
+        """✅ Update retained cards in place; visible cards whose inputs changed are recomposited"""
+        if len(self._cards) != len(self._scans_cache):
+            self._sync_cards()
+        
+        if not self._scans_cache:
+            message = "No scans available"
+        elif not self._active_layers:
+            message = "No layers selected\nPlease select layers to display"
+        else:
+            message = None
+        
+        if message != self._placeholder_message:
+            self._relayout(message)
+        if message:
+            return
+        
+        w = int(self.card_width * self._zoom_factor)
+        for i, card in enumerate(self._cards):
+            card.set_active(i == self.active_scan_index)
+            card.set_card_width(w, self._frame_shape(card.scan_data))
+            card.set_status(self.current_view, self._active_layers)
+        
+        # Every card is re-checked against its render key, but only when it is on screen
+        self._render_generation += 1
+        self._schedule_render()
 
-        hbox = QHBoxLayout()
-        
-        # Header info with BSI
-        header_label = QLabel(f"<b>{hdr}</b>{bsi_text}")
-        header_label.setStyleSheet("font-size: 11px;")
-        hbox.addWidget(header_label)
-        hbox.addStretch()
-        
-        # Select button
-        select_btn = QPushButton("Select")
-        select_btn.setFixedSize(60, 24)
-        select_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #6c757d;
-                color: white;
-                border: none;
-                border-radius: 3px;
-                font-size: 10px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #5a6268;
-            }
-            QPushButton:pressed {
-                background-color: #495057;
-            }
-        """)
-        select_btn.clicked.connect(lambda *_: self._on_scan_selected(idx))
-        hbox.addWidget(select_btn)
+    def _schedule_render(self, *_):
+        """Coalesce render requests (rebuilds, scrolling, resizing) into one pass per event-loop turn"""
+        if not self._render_pending:
+            self._render_pending = True
+            QTimer.singleShot(0, self._render_visible_cards)
+
+    def eventFilter(self, obj, event):
+        if obj is self.scroll_area.viewport() and event.type() == QEvent.Resize:
+            self._schedule_render()
+        return super().eventFilter(obj, event)
+
+    def _render_visible_cards(self):
+        """Render cards inside (or one card beside) the viewport, release far off-screen pixmaps"""
+        self._render_pending = False
+        if self._placeholder_message or not self._cards:
+            return
         
-        return hbox
-    
+        # Make sure card geometry (and the scroll area's container size) reflects pending layout changes
+        QCoreApplication.sendPostedEvents(None, QEvent.LayoutRequest)
+        
+        viewport_width = max(1, self.scroll_area.viewport().width())
+        left = self.scroll_area.horizontalScrollBar().value()
+        right = left + viewport_width
+        render_margin = int(self.card_width * self._zoom_factor)
+        release_margin = CARD_RELEASE_VIEWPORTS * viewport_width
+        
+        for card in self._cards:
+            geo = card.geometry()
+            if geo.right() >= left - render_margin and geo.left() <= right + render_margin:
+                if card.rendered_generation != self._render_generation:
+                    self._render_card(card)
+            elif geo.right() < left - release_margin or geo.left() > right + release_margin:
+                if card.render_key is not None:
+                    card.clear_image()
+
+    def _render_card(self, card: TimelineCard):
+        """Recomposite a card only if its layers, opacities, view or width changed"""
+        card.rendered_generation = self._render_generation
+        
+        all_layers = self._get_layer_images(card.scan_data)
+        active = [(name, all_layers[name]) for name in self._active_layers if name in all_layers]
+        
+        # Cached layer images are shared objects: identity changes only when a file changed
+        render_key = (
+            self.current_view,
+            card.card_width,
+            tuple((name, id(image), self._layer_opacities.get(name, 1.0)) for name, image in active),
+        )
+        if render_key == card.render_key:
+            return
+        card.render_key = render_key
+        card._layer_refs = [image for _, image in active]  # keep ids valid while the key is in use
+        
+        if not active:
+            card.set_message(f"No classification data available\nfor {self.current_view}")
+            card.setToolTip("")
+            return
+        
+        try:
+            card.set_image(self._composite_layers(active))
+            card.set_tooltip_info([name for name, _ in active], self._layer_opacities)
+            print(f"[DEBUG] ✅ Card {card.scan_index} composited: {[name for name, _ in active]}")
+        except Exception as e:
+            print(f"[ERROR] Failed to create CLASSIFICATION composite image for card {card.scan_index}: {e}")
+            card.set_message(f"Error creating classification composite\nfor {self.current_view}", error=True)
+            card.setToolTip(str(e))
+
+    # ------------------------------------------------------ card selection
     def _on_scan_selected(self, idx: int):
         """Handle scan selection and emit signal to parent"""
         print(f"[DEBUG] Timeline scan selected: {idx}")
+        previous = self.active_scan_index
         self.active_scan_index = idx
         self._update_scan_info_display()
         self._update_edit_button_states()
@@ -666,8 +777,10 @@ class ScanTimelineWidget(QWidget):
         # Emit signal to parent (MainWindow) to sync with scan buttons
         self.scan_selected.emit(idx)
         
-        # Rebuild to update visual selection
-        self._rebuild()
+        # Only the highlight moves - no recompositing
+        for i in (previous, idx):
+            if 0 <= i < len(self._cards):
+                self._cards[i].set_active(i == idx)
     
     def _get_patient_session_from_scan(self, scan: Dict) -> tuple[str, str]:
         """Extract patient ID and session code from scan path using NEW structure"""
@@ -685,7 +798,7 @@ class ScanTimelineWidget(QWidget):
             print(f"[WARN] Failed to extract patient/session from scan: {e}")
             return "UNKNOWN", self.session_code or "UNKNOWN"
     
-    def _create_bbox_visualization_from_classification(self, xml_path: Path, original_frame: np.ndarray) -> Optional[Image.Image]:
+    def _create_bbox_visualization_from_classification(self, xml_path: Path, frame_shape: tuple) -> Optional[Image.Image]:
         """✅ FIXED: Create bounding box visualization from CLASSIFICATION XML only"""
         try:
             import xml.etree.ElementTree as ET
@@ -698,7 +811,7 @@ class ScanTimelineWidget(QWidget):
             root = tree.getroot()
             
             # Get image dimensions
-            height, width = original_frame.shape[:2]
+            height, width = frame_shape[:2]
             
             # Create transparent image for bounding boxes
             bbox_image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
@@ -795,214 +908,108 @@ class ScanTimelineWidget(QWidget):
             print(f"[ERROR] Failed to create classification bbox visualization: {e}")
             return None
     
+    def _frame_shape(self, scan: Dict) -> Optional[tuple]:
+        """Shape of the current view's frame without decoding lazy scans (header only)"""
+        frame_map = scan["frames"]
+        if self.current_view not in frame_map:
+            return None
+        frame_shape = getattr(frame_map, "frame_shape", None)
+        return frame_shape if frame_shape is not None else frame_map[self.current_view].shape
+
+    def _get_filename_stem(self, scan: Dict) -> str:
+        """Filename stem ({patient}_{study_date}) of a scan; the DICOM header is read once per file version"""
+        dicom_path = Path(scan["path"])
+
+        def _load_stem(path: Path) -> str:
+            try:
+                study_date = extract_study_date_from_dicom(path)
+                patient_id, _ = self._get_patient_session_from_scan(scan)
+                return generate_filename_stem(patient_id, study_date)
+            except Exception as e:
+                print(f"[WARN] Could not extract study date, using original filename: {e}")
+                return path.stem
+
+        return self._layer_cache.get_or_load(dicom_path, None, "filename_stem", _load_stem) or dicom_path.stem
+
     def _get_layer_images(self, scan: Dict) -> Dict[str, Image.Image]:
-        """✅ FIXED: Get layer images - CLASSIFICATION ONLY"""
+        """✅ FIXED: Get layer images - CLASSIFICATION ONLY
+
+        Decoded layers come from the shared layer cache (keyed on file path, view,
+        layer and mtime), so rebuilding for an opacity or selection change does
+        not touch the disk. The returned images are shared - do not modify them.
+        """
         frame_map = scan["frames"]
         dicom_path = Path(scan["path"])
-        filename = dicom_path.stem
+        view = self.current_view
+        cache = self._layer_cache
         
         layers = {}
         
         # ✅ Layer 1: Original (base) - convert to RGBA for opacity support
-        if self.current_view in frame_map:
-            original_arr = frame_map[self.current_view]
-            # Convert to PIL Image with RGBA mode for opacity support
-            original_normalized = ((original_arr - original_arr.min()) / max(1, np.ptp(original_arr)) * 255).astype(np.uint8)
-            original_image = Image.fromarray(original_normalized).convert("RGBA")
-            layers["Original"] = original_image
-            print(f"[DEBUG] Loaded Original layer for {self.current_view}")
+        # (lazy scans only decode their pixels on a cache miss here)
+        frame_shape = self._frame_shape(scan)
+        if frame_shape is not None:
+            def _load_original(_path: Path) -> Image.Image:
+                original_arr = frame_map[view]
+                original_normalized = ((original_arr - original_arr.min()) / max(1, np.ptp(original_arr)) * 255).astype(np.uint8)
+                return Image.fromarray(original_normalized).convert("RGBA")
+
+            layers["Original"] = cache.get_or_load(dicom_path, view, "Original", _load_original)
         
         # Layer 2: Segmentation - with transparency processing
-        try:
-            study_date = extract_study_date_from_dicom(dicom_path)
-            patient_id, session_code = self._get_patient_session_from_scan(scan)
-            filename_with_date = generate_filename_stem(patient_id, study_date)
-            print(f"[DEBUG] Using filename stem with study date: {filename_with_date}")
-        except Exception as e:
-            print(f"[WARN] Could not extract study date, using original filename: {e}")
-            study_date = None
-            filename_with_date = filename
-        
-        seg_files = get_segmentation_files_with_edited(dicom_path.parent, filename_with_date, self.current_view)
+        filename_with_date = self._get_filename_stem(scan)
+        seg_files = get_segmentation_files_with_edited(dicom_path.parent, filename_with_date, view)
         
         # Prioritize edited files
         if seg_files['png_colored_edited'].exists():
             seg_png = seg_files['png_colored_edited']
-            print(f"[DEBUG] Found edited segmentation: {seg_png}")
         else:
             seg_png = seg_files['png_colored']
-            print(f"[DEBUG] Found original segmentation: {seg_png}")
         
-        if seg_png.exists():
+        def _load_transparent(path: Path) -> Optional[Image.Image]:
             try:
                 # Load with transparency (make black pixels transparent)
-                seg_image = load_image_with_transparency(seg_png, make_transparent=True)
-                layers["Segmentation"] = seg_image
-                print(f"[DEBUG] Loaded segmentation with transparency: {seg_png}")
+                return load_image_with_transparency(path, make_transparent=True)
             except Exception as e:
-                print(f"[WARN] Failed to load segmentation image: {e}")
-        else:
-            print(f"[WARN] Segmentation file not found: {seg_png}")
+                print(f"[WARN] Failed to load layer image {path.name}: {e}")
+                return None
+
+        seg_image = cache.get_or_load(seg_png, view, "Segmentation", _load_transparent)
+        if seg_image is not None:
+            layers["Segmentation"] = seg_image
         
-        # ✅ Layer 3: Hotspot - CLASSIFICATION MASKS ONLY
-        view_normalized = self.current_view.lower()
+        # ✅ Layer 3: Hotspot - CLASSIFICATION MASKS ONLY (no fallback)
+        view_normalized = view.lower()
         classification_mask_path = dicom_path.parent / f"{filename_with_date}_{view_normalized}_classification_mask.png"
+        classification_image = cache.get_or_load(classification_mask_path, view, "Hotspot", _load_transparent)
+        if classification_image is not None:
+            layers["Hotspot"] = classification_image
         
-        print(f"[DEBUG] Looking for CLASSIFICATION mask ONLY: {classification_mask_path}")
-        
-        if classification_mask_path.exists():
-            try:
-                # Load classification mask with transparency
-                classification_image = load_image_with_transparency(classification_mask_path, make_transparent=True)
-                layers["Hotspot"] = classification_image
-                print(f"[DEBUG] ✅ Loaded CLASSIFICATION MASK as Hotspot layer: {classification_mask_path}")
-            except Exception as e:
-                print(f"[WARN] Failed to load classification mask: {e}")
-        else:
-            print(f"[DEBUG] ❌ CLASSIFICATION mask not found: {classification_mask_path}")
-            print(f"[DEBUG] ❌ NO FALLBACK - Classification results only!")
-        
-        # ✅ Layer 4: HotspotBBox - CLASSIFICATION XML ONLY
-        try:
+        # ✅ Layer 4: HotspotBBox - CLASSIFICATION XML ONLY (no fallback)
+        if frame_shape is not None:
             # Determine view for XML files (use short names: ant/post)
-            view_short = "ant" if "ant" in self.current_view.lower() else "post"
+            view_short = "ant" if "ant" in view.lower() else "post"
             classification_xml_path = dicom_path.parent / f"{filename_with_date}_{view_short}_classification.xml"
-            
-            print(f"[DEBUG] Looking for CLASSIFICATION XML ONLY: {classification_xml_path}")
-            
-            if classification_xml_path.exists():
-                # Create bounding box visualization from CLASSIFICATION XML
-                bbox_image = self._create_bbox_visualization_from_classification(classification_xml_path, original_arr)
-                if bbox_image:
-                    layers["HotspotBBox"] = bbox_image
-                    print(f"[DEBUG] ✅ Created HotspotBBox from CLASSIFICATION XML: {classification_xml_path}")
-                else:
-                    print(f"[DEBUG] ❌ Failed to create bbox visualization from CLASSIFICATION XML: {classification_xml_path}")
-            else:
-                print(f"[DEBUG] ❌ CLASSIFICATION XML not found: {classification_xml_path}")
-                print(f"[DEBUG] ❌ NO FALLBACK - Classification results only!")
-        except Exception as e:
-            print(f"[WARN] Error loading CLASSIFICATION HotspotBBox: {e}")
-        
-        print(f"[DEBUG] Total CLASSIFICATION layers loaded for {self.current_view}: {list(layers.keys())}")
+            bbox_image = cache.get_or_load(
+                classification_xml_path, view, "HotspotBBox",
+                lambda path: self._create_bbox_visualization_from_classification(path, frame_shape)
+            )
+            if bbox_image is not None:
+                layers["HotspotBBox"] = bbox_image
+        
+        print(f"[DEBUG] Total CLASSIFICATION layers for {view}: {list(layers.keys())}")
         return layers
     
-    def _make_layered_card(self, scan: Dict, w: int, idx: int) -> QFrame:
-        """✅ FIXED: Create card with proper view-specific layered display"""
-        card = QFrame()
-        card.setFrameStyle(QFrame.Box | QFrame.Raised)
-        card.setLineWidth(1)
-        
-        # Highlight active scan
-        if idx == self.active_scan_index:
-            card.setStyleSheet("""
-                QFrame {
-                    border: 2px solid #4e73ff;
-                    border-radius: 6px;
-                    background-color: #f0f4ff;
-                }
-            """)
-        else:
-            card.setStyleSheet("""
-                QFrame {
-                    border: 1px solid #dee2e6;
-                    border-radius: 6px;
-                    background-color: white;
-                }
-                QFrame:hover {
-                    border: 1px solid #4e73ff;
-                }
-            """)
-        
-        lay = QVBoxLayout(card)
-        lay.setContentsMargins(8, 8, 8, 8)
-        lay.addLayout(self._make_header(scan, idx))
-        
-        lbl = QLabel(alignment=Qt.AlignCenter)
-        
-        # ✅ FIXED: Better debug messages
-        print(f"[DEBUG] Creating CLASSIFICATION card {idx} for view: {self.current_view}")
-        print(f"[DEBUG] Active layers selected: {self._active_layers}")
-        
-        all_layers = self._get_layer_images(scan)
-        print(f"[DEBUG] Available CLASSIFICATION layers in files: {list(all_layers.keys())}")
-        
-        # Apply opacity to individual layers before compositing
-        active_layer_images = {}
-        for layer_name in self._active_layers:
-            if layer_name in all_layers:
-                layer_image = all_layers[layer_name]
-                layer_opacity = self._layer_opacities.get(layer_name, 1.0)
-                
-                # Apply opacity to the layer
-                if layer_opacity < 1.0:
-                    layer_image = apply_opacity_to_image(layer_image, layer_opacity)
-                
-                active_layer_images[layer_name] = layer_image
-                print(f"[DEBUG] ✅ Added CLASSIFICATION {layer_name} to card {idx} (opacity: {layer_opacity:.2f})")
-            else:
-                print(f"[DEBUG] ❌ Layer {layer_name} not found in CLASSIFICATION files for card {idx}")
-        
-        if not active_layer_images:
-            lbl.setText(f"No classification data available\nfor {self.current_view}")
-            lbl.setStyleSheet("color:#888; font-size: 12px; padding: 20px;")
-        else:
-            # Create composite image from active layers
-            try:
-                # Use opacity 1.0 for all layers since we already applied opacity above
-                uniform_opacities = {layer: 1.0 for layer in active_layer_images.keys()}
-                
-                composite_image = create_composite_image(
-                    layers=active_layer_images,
-                    layer_order=self._active_layers,
-                    layer_opacities=uniform_opacities
-                )
-                
-                # Convert composite to displayable format
-                if composite_image.mode == 'RGBA':
-                    # Create white background for transparency display
-                    background = Image.new('RGB', composite_image.size, (255, 255, 255))
-                    display_image = Image.alpha_composite(background.convert('RGBA'), composite_image)
-                    display_image = display_image.convert('RGB')
-                else:
-                    display_image = composite_image
-                
-                lbl.setPixmap(_pil_to_pixmap(display_image, w))
-                
-                # Create tooltip with layer info
-                tooltip_parts = []
-                for layer_name in self._active_layers:
-                    if layer_name in active_layer_images:
-                        opacity_pct = int(self._layer_opacities.get(layer_name, 1.0) * 100)
-                        tooltip_parts.append(f"{layer_name}: {opacity_pct}%")
-                
-                lbl.setToolTip("Classification layers: " + " | ".join(tooltip_parts))
-                print(f"[DEBUG] ✅ CLASSIFICATION card {idx} composite created with layers: {list(active_layer_images.keys())}")
-                
-            except Exception as e:
-                print(f"[ERROR] Failed to create CLASSIFICATION composite image for card {idx}: {e}")
-                lbl.setText(f"Error creating classification composite\nfor {self.current_view}")
-                lbl.setStyleSheet("color:#dc3545; font-size: 12px; padding: 20px;")
-                lbl.setToolTip(str(e))
-        
-        lay.addWidget(lbl)
-        
-        # ✅ FIXED: Create status label showing current view and classification status
-        status_label = QLabel(f"{self.current_view}")
-        status_label.setAlignment(Qt.AlignCenter)
-        status_label.setStyleSheet("""
-            QLabel {
-                font-size: 10px;
-                color: #495057;
-                padding: 4px;
-                background: #e9ecef;
-                border-radius: 3px;
-                font-weight: bold;
-            }
-        """)
-        lay.addWidget(status_label)
-        
-        return card
+    def _composite_layers(self, active_layers: List[tuple]) -> np.ndarray:
+        """Composite (name, image) pairs bottom-to-top onto white with the current layer opacities
+
+        Returns the compositor's reusable RGB buffer - it must be copied (set_image does) before
+        the next composite.
+        """
+        return self._compositor.composite(
+            [image for _, image in active_layers],
+            [self._layer_opacities.get(name, 1.0) for name, _ in active_layers],
+        )
     
     # ------------------------------------------------------ editor dialogs
     def _open_segmentation_editor(self):
@@ -1018,6 +1025,7 @@ class ScanTimelineWidget(QWidget):
         if dlg.exec():
             print("[DEBUG] Segmentation editor completed, refreshing timeline")
             self._rebuild()
+            self.edits_saved.emit(scan, "segmentation")
 
     def _open_hotspot_editor(self):
         """✅ UPDATED: Open hotspot editor for current scan - CLASSIFICATION FILES ONLY"""
@@ -1031,9 +1039,7 @@ class ScanTimelineWidget(QWidget):
         # ✅ PREPARE CLASSIFICATION-SPECIFIC DATA FOR EDITOR
         try:
             dicom_path = Path(scan["path"])
-            study_date = extract_study_date_from_dicom(dicom_path)
-            patient_id, session_code = self._get_patient_session_from_scan(scan)
-            filename_with_date = generate_filename_stem(patient_id, study_date)
+            filename_with_date = self._get_filename_stem(scan)
             
             # Get classification files
             view_normalized = self.current_view.lower()
@@ -1065,6 +1071,7 @@ class ScanTimelineWidget(QWidget):
             if dlg.exec():
                 print("[DEBUG] CLASSIFICATION editor completed, refreshing timeline")
                 self._rebuild()
+                self.edits_saved.emit(scan, "hotspot")
                 
         except Exception as e:
             print(f"[ERROR] Failed to prepare classification data for editor: {e}")
@@ -1089,4 +1096,8 @@ class ScanTimelineWidget(QWidget):
         """Cleanup resources"""
         print("[DEBUG] Cleaning up ScanTimelineWidget...")
         self._clear()
+        for card in self._cards:
+            card.deleteLater()
+        self._cards = []
+        self._placeholder_message = ""
         self._scans_cache.clear()
\ No newline at end of file
@@ -40,6 +40,8 @@ from core.config.sessions import get_current_session
 from features.dicom_import.logic.dicom_loader import extract_patient_info_from_path
 
 from features.spect_viewer.logic.colorizer import label_mask_to_rgb, _PALETTE
+from features.spect_viewer.logic.brush_engine import LabelBrush, palette_lut, render_rgba
+from features.spect_viewer.logic.edit_history import EditHistory, StrokeRecorder
 
 # ---------------------------------------------------------------- label names & desc
 _LABEL_INFO: List[Tuple[str, str]] = [
@@ -239,20 +241,20 @@ class _Canvas(QGraphicsView):
         self._item_gray.setOpacity(0.5)
         self._scene.addItem(self._item_gray)
 
-        # mask layer
+        # -------- opacity states ---------------------------------
+        self._bg_alpha = 0.0    # label-0 (background) opacity (0-1)
+
+        # mask layer: satu label map, diedit langsung oleh brush engine
         self._mask_arr = mask.astype(np.uint8)
-        # --- NEW: bank layer per-label ---------------------------------
-        self._layers = {lbl: (self._mask_arr == lbl).astype(np.uint8)
-                        for lbl in range(len(_PALETTE))}
-        # ---------------------------------------------------------------
+        self._lut = palette_lut(_PALETTE)
+        self._stroke = StrokeRecorder(self._mask_arr)  # patch sebelum tiap dab (untuk undo)
+        self._brush = LabelBrush(self._mask_arr, before_dab=self._stroke.capture)
         self._mask_img = self._mask_to_qimage(show_all=False, label=1)
         self._item_mask = QGraphicsPixmapItem(QPixmap.fromImage(self._mask_img))
         self._scene.addItem(self._item_mask)
 
         # [OPSI] Tambah ini buat atur transparansi mask biar layer bawah kelihatan:
         self._item_mask.setOpacity(1.0)
-        # -------- opacity states ---------------------------------
-        self._bg_alpha = 0.0    # label-0 (background) opacity (0-1)
 
         
         print("===== DEBUG _Canvas =====")
@@ -278,72 +280,30 @@ class _Canvas(QGraphicsView):
         # Info callback
         self._info_callback = None
 
-        # State management per layer
-        self._layer_history = {}  # {label_id: {'undo': [], 'redo': []}}
+        # State management per layer: satu delta per stroke (bbox + pixel yang
+        # berubah), dibatasi per layer dan total memori
         self._max_history = 50  # Batas maksimal history per layer
-        
-        # Inisialisasi history untuk setiap layer
-        for label_id in range(len(_PALETTE)):
-            self._init_layer_history(label_id)
-            
-        # Simpan state awal untuk semua layer
-        self._save_all_states()
-
-    def _init_layer_history(self, label_id: int):
-        """Inisialisasi struktur history untuk layer tertentu"""
-        self._layer_history[label_id] = {
-            'undo': [],
-            'redo': []
-        }
+        self._history = EditHistory(max_per_label=self._max_history)
 
-    def _save_layer_state(self, label_id: int):
-        """Simpan state layer tertentu ke undo stack"""
-        history = self._layer_history[label_id]
-        
-        # Salinan array layer saat ini
-        state = self._layers[label_id].copy()
-        
-        # Batasi jumlah history
-        if len(history['undo']) >= self._max_history:
-            history['undo'].pop(0)
-        
-        history['undo'].append(state)
-        history['redo'].clear()  # Reset redo setelah perubahan baru
-
-    def _save_all_states(self):
-        """Simpan state semua layer (digunakan saat inisialisasi)"""
-        for label_id in range(len(_PALETTE)):
-            self._save_layer_state(label_id)
-
-    def _restore_layer_state(self, label_id: int, state: np.ndarray):
-        """Kembalikan state untuk layer tertentu"""
-        self._layers[label_id] = state.copy()
-        self._rebuild_combined()
-        self._refresh_mask()
+    def _save_stroke(self, label_id: int, rect):
+        """Simpan delta stroke yang baru selesai ke undo stack layer tertentu"""
+        delta = self._stroke.finish(label_id, rect)
+        if delta is not None:
+            self._history.push(delta)
 
     def undo(self, label_id: int):
         """Kembalikan ke state sebelumnya untuk layer tertentu"""
-        history = self._layer_history.get(label_id)
-        if not history or len(history['undo']) < 2:
-            return  # Tidak ada history yang cukup
-        
-        # Pindahkan state saat ini ke redo stack
-        current_state = history['undo'].pop()
-        history['redo'].append(current_state)
-        
-        # Kembalikan ke state sebelumnya
-        prev_state = history['undo'][-1]
-        self._restore_layer_state(label_id, prev_state)
+        delta = self._history.undo(label_id)
+        if delta is None:
+            return  # Tidak ada history
+        self._refresh_mask_rect(delta.apply(self._mask_arr, undo=True))
 
     def redo(self, label_id: int):
         """Kembalikan perubahan yang di-undo untuk layer tertentu"""
-        history = self._layer_history.get(label_id)
-        if not history or not history['redo']:
+        delta = self._history.redo(label_id)
+        if delta is None:
             return
-        
-        state = history['redo'].pop()
-        history['undo'].append(state)
-        self._restore_layer_state(label_id, state)
+        self._refresh_mask_rect(delta.apply(self._mask_arr, undo=False))
 
     def set_info_callback(self, callback):
         """Set callback to update info display"""
@@ -364,24 +324,13 @@ class _Canvas(QGraphicsView):
         h, w = u8.shape
         return QImage(u8.data, w, h, w, QImage.Format_Grayscale8).copy()
 
-    def _mask_to_qimage(self, *, show_all: bool, label: int) -> QImage:
-        rgb = label_mask_to_rgb(self._mask_arr)          # (H, W, 3)
-        h, w, _ = rgb.shape
-
-        # build an alpha channel: fully opaque where we want to show,
-        #  fully transparent everywhere else
-        if show_all:
-            alpha = np.full((h, w), 255, np.uint8)
-            # label-0 transparency:
-            alpha[self._mask_arr == 0] = int(self._bg_alpha * 255)
-        else:
-            sel = (self._layers[label] == 1)   
-            rgb[sel] = np.array(_PALETTE[label], dtype=np.uint8)# ← inilah baris baru
-            alpha = np.zeros((h, w), np.uint8)
-            alpha[sel] = 255
-
-        # stack RGB + alpha → RGBA image
-        rgba = np.dstack([rgb, alpha])
+    def _mask_to_qimage(self, *, show_all: bool, label: int, rect=None) -> QImage:
+        """RGBA mask image (seluruh mask, atau hanya ``rect`` = (x0, y0, x1, y1))."""
+        # show_all: semua label opaque, label-0 pakai bg_alpha;
+        # selain itu hanya label aktif yang terlihat
+        rgba = render_rgba(self._mask_arr, rect, self._lut, show_all=show_all,
+                           current_label=label, bg_alpha=self._bg_alpha)
+        h, w, _ = rgba.shape
 
         # create QImage from the raw data
         return QImage(rgba.data, w, h, 4*w, QImage.Format_RGBA8888).copy()
@@ -446,54 +395,45 @@ class _Canvas(QGraphicsView):
         return self._mask_arr
 
     # -------- refresh mask pixmap
-    # -------- NEW: rebuild gabungan dari semua layer ------------
-    def _rebuild_combined(self):
-        """Merge self._layers → self._mask_arr (prioritas label kecil→besar)."""
-        combined = np.zeros_like(self._mask_arr)
-        for lbl in range(len(_PALETTE)):              # 0 … 12
-            layer = self._layers[lbl]
-            combined[layer == 1] = lbl
-        self._mask_arr = combined
-    # ------------------------------------------------------------
     def _refresh_mask(self):
         self._mask_img = self._mask_to_qimage(
             show_all=self._show_all, label=self._cur_label)
         self._item_mask.setPixmap(QPixmap.fromImage(self._mask_img))
         self.viewport().update()
 
+    def _refresh_mask_rect(self, rect):
+        """Render ulang hanya dirty rectangle (x0, y0, x1, y1) ke pixmap mask."""
+        if rect is None:
+            return
+        x0, y0, _, _ = rect
+        patch = self._mask_to_qimage(show_all=self._show_all, label=self._cur_label, rect=rect)
+        pixmap = self._item_mask.pixmap()
+        painter = QPainter(pixmap)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(x0, y0, patch)
+        painter.end()
+        self._item_mask.setPixmap(pixmap)
+
     # -------- FIXED: drawing helpers dengan koordinat yang presisi
-    def _apply_brush(self, scene_pos: QPointF):
-        """Apply brush dengan koordinat yang presisi, tidak miss lagi."""
+    def _apply_brush(self, scene_pos: QPointF, start: bool = False):
+        """Apply brush dengan koordinat yang presisi, tidak miss lagi.
+
+        ``start`` memulai stroke baru; event berikutnya diinterpolasi dari
+        titik sebelumnya supaya stroke cepat tetap tersambung.
+        """
         # Pastikan koordinat tepat pada pixel center
         x = max(0, min(self._img_width - 1, int(scene_pos.x() + 0.5)))
         y = max(0, min(self._img_height - 1, int(scene_pos.y() + 0.5)))
-        
-        h, w = self._mask_arr.shape
-        
-        if self._brush_sz == 1:
-            targets = [(x, y)]
+
+        # Eraser hanya menghapus label aktif
+        if start or not self._brush.active:
+            self._stroke.reset()
+            rect = self._brush.begin(x, y, self._brush_sz, self._cur_label, erase=self._eraser)
         else:
-            targets = []
-            radius = self._brush_sz
-            for dy in range(-radius, radius + 1):
-                for dx in range(-radius, radius + 1):
-                    if dx*dx + dy*dy <= radius*radius:
-                        px, py = x + dx, y + dy
-                        if 0 <= px < w and 0 <= py < h:
-                            targets.append((px, py))
-
-        # ---- NEW core: sentuh hanya layer aktif -----------------------
-        lay = self._layers[self._cur_label]
-        for px, py in targets:
-            if self._eraser:
-                lay[py, px] = 0            # hapus hanya label aktif
-            else:
-                lay[py, px] = 1            # warnai label aktif
-        # --------------------------------------------------------------
+            rect = self._brush.move_to(x, y)
 
-        # selesai → re-compose lalu refresh
-        self._rebuild_combined()
-        self._refresh_mask()
+        # selesai → refresh hanya area yang berubah
+        self._refresh_mask_rect(rect)
 
 
     # -------- Qt events dengan koordinat yang diperbaiki
@@ -502,7 +442,7 @@ class _Canvas(QGraphicsView):
             self._drawing = True
             # FIXED: Gunakan koordinat yang tepat
             scene_pos = self.mapToScene(ev.position().toPoint())
-            self._apply_brush(scene_pos)
+            self._apply_brush(scene_pos, start=True)
             ev.accept()
         elif ev.button() == Qt.MiddleButton:
             # Enable pan mode temporarily
@@ -524,8 +464,8 @@ class _Canvas(QGraphicsView):
 
     def mouseReleaseEvent(self, ev):
         if ev.button() == Qt.LeftButton and self._drawing:
-            # Simpan state layer yang sedang diedit
-            self._save_layer_state(self._cur_label)
+            # Simpan delta stroke layer yang sedang diedit
+            self._save_stroke(self._cur_label, self._brush.end())
             self._drawing = False
 
         if ev.button() == Qt.LeftButton:
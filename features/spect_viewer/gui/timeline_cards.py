@@ -4,7 +4,7 @@ Card rendering UI components for timeline widget
 """
 from __future__ import annotations
 from datetime import datetime
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Union
 import numpy as np
 from PIL import Image
 
@@ -28,6 +28,12 @@ class TimelineCard(QFrame):
         self.card_width = card_width
         self.is_active = False
         
+        # Retained-card bookkeeping (owned by ScanTimelineWidget): what the
+        # current pixmap was composited from, so unchanged cards are skipped
+        self.render_key = None
+        self.rendered_generation = -1
+        self._layer_refs: List[Image.Image] = []
+        
         self._build_ui()
     
     def _build_ui(self):
@@ -65,22 +71,12 @@ class TimelineCard(QFrame):
     
     def _create_header(self) -> QHBoxLayout:
         """Create header with scan info and select button"""
-        meta = self.scan_data["meta"]
-        date_raw = meta.get("study_date", "")
-        
-        try:   
-            date_str = datetime.strptime(date_raw, "%Y%m%d").strftime("%b %d, %Y")
-        except ValueError: 
-            date_str = "Unknown"
-        
-        bsi = meta.get("bsi_value", "N/A")
-        
         header_layout = QHBoxLayout()
         
         # Header info
-        header_label = QLabel(f"<b>{date_str}</b><br>BSI: {bsi}")
-        header_label.setStyleSheet("font-size: 11px;")
-        header_layout.addWidget(header_label)
+        self.header_label = QLabel(self._header_text())
+        self.header_label.setStyleSheet("font-size: 11px;")
+        header_layout.addWidget(self.header_label)
         header_layout.addStretch()
         
         # Select button
@@ -107,8 +103,43 @@ class TimelineCard(QFrame):
         
         return header_layout
     
+    def _header_text(self) -> str:
+        """Study date plus BSI (when quantified) for the header label"""
+        meta = self.scan_data["meta"]
+        date_raw = meta.get("study_date", "")
+        
+        try:   
+            date_str = datetime.strptime(date_raw, "%Y%m%d").strftime("%b %d, %Y")
+        except ValueError: 
+            date_str = "Unknown"
+        
+        bsi_text = ""
+        if meta.get("has_bsi", False):
+            bsi_text = f"<br><small>BSI: {meta.get('bsi_score', 0.0):.1f}%</small>"
+        
+        return f"<b>{date_str}</b>{bsi_text}"
+    
+    def update_scan(self, scan_data: Dict, scan_index: int):
+        """Point a retained card at new scan data (e.g. after BSI refresh); forces a re-render"""
+        self.scan_data = scan_data
+        self.scan_index = scan_index
+        self.header_label.setText(self._header_text())
+        self.render_key = None
+    
+    def set_card_width(self, card_width: int, frame_shape: Optional[tuple] = None):
+        """Set display width and reserve the image area so un-rendered cards keep their size"""
+        if card_width != self.card_width:
+            self.card_width = card_width
+            self.render_key = None
+        
+        if frame_shape is not None and len(frame_shape) >= 2:
+            height, width = frame_shape[:2]
+            self.image_label.setMinimumSize(card_width, int(card_width * height / max(1, width)))
+    
     def set_active(self, active: bool):
         """Set card active state"""
+        if active == self.is_active:
+            return
         self.is_active = active
         self._update_card_style()
     
@@ -134,16 +165,19 @@ class TimelineCard(QFrame):
                 }
             """)
     
-    def set_image(self, image: Optional[Image.Image]):
-        """Set card image"""
+    def set_image(self, image: Optional[Union[Image.Image, np.ndarray]]):
+        """Set card image (PIL image, or an RGB uint8 array that is copied into the pixmap)"""
         if image is None:
             self.image_label.setText("No layer data available")
             self.image_label.setStyleSheet("color:#888; font-size: 12px; padding: 20px;")
             return
         
         try:
-            # Convert PIL image to QPixmap
-            pixmap = self._pil_to_pixmap(image, self.card_width)
+            # Convert to QPixmap
+            if isinstance(image, np.ndarray):
+                pixmap = self._rgb_array_to_pixmap(image, self.card_width)
+            else:
+                pixmap = self._pil_to_pixmap(image, self.card_width)
             self.image_label.setPixmap(pixmap)
             self.image_label.setStyleSheet("")  # Clear any text styling
         except Exception as e:
@@ -151,6 +185,20 @@ class TimelineCard(QFrame):
             self.image_label.setText("Error loading image")
             self.image_label.setStyleSheet("color:#dc3545; font-size: 12px; padding: 20px;")
     
+    def set_message(self, text: str, error: bool = False):
+        """Show a text message instead of an image"""
+        self.image_label.clear()
+        self.image_label.setText(text)
+        color = "#dc3545" if error else "#888"
+        self.image_label.setStyleSheet(f"color:{color}; font-size: 12px; padding: 20px;")
+    
+    def clear_image(self):
+        """Release the pixmap of an off-screen card (size is kept); it is re-rendered when visible"""
+        self.image_label.clear()
+        self.render_key = None
+        self.rendered_generation = -1
+        self._layer_refs = []
+    
     def set_status(self, current_view: str, active_layers: List[str] = None):
         """Set card status text"""
         if active_layers:
@@ -176,6 +224,14 @@ class TimelineCard(QFrame):
         tooltip_text = "Active layers: " + " | ".join(tooltip_parts)
         self.setToolTip(tooltip_text)
     
+    def _rgb_array_to_pixmap(self, rgb: np.ndarray, width: int) -> QPixmap:
+        """Convert an HxWx3 uint8 array (already flattened onto the background) to QPixmap"""
+        rgb = np.ascontiguousarray(rgb)
+        height, width_orig = rgb.shape[:2]
+        q_image = QImage(rgb.data, width_orig, height, 3 * width_orig, QImage.Format_RGB888)
+        # QPixmap.fromImage copies the pixels, so the source buffer can be reused afterwards
+        return QPixmap.fromImage(q_image.scaledToWidth(width, Qt.SmoothTransformation))
+    
     def _pil_to_pixmap(self, pil_image: Image.Image, width: int) -> QPixmap:
         """Convert PIL Image to QPixmap with scaling"""
         # Handle different PIL Image modes
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from core.tracing import traced
+
 DICT_SEGMENT_ID = {
     0: "background", 
     1: "skull", 
@@ -44,6 +46,7 @@ def load_image_as_array(path):
         raise FileNotFoundError(f"Could not load image: {path}")
     return image
 
+@traced("bsi.calculate")
 def calculate_BSI(image_segment_anterior, image_segment_posterior, image_hotspot_anterior, image_hotspot_posterior):
     result = {}
     for segment_id in DICT_SEGMENT_ID:
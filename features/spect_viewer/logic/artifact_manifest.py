@@ -0,0 +1,278 @@
+# features/spect_viewer/logic/artifact_manifest.py - Per-study artifact manifest
+"""
+Dependency-aware bookkeeping for the SPECT analysis pipeline.
+
+Every study folder gets a ``{stem}_manifest.json`` recording, per stage, the
+content hashes of the files the stage read, the parameters it ran with (model
+checkpoints, algorithm version) and the hashes of the files it wrote:
+
+    segmentation   → original PNGs, bone mask / colored PNGs
+    detection      → YOLO XML per view
+    otsu           → hotspot mask PNGs
+    classification → classification JSON + mask per view (+ coordinates NPZ)
+    quantification → BSI JSON
+
+A stage is stale when an output is missing, an input or parameter changed, or
+an output was modified outside the pipeline. Inputs are resolved exactly like
+the stage itself resolves them (edited → original), so saving an edited
+segmentation or XML only invalidates the stages that read it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config.paths import (
+    YOLO_MODEL_PATH,
+    CLASSIFICATION_XGBOOST_MODEL,
+    CLASSIFICATION_SCALER_MODEL,
+    generate_filename_stem,
+)
+
+MANIFEST_VERSION = 1
+
+# Pipeline order; a stage only reads files written by the stages before it
+STAGES = ("segmentation", "detection", "otsu", "classification", "quantification")
+
+# Bump when an algorithm changes its output for the same inputs
+ALGORITHM_VERSIONS = {
+    "segmentation": "nnunet-bone-v1",
+    "detection": "yolo-v1",
+    "otsu": "otsu-fill-v1",
+    "classification": "xgboost-radiomics-v1",
+    "quantification": "bsi-v1",
+}
+
+VIEWS = (("anterior", "ant"), ("posterior", "post"))
+
+
+# ------------------------------------------------------------------ hashing
+def file_hash(path: Path) -> Optional[str]:
+    """SHA-1 of a file's bytes (None if missing); cached by (path, size, mtime)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    if not hasattr(file_hash, "_cache"):
+        file_hash._cache = {}
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    if key not in file_hash._cache:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        file_hash._cache[key] = h.hexdigest()
+    return file_hash._cache[key]
+
+
+def _model_fingerprint(path: Path) -> str:
+    """Cheap checkpoint identity (name, size, mtime) - weights are too big to hash per call."""
+    try:
+        st = os.stat(path)
+        return f"{Path(path).name}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return f"{Path(path).name}:missing"
+
+
+# ------------------------------------------------------------------ outputs
+# Outputs that studies processed by older pipeline versions may lack. A missing
+# one never makes a stage incomplete; once recorded, changing or deleting it does.
+OPTIONAL_OUTPUTS = {"classification": ("coords",)}
+
+
+def is_optional_output(stage: str, key: str) -> bool:
+    return key.rsplit(".", 1)[-1] in OPTIONAL_OUTPUTS.get(stage, ())
+
+
+def stage_output_paths(folder: Path, stem: str, stage: str) -> Dict[str, Path]:
+    """Files a stage writes for the study ``stem`` in ``folder``."""
+    outputs: Dict[str, Path] = {}
+
+    if stage == "segmentation":
+        for view, _ in VIEWS:
+            outputs[f"{view}.original"] = folder / f"{stem}_{view}_original.png"
+            outputs[f"{view}.mask"] = folder / f"{stem}_{view}_mask.png"
+            outputs[f"{view}.colored"] = folder / f"{stem}_{view}_colored.png"
+    elif stage == "detection":
+        for _, short in VIEWS:
+            outputs[f"{short}.xml"] = folder / f"{stem}_{short}.xml"
+    elif stage == "otsu":
+        for _, short in VIEWS:
+            outputs[f"{short}.hotspot_mask"] = folder / f"{stem}_{short}_hotspot_mask.png"
+    elif stage == "classification":
+        for view, _ in VIEWS:
+            outputs[f"{view}.json"] = folder / f"{stem}_{view}_classification.json"
+            outputs[f"{view}.coords"] = folder / f"{stem}_{view}_classification_coords.npz"
+            outputs[f"{view}.mask"] = folder / f"{stem}_{view}_classification_mask.png"
+    elif stage == "quantification":
+        outputs["bsi_json"] = folder / f"{stem}_bsi_quantification.json"
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    return outputs
+
+
+def required_output_paths(folder: Path, stem: str, stage: str) -> Dict[str, Path]:
+    """Outputs that must exist for a stage to count as done (no optional ones)."""
+    return {k: p for k, p in stage_output_paths(folder, stem, stage).items()
+            if not is_optional_output(stage, k)}
+
+
+# ------------------------------------------------------------------ manifest
+class ArtifactManifest:
+    """Manifest of one study (one DICOM + its derived files)."""
+
+    def __init__(self, dicom_path: Path, patient_id: str, study_date: str):
+        self.dicom_path = Path(dicom_path)
+        self.patient_folder = self.dicom_path.parent
+        self.filename_stem = generate_filename_stem(patient_id, study_date)
+        self.path = self.patient_folder / f"{self.filename_stem}_manifest.json"
+        self.data = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                return data
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[MANIFEST WARN] Ignoring unreadable manifest {self.path.name}: {e}")
+        return {"version": MANIFEST_VERSION, "stages": {}}
+
+    def save(self) -> None:
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    # -------------------------------------------------------------- stage wiring
+    def stage_inputs(self, stage: str) -> Dict[str, Path]:
+        """Files a stage reads, resolved with the same edited → original priority it uses."""
+        folder, stem = self.patient_folder, self.filename_stem
+
+        if stage in ("segmentation", "detection"):
+            return {"dicom": self.dicom_path}
+
+        if stage == "otsu":
+            inputs = {"dicom": self.dicom_path}
+            for _, short in VIEWS:
+                inputs[f"{short}.xml"] = folder / f"{stem}_{short}.xml"
+            return inputs
+
+        if stage == "classification":
+            from .classification_wrapper import get_classification_input_paths
+            inputs = {}
+            for view, short in VIEWS:
+                for name, path in get_classification_input_paths(folder, stem, view, short).items():
+                    inputs[f"{view}.{name}"] = path
+            return inputs
+
+        if stage == "quantification":
+            from .quantification_wrapper import get_quantification_input_paths
+            paths = get_quantification_input_paths(folder, stem)
+            paths.pop("output_result", None)
+            return paths
+
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def stage_outputs(self, stage: str) -> Dict[str, Path]:
+        """Files a stage writes (the ones downstream stages or the viewer rely on)."""
+        return stage_output_paths(self.patient_folder, self.filename_stem, stage)
+
+    def required_outputs(self, stage: str) -> Dict[str, Path]:
+        """Outputs whose presence marks the stage as done."""
+        return required_output_paths(self.patient_folder, self.filename_stem, stage)
+
+    def stage_params(self, stage: str) -> Dict[str, str]:
+        """Parameters that change a stage's output for identical inputs."""
+        params = {"algorithm": ALGORITHM_VERSIONS[stage]}
+        if stage == "detection":
+            params["model"] = _model_fingerprint(YOLO_MODEL_PATH)
+        elif stage == "classification":
+            params["model"] = _model_fingerprint(CLASSIFICATION_XGBOOST_MODEL)
+            params["scaler"] = _model_fingerprint(CLASSIFICATION_SCALER_MODEL)
+        return params
+
+    # -------------------------------------------------------------- staleness
+    def _snapshot(self, stage: str) -> Dict:
+        return {
+            "inputs": {k: {"path": p.name, "sha1": file_hash(p)} for k, p in self.stage_inputs(stage).items()},
+            "params": self.stage_params(stage),
+            "outputs": {k: {"path": p.name, "sha1": file_hash(p)} for k, p in self.stage_outputs(stage).items()
+                        if not is_optional_output(stage, k) or p.exists()},
+        }
+
+    def check_stage(self, stage: str) -> Tuple[bool, str]:
+        """
+        Returns:
+            (is_stale, reason) - reason is "" for a fresh stage
+        """
+        current = self._snapshot(stage)
+
+        missing = [k for k, v in current["outputs"].items() if v["sha1"] is None]
+        if missing:
+            return True, f"missing outputs: {', '.join(missing)}"
+
+        recorded = self.data["stages"].get(stage)
+        if recorded is None:
+            return True, "no manifest record"
+
+        for section in ("inputs", "params", "outputs"):
+            current_section, recorded_section = current[section], recorded.get(section, {})
+            if section == "outputs":
+                # Optional outputs written after the record was made are not a change
+                current_section = {k: v for k, v in current_section.items()
+                                   if k in recorded_section or not is_optional_output(stage, k)}
+            if recorded_section != current_section:
+                changed = [k for k in set(current_section) | set(recorded_section)
+                           if recorded_section.get(k) != current_section.get(k)]
+                return True, f"{section} changed: {', '.join(sorted(changed))}"
+
+        return False, ""
+
+    def is_stale(self, stage: str) -> bool:
+        return self.check_stage(stage)[0]
+
+    def stale_stages(self) -> List[str]:
+        return [stage for stage in STAGES if self.is_stale(stage)]
+
+    def record(self, stage: str, save: bool = True) -> None:
+        """Store the current inputs/params/outputs of a stage after it ran."""
+        entry = self._snapshot(stage)
+        entry["updated"] = datetime.now().isoformat(timespec="seconds")
+        self.data["stages"][stage] = entry
+        if save:
+            self.save()
+
+    def adopt_existing(self) -> List[str]:
+        """
+        Record stages whose outputs already exist but that have no manifest entry
+        (studies processed before manifests existed), so they are not recomputed.
+
+        Returns:
+            Names of the stages that were adopted
+        """
+        adopted = []
+        for stage in STAGES:
+            if stage in self.data["stages"]:
+                continue
+            if all(p.exists() for p in self.required_outputs(stage).values()):
+                self.record(stage, save=False)
+                adopted.append(stage)
+        if adopted:
+            self.save()
+        return adopted
+
+
+def get_manifest(dicom_path: Path, patient_id: str, study_date: str = None) -> ArtifactManifest:
+    """Manifest for a study; study_date is read from the DICOM when omitted."""
+    if not study_date:
+        from core.config.paths import extract_study_date_from_dicom
+        study_date = extract_study_date_from_dicom(dicom_path)
+    return ArtifactManifest(dicom_path, patient_id, study_date)
@@ -4,10 +4,12 @@ YOLO Box Detection with DICOM Integration
 Integrates with dicom_loader for direct frame processing
 """
 
+import os
 import sys
+import time
 import traceback
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
 from PIL import Image
@@ -22,19 +24,102 @@ from ultralytics import YOLO
 # Import from your modules
 from core.config.paths import (
     YOLO_MODEL_PATH, 
+    YOLO_BATCH_SIZE,
     get_hotspot_files, 
     extract_study_date_from_dicom, 
     generate_filename_stem
 )
 from features.dicom_import.logic.dicom_loader import load_frames_and_metadata
+from core.tracing import traced
 
-# Initialize YOLO model
-print(f"[YOLO] Loading model from: {YOLO_MODEL_PATH}")
-if not YOLO_MODEL_PATH.exists():
-    raise FileNotFoundError(f"YOLO model not found at: {YOLO_MODEL_PATH}")
+def load_yolo_model() -> YOLO:
+    """Lazy-load + cache the YOLO detection model."""
+    if not hasattr(load_yolo_model, "_cache"):
+        load_yolo_model._cache = {}
+    cache = load_yolo_model._cache
 
-model = YOLO(str(YOLO_MODEL_PATH))
-print(f"[YOLO] Model loaded successfully")
+    if "yolo" not in cache:
+        print(f"[YOLO] Loading model from: {YOLO_MODEL_PATH}")
+        if not YOLO_MODEL_PATH.exists():
+            raise FileNotFoundError(f"YOLO model not found at: {YOLO_MODEL_PATH}")
+
+        cache["yolo"] = YOLO(str(YOLO_MODEL_PATH))
+        print(f"[YOLO] Model loaded successfully")
+    return cache["yolo"]
+
+
+def _prepare_frame(frame_array: np.ndarray) -> np.ndarray:
+    """
+    Convert a DICOM frame into the uint8 3-channel image YOLO expects.
+    Multi-frame (3-D) data is collapsed with a sum projection first.
+    """
+    if frame_array.ndim == 3 and frame_array.shape[-1] not in (3, 4):
+        frame_array = np.sum(frame_array, axis=0)
+
+    # Ensure frame is in proper format
+    if frame_array.dtype != np.uint8:
+        # Normalize to 0-255 range (in place on one float32 copy)
+        frame_norm = frame_array.astype(np.float32)
+        frame_norm -= frame_array.min()
+        frame_norm /= max(frame_norm.max(), 1)
+        frame_norm *= 255
+        frame_array = frame_norm.astype(np.uint8)
+
+    # Convert to RGB if grayscale (YOLO expects 3 channels)
+    if frame_array.ndim == 2:
+        frame_array = np.repeat(frame_array[..., None], 3, axis=-1)
+
+    return frame_array
+
+
+def _parse_yolo_result(result) -> List[Dict]:
+    """Convert one ultralytics Results object into detection dicts."""
+    if result is None or not hasattr(result, 'boxes') or result.boxes is None:
+        return []
+
+    boxes = result.boxes
+    xyxy = boxes.xyxy.cpu().numpy()
+    conf = boxes.conf.cpu().numpy()
+    cls = boxes.cls.cpu().numpy().astype(int)
+    labels = [result.names[c] for c in cls]
+
+    detection_results = []
+    for i in range(len(xyxy)):
+        detection_results.append({
+            "label": labels[i],
+            "class_id": int(cls[i]),
+            "confidence": float(conf[i]),
+            "bbox": [float(x) for x in xyxy[i]]
+        })
+    return detection_results
+
+
+def inference_detection_batch(frames: List[np.ndarray], batch_size: int = None) -> List[List[Dict]]:
+    """
+    Run YOLO on many frames, ``batch_size`` images per forward pass.
+
+    Args:
+        frames: Raw DICOM frames (any dtype) or prepared uint8 RGB images
+        batch_size: Images per YOLO call (defaults to YOLO_BATCH_SIZE)
+
+    Returns:
+        One detection list per input frame, in input order
+    """
+    batch_size = max(1, batch_size or YOLO_BATCH_SIZE)
+    model = load_yolo_model()
+    detections: List[List[Dict]] = []
+
+    for start in range(0, len(frames), batch_size):
+        chunk = [_prepare_frame(f) for f in frames[start:start + batch_size]]
+        try:
+            results = model(chunk, verbose=False)
+            detections.extend(_parse_yolo_result(r) for r in results)
+        except Exception as e:
+            print(f"[YOLO ERROR] Batch inference failed: {e}")
+            traceback.print_exc()
+            detections.extend([] for _ in chunk)
+
+    return detections
 
 
 def inference_detection_from_array(frame_array: np.ndarray) -> List[Dict]:
@@ -48,44 +133,12 @@ def inference_detection_from_array(frame_array: np.ndarray) -> List[Dict]:
         List of detection results with bbox, confidence, and label
     """
     try:
-        # Ensure frame is in proper format
-        if frame_array.dtype != np.uint8:
-            # Normalize to 0-255 range
-            frame_norm = (frame_array.astype(np.float32) - frame_array.min())
-            frame_norm /= max(frame_norm.max(), 1)
-            frame_array = (frame_norm * 255).astype(np.uint8)
-        
-        # Convert to RGB if grayscale (YOLO expects 3 channels)
-        if len(frame_array.shape) == 2:
-            frame_array = np.stack([frame_array] * 3, axis=-1)
-        
-        # Run YOLO inference
-        results = model(frame_array)
+        results = load_yolo_model()(_prepare_frame(frame_array))
         
         if not results or len(results) == 0:
             return []
             
-        result = results[0]
-        
-        if not hasattr(result, 'boxes') or result.boxes is None:
-            return []
-            
-        boxes = result.boxes
-        xyxy = boxes.xyxy.cpu().numpy()
-        conf = boxes.conf.cpu().numpy()
-        cls = boxes.cls.cpu().numpy().astype(int)
-        labels = [result.names[c] for c in cls]
-        
-        detection_results = []
-        for i in range(len(xyxy)):
-            detection_results.append({
-                "label": labels[i],
-                "class_id": int(cls[i]),
-                "confidence": float(conf[i]),
-                "bbox": [float(x) for x in xyxy[i]]
-            })
-        
-        return detection_results
+        return _parse_yolo_result(results[0])
         
     except Exception as e:
         print(f"[YOLO ERROR] Inference failed: {e}")
@@ -104,94 +157,243 @@ def inference_detection_from_path(image_path: str) -> List[Dict]:
         List of detection results
     """
     try:
-        results = model(image_path)
+        results = load_yolo_model()(image_path)
         
         if not results or len(results) == 0:
             return []
             
-        result = results[0]
-        
-        if not hasattr(result, 'boxes') or result.boxes is None:
-            return []
-        
-        boxes = result.boxes
-        xyxy = boxes.xyxy.cpu().numpy()
-        conf = boxes.conf.cpu().numpy()
-        cls = boxes.cls.cpu().numpy().astype(int)
-        labels = [result.names[c] for c in cls]
-        
-        detection_results = []
-        for i in range(len(xyxy)):
-            detection_results.append({
-                "label": labels[i],
-                "class_id": int(cls[i]),
-                "confidence": float(conf[i]),
-                "bbox": [float(x) for x in xyxy[i]]
-            })
-        
-        return detection_results
+        return _parse_yolo_result(results[0])
         
     except Exception as e:
         print(f"[YOLO ERROR] Inference from path failed: {e}")
         return []
 
 
+def build_pascal_voc_xml(image_shape: Tuple[int, int], objects: List[Dict],
+                         image_filename: str = "image.png") -> str:
+    """
+    Build the PASCAL VOC XML text for one image (same layout as the previous
+    minidom pretty-print, without re-parsing the document).
+    """
+    height, width = image_shape[:2]
+    
+    annotation = ET.Element("annotation")
+    
+    # --- PERUBAHAN & PENAMBAHAN DI SINI ---
+    ET.SubElement(annotation, "folder").text = "BS-80K" # DIUBAH
+    ET.SubElement(annotation, "filename").text = image_filename
+    
+    # DITAMBAHKAN: Tag <source>
+    source = ET.SubElement(annotation, "source")
+    ET.SubElement(source, "database").text = "The BS-80K Database"
+
+    size = ET.SubElement(annotation, "size")
+    ET.SubElement(size, "width").text = str(width)
+    ET.SubElement(size, "height").text = str(height)
+    ET.SubElement(size, "depth").text = "1"
+    
+    # DITAMBAHKAN: Tag <segmented>
+    ET.SubElement(annotation, "segmented").text = "0"
+    
+    for obj in objects:
+        obj_el = ET.SubElement(annotation, "object")
+        ET.SubElement(obj_el, "name").text = obj["label"]
+        
+        # --- PERUBAHAN & PENAMBAHAN DI DALAM <object> ---
+        ET.SubElement(obj_el, "pose").text = "Unspecified" # DITAMBAHKAN
+        ET.SubElement(obj_el, "truncated").text = "0" # DITAMBAHKAN
+        ET.SubElement(obj_el, "difficult").text = "0" # DITAMBAHKAN
+        
+        # DIHAPUS: Tag <confidence> tidak lagi ada di dalam <object>
+        # ET.SubElement(obj_el, "confidence").text = f"{obj['confidence']:.4f}"
+
+        bbox = obj["bbox"]
+        bndbox = ET.SubElement(obj_el, "bndbox")
+        ET.SubElement(bndbox, "xmin").text = str(int(bbox[0]))
+        ET.SubElement(bndbox, "ymin").text = str(int(bbox[1]))
+        ET.SubElement(bndbox, "xmax").text = str(int(bbox[2]))
+        ET.SubElement(bndbox, "ymax").text = str(int(bbox[3]))
+    
+    ET.indent(annotation, space="    ")
+    return '<?xml version="1.0" ?>\n' + ET.tostring(annotation, encoding="unicode") + "\n"
+
+
 def write_pascal_voc_xml(output_path: Path, image_shape: Tuple[int, int], 
-                         objects: List[Dict], image_filename: str = "image.png"):
+                         objects: List[Dict], image_filename: str = "image.png") -> bool:
     """
     Menulis hasil deteksi ke format PASCAL VOC XML yang lebih lengkap.
+
+    Returns:
+        True jika XML berhasil ditulis, False jika gagal
     """
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
     try:
-        height, width = image_shape[:2]
-        
-        annotation = ET.Element("annotation")
-        
-        # --- PERUBAHAN & PENAMBAHAN DI SINI ---
-        ET.SubElement(annotation, "folder").text = "BS-80K" # DIUBAH
-        ET.SubElement(annotation, "filename").text = image_filename
-        
-        # DITAMBAHKAN: Tag <source>
-        source = ET.SubElement(annotation, "source")
-        ET.SubElement(source, "database").text = "The BS-80K Database"
-
-        size = ET.SubElement(annotation, "size")
-        ET.SubElement(size, "width").text = str(width)
-        ET.SubElement(size, "height").text = str(height)
-        ET.SubElement(size, "depth").text = "1"
-        
-        # DITAMBAHKAN: Tag <segmented>
-        ET.SubElement(annotation, "segmented").text = "0"
-        
-        for obj in objects:
-            obj_el = ET.SubElement(annotation, "object")
-            ET.SubElement(obj_el, "name").text = obj["label"]
-            
-            # --- PERUBAHAN & PENAMBAHAN DI DALAM <object> ---
-            ET.SubElement(obj_el, "pose").text = "Unspecified" # DITAMBAHKAN
-            ET.SubElement(obj_el, "truncated").text = "0" # DITAMBAHKAN
-            ET.SubElement(obj_el, "difficult").text = "0" # DITAMBAHKAN
-            
-            # DIHAPUS: Tag <confidence> tidak lagi ada di dalam <object>
-            # ET.SubElement(obj_el, "confidence").text = f"{obj['confidence']:.4f}"
-
-            bbox = obj["bbox"]
-            bndbox = ET.SubElement(obj_el, "bndbox")
-            ET.SubElement(bndbox, "xmin").text = str(int(bbox[0]))
-            ET.SubElement(bndbox, "ymin").text = str(int(bbox[1]))
-            ET.SubElement(bndbox, "xmax").text = str(int(bbox[2]))
-            ET.SubElement(bndbox, "ymax").text = str(int(bbox[3]))
+        xml_str = build_pascal_voc_xml(image_shape, objects, image_filename)
         
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        xml_str = minidom.parseString(ET.tostring(annotation)).toprettyxml(indent="    ")
-        with open(output_path, "w", encoding="utf-8") as f:
+        # Tulis ke file sementara dulu: XML setengah jadi tidak boleh dianggap "sudah ada"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             f.write(xml_str)
+        os.replace(tmp_path, output_path)
             
         print(f"[XML] Saved detection XML to: {output_path}")
+        return True
         
     except Exception as e:
         print(f"[XML ERROR] Failed to write XML: {e}")
         traceback.print_exc()
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return False
+
+
+def _xml_writer() -> ThreadPoolExecutor:
+    """Background thread that writes XML files while YOLO keeps running."""
+    if not hasattr(_xml_writer, "_executor"):
+        _xml_writer._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xml-writer")
+    return _xml_writer._executor
+
+
+def write_pascal_voc_xml_async(output_path: Path, image_shape: Tuple[int, int],
+                               objects: List[Dict], image_filename: str = "image.png") -> Future:
+    """Queue write_pascal_voc_xml on the background writer; its Future resolves to the success flag."""
+    return _xml_writer().submit(write_pascal_voc_xml, output_path, image_shape, objects, image_filename)
+
+
+def _view_names(view_name: str) -> Tuple[str, str]:
+    """Map a frame label to (view_type, view_full), e.g. ('ant', 'anterior')."""
+    view_lower = view_name.lower()
+    if "ant" in view_lower:
+        return "ant", "anterior"
+    if "post" in view_lower:
+        return "post", "posterior"
+    # Default to anterior for unknown views
+    print(f"[DETECTION WARNING] Unknown view '{view_name}', defaulting to anterior")
+    return "ant", "anterior"
+
+
+def _collect_detection_jobs(dicom_path: Path, patient_id: str, session_code: str, study_date: str,
+                            frames_dict: Dict[str, np.ndarray], overwrite: bool,
+                            results: Dict[Path, Dict[str, bool]], jobs: list) -> None:
+    """Queue the views of one scan that still need an XML (existing XMLs count as done)."""
+    print(f"[DETECTION] Patient: {patient_id}, Session: {session_code}, Study Date: {study_date}")
+    print(f"[DETECTION] Loaded {len(frames_dict)} frames: {list(frames_dict.keys())}")
+
+    for view_name, frame_data in frames_dict.items():
+        view_type, view_full = _view_names(view_name)
+        hotspot_files = get_hotspot_files(patient_id, session_code, view_type, study_date)
+        xml_output_path = Path(hotspot_files['xml_file'])
+
+        # Skip if XML already exists
+        if xml_output_path.exists() and not overwrite:
+            print(f"[DETECTION] XML already exists for {view_full}: {xml_output_path}")
+            results[dicom_path][view_full] = True
+            continue
+
+        if not isinstance(frame_data, np.ndarray):
+            print(f"[DETECTION ERROR] Invalid frame data type: {type(frame_data)}")
+            continue
+
+        jobs.append((dicom_path, view_full, xml_output_path,
+                     f"{patient_id}_{study_date}_{view_type}.png", frame_data))
+
+
+@traced("detection.yolo")
+def _run_detection_jobs(jobs: list, results: Dict[Path, Dict[str, bool]], batch_size: int = None) -> None:
+    """YOLO over the queued views in batches; XMLs are written while the next batch runs."""
+    batch_size = max(1, batch_size or YOLO_BATCH_SIZE)
+    print(f"[DETECTION] Running YOLO on {len(jobs)} view(s), batch size {batch_size}...")
+    t_start = time.perf_counter()
+
+    writes = []
+    for start in range(0, len(jobs), batch_size):
+        chunk = jobs[start:start + batch_size]
+        detections = inference_detection_batch([job[4] for job in chunk], batch_size)
+        for (dicom_path, view_full, xml_path, image_filename, frame), dets in zip(chunk, detections):
+            print(f"[DETECTION] {dicom_path.name} {view_full}: {len(dets)} hotspot(s)")
+            shape = frame.shape[1:] if frame.ndim == 3 and frame.shape[-1] not in (3, 4) else frame.shape
+            writes.append((dicom_path, view_full,
+                           write_pascal_voc_xml_async(xml_path, shape, dets, image_filename)))
+
+    for dicom_path, view_full, future in writes:
+        try:
+            written = future.result()
+        except Exception as e:
+            print(f"[XML ERROR] {dicom_path.name} {view_full}: {e}")
+            written = False
+        results[dicom_path][view_full] = bool(written)
+
+    elapsed = time.perf_counter() - t_start
+    print(f"[DETECTION] {len(jobs)} view(s) in {elapsed:.2f}s ({len(jobs) / max(elapsed, 1e-9):.1f} frames/s)")
+
+
+def detect_dicoms_batch(scans: List[Tuple[Path, str, Optional[str]]], batch_size: int = None,
+                        overwrite: bool = False) -> Dict[Path, Dict[str, bool]]:
+    """
+    Batched YOLO detection over many DICOM files.
+
+    Frames of every scan are collected first, run through YOLO ``batch_size``
+    at a time, and the XML files are written on a background thread while the
+    next batch is inferred. Returns once every XML is on disk.
+
+    Args:
+        scans: (dicom_path, patient_id, session_code or None) tuples
+        batch_size: Images per YOLO call (defaults to YOLO_BATCH_SIZE)
+        overwrite: Re-run views whose XML already exists
+
+    Returns:
+        {dicom_path: {"anterior": bool, "posterior": bool}}
+    """
+    results: Dict[Path, Dict[str, bool]] = {}
+    jobs = []       # (dicom_path, view_full, xml_path, image_filename, frame)
+
+    for dicom_path, patient_id, session_code in scans:
+        dicom_path = Path(dicom_path)
+        results[dicom_path] = {"anterior": False, "posterior": False}
+        try:
+            frames_dict, _ = load_frames_and_metadata(str(dicom_path))
+            if not frames_dict:
+                print(f"[DETECTION ERROR] No frames loaded from {dicom_path}")
+                continue
+
+            study_date = extract_study_date_from_dicom(dicom_path)
+            # Extract session code from path if not provided
+            if not session_code:
+                session_code = dicom_path.parent.parent.name
+
+            _collect_detection_jobs(dicom_path, patient_id, session_code, study_date,
+                                    frames_dict, overwrite, results, jobs)
+
+        except Exception as e:
+            print(f"[DETECTION FATAL ERROR] Failed to process {dicom_path}: {e}")
+            traceback.print_exc()
+
+    if jobs:
+        _run_detection_jobs(jobs, results, batch_size)
+    return results
+
+
+def detect_study(context, overwrite: bool = False) -> Dict[str, bool]:
+    """
+    YOLO detection for an import StudyContext, using its already decoded frames.
+
+    Returns:
+        {"anterior": bool, "posterior": bool}
+    """
+    dicom_path = Path(context.dicom_path)
+    results = {dicom_path: {"anterior": False, "posterior": False}}
+    jobs = []
+    try:
+        _collect_detection_jobs(dicom_path, context.patient_id, context.session_code, context.study_date,
+                                context.frames, overwrite, results, jobs)
+        if jobs:
+            _run_detection_jobs(jobs, results)
+    except Exception as e:
+        print(f"[DETECTION FATAL ERROR] Failed to process {dicom_path}: {e}")
+        traceback.print_exc()
+    return results[dicom_path]
 
 
 def process_dicom_for_detection(dicom_path: Path, patient_id: str, 
@@ -207,111 +409,8 @@ def process_dicom_for_detection(dicom_path: Path, patient_id: str,
     Returns:
         Dictionary indicating success for each view
     """
-    try:
-        print(f"[DETECTION] Processing DICOM: {dicom_path}")
-        
-        # Load frames from DICOM
-        frames_dict, metadata = load_frames_and_metadata(str(dicom_path))
-        
-        if not frames_dict:
-            print(f"[DETECTION ERROR] No frames loaded from {dicom_path}")
-            return {"anterior": False, "posterior": False}
-        
-        # Extract study date
-        study_date = extract_study_date_from_dicom(dicom_path)
-        
-        # Extract session code from path if not provided
-        if not session_code:
-            session_code = dicom_path.parent.parent.name
-        
-        print(f"[DETECTION] Patient: {patient_id}, Session: {session_code}, Study Date: {study_date}")
-        print(f"[DETECTION] Loaded {len(frames_dict)} frames: {list(frames_dict.keys())}")
-        
-        results = {"anterior": False, "posterior": False}
-        
-        # Process each view
-        for view_name, frame_data in frames_dict.items():
-            try:
-                # Determine view type from frame name
-                view_lower = view_name.lower()
-                if "ant" in view_lower:
-                    view_type = "ant"
-                    view_full = "anterior"
-                elif "post" in view_lower:
-                    view_type = "post"
-                    view_full = "posterior"
-                else:
-                    # Default to anterior for unknown views
-                    view_type = "ant"
-                    view_full = "anterior"
-                    print(f"[DETECTION WARNING] Unknown view '{view_name}', defaulting to anterior")
-                
-                print(f"[DETECTION] Processing view: {view_name} -> {view_full}")
-                
-                # Get output paths
-                hotspot_files = get_hotspot_files(patient_id, session_code, view_type, study_date)
-                xml_output_path = Path(hotspot_files['xml_file'])
-                
-                # Skip if XML already exists
-                if xml_output_path.exists():
-                    print(f"[DETECTION] XML already exists for {view_full}: {xml_output_path}")
-                    results[view_full] = True
-                    continue
-                
-                # Handle multi-frame data
-                if isinstance(frame_data, np.ndarray):
-                    if frame_data.ndim == 3:
-                        # Multi-frame: create sum projection
-                        processed_frame = np.sum(frame_data, axis=0)
-                        print(f"[DETECTION] Created sum projection from {frame_data.shape[0]} frames")
-                    else:
-                        # Single frame
-                        processed_frame = frame_data
-                else:
-                    print(f"[DETECTION ERROR] Invalid frame data type: {type(frame_data)}")
-                    continue
-                
-                # Run YOLO detection
-                print(f"[DETECTION] Running YOLO on {view_full} view...")
-                detections = inference_detection_from_array(processed_frame)
-                
-                if detections:
-                    print(f"[DETECTION] Found {len(detections)} hotspots in {view_full}")
-                    
-                    # Write XML file
-                    write_pascal_voc_xml(
-                        xml_output_path, 
-                        processed_frame.shape, 
-                        detections,
-                        f"{patient_id}_{study_date}_{view_type}.png"
-                    )
-                    
-                    results[view_full] = True
-                    
-                else:
-                    print(f"[DETECTION] No hotspots detected in {view_full}")
-                    
-                    # Create empty XML file to indicate processing was done
-                    write_pascal_voc_xml(
-                        xml_output_path, 
-                        processed_frame.shape, 
-                        [],
-                        f"{patient_id}_{study_date}_{view_type}.png"
-                    )
-                    
-                    results[view_full] = True
-                
-            except Exception as e:
-                print(f"[DETECTION ERROR] Failed to process view {view_name}: {e}")
-                traceback.print_exc()
-                continue
-        
-        return results
-        
-    except Exception as e:
-        print(f"[DETECTION FATAL ERROR] Failed to process {dicom_path}: {e}")
-        traceback.print_exc()
-        return {"anterior": False, "posterior": False}
+    print(f"[DETECTION] Processing DICOM: {dicom_path}")
+    return detect_dicoms_batch([(dicom_path, patient_id, session_code)])[Path(dicom_path)]
 
 
 def run_yolo_detection_for_patient(scan_path: Path, patient_id: str) -> Dict[str, bool]:
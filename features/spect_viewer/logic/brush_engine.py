@@ -0,0 +1,174 @@
+# features/spect_viewer/logic/brush_engine.py - Brush strokes on a label map for the mask editors
+"""
+Stroke engine shared by the segmentation and hotspot editors.
+
+The edited mask is a single uint8 label map. A dab stamps a disk, precomputed
+once per radius, into it with one slice assignment. The mouse samples of a
+stroke are joined by dabs spaced at most half a radius apart (one pixel for
+the 1-pixel brush), so fast strokes stay continuous. Every call returns the
+dirty rectangle it touched, and ``render_rgba`` colours just that rectangle,
+so the canvas only re-uploads the pixels that changed.
+
+Painting writes the current label over whatever was there; the eraser only
+clears pixels of the current label (back to 0, background). An optional
+``before_dab(rect)`` hook is called with each dab's rectangle just before it
+is stamped (the editors use it to keep undo patches, see edit_history).
+
+Usage:
+    brush = LabelBrush(mask)
+    rect = brush.begin(x, y, radius=5, label=3)        # (x0, y0, x1, y1) or None
+    rect = brush.move_to(x2, y2)
+    stroke_rect = brush.end()
+    rgba = render_rgba(mask, rect, palette_lut(_PALETTE), show_all=True)
+"""
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Rect = Tuple[int, int, int, int]  # (x0, y0, x1, y1), end-exclusive
+
+
+@lru_cache(maxsize=None)
+def disk_stamp(radius: int) -> np.ndarray:
+    """
+    Boolean disk footprint ``dx*dx + dy*dy <= radius*radius``, shape (2r+1, 2r+1).
+
+    Radius 1 is a single pixel (the editors' finest brush). The array is shared
+    between calls and read-only.
+    """
+    radius = max(1, int(radius))
+    if radius == 1:
+        stamp = np.ones((1, 1), dtype=bool)
+    else:
+        offsets = np.arange(-radius, radius + 1)
+        stamp = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius * radius
+    stamp.flags.writeable = False
+    return stamp
+
+
+def union_rect(a: Optional[Rect], b: Optional[Rect]) -> Optional[Rect]:
+    """Smallest rectangle containing both (None counts as empty)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def palette_lut(palette: Sequence[Sequence[int]]) -> np.ndarray:
+    """(256, 3) uint8 colour table for a palette; labels past its end render black."""
+    lut = np.zeros((256, 3), dtype=np.uint8)
+    lut[:len(palette)] = np.asarray(palette, dtype=np.uint8)
+    return lut
+
+
+def render_rgba(labels: np.ndarray, rect: Optional[Rect], lut: np.ndarray, *,
+                show_all: bool, current_label: int = 1, bg_alpha: float = 0.0) -> np.ndarray:
+    """
+    RGBA pixels of one rectangle of the label map, as the editor canvas shows them.
+
+    Args:
+        labels: (H, W) uint8 label map
+        rect: Rectangle to render (None = whole map)
+        lut: palette_lut() of the editor's palette
+        show_all: All labels opaque (background at ``bg_alpha``); otherwise only
+            ``current_label`` is shown and everything else is transparent
+        current_label: Label shown when not ``show_all``
+        bg_alpha: Opacity (0-1) of label 0 in ``show_all`` mode
+
+    Returns:
+        C-contiguous (h, w, 4) uint8 array
+    """
+    x0, y0, x1, y1 = rect if rect is not None else (0, 0, labels.shape[1], labels.shape[0])
+    region = labels[y0:y1, x0:x1]
+    rgba = np.empty(region.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[region]
+    if show_all:
+        rgba[..., 3] = np.where(region == 0, np.uint8(int(bg_alpha * 255)), np.uint8(255))
+    else:
+        rgba[..., 3] = np.where(region == current_label, np.uint8(255), np.uint8(0))
+    return rgba
+
+
+class LabelBrush:
+    """Paints strokes into a label map in place (see module docstring)."""
+
+    def __init__(self, labels: np.ndarray, before_dab: Optional[Callable[[Rect], None]] = None):
+        self.labels = labels
+        self.before_dab = before_dab
+        self.radius = 1
+        self.label = 1
+        self.erase = False
+        self.stroke_rect: Optional[Rect] = None
+        self._last: Optional[Tuple[int, int]] = None
+
+    # -------------------------------------------------------------- strokes
+    def begin(self, x: int, y: int, radius: int, label: int, erase: bool = False) -> Optional[Rect]:
+        """Start a stroke with one dab at (x, y); returns the dirty rectangle."""
+        self.radius = max(1, int(radius))
+        self.label = int(label)
+        self.erase = bool(erase)
+        self.stroke_rect = None
+        self._last = (int(x), int(y))
+        return self._track(self._dab(int(x), int(y)))
+
+    def move_to(self, x: int, y: int) -> Optional[Rect]:
+        """Continue the stroke to (x, y) with dabs along the way; returns the dirty rectangle."""
+        if self._last is None:
+            return self.begin(x, y, self.radius, self.label, self.erase)
+
+        dirty = None
+        for px, py in self._segment_points(self._last, (int(x), int(y))):
+            dirty = union_rect(dirty, self._dab(px, py))
+        self._last = (int(x), int(y))
+        return self._track(dirty)
+
+    def end(self) -> Optional[Rect]:
+        """Finish the stroke; returns the rectangle covering everything it touched."""
+        rect, self.stroke_rect, self._last = self.stroke_rect, None, None
+        return rect
+
+    @property
+    def active(self) -> bool:
+        return self._last is not None
+
+    # -------------------------------------------------------------- internals
+    def _track(self, rect: Optional[Rect]) -> Optional[Rect]:
+        self.stroke_rect = union_rect(self.stroke_rect, rect)
+        return rect
+
+    def _segment_points(self, start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Dab centres after ``start`` up to and including ``end``."""
+        (x0, y0), (x1, y1) = start, end
+        spacing = max(1, self.radius // 2)
+        steps = int(math.ceil(max(abs(x1 - x0), abs(y1 - y0)) / spacing))
+        if steps == 0:
+            return []
+        t = np.arange(1, steps + 1) / steps
+        xs = np.rint(x0 + (x1 - x0) * t).astype(int)
+        ys = np.rint(y0 + (y1 - y0) * t).astype(int)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def _dab(self, x: int, y: int) -> Optional[Rect]:
+        """Stamp the brush centred on (x, y); returns the clipped rectangle or None."""
+        stamp = disk_stamp(self.radius)
+        r = stamp.shape[0] // 2
+        h, w = self.labels.shape
+        x0, y0 = max(x - r, 0), max(y - r, 0)
+        x1, y1 = min(x + r + 1, w), min(y + r + 1, h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        if self.before_dab is not None:
+            self.before_dab((x0, y0, x1, y1))
+        footprint = stamp[y0 - (y - r):y1 - (y - r), x0 - (x - r):x1 - (x - r)]
+        region = self.labels[y0:y1, x0:x1]
+        if self.erase:
+            region[footprint & (region == self.label)] = 0
+        else:
+            region[footprint] = self.label
+        return x0, y0, x1, y1
@@ -138,8 +138,8 @@ class BSITimelineIntegration:
                     if path_session == session_code:
                         patient_id = path_patient
                         
-                        # Extract study date from DICOM
-                        study_date = extract_study_date_from_dicom(dicom_path)
+                        # Study date from the already-read header, DICOM only as fallback
+                        study_date = scan_data.get("meta", {}).get("study_date") or extract_study_date_from_dicom(dicom_path)
                         return patient_id, study_date
             
             # Method 2: Extract from meta data
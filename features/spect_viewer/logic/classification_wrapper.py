@@ -297,11 +297,9 @@ def run_classification_inference(raw_path: str, segment_path: str, hotspot_path:
             _log(f"[ERROR] Scaler file not found: {clf_module.SCALER_PATH}")
             return [], None
         
-        # Reload models
-        import joblib
-        clf_module.model = joblib.load(clf_module.MODEL_PATH)
-        clf_module.scaler = joblib.load(clf_module.SCALER_PATH)
-        _log(f"[DEBUG] Models loaded successfully")
+        # Models stay cached in the module after the first call
+        clf_module.load_classification_models()
+        _log(f"[DEBUG] Models ready")
         
         # Load XML bounding boxes
         xml_bboxes = load_xml_bounding_boxes(Path(xml_path))
@@ -462,6 +460,38 @@ def get_classification_input_paths(patient_folder: Path, filename_stem: str, vie
         'xml_file': next((p for p in xml_candidates if p.exists()), xml_candidates[-1])
     }
 
+def load_classification_coordinates(json_path: Path) -> dict:
+    """
+    Load hotspot pixel coordinates saved next to a classification JSON.
+    
+    Returns:
+        {hotspot_id: int32 array of shape (N, 2) with [y, x] rows}
+    """
+    try:
+        with open(json_path, 'r') as f:
+            json_data = json.load(f)
+        
+        hotspots = json_data.get("hotspots", [])
+        coords_name = json_data.get("coordinates_file")
+        
+        if not coords_name:
+            # Older JSON files keep the coordinates inline as lists
+            return {
+                hotspot["id"]: np.asarray(hotspot.get("coordinates", []), dtype=np.int32).reshape(-1, 2)
+                for hotspot in hotspots
+            }
+        
+        coords_path = Path(json_path).parent / coords_name
+        with np.load(coords_path) as data:
+            return {
+                hotspot["id"]: data[hotspot["coordinates_key"]]
+                for hotspot in hotspots if hotspot.get("coordinates_key") in data
+            }
+        
+    except Exception as e:
+        _log(f"Failed to load classification coordinates: {e}")
+        return {}
+
 def save_classification_results(patient_folder: Path, filename_stem: str, view: str, results: list, mask: any):
     """✅ UPDATED: Save classification results with XML creation"""
     try:
@@ -478,19 +508,29 @@ def save_classification_results(patient_folder: Path, filename_stem: str, view:
             "hotspots": []
         }
         
+        # Hotspot pixel coordinates go to a compact binary sidecar instead of JSON lists
+        coords_path = patient_folder / f"{filename_stem}_{view}_classification_coords.npz"
+        coordinate_arrays = {}
+        json_data["coordinates_file"] = coords_path.name
+        
         for i, result in enumerate(results):
+            coordinates = np.asarray(result.get('coordinates', []), dtype=np.int32).reshape(-1, 2)
+            coordinate_arrays[f"hotspot_{i}"] = coordinates
             hotspot_data = {
                 "id": i,
                 "prediction": result.get('prediction', 'Unknown'),
                 "probability_normal": float(result.get('probability_normal', 0.0)),
                 "probability_abnormal": float(result.get('probability_abnormal', 0.0)),
-                "coordinates": result.get('coordinates', []),
+                "coordinates_key": f"hotspot_{i}",
+                "coordinate_count": int(len(coordinates)),
                 "segment": result.get('segment', 'Unknown'),
                 "bounding_box": result.get('bounding_box', {}),
                 "area_measurements": result.get('area_measurements', {})
             }
             json_data["hotspots"].append(hotspot_data)
         
+        np.savez_compressed(coords_path, **coordinate_arrays)
+        
         with open(json_path, 'w') as f:
             json.dump(json_data, f, indent=2)
         
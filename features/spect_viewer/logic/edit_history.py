@@ -0,0 +1,223 @@
+# features/spect_viewer/logic/edit_history.py - Delta undo/redo for the mask editors
+"""
+Per-label undo/redo history that stores one small delta per brush stroke.
+
+A ``StrokeDelta`` keeps the stroke's bounding rectangle, a bit-packed mask of
+the pixels it changed inside that rectangle, and their values before and
+after the stroke - nothing outside the rectangle and nothing that stayed the
+same. Undo/redo write just those pixels back, so the cost depends on the
+stroke, not on the frame size, and the canvas only redraws the rectangle.
+
+Deltas are reverted conservatively: a pixel is only restored while it still
+holds the value the stroke left there, so undoing one layer never wipes a
+later stroke of another layer that painted over the same spot.
+
+A ``StrokeRecorder`` collects the stroke's before-values while it is being
+painted: it copies each dab's rectangle just before the dab is stamped (the
+brush's ``before_dab`` hook), so a stroke never copies the whole frame.
+
+``EditHistory`` keeps an undo and a redo stack per label, at most
+``max_per_label`` undo steps each, and evicts the oldest deltas across all
+labels once the history grows past ``max_bytes``.
+
+Usage:
+    history = EditHistory()
+    recorder = StrokeRecorder(labels)
+    brush = LabelBrush(labels, before_dab=recorder.capture)
+    recorder.reset()                       # at stroke start
+    ...paint...
+    delta = recorder.finish(label, brush.end())
+    if delta is not None:
+        history.push(delta)
+    delta = history.undo(label)
+    if delta is not None:
+        dirty_rect = delta.apply(labels, undo=True)
+"""
+from __future__ import annotations
+
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+Rect = Tuple[int, int, int, int]  # (x0, y0, x1, y1), end-exclusive
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_PER_LABEL = 50
+
+
+class StrokeDelta:
+    """The pixels one stroke changed, cropped to its bounding rectangle."""
+
+    __slots__ = ("label", "rect", "seq", "_changed", "_before", "_after")
+
+    _counter = itertools.count()
+
+    def __init__(self, label: int, rect: Rect, changed: np.ndarray,
+                 before: np.ndarray, after: np.ndarray):
+        self.label = int(label)
+        self.rect = tuple(int(v) for v in rect)
+        self.seq = next(StrokeDelta._counter)
+        self._changed = np.packbits(changed, axis=None)
+        self._before = before
+        self._after = after
+
+    @classmethod
+    def from_patches(cls, label: int, rect: Optional[Rect],
+                     before: np.ndarray, after: np.ndarray) -> Optional["StrokeDelta"]:
+        """
+        Delta between two crops of the label map at ``rect``.
+
+        Returns:
+            The delta, or None when the stroke changed nothing
+        """
+        if rect is None:
+            return None
+        changed = before != after
+        if not changed.any():
+            return None
+        return cls(label, rect, changed, before[changed], after[changed])
+
+    @property
+    def nbytes(self) -> int:
+        return self._changed.nbytes + self._before.nbytes + self._after.nbytes
+
+    def _changed_mask(self) -> np.ndarray:
+        x0, y0, x1, y1 = self.rect
+        size = (y1 - y0) * (x1 - x0)
+        return np.unpackbits(self._changed, count=size).reshape(y1 - y0, x1 - x0).astype(bool)
+
+    def apply(self, labels: np.ndarray, undo: bool) -> Rect:
+        """
+        Revert (``undo=True``) or re-apply the stroke in place.
+
+        Only pixels still holding the stroke's other side are touched.
+
+        Returns:
+            The rectangle to redraw
+        """
+        x0, y0, x1, y1 = self.rect
+        region = labels[y0:y1, x0:x1]
+        changed = self._changed_mask()
+        src, dst = (self._after, self._before) if undo else (self._before, self._after)
+        current = region[changed]
+        region[changed] = np.where(current == src, dst, current)
+        return self.rect
+
+
+def _contains(outer: Rect, inner: Rect) -> bool:
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[2] <= outer[2] and inner[3] <= outer[3])
+
+
+class StrokeRecorder:
+    """Before-patches of the stroke being painted, captured dab by dab."""
+
+    def __init__(self, labels: np.ndarray):
+        self.labels = labels
+        self._patches: List[Tuple[Rect, np.ndarray]] = []
+
+    def reset(self) -> None:
+        """Forget the patches of an unfinished stroke."""
+        self._patches.clear()
+
+    def capture(self, rect: Rect) -> None:
+        """Copy ``rect`` before a dab paints it (skipped when the last patch covers it)."""
+        if self._patches and _contains(self._patches[-1][0], rect):
+            return
+        x0, y0, x1, y1 = rect
+        self._patches.append((rect, self.labels[y0:y1, x0:x1].copy()))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(patch.nbytes for _, patch in self._patches)
+
+    def finish(self, label: int, rect: Optional[Rect]) -> Optional[StrokeDelta]:
+        """
+        Delta of the finished stroke covering ``rect`` (the brush's stroke rectangle).
+
+        Returns:
+            The delta, or None when the stroke changed nothing
+        """
+        patches, self._patches = self._patches, []
+        if rect is None or not patches:
+            return None
+        x0, y0, x1, y1 = rect
+        after = self.labels[y0:y1, x0:x1]
+        before = after.copy()
+        # Earliest patch wins: it holds the value from before the stroke
+        for (px0, py0, px1, py1), patch in reversed(patches):
+            before[py0 - y0:py1 - y0, px0 - x0:px1 - x0] = patch
+        return StrokeDelta.from_patches(label, rect, before, after)
+
+
+class EditHistory:
+    """Undo/redo stacks of StrokeDelta per label with a global memory cap."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_per_label: int = DEFAULT_MAX_PER_LABEL):
+        self.max_bytes = int(max_bytes)
+        self.max_per_label = int(max_per_label)
+        self._undo: Dict[int, List[StrokeDelta]] = {}
+        self._redo: Dict[int, List[StrokeDelta]] = {}
+        self._nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by all stored deltas."""
+        return self._nbytes
+
+    def can_undo(self, label: int) -> bool:
+        return bool(self._undo.get(label))
+
+    def can_redo(self, label: int) -> bool:
+        return bool(self._redo.get(label))
+
+    def push(self, delta: StrokeDelta) -> None:
+        """Record a new stroke (clears that label's redo stack)."""
+        undo = self._undo.setdefault(delta.label, [])
+        redo = self._redo.setdefault(delta.label, [])
+        self._nbytes -= sum(d.nbytes for d in redo)
+        redo.clear()
+
+        undo.append(delta)
+        self._nbytes += delta.nbytes
+        if len(undo) > self.max_per_label:
+            self._nbytes -= undo.pop(0).nbytes
+        self._enforce_cap()
+
+    def undo(self, label: int) -> Optional[StrokeDelta]:
+        """Move the label's last stroke to its redo stack; the caller reverts it."""
+        undo = self._undo.get(label)
+        if not undo:
+            return None
+        delta = undo.pop()
+        self._redo.setdefault(label, []).append(delta)
+        return delta
+
+    def redo(self, label: int) -> Optional[StrokeDelta]:
+        """Move the label's last undone stroke back; the caller re-applies it."""
+        redo = self._redo.get(label)
+        if not redo:
+            return None
+        delta = redo.pop()
+        self._undo.setdefault(label, []).append(delta)
+        return delta
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._nbytes = 0
+
+    def _enforce_cap(self) -> None:
+        """Drop the oldest undo steps (any label) until the history fits ``max_bytes``."""
+        while self._nbytes > self.max_bytes:
+            oldest = min((stack for stack in self._undo.values() if stack),
+                         key=lambda stack: stack[0].seq, default=None)
+            if oldest is None:
+                # Only redo steps left - they are the least likely to be needed
+                for redo in self._redo.values():
+                    redo.clear()
+                self._nbytes = 0
+                return
+            self._nbytes -= oldest.pop(0).nbytes
@@ -8,6 +8,9 @@ import matplotlib.colors as mcolors
 from skimage.filters import threshold_otsu
 from skimage.morphology import binary_dilation, disk
 
+from core.tracing import traced
+from core.utils.otsu import gather_box_values, otsu_threshold_hist, otsu_thresholds_hist
+
 # Import untuk extract study date
 try:
     from features.dicom_import.logic.dicom_loader import extract_study_date_from_dicom
@@ -45,7 +48,7 @@ def extract_grayscale_matrix(image_file: str, bbox: Tuple[int, int, int, int]) -
 
 def threshold_otsu_impl(grayscale_matrix: np.ndarray, nbins: int = 256) -> float:
     """
-    Custom Otsu threshold implementation.
+    Histogram Otsu threshold (core.utils.otsu, scored from cumulative histograms).
     
     Args:
         grayscale_matrix: Input grayscale image as numpy array
@@ -54,39 +57,7 @@ def threshold_otsu_impl(grayscale_matrix: np.ndarray, nbins: int = 256) -> float
     Returns:
         float: Optimal threshold value
     """
-    # Calculate histogram
-    hist, bin_edges = np.histogram(grayscale_matrix.flatten(), bins=nbins, range=(0, 256))
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
-    
-    # Calculate weights and means
-    total_pixels = grayscale_matrix.size
-    cumsum_hist = np.cumsum(hist)
-    cumsum_weighted = np.cumsum(hist * bin_centers)
-    
-    # Calculate between-class variance for each threshold
-    variances = []
-    for i in range(1, len(hist)):
-        # Weight of background class
-        w0 = cumsum_hist[i-1] / total_pixels
-        # Weight of foreground class
-        w1 = 1 - w0
-        
-        if w0 == 0 or w1 == 0:
-            variances.append(0)
-            continue
-            
-        # Mean of background class
-        mu0 = cumsum_weighted[i-1] / cumsum_hist[i-1] if cumsum_hist[i-1] > 0 else 0
-        # Mean of foreground class
-        mu1 = (cumsum_weighted[-1] - cumsum_weighted[i-1]) / (total_pixels - cumsum_hist[i-1]) if (total_pixels - cumsum_hist[i-1]) > 0 else 0
-        
-        # Between-class variance
-        variance = w0 * w1 * (mu0 - mu1) ** 2
-        variances.append(variance)
-    
-    # Find threshold that maximizes between-class variance
-    optimal_idx = np.argmax(variances)
-    return bin_centers[optimal_idx]
+    return otsu_threshold_hist(grayscale_matrix, nbins=nbins)
 
 
 def parse_xml_annotations(xml_file: str) -> List[Tuple[int, int, int, int, str]]:
@@ -138,13 +109,272 @@ def parse_xml_annotations(xml_file: str) -> List[Tuple[int, int, int, int, str]]
         return []
 
 
-# UPDATE create_hotspot_mask function in hotspot_processor.py
+# ----------------------------------------------------------------------------- mask engine helpers
+
+def _clamp_bbox(bbox: Tuple[int, int, int, int, str], width: int, height: int) -> Tuple[int, int, int, int]:
+    """Clamp a bounding box to the image bounds (always at least 1x1 pixel)."""
+    x_min, y_min, x_max, y_max = bbox[:4]
+    x_min = max(0, min(x_min, width - 1))
+    y_min = max(0, min(y_min, height - 1))
+    x_max = max(x_min + 1, min(x_max, width))
+    y_max = max(y_min + 1, min(y_max, height))
+    return x_min, y_min, x_max, y_max
+
+
+def _label_to_mask_value(label: str) -> int:
+    """Mask value for a box label: 255 abnormal, 128 normal, 64 unknown."""
+    if label.lower() in ['abnormal', 'hotspot', 'positive']:
+        return 255  # White for abnormal (hotspot)
+    elif label.lower() in ['normal', 'negative']:
+        return 128  # Gray for normal
+    return 64       # Dark gray for unknown
+
+
+def _label_to_overlay_color(label: str) -> np.ndarray:
+    """Overlay color for a box label."""
+    if label.lower() in ['abnormal', 'hotspot', 'positive']:
+        return np.array([255, 0, 0])        # Red for abnormal
+    elif label.lower() in ['normal', 'negative']:
+        return np.array([255, 241, 188])    # Light cream for normal
+    return np.array([0, 255, 0])            # Green for unknown
+
+
+def _dilate_cross(binary_mask: np.ndarray) -> np.ndarray:
+    """Binary dilation with ``disk(1)`` (3x3 cross), pixels outside the array count as False."""
+    dilated = binary_mask.copy()
+    dilated[1:, :] |= binary_mask[:-1, :]
+    dilated[:-1, :] |= binary_mask[1:, :]
+    dilated[:, 1:] |= binary_mask[:, :-1]
+    dilated[:, :-1] |= binary_mask[:, 1:]
+    return dilated
+
+
+def _fill_holes_in_box(mask: np.ndarray, mask_value: int,
+                       x_min: int, y_min: int, x_max: int, y_max: int) -> None:
+    """
+    Fill holes inside a box in-place: a pixel takes ``mask_value`` when at least
+    3 of its 4 direct neighbours already have it.
+    
+    The fill is sequential (x outer, y inner) and reads pixels it has already
+    updated. Inside a column the recurrence ``cur[y] = seed[y] | (carry[y] & cur[y-1])``
+    is resolved with a running maximum over "decided" rows. All remaining columns
+    are evaluated at once; since a column only depends on its already final left
+    neighbour, results are exact up to and including the first column that
+    changes, and evaluation restarts right after it.
+    """
+    height, width = mask.shape
+    x_start, x_end = max(1, x_min), min(width - 1, x_max)
+    y_start, y_end = max(1, y_min), min(height - 1, y_max)
+    if x_start >= x_end or y_start >= y_end:
+        return
+    
+    # Match map of the box plus a 1-pixel border (neighbours outside the box count too)
+    match = mask[y_start - 1:y_end + 1, x_start - 1:x_end + 1] == mask_value
+    n_cols = x_end - x_start
+    rows = np.arange(y_end - y_start)[:, None]
+    
+    col = 1
+    while col <= n_cols:
+        column = match[:, col:n_cols + 1]
+        side = match[1:-1, col - 1:n_cols].astype(np.int8)   # (x-1, y)
+        side += match[1:-1, col + 1:n_cols + 2]              # (x+1, y)
+        side += column[2:]                                   # (x, y+1), not processed yet
+        
+        seed = column[1:-1] | (side >= 3)
+        carry = side == 2                                    # filled only if (x, y-1) is filled
+        decided = seed | ~carry
+        
+        last = np.maximum.accumulate(np.where(decided, rows, -1), axis=0)
+        filled = np.take_along_axis(seed, np.maximum(last, 0), axis=0)
+        filled = np.where(last >= 0, filled, column[0])
+        
+        changed = (filled != column[1:-1]).any(axis=0)
+        if not changed.any():
+            break
+        
+        first = int(np.argmax(changed))
+        match[1:-1, col + first] = filled[:, first]
+        col += first + 1
+    
+    mask[y_start:y_end, x_start:x_end][match[1:-1, 1:-1]] = mask_value
+
+
+def build_hotspot_mask(gray_array: np.ndarray,
+                       bounding_boxes: List[Tuple[int, int, int, int, str]]) -> np.ndarray:
+    """
+    Build the Otsu hotspot mask for all bounding boxes from a decoded grayscale frame.
+    
+    Args:
+        gray_array: 2D uint8 grayscale image
+        bounding_boxes: List of bounding boxes with labels
+    
+    Returns:
+        np.ndarray: uint8 mask (255 abnormal, 128 normal, 64 unknown, 0 background)
+    """
+    height, width = gray_array.shape
+    
+    # Initialize mask with black background
+    mask = np.zeros((height, width), dtype=np.uint8)
+    
+    clamped = [_clamp_bbox(bbox, width, height) for bbox in bounding_boxes]
+    
+    # Otsu thresholds of every box in one batched pass (they only depend on the frame)
+    values, offsets = gather_box_values(gray_array, clamped)
+    thresholds = otsu_thresholds_hist(values, offsets, nbins=10)
+    
+    for bbox, (x_min, y_min, x_max, y_max), otsu_thresh in zip(bounding_boxes, clamped, thresholds):
+        # Grayscale matrix for the bounding box (view into the decoded frame)
+        grayscale_matrix = gray_array[y_min:y_max, x_min:x_max]
+        
+        if grayscale_matrix.size == 0:
+            continue
+        
+        # Create binary mask with Otsu threshold and dilate (disk(1)) to fill holes
+        dilated_mask = _dilate_cross(grayscale_matrix > otsu_thresh)
+        
+        mask_value = _label_to_mask_value(bbox[4])
+        
+        # Apply mask to the region
+        mask[y_min:y_max, x_min:x_max][dilated_mask] = mask_value
+        
+        # Fill remaining holes using neighborhood checking
+        _fill_holes_in_box(mask, mask_value, x_min, y_min, x_max, y_max)
+    
+    return mask
+
+
+def colorize_hotspot_mask(mask: np.ndarray) -> np.ndarray:
+    """Map mask values to the pure palette colors (RGB uint8)."""
+    pure_colored_array = np.zeros(mask.shape + (3,), dtype=np.uint8)
+    pure_colored_array[mask == 64] = [255, 241, 188]   # Cream for unknown
+    pure_colored_array[mask == 128] = [255, 241, 188]  # Cream for normal
+    pure_colored_array[mask == 255] = [255, 0, 0]      # Red for hotspot
+    return pure_colored_array
+
 
+def blend_hotspot_overlay(rgb_array: np.ndarray, mask: np.ndarray,
+                          bounding_boxes: List[Tuple[int, int, int, int, str]]) -> np.ndarray:
+    """
+    Blend box colors (50% transparency) onto the RGB frame wherever the mask is set.
+    
+    Boxes are applied in order, so overlapping boxes blend repeatedly exactly
+    like the original per-pixel implementation.
+    """
+    height, width = mask.shape
+    overlayed_array = rgb_array.copy()
+    alpha = 0.5
+    
+    for bbox in bounding_boxes:
+        x_min, y_min, x_max, y_max = _clamp_bbox(bbox, width, height)
+        overlay_color = _label_to_overlay_color(bbox[4])
+        
+        region = overlayed_array[y_min:y_max, x_min:x_max]
+        selected = mask[y_min:y_max, x_min:x_max] > 0
+        region[selected] = (
+            alpha * overlay_color +
+            (1 - alpha) * region[selected]
+        ).astype(np.uint8)
+    
+    return overlayed_array
+
+
+def frame_to_gray_rgb(frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    uint8 grayscale and RGB arrays of a frame, as its PNG rendering would decode.
+    
+    Non-uint8 frames are min-max normalized to 0-255 first; a grayscale frame
+    becomes RGB by repeating the gray channel (what ``convert('RGB')`` does).
+    """
+    if frame.dtype != np.uint8:
+        lo, hi = frame.min(), frame.max()
+        if hi > lo:
+            frame = ((frame - lo) / (hi - lo) * 255).astype(np.uint8)
+        else:
+            frame = np.zeros(frame.shape, dtype=np.uint8)
+    
+    if frame.ndim == 2:
+        return frame, np.repeat(frame[:, :, None], 3, axis=2)
+    
+    image = Image.fromarray(frame)
+    return np.array(image.convert('L')), np.array(image.convert('RGB'))
+
+
+@traced("otsu.hotspot_arrays")
+def compute_hotspot_arrays(frame: np.ndarray,
+                           bounding_boxes: List[Tuple[int, int, int, int, str]]
+                           ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Otsu hotspot mask of a frame, fully in memory (nothing is read or written).
+    
+    Args:
+        frame: 2D frame (any dtype, normalized like the import PNGs) or uint8 RGB image
+        bounding_boxes: Parsed boxes (x_min, y_min, x_max, y_max, label)
+    
+    Returns:
+        Tuple of (mask, blended, pure):
+        - uint8 mask (255 abnormal, 128 normal, 64 unknown, 0 background)
+        - RGB frame with the box colors blended over the hotspots
+        - RGB image with the palette colors only
+    """
+    gray_array, rgb_array = frame_to_gray_rgb(frame)
+    mask = build_hotspot_mask(gray_array, bounding_boxes)
+    return mask, blend_hotspot_overlay(rgb_array, mask, bounding_boxes), colorize_hotspot_mask(mask)
+
+
+def hotspot_output_paths(output_dir: Path, patient_id: str, view: str,
+                         study_date: str = None) -> Dict[str, Path]:
+    """
+    File names of the hotspot outputs of one view.
+    
+    Returns:
+        {"blended": *_ant_hotspot_colored.png, "pure": *_anterior_hotspot_colored.png,
+         "mask": *_ant_hotspot_mask.png}
+    """
+    filename_stem = generate_filename_stem(patient_id, study_date) if study_date else patient_id
+    view_suffix = "ant" if "ant" in view.lower() else "post"
+    view_full = "anterior" if "ant" in view.lower() else "posterior"
+    output_dir = Path(output_dir)
+    return {
+        "blended": output_dir / f"{filename_stem}_{view_suffix}_hotspot_colored.png",
+        "pure": output_dir / f"{filename_stem}_{view_full}_hotspot_colored.png",
+        "mask": output_dir / f"{filename_stem}_{view_suffix}_hotspot_mask.png",
+    }
+
+
+def save_hotspot_outputs(output_dir: Path, patient_id: str, view: str, study_date: str,
+                         mask: np.ndarray, blended: np.ndarray, pure: np.ndarray) -> Dict[str, Path]:
+    """
+    Write the arrays of compute_hotspot_arrays() as the hotspot PNGs of one view.
+    
+    Returns:
+        The written paths (see hotspot_output_paths)
+    """
+    paths = hotspot_output_paths(output_dir, patient_id, view, study_date)
+    paths["blended"].parent.mkdir(exist_ok=True)
+    
+    # ✅ SAVE BLENDED VERSION (original naming)
+    Image.fromarray(blended).save(paths["blended"])
+    print(f"Blended hotspot image saved: {paths['blended']}")
+    
+    # ✅ SAVE PURE VERSION (new naming with full view name)
+    Image.fromarray(pure).save(paths["pure"])
+    print(f"Pure hotspot image saved: {paths['pure']}")
+    
+    # Save mask as well
+    Image.fromarray(mask).save(paths["mask"])
+    print(f"Hotspot mask saved: {paths['mask']}")
+    return paths
+
+
+@traced("otsu.create_hotspot_mask")
 def create_hotspot_mask(image_file: str, bounding_boxes: List[Tuple[int, int, int, int, str]], 
                        patient_id: str, view: str, study_date: str = None, output_dir: str = None) -> Tuple[np.ndarray, Image.Image, Image.Image]:
     """
     Create hotspot mask, overlayed image, and PURE colored image based on Otsu threshold.
     
+    Reads the frame from an image file; frames already in memory should go
+    through compute_hotspot_arrays() (+ save_hotspot_outputs()) instead.
+    
     Args:
         image_file: Path to input image
         bounding_boxes: List of bounding boxes with labels
@@ -159,162 +389,20 @@ def create_hotspot_mask(image_file: str, bounding_boxes: List[Tuple[int, int, in
         - Overlayed image (blended with original)
         - Pure colored image (palette colors only)
     """
+    # Decode the image once; every box works on views of these arrays
     with Image.open(image_file) as img:
-        # Convert to grayscale for mask creation
-        gray_img = img.convert('L')
-        gray_array = np.array(gray_img)
-        
-        # Convert to RGB for overlay
-        rgb_img = img.convert('RGB')
-        rgb_array = np.array(rgb_img)
-        
-        width, height = img.size
-        
-        # Initialize mask with black background
-        mask = np.zeros((height, width), dtype=np.uint8)
-        
-        for bbox in bounding_boxes:
-            x_min, y_min, x_max, y_max, label = bbox
-            
-            # Ensure coordinates are within image bounds
-            x_min = max(0, min(x_min, width - 1))
-            y_min = max(0, min(y_min, height - 1))
-            x_max = max(x_min + 1, min(x_max, width))
-            y_max = max(y_min + 1, min(y_max, height))
-            
-            # Extract grayscale matrix for the bounding box
-            grayscale_matrix = extract_grayscale_matrix(image_file, (x_min, y_min, x_max, y_max))
-            
-            if grayscale_matrix.size == 0:
-                continue
-            
-            # Apply Otsu threshold
-            otsu_thresh = threshold_otsu_impl(grayscale_matrix, nbins=10)
-            
-            # Create binary mask with Otsu threshold
-            binary_mask = grayscale_matrix > otsu_thresh
-            
-            # Dilate mask to fill holes
-            dilated_mask = binary_dilation(binary_mask, disk(1))
-            
-            # Set mask values based on label
-            if label.lower() in ['abnormal', 'hotspot', 'positive']:
-                mask_value = 255  # White for abnormal (hotspot)
-            elif label.lower() in ['normal', 'negative']:
-                mask_value = 128  # Gray for normal
-            else:
-                mask_value = 64   # Dark gray for unknown
-            
-            # Apply mask to the region
-            for x in range(x_min, x_max):
-                for y in range(y_min, y_max):
-                    # Calculate mask position
-                    mask_x = x - x_min
-                    mask_y = y - y_min
-                    
-                    # Set mask value if within dilated mask
-                    if mask_y < dilated_mask.shape[0] and mask_x < dilated_mask.shape[1]:
-                        if dilated_mask[mask_y, mask_x]:
-                            mask[y, x] = mask_value
-            
-            # Fill remaining holes using neighborhood checking
-            for x in range(max(1, x_min), min(width - 1, x_max)):
-                for y in range(max(1, y_min), min(height - 1, y_max)):
-                    # Check various neighborhood patterns
-                    neighbors = [
-                        (x-1, y), (x+1, y), (x, y-1), (x, y+1),
-                        (x-2, y), (x+2, y), (x, y-2), (x, y+2),
-                        (x-3, y), (x+3, y), (x, y-3), (x, y+3)
-                    ]
-                    
-                    # Count matching neighbors
-                    matching_neighbors = 0
-                    for nx, ny in neighbors[:4]:  # Check direct neighbors first
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if mask[ny, nx] == mask_value:
-                                matching_neighbors += 1
-                    
-                    # Fill if surrounded by colored pixels
-                    if matching_neighbors >= 3:
-                        mask[y, x] = mask_value
-        
-        # ✅ NEW: Create PURE colored image (palette colors only)
-        pure_colored_array = np.zeros((height, width, 3), dtype=np.uint8)
-        
-        # Apply pure palette colors
-        pure_colored_array[mask == 0] = [0, 0, 0]          # Black background
-        pure_colored_array[mask == 64] = [255, 241, 188]   # Cream for unknown
-        pure_colored_array[mask == 128] = [255, 241, 188]  # Cream for normal
-        pure_colored_array[mask == 255] = [255, 0, 0]      # Red for hotspot
-        
-        pure_colored_image = Image.fromarray(pure_colored_array)
-        
-        # ✅ Create BLENDED overlayed image (original logic)
-        overlayed_array = rgb_array.copy()
-        
-        # Apply color overlay where mask is non-black
-        for bbox in bounding_boxes:
-            x_min, y_min, x_max, y_max, label = bbox
-            
-            # Ensure coordinates are within image bounds
-            x_min = max(0, min(x_min, width - 1))
-            y_min = max(0, min(y_min, height - 1))
-            x_max = max(x_min + 1, min(x_max, width))
-            y_max = max(y_min + 1, min(y_max, height))
-            
-            # Define overlay color based on label
-            if label.lower() in ['abnormal', 'hotspot', 'positive']:
-                overlay_color = np.array([255, 0, 0])  # Red for abnormal
-            elif label.lower() in ['normal', 'negative']:
-                overlay_color = np.array([255, 241, 188])  # Light cream for normal
-            else:
-                overlay_color = np.array([0, 255, 0])  # Green for unknown
-            
-            # Apply overlay with transparency
-            for y in range(y_min, y_max):
-                for x in range(x_min, x_max):
-                    if mask[y, x] > 0:  # Non-black pixels in mask
-                        # Blend original image with overlay color (50% transparency)
-                        alpha = 0.5
-                        overlayed_array[y, x] = (
-                            alpha * overlay_color + 
-                            (1 - alpha) * overlayed_array[y, x]
-                        ).astype(np.uint8)
-        
-        overlayed_image = Image.fromarray(overlayed_array)
-        
-        # Save both versions if output_dir specified
-        if output_dir:
-            output_path = Path(output_dir)
-            output_path.mkdir(exist_ok=True)
-            
-            # Generate filename stems
-            if study_date:
-                filename_stem = generate_filename_stem(patient_id, study_date)
-            else:
-                filename_stem = patient_id
-            
-            # ✅ SAVE BLENDED VERSION (original naming)
-            view_suffix = "ant" if "ant" in view.lower() else "post"
-            blended_filename = f"{filename_stem}_{view_suffix}_hotspot_colored.png"
-            blended_path = output_path / blended_filename
-            overlayed_image.save(blended_path)
-            print(f"Blended hotspot image saved: {blended_path}")
-            
-            # ✅ SAVE PURE VERSION (new naming with full view name)
-            view_full = "anterior" if "ant" in view.lower() else "posterior"
-            pure_filename = f"{filename_stem}_{view_full}_hotspot_colored.png"
-            pure_path = output_path / pure_filename
-            pure_colored_image.save(pure_path)
-            print(f"Pure hotspot image saved: {pure_path}")
-            
-            # Save mask as well
-            mask_filename = f"{filename_stem}_{view_suffix}_hotspot_mask.png"
-            mask_path = output_path / mask_filename
-            Image.fromarray(mask).save(mask_path)
-            print(f"Hotspot mask saved: {mask_path}")
-        
-        return mask, overlayed_image, pure_colored_image
+        gray_array = np.array(img.convert('L'))
+        rgb_array = np.array(img.convert('RGB'))
+    
+    mask = build_hotspot_mask(gray_array, bounding_boxes)
+    blended = blend_hotspot_overlay(rgb_array, mask, bounding_boxes)
+    pure = colorize_hotspot_mask(mask)
+    
+    # Save both versions if output_dir specified
+    if output_dir:
+        save_hotspot_outputs(Path(output_dir), patient_id, view, study_date, mask, blended, pure)
+    
+    return mask, Image.fromarray(blended), Image.fromarray(pure)
 
 def color_pixels_within_bounding_boxes(image_file: str, bounding_boxes: List[Tuple[int, int, int, int, str]], 
                                      output_file: str = None, colormap: str = 'jet') -> Image.Image:
@@ -427,8 +515,8 @@ class HotspotProcessor:
     """
     
     def __init__(self, temp_dir: str = "data/tmp/hotspot_temp"):
+        # Frames are processed in memory; temp_dir is only swept by cleanup()
         self.temp_dir = Path(temp_dir)
-        self.temp_dir.mkdir(exist_ok=True)
     
     def _extract_patient_and_study_info(self, image_path: str, patient_id: str = None) -> Tuple[str, str]:
         """
@@ -522,7 +610,7 @@ class HotspotProcessor:
         
         # Process image with bounding boxes using new method
         try:
-            mask, overlayed_image = create_hotspot_mask(
+            mask, overlayed_image, _ = create_hotspot_mask(
                 image_path, 
                 bounding_boxes,
                 final_patient_id,
@@ -537,12 +625,14 @@ class HotspotProcessor:
             print(f"Error processing image {image_path}: {e}")
             return None
     
-    # UPDATE process_frame_with_xml method in hotspot_processor.py
-
-    def process_frame_with_xml(self, frame: np.ndarray, xml_path: str, patient_id: str, view: str, study_date=None) -> Optional[np.ndarray]:
+    def process_frame_with_xml(self, frame: np.ndarray, xml_path: str, patient_id: str, view: str,
+                               study_date=None, save: bool = True) -> Optional[np.ndarray]:
         """
         Process a numpy frame with XML annotations (for multiprocessing).
-        FIXED: Handle dual output and save both versions
+        
+        The frame is processed in memory (see compute_hotspot_arrays), so
+        concurrent jobs never share files; only the outputs are written, and
+        only when ``save`` is set.
         
         Args:
             frame: Input frame as numpy array
@@ -550,6 +640,7 @@ class HotspotProcessor:
             patient_id: Patient ID
             view: View type (ant/post)
             study_date: Study date in YYYYMMDD format
+            save: Write the hotspot PNGs next to the XML
             
         Returns:
             np.ndarray or None: Processed frame with hotspots (blended version for compatibility)
@@ -563,38 +654,20 @@ class HotspotProcessor:
             if not bounding_boxes:
                 return None
             
-            # Convert frame to PIL Image temporarily
-            if frame.dtype != np.uint8:
-                # Normalize to 0-255 range
-                frame_norm = ((frame - frame.min()) / (frame.max() - frame.min()) * 255).astype(np.uint8)
-            else:
-                frame_norm = frame
-            
-            temp_image = Image.fromarray(frame_norm)
-            temp_path = self.temp_dir / f"temp_{patient_id}_{view}.png"
-            temp_image.save(temp_path)
-            
-            # ✅ FIX: Use provided study_date instead of extracting
+            # The XML sits next to the study's DICOM
             if study_date is None:
-                _, study_date = self._extract_patient_and_study_info(str(temp_path), patient_id)
+                _, study_date = self._extract_patient_and_study_info(str(xml_path), patient_id)
             
             print(f"[DEBUG] Processing frame with study_date: {study_date}")
             
-            # ✅ FIX: Process with create_hotspot_mask - now returns 3 values
-            mask, overlayed_image, pure_colored_image = create_hotspot_mask(
-                str(temp_path),
-                bounding_boxes,
-                patient_id,
-                view,
-                study_date,
-                output_dir=str(Path(xml_path).parent)  # Save to same directory as XML
-            )
+            mask, blended, pure = compute_hotspot_arrays(frame, bounding_boxes)
             
-            # Clean up temp file
-            temp_path.unlink(missing_ok=True)
+            if save:
+                save_hotspot_outputs(Path(xml_path).parent, patient_id, view, study_date,
+                                     mask, blended, pure)
             
             # ✅ Return blended version for compatibility (overlayed_image)
-            return np.array(overlayed_image)
+            return blended
             
         except Exception as e:
             print(f"Error processing frame with XML {xml_path}: {e}")
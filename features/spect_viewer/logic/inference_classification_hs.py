@@ -11,6 +11,8 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 from xgboost import XGBClassifier
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.image as mpimg
@@ -21,6 +23,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from core.config.paths import CLASSIFICATION_XGBOOST_MODEL, CLASSIFICATION_SCALER_MODEL
+from core.tracing import span, traced
 
 # ✅ FIXED: Use correct path from config
 MODEL_PATH = str(CLASSIFICATION_XGBOOST_MODEL)
@@ -100,14 +103,61 @@ EXPECTED_COLLUMNS = [
     'segment_thoracic vertebrae'
 ]
 
-try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-except:
-    raise Exception("Model/scaler belum ada")
+def load_classification_models():
+    """
+    Lazy-load + cache the XGBoost model and scaler.
+    Reloaded only when MODEL_PATH / SCALER_PATH change.
+    
+    Returns:
+        Tuple of (model, scaler)
+    """
+    if not hasattr(load_classification_models, "_cache"):
+        load_classification_models._cache = {}
+    cache = load_classification_models._cache
 
-extractor = featureextractor.RadiomicsFeatureExtractor()
-extractor.enableAllFeatures()
+    key = (MODEL_PATH, SCALER_PATH)
+    if key not in cache:
+        try:
+            loaded = (joblib.load(MODEL_PATH), joblib.load(SCALER_PATH))
+        except Exception:
+            raise Exception("Model/scaler belum ada")
+        cache.clear()
+        cache[key] = loaded
+        print(f"[INFO] Classification model and scaler loaded")
+    return cache[key]
+
+# Radiomics tasks run in a process pool when a study has enough boxes
+FEATURE_WORKERS = int(os.getenv("CLASSIFICATION_FEATURE_WORKERS", max(1, min(4, (os.cpu_count() or 1) - 1))))
+MIN_TASKS_FOR_POOL = 4
+
+def _enabled_features_from_columns(columns):
+    """
+    Map model columns to {feature_class: [feature_names]} for the radiomics extractor.
+    'region_features_' and 'ratio_' columns need the same original feature.
+    """
+    enabled = {}
+    for column in columns:
+        name = column
+        for prefix in ("region_features_", "ratio_"):
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+                break
+        if not name.startswith("original_"):
+            continue
+        _, feature_class, feature_name = name.split("_", 2)
+        feature_names = enabled.setdefault(feature_class, [])
+        if feature_name not in feature_names:
+            feature_names.append(feature_name)
+    return enabled
+
+def get_extractor():
+    """Lazy-create + cache the radiomics extractor (only the features the XGBoost model uses)"""
+    if getattr(get_extractor, "_extractor", None) is None:
+        extractor = featureextractor.RadiomicsFeatureExtractor()
+        extractor.disableAllFeatures()
+        extractor.enableFeaturesByName(**_enabled_features_from_columns(EXPECTED_COLLUMNS))
+        get_extractor._extractor = extractor
+    return get_extractor._extractor
 
 def region_to_key_value(image_region_path):
     """
@@ -199,34 +249,43 @@ def loadBoundingBox2List(list_bb):
     return list_bb
 
 def findCoordinate(xmin, ymin, xmax, ymax, image_hotspot):
-    """Find coordinates of non-zero pixels in bounding box"""
-    arrCoor = []
+    """
+    Find coordinates of non-zero pixels in bounding box
+    
+    Returns:
+        int32 array of shape (N, 2) with [y, x] rows, ordered column by column (x, then y)
+    """
     height, width = image_hotspot.shape[:2]
-    for x in range(xmin, min(xmax, width)):
-        for y in range(ymin, min(ymax, height)):
-            if image_hotspot[y][x] != 0:
-                arrCoor.append([y, x])
-    return arrCoor
+    xmin, ymin = max(0, xmin), max(0, ymin)
+    box = image_hotspot[ymin:min(ymax, height), xmin:min(xmax, width)]
+    # Transposed nonzero keeps the x-outer / y-inner order of the original scan
+    xs, ys = np.nonzero(box.T)
+    return np.column_stack((ys + ymin, xs + xmin)).astype(np.int32)
+
+def _valid_coordinates(arrCoor, shape):
+    """Coordinates as (N, 2) int array, restricted to pixels inside an image of the given shape"""
+    coords = np.asarray(arrCoor, dtype=np.int64).reshape(-1, 2)
+    inside = (
+        (coords[:, 0] >= 0) & (coords[:, 0] < shape[0]) &
+        (coords[:, 1] >= 0) & (coords[:, 1] < shape[1])
+    )
+    return coords[inside]
 
 def findSegment(arrCoor, image_segment):
     """Find the most common segment ID in the coordinate array"""
-    segmentIDArr = []
-    height, width = image_segment.shape
-    for y, x in arrCoor:
-        if 0 <= y < height and 0 <= x < width:
-            segmentIDArr.append(image_segment[y][x])
-    if not segmentIDArr:
+    coords = _valid_coordinates(arrCoor, image_segment.shape)
+    if len(coords) == 0:
         return 0
-    values, counts = np.unique(segmentIDArr, return_counts=True)
-    return values[np.argmax(counts)]
+    counts = np.bincount(image_segment[coords[:, 0], coords[:, 1]].ravel())
+    # argmax picks the lowest ID on ties, same as np.unique + argmax
+    return int(np.argmax(counts))
 
 def cropSegmentSpot(arrCoor, image_hotspot):
     """Crop hotspot image to show only specified coordinates"""
     image_hotspot_new = np.zeros_like(image_hotspot)
-    height, width = image_hotspot.shape[:2]
-    for y, x in arrCoor:
-        if 0 <= y < height and 0 <= x < width:
-            image_hotspot_new[y][x] = image_hotspot[y][x]
+    coords = _valid_coordinates(arrCoor, image_hotspot.shape[:2])
+    ys, xs = coords[:, 0], coords[:, 1]
+    image_hotspot_new[ys, xs] = image_hotspot[ys, xs]
     return image_hotspot_new
 
 def cropOnlySegment(segmentID, img_segment, img_raw):
@@ -263,117 +322,220 @@ def create_hotspot_mask(image_shape, results):
         else:
             pixel_value = 2  # Index 2 in _HOTSPOT_PALLETTE = [255, 241, 188] (Light cream)
         
-        coordinates = result.get('coordinates', [])
+        coordinates = _valid_coordinates(result.get('coordinates', []), mask.shape)
         print(f"[DEBUG] Result {i}: {result['prediction']}, {len(coordinates)} coordinates, pixel_value={pixel_value}")
         
-        for coord in coordinates:
-            if len(coord) >= 2:
-                y, x = coord[0], coord[1]  # coordinates are [y, x]
-                if 0 <= y < mask.shape[0] and 0 <= x < mask.shape[1]:
-                    mask[y, x] = pixel_value
+        # coordinates are [y, x]
+        mask[coordinates[:, 0], coordinates[:, 1]] = pixel_value
         
         print(f"[DEBUG] After processing result {i}, mask has {np.sum(mask > 0)} non-zero pixels")
     
     print(f"[DEBUG] Final mask stats: shape={mask.shape}, unique_values={np.unique(mask)}, non_zero_count={np.sum(mask > 0)}")
     return mask
 
-def extractFeatures(image_raw, image_segment, image_hotspot, bb, file_path):
-    """Extract features with FIXED EXACT segment mapping"""
-    coordinate = findCoordinate(bb["xmin"], bb["ymin"], bb["xmax"], bb["ymax"], image_hotspot)
-    if not coordinate:
-        return None
+def _flatten_features(all_features, prefix=""):
+    """Drop diagnostics entries and cast feature values to float"""
+    return {
+        f"{prefix}{key}": float(value) for key, value in all_features.items()
+        if not key.startswith('diagnostics_')
+    }
 
-    segmentID = findSegment(coordinate, image_segment)
-    
-    # ✅ FIXED: Use exact segment mapping
-    segment_name = get_exact_segment_name(segmentID)
+def _execute_radiomics(gray_image, mask):
+    """
+    Run the radiomics extractor on one image/mask pair.
+    Top-level so it can be dispatched to the feature process pool.
     
-    print(f"[SEGMENT MAPPING] ID {segmentID} → {segment_name}")
-
-    if segmentID == 0:
-        return None
-
-    hotspot = cropSegmentSpot(coordinate, image_hotspot)
-    segment = cropOnlySegment(segmentID, image_segment, image_raw)
-
-    gray_hotspot = to_gray(segment).astype(np.int16)
-    mask_hotspot = (to_gray(hotspot) > 0).astype(np.uint8)
-    mask_hotspot[mask_hotspot > 0] = 1
-
-    area_hotspot_pixel = int(np.sum(mask_hotspot))
-    area_hotspot_mm2 = area_hotspot_pixel * PIXEL_SPACING_X * PIXEL_SPACING_Y
+    Returns:
+        Tuple of (flattened_features, error_message)
+    """
+    try:
+        all_features = get_extractor().execute(sitk.GetImageFromArray(gray_image), sitk.GetImageFromArray(mask))
+        return _flatten_features(all_features), None
+    except Exception as e:
+        return None, str(e)
 
-    if np.sum(mask_hotspot) == 0:
+def _get_feature_pool():
+    """Lazily created, reused process pool for radiomics tasks (None if disabled)"""
+    if FEATURE_WORKERS <= 1:
         return None
+    if getattr(_get_feature_pool, "_pool", None) is None:
+        _get_feature_pool._pool = ProcessPoolExecutor(max_workers=FEATURE_WORKERS)
+    return _get_feature_pool._pool
+
+def _shutdown_feature_pool():
+    """Drop the feature pool (e.g. after it broke) so the next call can recreate it"""
+    pool = getattr(_get_feature_pool, "_pool", None)
+    _get_feature_pool._pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _run_radiomics_tasks(tasks):
+    """
+    Run independent (gray_image, mask) radiomics tasks, in the process pool when
+    there are enough of them, sequentially otherwise (or if the pool is unusable).
+    
+    Returns:
+        List of (flattened_features, error_message) in task order
+    """
+    pool = _get_feature_pool() if len(tasks) >= MIN_TASKS_FOR_POOL else None
+    if pool is not None:
+        try:
+            futures = [pool.submit(_execute_radiomics, gray_image, mask) for gray_image, mask in tasks]
+            return [future.result() for future in futures]
+        except Exception as e:
+            print(f"[WARN] Feature process pool unavailable, running sequentially: {e}")
+            _shutdown_feature_pool()
+    return [_execute_radiomics(gray_image, mask) for gray_image, mask in tasks]
 
-    image_sitk_hotspot = sitk.GetImageFromArray(gray_hotspot)
-    mask_sitk_hotspot = sitk.GetImageFromArray(mask_hotspot)
+def extract_features_batch(image_raw, image_segment, image_hotspot, list_bb, file_path, timings=None):
+    """
+    Extract features for all bounding boxes of one image.
+    
+    Region (whole bone segment) features only depend on the segment ID, so they are
+    computed once per segment and shared by every hotspot lying on that segment.
+    Hotspot and region extractions are independent and run as one batch of tasks.
+    
+    Args:
+        image_raw: Original grayscale image
+        image_segment: Segmentation image with segment IDs (0-12)
+        image_hotspot: Hotspot mask image
+        list_bb: List of bounding box dicts (xmin, ymin, xmax, ymax, label)
+        file_path: Source path, used in log messages
+        timings: Optional dict that receives per-stage durations in seconds
+        
+    Returns:
+        List of feature dicts in bounding box order (failed boxes are skipped)
+    """
+    if timings is None:
+        timings = {}
+    
+    # Stage 1: coordinates, segment lookup and hotspot masks per box
+    t_start = time.perf_counter()
+    boxes = []
+    gray_segments = {}
+    for bb in list_bb:
+        coordinate = findCoordinate(bb["xmin"], bb["ymin"], bb["xmax"], bb["ymax"], image_hotspot)
+        if len(coordinate) == 0:
+            continue
 
-    try:
-        all_features_hotspot = extractor.execute(image_sitk_hotspot, mask_sitk_hotspot)
-    except Exception as e:
-        print(f"Feature extraction failed for {file_path} (hotspot): {str(e)}")
-        return None
+        segmentID = findSegment(coordinate, image_segment)
+        
+        # ✅ FIXED: Use exact segment mapping
+        segment_name = get_exact_segment_name(segmentID)
+        
+        print(f"[SEGMENT MAPPING] ID {segmentID} → {segment_name}")
 
-    flattened_hotspot_features = {
-        key: float(value) for key, value in all_features_hotspot.items()
-        if not key.startswith('diagnostics_')
-    }
+        if segmentID == 0:
+            continue
 
-    gray_segment = to_gray(segment).astype(np.int16)
-    mask_segment = (image_segment == segmentID).astype(np.uint8)
-    area_segment_pixel = int(np.sum(mask_segment))
-    area_segment_mm2 = area_segment_pixel * PIXEL_SPACING_X * PIXEL_SPACING_Y
+        # Segment image only depends on the segment ID - build it once
+        if segmentID not in gray_segments:
+            segment = cropOnlySegment(segmentID, image_segment, image_raw)
+            gray_segments[segmentID] = to_gray(segment).astype(np.int16)
 
-    if np.sum(mask_segment) == 0:
-        return None
+        hotspot = cropSegmentSpot(coordinate, image_hotspot)
+        mask_hotspot = (to_gray(hotspot) > 0).astype(np.uint8)
 
-    image_sitk_segment = sitk.GetImageFromArray(gray_segment)
-    mask_sitk_segment = sitk.GetImageFromArray(mask_segment)
+        area_hotspot_pixel = int(np.sum(mask_hotspot))
+        if area_hotspot_pixel == 0:
+            continue
 
-    try:
-        all_features_segment = extractor.execute(image_sitk_segment, mask_sitk_segment)
-    except Exception as e:
-        print(f"Feature extraction failed for {file_path} (segment): {str(e)}")
-        return None
+        boxes.append({
+            "bb": bb,
+            "coordinate": coordinate,
+            "segment_id": segmentID,
+            "segment_name": segment_name,
+            "mask_hotspot": mask_hotspot,
+            "area_hotspot_pixel": area_hotspot_pixel,
+        })
+    timings["boxes"] = time.perf_counter() - t_start
+    
+    if not boxes:
+        timings["radiomics"] = 0.0
+        return []
+    
+    # Stage 2: radiomics - one region task per unique segment, one hotspot task per box
+    t_start = time.perf_counter()
+    segment_ids = sorted({box["segment_id"] for box in boxes})
+    segment_masks = {sid: (image_segment == sid).astype(np.uint8) for sid in segment_ids}
+    
+    tasks = [(gray_segments[sid], segment_masks[sid]) for sid in segment_ids]
+    tasks += [(gray_segments[box["segment_id"]], box["mask_hotspot"]) for box in boxes]
+    outputs = _run_radiomics_tasks(tasks)
+    
+    region_results = dict(zip(segment_ids, outputs[:len(segment_ids)]))
+    hotspot_results = outputs[len(segment_ids):]
+    timings["radiomics"] = time.perf_counter() - t_start
+    timings["radiomics_tasks"] = len(tasks)
+    timings["region_segments"] = len(segment_ids)
+    
+    # Stage 3: assemble feature rows
+    list_features = []
+    for box, (flattened_hotspot_features, hotspot_error) in zip(boxes, hotspot_results):
+        bb = box["bb"]
+        segmentID = box["segment_id"]
+        
+        if flattened_hotspot_features is None:
+            print(f"Feature extraction failed for {file_path} (hotspot): {hotspot_error}")
+            continue
 
-    flattened_segment_features = {
-        f"region_features_{key}": float(value) for key, value in all_features_segment.items()
-        if not key.startswith('diagnostics_')
-    }
+        region_features, region_error = region_results[segmentID]
+        if region_features is None:
+            print(f"Feature extraction failed for {file_path} (segment): {region_error}")
+            continue
 
-    ratio_features = {}
-    for key in flattened_hotspot_features:
-        region_key = f"region_features_{key}"
-        if region_key in flattened_segment_features:
-            region_value = flattened_segment_features[region_key]
-            hotspot_value = flattened_hotspot_features[key]
-            if isinstance(region_value, (int, float)) and region_value != 0:
-                ratio = hotspot_value / region_value
-            else:
-                ratio = float('nan')
-            ratio_features[f"ratio_{key}"] = ratio
-
-    features = {
-        "label": bb["label"],
-        "xmin": bb["xmin"],
-        "ymin": bb["ymin"],
-        "xmax": bb["xmax"],
-        "ymax": bb["ymax"],
-        "segment": segment_name,
-        "area_hotspot_pixel": area_hotspot_pixel,
-        "area_hotspot_mm2": area_hotspot_mm2,
-        "area_segment_pixel": area_segment_pixel,
-        "area_segment_mm2": area_segment_mm2,
-        "ratio_area_pixel": area_hotspot_pixel / area_segment_pixel if area_segment_pixel != 0 else float('nan'),
-        "ratio_area_mm2": area_hotspot_mm2 / area_segment_mm2 if area_segment_mm2 != 0 else float('nan'),
-        "coordinates": coordinate,
-        **flattened_hotspot_features,
-        **flattened_segment_features,
-        **ratio_features
-    }
+        flattened_segment_features = {f"region_features_{key}": value for key, value in region_features.items()}
+
+        area_hotspot_pixel = box["area_hotspot_pixel"]
+        area_hotspot_mm2 = area_hotspot_pixel * PIXEL_SPACING_X * PIXEL_SPACING_Y
+        area_segment_pixel = int(np.sum(segment_masks[segmentID]))
+        area_segment_mm2 = area_segment_pixel * PIXEL_SPACING_X * PIXEL_SPACING_Y
+
+        ratio_features = {}
+        for key in flattened_hotspot_features:
+            region_key = f"region_features_{key}"
+            if region_key in flattened_segment_features:
+                region_value = flattened_segment_features[region_key]
+                hotspot_value = flattened_hotspot_features[key]
+                if isinstance(region_value, (int, float)) and region_value != 0:
+                    ratio = hotspot_value / region_value
+                else:
+                    ratio = float('nan')
+                ratio_features[f"ratio_{key}"] = ratio
+
+        list_features.append({
+            "label": bb["label"],
+            "xmin": bb["xmin"],
+            "ymin": bb["ymin"],
+            "xmax": bb["xmax"],
+            "ymax": bb["ymax"],
+            "segment": box["segment_name"],
+            "area_hotspot_pixel": area_hotspot_pixel,
+            "area_hotspot_mm2": area_hotspot_mm2,
+            "area_segment_pixel": area_segment_pixel,
+            "area_segment_mm2": area_segment_mm2,
+            "ratio_area_pixel": area_hotspot_pixel / area_segment_pixel if area_segment_pixel != 0 else float('nan'),
+            "ratio_area_mm2": area_hotspot_mm2 / area_segment_mm2 if area_segment_mm2 != 0 else float('nan'),
+            "coordinates": box["coordinate"],
+            **flattened_hotspot_features,
+            **flattened_segment_features,
+            **ratio_features
+        })
+
+    return list_features
+
+def _print_stage_timings(timings):
+    """Print per-stage durations collected during inference_classification"""
+    stages = [f"{name}={timings[name] * 1000:.1f}ms"
+              for name in ("load", "boxes", "radiomics", "predict", "total") if name in timings]
+    print(f"[TIMING] {' '.join(stages)} "
+          f"(radiomics tasks={timings.get('radiomics_tasks', 0)}, "
+          f"region segments={timings.get('region_segments', 0)}, workers={FEATURE_WORKERS})")
 
-    return features
+def extractFeatures(image_raw, image_segment, image_hotspot, bb, file_path):
+    """Extract features for a single bounding box (see extract_features_batch)"""
+    list_features = extract_features_batch(image_raw, image_segment, image_hotspot, [bb], file_path)
+    return list_features[0] if list_features else None
 
 def predict_features(features_list):
     """Predict features"""
@@ -385,6 +547,8 @@ def predict_features(features_list):
 
     df = df.reindex(columns=[c for c in EXPECTED_COLLUMNS if c != "label"], fill_value=0)
 
+    model, scaler = load_classification_models()
+
     X_scaled = scaler.transform(df)
     preds = model.predict(X_scaled)
     probs = model.predict_proba(X_scaled)  # shape: (n_samples, 2)
@@ -397,253 +561,8 @@ def predict_features(features_list):
         )
     return features_list
 
-def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
-    """
-    Main inference function - FIXED with automatic colored-to-grayscale conversion
-    
-    Args:
-        path_raw: Path to original PNG file
-        path_segment: Path to segmentation file (colored or grayscale)
-        path_hotspot: Path to hotspot mask
-        path_xml: List of bounding boxes or XML path
-        
-    Returns:
-        Tuple of (results_list, classification_mask)
-    """
-    print(f"[INFERENCE DEBUG] Starting inference with automatic conversion")
-    print(f"[INFERENCE DEBUG] Input paths:")
-    print(f"  Raw: {path_raw}")
-    print(f"  Segment: {path_segment}")
-    print(f"  Hotspot: {path_hotspot}")
-    print(f"  XML: {len(path_xml) if isinstance(path_xml, list) else path_xml}")
-    
-    # ✅ STEP 1: Convert colored segmentation to grayscale if needed
-    converted_segment_path = convert_colored_segmentation_if_needed(path_segment)
-    print(f"[INFERENCE DEBUG] Using segmentation: {Path(converted_segment_path).name}")
-    
-    # ✅ STEP 2: Load images using OpenCV (same as backup)
-    image_raw = cv2.imread(path_raw, cv2.IMREAD_GRAYSCALE)
-    image_segment = cv2.imread(converted_segment_path, cv2.IMREAD_GRAYSCALE)
-    
-    # Handle both array and path inputs for hotspot
-    if isinstance(path_hotspot, np.ndarray):
-        image_hotspot = np.squeeze(path_hotspot)
-    else:
-        image_hotspot = cv2.imread(str(path_hotspot), cv2.IMREAD_GRAYSCALE)
-    
-    # Ensure all images are 2D
-    image_raw = np.squeeze(image_raw)
-    image_segment = np.squeeze(image_segment)
-    image_hotspot = np.squeeze(image_hotspot)
-    
-    print(f"[INFERENCE DEBUG] Images loaded:")
-    print(f"  Raw: {image_raw.shape if image_raw is not None else 'Failed'}")
-    print(f"  Segment: {image_segment.shape if image_segment is not None else 'Failed'}")
-    print(f"  Hotspot: {image_hotspot.shape if image_hotspot is not None else 'Failed'}")
-    
-    if image_raw is None or image_segment is None or image_hotspot is None:
-        print(f"[INFERENCE ERROR] Failed to load one or more images")
-        return [], None
-    
-    # Process bounding boxes
-    list_bb = loadBoundingBox2List(path_xml)
-    print(f"[INFERENCE DEBUG] Loaded {len(list_bb)} bounding boxes")
 
-    # Extract features (same processing as backup)
-    list_features = []
-    for i, bb in enumerate(list_bb):
-        print(f"[INFERENCE DEBUG] Processing bbox {i}: {bb}")
-        feature = extractFeatures(image_raw, image_segment, image_hotspot, bb, path_raw)
-        if feature is None:
-            print(f"[INFERENCE DEBUG] Feature extraction failed for bbox {i}")
-            continue
-        list_features.append(feature)
-        print(f"[INFERENCE DEBUG] Feature extracted for bbox {i}: segment={feature.get('segment')}")
-
-    if not list_features:
-        print(f"[INFERENCE DEBUG] No valid features extracted")
-        return [], None
-
-    print(f"[INFERENCE DEBUG] Extracted {len(list_features)} valid features")
-
-    # Predict (same as backup)
-    try:
-        results = predict_features(list_features)
-        print(f"[INFERENCE DEBUG] Prediction completed: {len(results)} results")
-    except Exception as e:
-        print(f"[INFERENCE ERROR] Prediction failed: {e}")
-        return [], None
-    
-    # Format output (same as backup)
-    output_list = []
-    for result in results:
-        output_dict = {
-            'bounding_box': {
-                'xmin': result['xmin'],
-                'ymin': result['ymin'],
-                'xmax': result['xmax'],
-                'ymax': result['ymax'],
-            },
-            'coordinates': [list(coord) for coord in result['coordinates']],
-            'segment': result['segment'],
-            'prediction': result['prediction'],
-            'probability_abnormal': float(result['probability_abnormal']),
-            'probability_normal': float(result['probability_normal']),
-            'area_measurements': {
-                'hotspot_pixels': result['area_hotspot_pixel'],
-                'hotspot_mm2': result['area_hotspot_mm2'],
-                'segment_pixels': result['area_segment_pixel'],
-                'segment_mm2': result['area_segment_mm2'],
-                'ratio_pixels': result['ratio_area_pixel'],
-                'ratio_mm2': result['ratio_area_mm2']
-            },
-            'raw_features': {k: v for k, v in result.items()
-                            if k not in ['xmin', 'ymin', 'xmax', 'ymax',
-                                        'segment', 'label', 'prediction',
-                                        'probability_abnormal', 'probability_normal',
-                                        'area_hotspot_pixel', 'area_hotspot_mm2',
-                                        'area_segment_pixel', 'area_segment_mm2',
-                                        'ratio_area_pixel', 'ratio_area_mm2',
-                                        'coordinates']}
-        }
-        output_list.append(output_dict)
-        
-    print(f"[INFERENCE DEBUG] Final output: {len(output_list)} classifications")
-    
-    # ✅ Create output mask with RGB format (will be converted to BGR in save function)
-    if output_list:
-        hotspot_mask_gray = create_hotspot_mask(image_raw.shape, output_list)
-        
-        # Create RGB mask (BGR conversion will happen in save function)
-        h, w = hotspot_mask_gray.shape
-        hotspot_mask = np.zeros((h, w, 3), dtype=np.uint8)
-        
-        print(f"[INFERENCE DEBUG] Creating RGB mask for BGR conversion in save")
-        
-        # Apply RGB colors (will be converted to BGR when saving)
-        hotspot_mask[hotspot_mask_gray == 0] = [0, 0, 0]        # Black background
-        hotspot_mask[hotspot_mask_gray == 1] = [255, 0, 0]      # Red for Abnormal
-        hotspot_mask[hotspot_mask_gray == 2] = [255, 241, 188]  # Cream for Normal
-        
-        print(f"[INFERENCE DEBUG] RGB mask created - will be converted to BGR in save function")
-        
-    else:
-        hotspot_mask = np.zeros((image_raw.shape[0], image_raw.shape[1], 3), dtype=np.uint8)
-        print(f"[INFERENCE DEBUG] Created empty mask - no results")
-    
-    return output_list, hotspot_mask
-    """
-    Main inference function - FIXED with automatic colored-to-grayscale conversion
-    
-    Args:
-        path_raw: Path to original PNG file
-        path_segment: Path to segmentation file (colored or grayscale)
-        path_hotspot: Path to hotspot mask
-        path_xml: List of bounding boxes or XML path
-        
-    Returns:
-        Tuple of (results_list, classification_mask)
-    """
-    print(f"[INFERENCE DEBUG] Starting inference with automatic conversion")
-    print(f"[INFERENCE DEBUG] Input paths:")
-    print(f"  Raw: {path_raw}")
-    print(f"  Segment: {path_segment}")
-    print(f"  Hotspot: {path_hotspot}")
-    print(f"  XML: {len(path_xml) if isinstance(path_xml, list) else path_xml}")
-    
-    # ✅ STEP 1: Convert colored segmentation to grayscale if needed
-    converted_segment_path = convert_colored_segmentation_if_needed(path_segment)
-    print(f"[INFERENCE DEBUG] Using segmentation: {Path(converted_segment_path).name}")
-    
-    # ✅ STEP 2: Load images using OpenCV (same as backup)
-    image_raw = cv2.imread(path_raw, cv2.IMREAD_GRAYSCALE)
-    image_segment = cv2.imread(converted_segment_path, cv2.IMREAD_GRAYSCALE)
-    
-    # Handle both array and path inputs for hotspot
-    if isinstance(path_hotspot, np.ndarray):
-        image_hotspot = np.squeeze(path_hotspot)
-    else:
-        image_hotspot = cv2.imread(str(path_hotspot), cv2.IMREAD_GRAYSCALE)
-    
-    # Ensure all images are 2D
-    image_raw = np.squeeze(image_raw)
-    image_segment = np.squeeze(image_segment)
-    image_hotspot = np.squeeze(image_hotspot)
-    
-    print(f"[INFERENCE DEBUG] Images loaded:")
-    print(f"  Raw: {image_raw.shape if image_raw is not None else 'Failed'}")
-    print(f"  Segment: {image_segment.shape if image_segment is not None else 'Failed'}")
-    print(f"  Hotspot: {image_hotspot.shape if image_hotspot is not None else 'Failed'}")
-    
-    if image_raw is None or image_segment is None or image_hotspot is None:
-        print(f"[INFERENCE ERROR] Failed to load one or more images")
-        return [], None
-    
-    # Process bounding boxes
-    list_bb = loadBoundingBox2List(path_xml)
-    print(f"[INFERENCE DEBUG] Loaded {len(list_bb)} bounding boxes")
-
-    # Extract features (same processing as backup)
-    list_features = []
-    for i, bb in enumerate(list_bb):
-        print(f"[INFERENCE DEBUG] Processing bbox {i}: {bb}")
-        feature = extractFeatures(image_raw, image_segment, image_hotspot, bb, path_raw)
-        if feature is None:
-            print(f"[INFERENCE DEBUG] Feature extraction failed for bbox {i}")
-            continue
-        list_features.append(feature)
-        print(f"[INFERENCE DEBUG] Feature extracted for bbox {i}: segment={feature.get('segment')}")
-
-    if not list_features:
-        print(f"[INFERENCE DEBUG] No valid features extracted")
-        return [], None
-
-    print(f"[INFERENCE DEBUG] Extracted {len(list_features)} valid features")
-
-    # Predict (same as backup)
-    try:
-        results = predict_features(list_features)
-        print(f"[INFERENCE DEBUG] Prediction completed: {len(results)} results")
-    except Exception as e:
-        print(f"[INFERENCE ERROR] Prediction failed: {e}")
-        return [], None
-    
-    # Format output (same as backup)
-    output_list = []
-    for result in results:
-        output_dict = {
-            'bounding_box': {
-                'xmin': result['xmin'],
-                'ymin': result['ymin'],
-                'xmax': result['xmax'],
-                'ymax': result['ymax'],
-            },
-            'coordinates': [list(coord) for coord in result['coordinates']],
-            'segment': result['segment'],
-            'prediction': result['prediction'],
-            'probability_abnormal': float(result['probability_abnormal']),
-            'probability_normal': float(result['probability_normal']),
-            'area_measurements': {
-                'hotspot_pixels': result['area_hotspot_pixel'],
-                'hotspot_mm2': result['area_hotspot_mm2'],
-                'segment_pixels': result['area_segment_pixel'],
-                'segment_mm2': result['area_segment_mm2'],
-                'ratio_pixels': result['ratio_area_pixel'],
-                'ratio_mm2': result['ratio_area_mm2']
-            },
-            'raw_features': {k: v for k, v in result.items()
-                            if k not in ['xmin', 'ymin', 'xmax', 'ymax',
-                                        'segment', 'label', 'prediction',
-                                        'probability_abnormal', 'probability_normal',
-                                        'area_hotspot_pixel', 'area_hotspot_mm2',
-                                        'area_segment_pixel', 'area_segment_mm2',
-                                        'ratio_area_pixel', 'ratio_area_mm2',
-                                        'coordinates']}
-        }
-        output_list.append(output_dict)
-        
-    print(f"[INFERENCE DEBUG] Final output: {len(output_list)} classifications")
-    
+@traced("classification.inference")
 def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
     """
     Main inference function - FIXED with automatic colored-to-grayscale conversion
@@ -664,24 +583,30 @@ def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
     print(f"  Hotspot: {path_hotspot}")
     print(f"  XML: {len(path_xml) if isinstance(path_xml, list) else path_xml}")
     
-    # ✅ STEP 1: Convert colored segmentation to grayscale if needed
-    converted_segment_path = convert_colored_segmentation_if_needed(path_segment)
-    print(f"[INFERENCE DEBUG] Using segmentation: {Path(converted_segment_path).name}")
+    timings = {}
+    inference_classification.last_timings = timings
+    t_start = time.perf_counter()
     
-    # ✅ STEP 2: Load images using OpenCV (same as backup)
-    image_raw = cv2.imread(path_raw, cv2.IMREAD_GRAYSCALE)
-    image_segment = cv2.imread(converted_segment_path, cv2.IMREAD_GRAYSCALE)
+    with span("classification.load"):
+        # ✅ STEP 1: Convert colored segmentation to grayscale if needed
+        converted_segment_path = convert_colored_segmentation_if_needed(path_segment)
+        print(f"[INFERENCE DEBUG] Using segmentation: {Path(converted_segment_path).name}")
     
-    # Handle both array and path inputs for hotspot
-    if isinstance(path_hotspot, np.ndarray):
-        image_hotspot = np.squeeze(path_hotspot)
-    else:
-        image_hotspot = cv2.imread(str(path_hotspot), cv2.IMREAD_GRAYSCALE)
+        # ✅ STEP 2: Load images using OpenCV (same as backup)
+        image_raw = cv2.imread(path_raw, cv2.IMREAD_GRAYSCALE)
+        image_segment = cv2.imread(converted_segment_path, cv2.IMREAD_GRAYSCALE)
+    
+        # Handle both array and path inputs for hotspot
+        if isinstance(path_hotspot, np.ndarray):
+            image_hotspot = np.squeeze(path_hotspot)
+        else:
+            image_hotspot = cv2.imread(str(path_hotspot), cv2.IMREAD_GRAYSCALE)
     
-    # Ensure all images are 2D
-    image_raw = np.squeeze(image_raw)
-    image_segment = np.squeeze(image_segment)
-    image_hotspot = np.squeeze(image_hotspot)
+        # Ensure all images are 2D
+        image_raw = np.squeeze(image_raw)
+        image_segment = np.squeeze(image_segment)
+        image_hotspot = np.squeeze(image_hotspot)
+    timings["load"] = time.perf_counter() - t_start
     
     print(f"[INFERENCE DEBUG] Images loaded:")
     print(f"  Raw: {image_raw.shape if image_raw is not None else 'Failed'}")
@@ -696,16 +621,12 @@ def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
     list_bb = loadBoundingBox2List(path_xml)
     print(f"[INFERENCE DEBUG] Loaded {len(list_bb)} bounding boxes")
 
-    # Extract features (same processing as backup)
-    list_features = []
-    for i, bb in enumerate(list_bb):
-        print(f"[INFERENCE DEBUG] Processing bbox {i}: {bb}")
-        feature = extractFeatures(image_raw, image_segment, image_hotspot, bb, path_raw)
-        if feature is None:
-            print(f"[INFERENCE DEBUG] Feature extraction failed for bbox {i}")
-            continue
-        list_features.append(feature)
-        print(f"[INFERENCE DEBUG] Feature extracted for bbox {i}: segment={feature.get('segment')}")
+    # Extract features (region features computed once per segment)
+    with span("classification.features", boxes=len(list_bb)):
+        list_features = extract_features_batch(image_raw, image_segment, image_hotspot, list_bb, path_raw, timings)
+    for feature in list_features:
+        print(f"[INFERENCE DEBUG] Feature extracted for bbox ({feature['xmin']}, {feature['ymin']}, "
+              f"{feature['xmax']}, {feature['ymax']}): segment={feature.get('segment')}")
 
     if not list_features:
         print(f"[INFERENCE DEBUG] No valid features extracted")
@@ -714,12 +635,15 @@ def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
     print(f"[INFERENCE DEBUG] Extracted {len(list_features)} valid features")
 
     # Predict (same as backup)
+    t_predict = time.perf_counter()
     try:
-        results = predict_features(list_features)
+        with span("classification.predict", features=len(list_features)):
+            results = predict_features(list_features)
         print(f"[INFERENCE DEBUG] Prediction completed: {len(results)} results")
     except Exception as e:
         print(f"[INFERENCE ERROR] Prediction failed: {e}")
         return [], None
+    timings["predict"] = time.perf_counter() - t_predict
     
     # Format output (same as backup)
     output_list = []
@@ -731,7 +655,7 @@ def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
                 'xmax': result['xmax'],
                 'ymax': result['ymax'],
             },
-            'coordinates': [list(coord) for coord in result['coordinates']],
+            'coordinates': result['coordinates'],  # int32 (N, 2) array of [y, x]
             'segment': result['segment'],
             'prediction': result['prediction'],
             'probability_abnormal': float(result['probability_abnormal']),
@@ -778,4 +702,7 @@ def inference_classification(path_raw, path_segment, path_hotspot, path_xml):
         hotspot_mask = np.zeros((image_raw.shape[0], image_raw.shape[1], 3), dtype=np.uint8)
         print(f"[INFERENCE DEBUG] Created empty mask - no results")
     
+    timings["total"] = time.perf_counter() - t_start
+    _print_stage_timings(timings)
+    
     return output_list, hotspot_mask
\ No newline at end of file
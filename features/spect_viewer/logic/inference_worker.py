@@ -0,0 +1,330 @@
+# features/spect_viewer/logic/inference_worker.py - Persistent warm inference worker
+"""
+Long-lived inference process for the SPECT pipeline.
+
+The worker imports nnU-Net, YOLO and the XGBoost classifier once, keeps the
+models warm (each module caches its model after the first load) and serves
+jobs sent over a multiprocessing queue. The GUI and batch import share one
+worker through ``get_inference_worker()``, so a scan only pays for compute,
+not for model loading.
+
+Usage:
+    worker = get_inference_worker()
+    seg = worker.call("segment_frame", frame)              # blocking
+    future = worker.submit("hotspot", dicom_path, pid)     # concurrent.futures.Future
+
+    # or, falling back to in-process execution when the worker is disabled:
+    seg = run_inference_job("segment_frame", frame)
+"""
+from __future__ import annotations
+
+import atexit
+import importlib
+import itertools
+import multiprocessing
+import multiprocessing.util  # registers its exit hook before ours, so ours runs first
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from core import logger, tracing
+
+# Job name -> "module:function" (resolved lazily inside the process that runs the job)
+JOB_HANDLERS: Dict[str, str] = {
+    "segment": "features.spect_viewer.logic.segmenter:predict_bone_mask",
+    "segment_frame": "features.spect_viewer.logic.segmenter:segment_frame",
+    "segment_batch": "features.spect_viewer.logic.segmenter:predict_bone_masks",
+    "detect": "features.spect_viewer.logic.box_detection:inference_detection_from_array",
+    "detect_batch": "features.spect_viewer.logic.box_detection:detect_dicoms_batch",
+    "detect_patient": "features.spect_viewer.logic.processing_wrapper:run_yolo_detection_for_patient",
+    "detect_study": "features.spect_viewer.logic.box_detection:detect_study",
+    "hotspot": "features.spect_viewer.logic.processing_wrapper:run_hotspot_processing_in_process",
+    "hotspot_study": "features.spect_viewer.logic.processing_wrapper:run_hotspot_processing_for_study",
+    "classify": "features.spect_viewer.logic.classification_wrapper:run_classification_inference",
+    "classify_patient": "features.spect_viewer.logic.processing_wrapper:run_classification_for_patient",
+    "warmup": "features.spect_viewer.logic.inference_worker:warm_up_models",
+    "ping": "features.spect_viewer.logic.inference_worker:_ping",
+}
+
+# Set INFERENCE_WORKER_ENABLED=false to run every job in the calling process
+INFERENCE_WORKER_ENABLED = os.getenv("INFERENCE_WORKER_ENABLED", "true").lower() == "true"
+
+_STOP = None  # queue sentinel
+
+
+# ------------------------------------------------------------------ job handlers
+def _resolve_handler(kind: str) -> Callable:
+    """Import and return the function registered for a job kind."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown inference job: {kind}")
+    module_name, func_name = JOB_HANDLERS[kind].split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _ping() -> str:
+    return "pong"
+
+
+def warm_up_models() -> Dict[str, bool]:
+    """Load every model once so the first real job is pure compute."""
+    status = {}
+
+    try:
+        from features.spect_viewer.logic.segmenter import load_bone_model
+        load_bone_model()
+        status["segmentation"] = True
+    except Exception as e:
+        print(f"[WORKER WARN] Segmentation model not loaded: {e}")
+        status["segmentation"] = False
+
+    try:
+        from features.spect_viewer.logic.box_detection import load_yolo_model
+        load_yolo_model()
+        status["detection"] = True
+    except Exception as e:
+        print(f"[WORKER WARN] YOLO model not loaded: {e}")
+        status["detection"] = False
+
+    try:
+        from features.spect_viewer.logic.classification_wrapper import setup_classification_path
+        setup_classification_path()
+        import inference_classification_hs as clf_module
+        clf_module.load_classification_models()
+        clf_module.get_extractor()
+        status["classification"] = True
+    except Exception as e:
+        print(f"[WORKER WARN] Classification model not loaded: {e}")
+        status["classification"] = False
+
+    return status
+
+
+# ------------------------------------------------------------------ worker process
+def _worker_main(requests, responses, warm_up: bool) -> None:
+    """Worker loop: (job_id, kind, args, kwargs) in, (tag, job_id, payload) out."""
+    # Forward pipeline log lines to the parent (printing still happens here),
+    # tagged with the job that wrote them
+    current_job = [None]
+    logger.set_log_callback(lambda msg: responses.put(("log", current_job[0], msg)))
+
+    if warm_up:
+        print(f"[WORKER] Warming up models...")
+        print(f"[WORKER] Warm-up status: {warm_up_models()}")
+
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            job = requests.get(timeout=5.0)
+        except queue.Empty:
+            # Not a daemon (see InferenceWorker.start), so leave on our own
+            # if the parent died without shutting us down
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        if job is _STOP:
+            break
+
+        job_id, kind, args, kwargs, study = job
+        current_job[0] = job_id
+        try:
+            # Spans of the job belong to the study that submitted it
+            with tracing.trace_study(study), tracing.span(f"worker.{kind}"):
+                result = _resolve_handler(kind)(*args, **kwargs)
+            responses.put(("ok", job_id, result))
+        except Exception as e:
+            responses.put(("error", job_id, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+
+    print(f"[WORKER] Inference worker stopped")
+
+
+class InferenceWorkerError(RuntimeError):
+    """Raised for jobs that failed inside the inference worker."""
+
+
+class InferenceWorker:
+    """Client side of the persistent inference process."""
+
+    def __init__(self, warm_up: bool = True):
+        self.warm_up = warm_up
+        self._ctx = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._listener: Optional[threading.Thread] = None
+        self._pending: Dict[int, Future] = {}
+        self._log_sinks: Dict[int, Callable[[str], None]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------- lifecycle
+    def start(self) -> None:
+        """Start the worker process (no-op if it is already running)."""
+        with self._lock:
+            if self.is_alive():
+                return
+
+            # Each worker generation owns its own pending table, so a dying
+            # worker never fails jobs that were queued on its replacement
+            self._pending = {}
+            self._requests = self._ctx.Queue()
+            self._responses = self._ctx.Queue()
+            # Not daemonic: classification jobs start the radiomics process
+            # pool, and daemonic processes may not have children. The process
+            # is stopped by shutdown_inference_worker() at interpreter exit.
+            self._process = self._ctx.Process(
+                target=_worker_main,
+                args=(self._requests, self._responses, self.warm_up),
+                name="InferenceWorker",
+                daemon=False,
+            )
+            self._process.start()
+
+            self._listener = threading.Thread(
+                target=self._listen, args=(self._process, self._responses, self._pending),
+                name="InferenceWorkerListener", daemon=True
+            )
+            self._listener.start()
+            print(f"[WORKER] Inference worker started (pid={self._process.pid})")
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop the worker process and fail any job still pending."""
+        with self._lock:
+            process, self._process = self._process, None
+            if process is None:
+                return
+            try:
+                self._requests.put(_STOP)
+                process.join(timeout)
+            except Exception:
+                pass
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+            self._responses.put(("stopped", None, None))
+            pending = self._pending
+        self._fail_pending(pending, "Inference worker was shut down")
+
+    # -------------------------------------------------------------- jobs
+    def submit(self, kind: str, *args, **kwargs) -> Future:
+        """Queue a job; returns a Future resolved with the handler's return value."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown inference job: {kind}")
+
+        self.start()
+        future: Future = Future()
+        job_id = next(self._ids)
+        sink = logger.get_log_sink()
+        with self._lock:
+            self._pending[job_id] = future
+            if sink:
+                # Worker log lines of this job reach the submitting thread's sink
+                self._log_sinks[job_id] = sink
+        self._requests.put((job_id, kind, args, kwargs, tracing.current_study()))
+        return future
+
+    def call(self, kind: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a job and wait for its result."""
+        return self.submit(kind, *args, **kwargs).result(timeout=timeout)
+
+    # -------------------------------------------------------------- internals
+    def _listen(self, process, responses, pending: Dict[int, Future]) -> None:
+        """Resolve futures from worker responses until the worker goes away."""
+        while True:
+            try:
+                tag, job_id, payload = responses.get(timeout=1.0)
+            except Exception:
+                if not process.is_alive():
+                    break
+                continue
+
+            if tag == "stopped":
+                break
+            if tag == "log":
+                logger.forward_log(payload, self._log_sinks.get(job_id))
+                continue
+
+            with self._lock:
+                future = pending.pop(job_id, None)
+                self._log_sinks.pop(job_id, None)
+            if future is None:
+                continue
+            if tag == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(InferenceWorkerError(payload))
+
+        if process.exitcode not in (None, 0):
+            print(f"[WORKER ERROR] Inference worker exited with code {process.exitcode}")
+        self._fail_pending(pending, "Inference worker stopped before the job finished")
+
+    def _fail_pending(self, pending: Dict[int, Future], reason: str) -> None:
+        with self._lock:
+            futures = list(pending.values())
+            for job_id in pending:
+                self._log_sinks.pop(job_id, None)
+            pending.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(InferenceWorkerError(reason))
+
+
+# ------------------------------------------------------------------ singleton
+_inference_worker: Optional[InferenceWorker] = None
+_inference_worker_lock = threading.Lock()
+
+# In-process jobs run one at a time, like they would on the worker
+_in_process_lock = threading.RLock()
+
+
+def get_inference_worker() -> InferenceWorker:
+    """Shared inference worker for the GUI and batch import (started on first use)."""
+    global _inference_worker
+    with _inference_worker_lock:
+        if _inference_worker is None:
+            _inference_worker = InferenceWorker()
+            atexit.register(shutdown_inference_worker)
+        return _inference_worker
+
+
+def shutdown_inference_worker() -> None:
+    """Stop the shared worker (called automatically at interpreter exit)."""
+    if _inference_worker is not None:
+        _inference_worker.shutdown()
+
+
+def run_inference_job(kind: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Run a job on the warm worker, or in the calling process when the worker
+    is disabled or cannot be started. Job errors are raised either way.
+    """
+    if INFERENCE_WORKER_ENABLED and multiprocessing.current_process().name == "MainProcess":
+        try:
+            future = get_inference_worker().submit(kind, *args, **kwargs)
+        except Exception as e:
+            print(f"[WORKER WARN] Inference worker unavailable, running {kind} in-process: {e}")
+        else:
+            return future.result(timeout=timeout)
+
+    with _in_process_lock:
+        return _resolve_handler(kind)(*args, **kwargs)
+
+
+def run_job_captured(kind: str, args: tuple = (), kwargs: Optional[Dict] = None, study: Optional[str] = None):
+    """
+    Run a job in this process and return ``(result, log_lines)``.
+
+    Entry point for process pools (e.g. the import scheduler's CPU stages):
+    the pipeline log lines are printed in the child as usual and handed back
+    so the parent can attribute them to the study that ran the job; spans are
+    recorded under ``study``.
+    """
+    lines = []
+    with logger.log_to(lines.append), tracing.trace_study(study), tracing.span(f"pool.{kind}"):
+        result = _resolve_handler(kind)(*args, **(kwargs or {}))
+    return result, lines
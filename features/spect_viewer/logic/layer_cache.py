@@ -0,0 +1,147 @@
+# features/spect_viewer/logic/layer_cache.py - Decoded layer cache for the timeline
+"""
+LRU cache of decoded timeline layers.
+
+``ScanTimelineWidget`` rebuilds its cards on every selection, layer toggle,
+view change and opacity change. Decoding the segmentation / classification
+PNGs, making black transparent and rendering the classification bbox overlay
+is the expensive part, and none of it depends on opacity - so the decoded RGBA
+images are kept here and a rebuild only recomposites in memory.
+
+Entries are keyed on ``(file path, view, layer, file mtime)``: saving an edited
+mask bumps the mtime, so the next lookup misses and the stale entry is dropped.
+The cache is bounded by a byte budget (``TIMELINE_LAYER_CACHE_MB``), evicting
+the least recently used layers first.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from core.config.paths import TIMELINE_LAYER_CACHE_MB
+
+CacheKey = Tuple[str, Optional[str], str, int]
+
+
+def _file_mtime(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _value_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value (images dominate, the rest is ~0)."""
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 0
+
+
+class LayerCache:
+    """Byte-bounded LRU of decoded layers, keyed on (path, view, layer, mtime)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[Any, int]]" = OrderedDict()
+        self._latest: Dict[Tuple[str, Optional[str], str], CacheKey] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, path: Path, view: Optional[str], layer: str,
+                    loader: Callable[[Path], Any]) -> Any:
+        """
+        Return the cached value for a file, calling ``loader(path)`` on a miss.
+
+        Args:
+            path: File the layer is decoded from (its mtime is part of the key)
+            view: View name, or None for view-independent values
+            layer: Layer / value name
+            loader: Decodes the file; may return None (cached as well, so a
+                file without drawable content is not re-parsed every rebuild)
+
+        Returns:
+            The cached or freshly loaded value, None if the file does not exist.
+            Cached images are shared - callers must not modify them in place.
+        """
+        mtime = _file_mtime(path)
+        if mtime is None:
+            return None
+
+        slot = (str(path), view, layer)
+        key = slot + (mtime,)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader(path)
+
+        with self._lock:
+            # A newer mtime replaces the previous version of the same slot
+            old_key = self._latest.get(slot)
+            if old_key is not None and old_key != key:
+                self._discard(old_key)
+            if key in self._entries:
+                self._discard(key)
+
+            size = _value_nbytes(value)
+            self._entries[key] = (value, size)
+            self._latest[slot] = key
+            self._bytes += size
+            self._evict()
+        return value
+
+    def _discard(self, key: CacheKey) -> None:
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        if self._latest.get(key[:3]) == key:
+            del self._latest[key[:3]]
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate(self, path: Path = None) -> None:
+        """Drop every entry for a file (or the whole cache when path is None)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._latest.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._entries if k[0] == str(path)]:
+                self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_layer_cache: Optional[LayerCache] = None
+
+
+def get_layer_cache() -> LayerCache:
+    """Process-wide layer cache (shared by the timeline and the editors)."""
+    global _layer_cache
+    if _layer_cache is None:
+        _layer_cache = LayerCache(TIMELINE_LAYER_CACHE_MB * 1024 * 1024)
+    return _layer_cache
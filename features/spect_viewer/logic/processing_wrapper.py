@@ -8,7 +8,7 @@ import sys
 import traceback
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from PIL import Image
 
 # Add project root to path
@@ -22,6 +22,7 @@ from core.config.paths import (
     generate_filename_stem,
     get_patient_spect_path
 )
+from core.tracing import span, trace_study
 
 # Import DICOM loader
 from features.dicom_import.logic.dicom_loader import (
@@ -29,11 +30,16 @@ from features.dicom_import.logic.dicom_loader import (
     extract_patient_info_from_path
 )
 
-# Import segmenter
-from .segmenter import predict_bone_mask
+# segmenter (nnU-Net) and box_detection (YOLO) are imported where used, so the
+# import scheduler's CPU processes (Otsu, classification) do not load torch
 
-# Import box detection
-from .box_detection import run_yolo_detection_for_patient
+def run_yolo_detection_for_patient(*args, **kwargs):
+    """box_detection.run_yolo_detection_for_patient, imported on first call."""
+    from .box_detection import run_yolo_detection_for_patient as _run
+    return _run(*args, **kwargs)
+
+# Artifact manifest (stage staleness)
+from .artifact_manifest import STAGES, get_manifest
 
 # Import hotspot processor with fallback
 try:
@@ -87,6 +93,81 @@ def run_yolo_detection_wrapper(scan_path: Path, patient_id: str) -> Dict[str, bo
         return {"anterior": False, "posterior": False}
 
 
+def _process_hotspot_frames(processor, frames: Dict[str, np.ndarray], patient_id: str,
+                            session_code: str, study_date: str, scan_name: str) -> Dict:
+    """Otsu hotspot processing of already loaded frames (saves the hotspot PNGs)."""
+    filename_stem = generate_filename_stem(patient_id, study_date)
+    ant_hotspot_files = get_hotspot_files(patient_id, session_code, "ant", study_date)
+    post_hotspot_files = get_hotspot_files(patient_id, session_code, "post", study_date)
+    ant_xml_path = Path(ant_hotspot_files['xml_file'])
+    post_xml_path = Path(post_hotspot_files['xml_file'])
+
+    result = {"frames": [], "ant_frames": [], "post_frames": []}
+
+    for view_name, frame in frames.items():
+        if not isinstance(frame, np.ndarray):
+            continue
+        
+        processing_frame = np.sum(frame, axis=0) if frame.ndim == 3 else frame
+
+        # Proses Anterior
+        if ant_xml_path.exists() and "ant" in view_name.lower():
+            print(f"[DEBUG] Processing anterior with XML: {ant_xml_path}")
+            ant_processed = processor.process_frame_with_xml(
+                processing_frame, str(ant_xml_path), patient_id, "ant", study_date=study_date
+            )
+            if ant_processed is not None:
+                print(f"[PROCESS] Anterior hotspot processing completed (both versions saved)")
+                result["ant_frames"].append(ant_processed)
+            else:
+                print(f"[PROCESS] Anterior processing failed, using original frame")
+                result["ant_frames"].append(processing_frame)
+        elif "ant" in view_name.lower():
+            result["ant_frames"].append(processing_frame)
+
+        # Proses Posterior
+        if post_xml_path.exists() and "post" in view_name.lower():
+            print(f"[DEBUG] Processing posterior with XML: {post_xml_path}")
+            post_processed = processor.process_frame_with_xml(
+                processing_frame, str(post_xml_path), patient_id, "post", study_date=study_date
+            )
+            if post_processed is not None:
+                print(f"[PROCESS] Posterior hotspot processing completed (both versions saved)")
+                result["post_frames"].append(post_processed)
+            else:
+                print(f"[PROCESS] Posterior processing failed, using original frame")
+                result["post_frames"].append(processing_frame)
+        elif "post" in view_name.lower():
+            result["post_frames"].append(processing_frame)
+    
+    result["frames"] = result["ant_frames"] + result["post_frames"]
+
+    print(f"[PROCESS] Hotspot processing and file saving completed for {scan_name}")
+    print(f"[PROCESS] Expected files:")
+    print(f"  - Blended: {filename_stem}_ant_hotspot_colored.png")
+    print(f"  - Pure: {filename_stem}_anterior_hotspot_colored.png")
+    print(f"  - Blended: {filename_stem}_post_hotspot_colored.png")
+    print(f"  - Pure: {filename_stem}_posterior_hotspot_colored.png")
+    
+    return result
+
+
+def run_hotspot_processing_for_study(context) -> Dict:
+    """Otsu hotspot processing for an import StudyContext, using its decoded frames."""
+    try:
+        from .hotspot_processor import HotspotProcessor
+
+        if not context.frames:
+            return {"frames": [], "ant_frames": [], "post_frames": []}
+        return _process_hotspot_frames(HotspotProcessor(), context.frames, context.patient_id,
+                                       context.session_code, context.study_date, context.dicom_path.name)
+
+    except Exception as e:
+        print(f"[PROCESS FATAL ERROR] Exception in hotspot processing: {e}")
+        traceback.print_exc()
+        return {"frames": [], "ant_frames": [], "post_frames": []}
+
+
 def run_hotspot_processing_in_process(scan_path: Path, patient_id: str) -> Dict:
     """
     Menjalankan proses hotspot dan MENYIMPAN hasilnya ke file gambar.
@@ -96,7 +177,6 @@ def run_hotspot_processing_in_process(scan_path: Path, patient_id: str) -> Dict:
     try:
         from .hotspot_processor import HotspotProcessor
         from features.dicom_import.logic.dicom_loader import load_frames_and_metadata, extract_study_date_from_dicom
-        from core.config.paths import get_hotspot_files, generate_filename_stem
 
         processor = HotspotProcessor()
         frames, meta = load_frames_and_metadata(str(scan_path))
@@ -108,7 +188,6 @@ def run_hotspot_processing_in_process(scan_path: Path, patient_id: str) -> Dict:
         try:
             study_date = extract_study_date_from_dicom(scan_path)
             session_code = scan_path.parent.parent.name
-            filename_stem = generate_filename_stem(patient_id, study_date)
             print(f"[DEBUG] Extracted study_date: {study_date}, session: {session_code}")
         except Exception as e:
             print(f"[WARN] Could not extract study date from DICOM: {e}")
@@ -118,62 +197,9 @@ def run_hotspot_processing_in_process(scan_path: Path, patient_id: str) -> Dict:
                 from datetime import datetime
                 study_date = datetime.now().strftime("%Y%m%d")
             session_code = "unknown"
-            filename_stem = f"{patient_id}_{study_date}"
             print(f"[DEBUG] Using fallback study_date: {study_date}")
         
-        ant_hotspot_files = get_hotspot_files(patient_id, session_code, "ant", study_date)
-        post_hotspot_files = get_hotspot_files(patient_id, session_code, "post", study_date)
-        ant_xml_path = Path(ant_hotspot_files['xml_file'])
-        post_xml_path = Path(post_hotspot_files['xml_file'])
-
-        result = {"frames": [], "ant_frames": [], "post_frames": []}
-
-        for view_name, frame in frames.items():
-            if not isinstance(frame, np.ndarray):
-                continue
-            
-            processing_frame = np.sum(frame, axis=0) if frame.ndim == 3 else frame
-
-            # Proses Anterior
-            if ant_xml_path.exists() and "ant" in view_name.lower():
-                print(f"[DEBUG] Processing anterior with XML: {ant_xml_path}")
-                ant_processed = processor.process_frame_with_xml(
-                    processing_frame, str(ant_xml_path), patient_id, "ant", study_date=study_date
-                )
-                if ant_processed is not None:
-                    print(f"[PROCESS] Anterior hotspot processing completed (both versions saved)")
-                    result["ant_frames"].append(ant_processed)
-                else:
-                    print(f"[PROCESS] Anterior processing failed, using original frame")
-                    result["ant_frames"].append(processing_frame)
-            elif "ant" in view_name.lower():
-                result["ant_frames"].append(processing_frame)
-
-            # Proses Posterior
-            if post_xml_path.exists() and "post" in view_name.lower():
-                print(f"[DEBUG] Processing posterior with XML: {post_xml_path}")
-                post_processed = processor.process_frame_with_xml(
-                    processing_frame, str(post_xml_path), patient_id, "post", study_date=study_date
-                )
-                if post_processed is not None:
-                    print(f"[PROCESS] Posterior hotspot processing completed (both versions saved)")
-                    result["post_frames"].append(post_processed)
-                else:
-                    print(f"[PROCESS] Posterior processing failed, using original frame")
-                    result["post_frames"].append(processing_frame)
-            elif "post" in view_name.lower():
-                result["post_frames"].append(processing_frame)
-        
-        result["frames"] = result["ant_frames"] + result["post_frames"]
-
-        print(f"[PROCESS] Hotspot processing and file saving completed for {scan_path.name}")
-        print(f"[PROCESS] Expected files:")
-        print(f"  - Blended: {filename_stem}_ant_hotspot_colored.png")
-        print(f"  - Pure: {filename_stem}_anterior_hotspot_colored.png")
-        print(f"  - Blended: {filename_stem}_post_hotspot_colored.png")
-        print(f"  - Pure: {filename_stem}_posterior_hotspot_colored.png")
-        
-        return result
+        return _process_hotspot_frames(processor, frames, patient_id, session_code, study_date, scan_path.name)
 
     except Exception as e:
         import traceback
@@ -268,6 +294,7 @@ def run_segmentation_in_process(dicom_path: Path, patient_id: str) -> Dict[str,
 
         # 2. Jalankan prediksi segmentasi
         # predict_bone_mask akan mengembalikan gambar RGB berwarna
+        from .segmenter import predict_bone_mask
         segmented_rgb = predict_bone_mask(anterior_frame, to_rgb=True)
 
         # 3. Simpan hasilnya ke file PNG
@@ -306,7 +333,13 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
     
     if not study_date:
         study_date = extract_study_date_from_dicom(dicom_path)
-    
+
+    with trace_study(generate_filename_stem(patient_id, study_date)), span("analysis.pipeline"):
+        return _run_analysis_steps(dicom_path, patient_id, study_date)
+
+
+def _run_analysis_steps(dicom_path: Path, patient_id: str, study_date: str) -> Dict:
+    """The four steps of run_complete_analysis_pipeline, each in its own span."""
     print(f"## Starting complete analysis pipeline for patient {patient_id}")
     print(f"## Study date: {study_date}")
     print(f"## Pipeline: YOLO → Otsu → Classification → QUANTIFICATION")
@@ -328,7 +361,8 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
     try:
         # Step 1: YOLO Detection
         print(f"## Step 1: YOLO Detection")
-        yolo_result = run_yolo_detection_wrapper(dicom_path, patient_id)
+        with span("analysis.yolo"):
+            yolo_result = run_yolo_detection_wrapper(dicom_path, patient_id)
         yolo_success = any(yolo_result.values())
         results["steps"]["yolo_detection"] = yolo_success
         if yolo_success:
@@ -340,7 +374,8 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
         
         # Step 2: Otsu Processing
         print(f"## Step 2: Otsu Hotspot Processing")
-        otsu_result = run_hotspot_processing_in_process(dicom_path, patient_id)
+        with span("analysis.otsu"):
+            otsu_result = run_hotspot_processing_in_process(dicom_path, patient_id)
         otsu_success = len(otsu_result.get("frames", [])) > 0
         results["steps"]["otsu_processing"] = otsu_success
         if otsu_success:
@@ -352,7 +387,8 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
         
         # Step 3: Classification
         print(f"## Step 3: Classification Analysis")
-        classification_result = run_classification_for_patient(dicom_path, patient_id, study_date)
+        with span("analysis.classification"):
+            classification_result = run_classification_for_patient(dicom_path, patient_id, study_date)
         results["steps"]["classification"] = classification_result
         if classification_result:
             results["files_generated"].extend(["Classification JSON", "Classification mask PNG"])
@@ -364,7 +400,8 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
         # Step 4: NEW Quantification (only if classification successful)
         print(f"## Step 4: BSI Quantification")
         if classification_result:
-            quantification_result = run_quantification_for_patient(dicom_path, patient_id, study_date)
+            with span("analysis.quantification"):
+                quantification_result = run_quantification_for_patient(dicom_path, patient_id, study_date)
             results["steps"]["quantification"] = quantification_result
             if quantification_result:
                 results["files_generated"].extend(["BSI quantification JSON"])
@@ -401,7 +438,8 @@ def run_complete_analysis_pipeline(dicom_path: Path, patient_id: str, study_date
 
 def get_patient_analysis_status(dicom_path: Path, patient_id: str, study_date: str = None) -> Dict:
     """
-    Get analysis status for a patient - check which files exist
+    Get analysis status for a patient - check which files exist and which
+    stages are stale according to the artifact manifest
     
     Args:
         dicom_path: Path to patient's DICOM file
@@ -449,12 +487,25 @@ def get_patient_analysis_status(dicom_path: Path, patient_id: str, study_date: s
         }
     }
     
+    # Stale stages from the artifact manifest (inputs/params changed since the stage ran)
+    status["stale"] = {}
+    try:
+        manifest = get_manifest(dicom_path, patient_id, study_date)
+        manifest.adopt_existing()
+        for stage in STAGES:
+            is_stale, reason = manifest.check_stage(stage)
+            if is_stale:
+                status["stale"][stage] = reason
+    except Exception as e:
+        print(f"[MANIFEST WARN] Could not check artifact manifest: {e}")
+    stale = status["stale"]
+    
     # Calculate completion percentages
-    seg_complete = all(status["files_exist"]["segmentation"].values())
-    yolo_complete = all(status["files_exist"]["yolo_xml"].values())
-    otsu_complete = all(status["files_exist"]["otsu_hotspot"].values())
-    classification_complete = all(status["files_exist"]["classification"].values())
-    quantification_complete = all(status["files_exist"]["quantification"].values())
+    seg_complete = all(status["files_exist"]["segmentation"].values()) and "segmentation" not in stale
+    yolo_complete = all(status["files_exist"]["yolo_xml"].values()) and "detection" not in stale
+    otsu_complete = all(status["files_exist"]["otsu_hotspot"].values()) and "otsu" not in stale
+    classification_complete = all(status["files_exist"]["classification"].values()) and "classification" not in stale
+    quantification_complete = all(status["files_exist"]["quantification"].values()) and "quantification" not in stale
     
     status["completion"] = {
         "segmentation": seg_complete,
@@ -482,14 +533,27 @@ def get_patient_analysis_status(dicom_path: Path, patient_id: str, study_date: s
     return status
 
 
-def run_missing_analysis_steps(dicom_path: Path, patient_id: str, study_date: str = None) -> Dict:
+def run_missing_analysis_steps(dicom_path: Path, patient_id: str, study_date: str = None,
+                               progress_callback: Optional[Callable[[int, int, str], None]] = None,
+                               step_callback: Optional[Callable[[str, bool], None]] = None,
+                               should_cancel: Optional[Callable[[], bool]] = None) -> Dict:
     """
-    Run only missing analysis steps for a patient
+    Run only missing or stale analysis steps for a patient
+    
+    Staleness is re-checked after every step, so a step that rewrites its
+    outputs invalidates exactly the downstream steps that read them (e.g. a
+    saved edited XML only re-runs classification and quantification).
     
     Args:
         dicom_path: Path to patient's DICOM file
         patient_id: Patient ID
         study_date: Study date (optional, will be extracted if not provided)
+        progress_callback: Called as (current, total, message) before each step
+            and once at the end (current == total)
+        step_callback: Called as (step_name, success) after each step that ran,
+            so callers can pick up its outputs right away
+        should_cancel: Checked before each step; when it returns True the
+            remaining steps are skipped and ``results["cancelled"]`` is set
         
     Returns:
         Dictionary with processing results
@@ -503,6 +567,8 @@ def run_missing_analysis_steps(dicom_path: Path, patient_id: str, study_date: st
     
     print(f"## Checking analysis status for patient {patient_id}")
     print(f"## Next step needed: {status['next_step']}")
+    for stage, reason in status["stale"].items():
+        print(f"##   stale {stage}: {reason}")
     
     results = {
         "patient_id": patient_id,
@@ -517,44 +583,57 @@ def run_missing_analysis_steps(dicom_path: Path, patient_id: str, study_date: st
         results["success"] = True
         return results
     
-    # Run missing steps in order
-    completion = status["completion"]
+    if "segmentation" in status["stale"]:
+        print(f"## [WARN] Segmentation is stale ({status['stale']['segmentation']}); re-import the scan to refresh it")
+    
+    manifest = get_manifest(dicom_path, patient_id, study_date)
+    steps = [
+        ("detection", "yolo_detection", "YOLO Detection",
+         lambda: any(run_yolo_detection_wrapper(dicom_path, patient_id).values())),
+        ("otsu", "otsu_processing", "Otsu Processing",
+         lambda: len(run_hotspot_processing_in_process(dicom_path, patient_id).get("frames", [])) > 0),
+        ("classification", "classification", "Classification",
+         lambda: run_classification_for_patient(dicom_path, patient_id, study_date)),
+        ("quantification", "quantification", "Quantification",
+         lambda: run_quantification_for_patient(dicom_path, patient_id, study_date)),
+    ]
+    
+    # Steps before the first stale one cannot become stale during this run
+    first = next((i for i, (stage, *_) in enumerate(steps) if manifest.is_stale(stage)), len(steps))
+    steps = steps[first:]
+    total = len(steps)
     
     try:
-        # YOLO Detection (if needed)
-        if not completion["yolo_detection"]:
-            print(f"## Running missing step: YOLO Detection")
-            yolo_result = run_yolo_detection_wrapper(dicom_path, patient_id)
-            yolo_success = any(yolo_result.values())
-            results["steps_run"].append(("yolo_detection", yolo_success))
-            if not yolo_success:
-                return results
-        
-        # Otsu Processing (if needed)
-        if not completion["otsu_processing"]:
-            print(f"## Running missing step: Otsu Processing")
-            otsu_result = run_hotspot_processing_in_process(dicom_path, patient_id)
-            otsu_success = len(otsu_result.get("frames", [])) > 0
-            results["steps_run"].append(("otsu_processing", otsu_success))
-            if not otsu_success:
-                return results
-        
-        # Classification (if needed)
-        if not completion["classification"]:
-            print(f"## Running missing step: Classification")
-            classification_result = run_classification_for_patient(dicom_path, patient_id, study_date)
-            results["steps_run"].append(("classification", classification_result))
-            if not classification_result:
+        for index, (stage, step_name, title, run_step) in enumerate(steps):
+            if should_cancel and should_cancel():
+                print(f"## Cancelled before {title}")
+                results["cancelled"] = True
                 return results
-        
-        # Quantification (if needed)
-        if not completion["quantification"]:
-            print(f"## Running missing step: Quantification")
-            quantification_result = run_quantification_for_patient(dicom_path, patient_id, study_date)
-            results["steps_run"].append(("quantification", quantification_result))
-            if not quantification_result:
+            
+            is_stale, reason = manifest.check_stage(stage)
+            if not is_stale:
+                continue
+            
+            if progress_callback:
+                progress_callback(index, total, f"{title}...")
+            print(f"## Running missing step: {title} ({reason})")
+            if stage == "detection":
+                # Detection skips views whose XML exists; drop XML made from old inputs/model
+                for xml_path in manifest.stage_outputs(stage).values():
+                    if xml_path.exists() and reason.startswith(("inputs", "params")):
+                        xml_path.unlink()
+            
+            step_success = bool(run_step())
+            results["steps_run"].append((step_name, step_success))
+            if step_success:
+                manifest.record(stage)
+            if step_callback:
+                step_callback(step_name, step_success)
+            if not step_success:
                 return results
         
+        if progress_callback:
+            progress_callback(total, total, "Analysis up to date")
         results["success"] = True
         print(f"## Missing analysis steps completed successfully")
         
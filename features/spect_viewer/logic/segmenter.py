@@ -1,21 +1,33 @@
 # features\spect_viewer\logic\segmenter.py - Enhanced with better progress messages
 from __future__ import annotations
 
+import hashlib
 import inspect
+import itertools
 import os
 import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import cv2
 import numpy as np
 import torch
 from nnunetv2.inference.predict_from_raw_data import nnUNetPredictor
 from core.logger import _log
+from core.tracing import traced
 from core.gui.ui_constants import truncate_text
 
 # ===== Import path configuration from core =====
-from core.config.paths import SEGMENTATION_MODEL_PATH
+from core.config.paths import (
+    SEGMENTATION_MODEL_PATH,
+    SEGMENTATION_CACHE_PATH,
+    SEGMENTATION_CACHE_ENABLED,
+    SEGMENTATION_BATCH_SIZE,
+    SEGMENTATION_NUM_THREADS,
+    SEGMENTATION_PROFILE,
+)
 
 # ------------------------------------------------------------------ try import colorizer
 try:
@@ -36,18 +48,67 @@ os.environ.setdefault("nnUNet_raw",          str(PROJECT_ROOT / "_nn_raw"))
 os.environ.setdefault("nnUNet_preprocessed", str(PROJECT_ROOT / "_nn_pre"))
 os.environ["nnUNet_results"] = str(SEG_DIR)
 
+BONE_MODEL_DIR = SEG_DIR / "Dataset001_BoneRegion" / "nnUNetTrainer_50epochs__nnUNetPlans__2d"
+BONE_CHECKPOINT = "checkpoint_best.pth"
+BONE_FOLDS = (0,)
+
+# In-memory LRU size (frames); the on-disk cache is unbounded
+SEGMENTATION_MEMORY_CACHE_SIZE = 32
+
+# Network input size as (width, height) for cv2.resize -> mask shape (1024, 256)
+MODEL_INPUT_SIZE = (256, 1024)
+
+# ------------------------------------------------------------------ PREDICTOR PROFILES
+# mirror_axes: None = every axis the plan allows, () = no test-time mirroring,
+#              (1,) = left-right flip only (axis 0 = cranio-caudal, 1 = left-right)
+# dtype:       "auto" = fp16 autocast on CUDA / fp32 on CPU, or "float32" | "float16" | "bfloat16"
+#              (bfloat16 falls back to float16 on GPUs without bf16 support)
+# num_threads: torch CPU threads while the profile runs (restored afterwards),
+#              0 = SEGMENTATION_NUM_THREADS / torch default
+# Check a profile change with benchmarks/validate_segmentation_profiles.py (Dice vs "accurate")
+PREDICTOR_PROFILES: Dict[str, dict] = {
+    "accurate": dict(tile_step_size=0.5, use_gaussian=True,  mirror_axes=None, dtype="auto", num_threads=0),
+    "balanced": dict(tile_step_size=0.5, use_gaussian=True,  mirror_axes=(1,), dtype="auto", num_threads=0),
+    "fast":     dict(tile_step_size=1.0, use_gaussian=False, mirror_axes=(),   dtype="bfloat16",
+                     num_threads=os.cpu_count() or 0),
+}
+
+_session_profile = SEGMENTATION_PROFILE if SEGMENTATION_PROFILE in PREDICTOR_PROFILES else "accurate"
+
+
+def set_segmentation_profile(name: str) -> None:
+    """Select the predictor profile used when a call does not pass ``profile``."""
+    global _session_profile
+    if name not in PREDICTOR_PROFILES:
+        raise ValueError(f"Unknown segmentation profile '{name}', expected one of {list(PREDICTOR_PROFILES)}")
+    _session_profile = name
+    _log(f"[INFO]  Segmentation profile set to '{name}'")
+
+
+def get_segmentation_profile() -> str:
+    """Name of the current session's predictor profile."""
+    return _session_profile
+
+
+def _resolve_profile(profile: Optional[str]) -> str:
+    name = profile or _session_profile
+    if name not in PREDICTOR_PROFILES:
+        raise ValueError(f"Unknown segmentation profile '{name}', expected one of {list(PREDICTOR_PROFILES)}")
+    return name
+
 
 # ------------------------------------------------------------------ HELPERS
-def create_predictor() -> nnUNetPredictor:
-    """Creates the nnUNet predictor with standardized settings."""
+def create_predictor(profile: str = "accurate") -> nnUNetPredictor:
+    """Creates the nnUNet predictor with the settings of a named profile."""
     use_cuda = torch.cuda.is_available()
     device = torch.device("cuda:0" if use_cuda else "cpu")
     _log(f"[INFO]  CUDA available: {use_cuda} – using {device}")
 
+    cfg = PREDICTOR_PROFILES[profile]
     settings = dict(
-        tile_step_size=0.5,
-        use_gaussian=True,
-        use_mirroring=True,
+        tile_step_size=cfg["tile_step_size"],
+        use_gaussian=cfg["use_gaussian"],
+        use_mirroring=cfg["mirror_axes"] != (),
         perform_everything_on_device=use_cuda,
         device=device,
         allow_tqdm=True
@@ -64,8 +125,7 @@ def load_bone_model() -> nnUNetPredictor:
     cache = load_bone_model._cache
 
     if "bone" not in cache:
-        dataset = "Dataset001_BoneRegion"
-        model_path = SEG_DIR / dataset / "nnUNetTrainer_50epochs__nnUNetPlans__2d"
+        model_path = BONE_MODEL_DIR
         _log(f"[INFO]  Loading bone segmentation model...")
         _log(f"[INFO]  Model path: {truncate_text(str(model_path), 60)}")
 
@@ -75,47 +135,306 @@ def load_bone_model() -> nnUNetPredictor:
         predictor = create_predictor()
         _log(f"[INFO]  Initializing model from trained weights...")
         predictor.initialize_from_trained_model_folder(
-            str(model_path), use_folds=(0,), checkpoint_name="checkpoint_best.pth"
+            str(model_path), use_folds=BONE_FOLDS, checkpoint_name=BONE_CHECKPOINT
         )
         cache["bone"] = predictor
         _log(f"[INFO]  Bone segmentation model loaded successfully")
     return cache["bone"]
 
 
-def run_prediction(image: np.ndarray, model: nnUNetPredictor) -> np.ndarray:
+def apply_predictor_profile(model: nnUNetPredictor, profile: Optional[str] = None) -> dict:
+    """
+    Switches a loaded predictor to a profile's inference settings (weights are
+    shared, so changing profile never reloads the checkpoint).
+
+    Returns:
+        The profile settings dict
+    """
+    name = _resolve_profile(profile)
+    cfg = PREDICTOR_PROFILES[name]
+
+    if not hasattr(model, "_plan_mirror_axes"):
+        model._plan_mirror_axes = tuple(getattr(model, "allowed_mirroring_axes", None) or ())
+    plan_axes = model._plan_mirror_axes
+    axes = plan_axes if cfg["mirror_axes"] is None else tuple(a for a in cfg["mirror_axes"] if a in plan_axes)
+
+    model.tile_step_size = cfg["tile_step_size"]
+    model.use_gaussian = cfg["use_gaussian"]
+    model.use_mirroring = bool(axes)
+    model.allowed_mirroring_axes = axes
+    return cfg
+
+
+def _autocast(model: nnUNetPredictor, dtype: str = "auto"):
+    """Autocast context for a profile dtype."""
+    if dtype == "auto":
+        return torch.autocast(model.device.type, enabled=model.device.type == "cuda")
+    if dtype == "float32":
+        return nullcontext()
+    if dtype == "bfloat16" and model.device.type == "cuda" and not torch.cuda.is_bf16_supported():
+        dtype = "float16"
+    return torch.autocast(model.device.type, dtype=getattr(torch, dtype))
+
+
+def run_prediction(image: np.ndarray, model: nnUNetPredictor, dtype: str = "auto") -> np.ndarray:
     """Runs sliding window inference on a pre-processed image."""
     _log(f"[INFO]  Running sliding window inference...")
     _log(f"[INFO]  Input image shape: {image.shape}")
     
     tensor = torch.from_numpy(image.astype(np.float32)[None, None]).to(model.device)
     
-    with torch.no_grad():
+    with torch.no_grad(), _autocast(model, dtype):
         logits = model.predict_sliding_window_return_logits(tensor)
         
     if logits.ndim == 4:
         logits = logits[:, 0]
         
-    prediction = torch.argmax(logits, dim=0).cpu().numpy().astype(np.uint8)
+    prediction = torch.argmax(logits.float(), dim=0).cpu().numpy().astype(np.uint8)
     _log(f"[INFO]  Prediction completed, output shape: {prediction.shape}")
     
     return prediction
 
 
-# ------------------------------------------------------------------ PUBLIC API
-def predict_bone_mask(
-    image: np.ndarray, *, to_rgb: bool = False
+def _set_torch_threads(num_threads: Optional[int]) -> None:
+    """Apply an intra-op CPU thread count (None/0 keeps the current setting)."""
+    if num_threads and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+        _log(f"[INFO]  Torch CPU threads set to {num_threads}")
+
+
+@contextmanager
+def _torch_threads(num_threads: Optional[int]):
+    """Run with an intra-op CPU thread count and restore the previous one (None/0 keeps it)."""
+    previous = torch.get_num_threads()
+    _set_torch_threads(num_threads)
+    try:
+        yield
+    finally:
+        if torch.get_num_threads() != previous:
+            torch.set_num_threads(previous)
+
+
+def _supports_batched_forward(model: nnUNetPredictor, shape: Tuple[int, int]) -> bool:
+    """
+    True when one network patch covers the whole frame. Sliding window then
+    reduces to a single tile (Gaussian weights cancel out), so frames can be
+    stacked and pushed through the network in one forward pass.
+    """
+    try:
+        return tuple(model.configuration_manager.patch_size) == tuple(shape)
+    except AttributeError:
+        return False
+
+
+def _forward_with_mirroring(model: nnUNetPredictor, batch: "torch.Tensor") -> "torch.Tensor":
+    """Network forward on [B, 1, H, W] with nnU-Net's test-time mirroring."""
+    prediction = model.network(batch)
+    if isinstance(prediction, (list, tuple)):      # deep supervision heads
+        prediction = prediction[0]
+
+    mirror_axes = model.allowed_mirroring_axes if model.use_mirroring else None
+    if mirror_axes:
+        axes = [m + 2 for m in mirror_axes]
+        combos = [c for n in range(len(axes)) for c in itertools.combinations(axes, n + 1)]
+        for combo in combos:
+            flipped = model.network(torch.flip(batch, combo))
+            if isinstance(flipped, (list, tuple)):
+                flipped = flipped[0]
+            prediction += torch.flip(flipped, combo)
+        prediction /= (len(combos) + 1)
+    return prediction
+
+
+def run_batched_prediction(
+    images: np.ndarray, model: nnUNetPredictor, batch_size: Optional[int] = None,
+    dtype: str = "auto"
 ) -> np.ndarray:
     """
-    Performs bone segmentation on an input image using simple resize preprocessing.
-    
+    Runs inference on a stack of pre-processed frames.
+
+    Args:
+        images: (N, H, W) array of resized frames
+        model: Initialised nnU-Net predictor
+        batch_size: Frames per forward pass (defaults to SEGMENTATION_BATCH_SIZE)
+        dtype: Inference dtype of the active profile
+
+    Returns:
+        (N, H, W) uint8 label masks
+    """
+    n_frames = images.shape[0]
+    if not _supports_batched_forward(model, images.shape[1:]):
+        _log(f"[INFO]  Patch size differs from frame size, using sliding window per frame")
+        return np.stack([run_prediction(img, model, dtype) for img in images])
+
+    batch_size = max(1, batch_size or SEGMENTATION_BATCH_SIZE)
+    _log(f"[INFO]  Running batched inference: {n_frames} frame(s), batch size {batch_size}")
+
+    network = model.network.to(model.device)
+    network.eval()
+
+    masks = np.empty(images.shape, dtype=np.uint8)
+    with torch.no_grad(), _autocast(model, dtype):
+        for start in range(0, n_frames, batch_size):
+            chunk = images[start:start + batch_size].astype(np.float32)
+            tensor = torch.from_numpy(chunk[:, None]).to(model.device)
+            logits = _forward_with_mirroring(model, tensor)
+            masks[start:start + len(chunk)] = torch.argmax(logits.float(), dim=1).cpu().numpy()
+
+    _log(f"[INFO]  Batched prediction completed, output shape: {masks.shape}")
+    return masks
+
+
+# ------------------------------------------------------------------ RESULT + CACHE
+class SegmentationResult:
+    """
+    Label mask from a single nnU-Net run plus products derived on first access.
+
+    Attributes:
+        label_mask: (1024, 256) uint8 class labels
+        cache_key:  content hash of the input frame + checkpoint (None if uncached)
+        from_cache: True when the mask came from the segmentation cache
+    """
+
+    def __init__(self, label_mask: np.ndarray, cache_key: Optional[str] = None,
+                 from_cache: bool = False):
+        self.label_mask = label_mask
+        self.cache_key = cache_key
+        self.from_cache = from_cache
+        self._rgb: Optional[np.ndarray] = None
+        self._binary: Optional[np.ndarray] = None
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """Colored (H, W, 3) uint8 image used for *_colored.png / RGB SC-DICOM."""
+        if self._rgb is None:
+            self._rgb = label_mask_to_rgb(self.label_mask)
+        return self._rgb
+
+    @property
+    def binary_mask(self) -> np.ndarray:
+        """0/255 uint8 bone mask used for *_mask.png / mask SC-DICOM."""
+        if self._binary is None:
+            self._binary = (self.label_mask > 0).astype(np.uint8) * 255
+        return self._binary
+
+    def __getstate__(self):
+        # Only ship the label mask between processes; products are cheap to rebuild
+        return {"label_mask": self.label_mask, "cache_key": self.cache_key,
+                "from_cache": self.from_cache}
+
+    def __setstate__(self, state):
+        self.__init__(state["label_mask"], state["cache_key"], state["from_cache"])
+
+
+def _checkpoint_fingerprint() -> str:
+    """Identifies the checkpoint weights, so retrained models invalidate the cache."""
+    if not hasattr(_checkpoint_fingerprint, "_cache"):
+        parts = [str(BONE_MODEL_DIR), BONE_CHECKPOINT]
+        for fold in BONE_FOLDS:
+            ckpt = BONE_MODEL_DIR / f"fold_{fold}" / BONE_CHECKPOINT
+            try:
+                st = ckpt.stat()
+                parts.append(f"{fold}:{st.st_size}:{st.st_mtime_ns}")
+            except OSError:
+                parts.append(f"{fold}:missing")
+        _checkpoint_fingerprint._cache = "|".join(parts)
+    return _checkpoint_fingerprint._cache
+
+
+def segmentation_cache_key(image: np.ndarray, profile: str = "accurate") -> str:
+    """Content hash of a 2-D frame (bytes, shape, dtype), the checkpoint and the profile."""
+    frame = np.ascontiguousarray(image)
+    h = hashlib.sha1()
+    h.update(_checkpoint_fingerprint().encode())
+    h.update(profile.encode())
+    h.update(f"{frame.dtype.str}{frame.shape}".encode())
+    h.update(frame.tobytes())
+    return h.hexdigest()
+
+
+def _memory_cache() -> "OrderedDict[str, np.ndarray]":
+    if not hasattr(_memory_cache, "_cache"):
+        _memory_cache._cache = OrderedDict()
+    return _memory_cache._cache
+
+
+def _to_2d(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3:
+        image = image[..., 0] # Use first channel if RGB
+    if image.ndim != 2:
+        raise ValueError("image must be 2-D or 3-D")
+    return image
+
+
+def _load_cached_mask(key: str) -> Optional[np.ndarray]:
+    cache = _memory_cache()
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    cache_file = SEGMENTATION_CACHE_PATH / f"{key}.npz"
+    if not cache_file.exists():
+        return None
+    try:
+        with np.load(cache_file) as data:
+            mask = data["label_mask"]
+    except Exception as e:
+        _log(f"[WARN]  Ignoring unreadable segmentation cache {cache_file.name}: {e}")
+        return None
+
+    _remember_mask(key, mask)
+    return mask
+
+
+def _remember_mask(key: str, mask: np.ndarray) -> None:
+    cache = _memory_cache()
+    cache[key] = mask
+    cache.move_to_end(key)
+    while len(cache) > SEGMENTATION_MEMORY_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _store_cached_mask(key: str, mask: np.ndarray) -> None:
+    _remember_mask(key, mask)
+    try:
+        SEGMENTATION_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        tmp_file = SEGMENTATION_CACHE_PATH / f"{key}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_file, label_mask=mask)
+        os.replace(tmp_file, SEGMENTATION_CACHE_PATH / f"{key}.npz")
+    except Exception as e:
+        _log(f"[WARN]  Could not write segmentation cache: {e}")
+
+
+def clear_segmentation_cache(disk: bool = False) -> None:
+    """Drop cached masks from memory (and from disk if ``disk`` is True)."""
+    _memory_cache().clear()
+    if disk and SEGMENTATION_CACHE_PATH.exists():
+        for cache_file in SEGMENTATION_CACHE_PATH.glob("*.npz"):
+            try:
+                cache_file.unlink()
+            except OSError:
+                pass
+
+
+# ------------------------------------------------------------------ PUBLIC API
+@traced("segmentation.segment_frame")
+def segment_frame(
+    image: np.ndarray, *, use_cache: bool = True, profile: Optional[str] = None
+) -> SegmentationResult:
+    """
+    Runs bone segmentation once and returns the label mask with lazy products.
+
+    Results are cached by frame content and checkpoint (memory LRU + .npz files
+    under SEGMENTATION_CACHE_PATH), so re-importing or reopening the same frame
+    does not run the network again.
+
     Args:
         image: Input image (2D or 3D numpy array)
-        to_rgb: If True, return colored RGB image; if False, return raw mask
-        
+        use_cache: Set False to force a fresh inference
+        profile: Predictor profile name (defaults to the session profile)
+
     Returns:
-        np.ndarray:
-            - mask (1024, 256) if to_rgb=False
-            - rgb_image (1024, 256, 3) if to_rgb=True
+        SegmentationResult with label_mask (1024, 256), .rgb and .binary_mask
     """
     _log(f"[INFO]  Starting bone mask segmentation...")
     _log(f"[INFO]  Input image shape: {image.shape}, dtype: {image.dtype}")
@@ -128,17 +447,28 @@ def predict_bone_mask(
     if image.ndim != 2:
         raise ValueError("image must be 2-D or 3-D")
 
+    profile = _resolve_profile(profile)
+    use_cache = use_cache and SEGMENTATION_CACHE_ENABLED
+    key = segmentation_cache_key(image, profile) if use_cache else None
+    if key is not None:
+        cached = _load_cached_mask(key)
+        if cached is not None:
+            _log(f"[INFO]  Segmentation cache hit ({key[:12]}), skipping inference")
+            return SegmentationResult(cached, key, from_cache=True)
+
     # --- Preprocessing: Simple resize to model's input size ---
     _log(f"[INFO]  Preprocessing: resizing to (256, 1024)...")
-    resized = cv2.resize(image, (256, 1024), interpolation=cv2.INTER_AREA)
+    resized = cv2.resize(image, MODEL_INPUT_SIZE, interpolation=cv2.INTER_AREA)
     _log(f"[INFO]  Preprocessing completed")
 
     # --- Inference ---
     _log(f"[INFO]  Loading segmentation model...")
     model = load_bone_model()
+    cfg = apply_predictor_profile(model, profile)
     
-    _log(f"[INFO]  Performing bone segmentation inference...")
-    mask = run_prediction(resized, model) # Output shape is (1024, 256)
+    _log(f"[INFO]  Performing bone segmentation inference (profile: {profile})...")
+    with _torch_threads(cfg["num_threads"] or SEGMENTATION_NUM_THREADS):
+        mask = run_prediction(resized, model, cfg["dtype"]) # Output shape is (1024, 256)
 
     # --- Post-processing ---
     elapsed = time.time() - t_start
@@ -147,12 +477,100 @@ def predict_bone_mask(
     _log(f"[INFO]  Output mask shape: {mask.shape}")
     _log(f"[INFO]  Unique labels found: {list(unique_labels)}")
 
+    if key is not None:
+        _store_cached_mask(key, mask)
+    return SegmentationResult(mask, key)
+
+
+@traced("segmentation.predict_batch")
+def predict_bone_masks(
+    frames: Sequence[np.ndarray],
+    *,
+    batch_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    use_cache: bool = True,
+    profile: Optional[str] = None,
+) -> List[SegmentationResult]:
+    """
+    Segments many frames (views and/or studies) with batched forward passes.
+
+    Cached frames are served from the segmentation cache; the rest are resized,
+    stacked and run through the network ``batch_size`` frames at a time, then
+    split back per frame.
+
+    Args:
+        frames: 2D or 3D input images, any size
+        batch_size: Frames per forward pass (defaults to SEGMENTATION_BATCH_SIZE)
+        num_threads: torch CPU threads (overrides the profile setting)
+        use_cache: Set False to force fresh inference
+        profile: Predictor profile name (defaults to the session profile)
+
+    Returns:
+        One SegmentationResult per input frame, in input order
+    """
+    t_start = time.time()
+    images = [_to_2d(np.asarray(f)) for f in frames]
+    results: List[Optional[SegmentationResult]] = [None] * len(images)
+
+    profile = _resolve_profile(profile)
+    use_cache = use_cache and SEGMENTATION_CACHE_ENABLED
+    keys = [segmentation_cache_key(img, profile) if use_cache else None for img in images]
+
+    todo: List[int] = []
+    for idx, key in enumerate(keys):
+        cached = _load_cached_mask(key) if key is not None else None
+        if cached is not None:
+            results[idx] = SegmentationResult(cached, key, from_cache=True)
+        else:
+            todo.append(idx)
+
+    _log(f"[INFO]  Batch segmentation ({profile}): {len(images)} frame(s), "
+         f"{len(images) - len(todo)} cached, {len(todo)} to infer")
+
+    if todo:
+        model = load_bone_model()
+        cfg = apply_predictor_profile(model, profile)
+        resized = np.stack([
+            cv2.resize(images[idx], MODEL_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+            for idx in todo
+        ])
+        with _torch_threads(num_threads or cfg["num_threads"] or SEGMENTATION_NUM_THREADS):
+            masks = run_batched_prediction(resized, model, batch_size, cfg["dtype"])
+
+        for idx, mask in zip(todo, masks):
+            if keys[idx] is not None:
+                _store_cached_mask(keys[idx], mask)
+            results[idx] = SegmentationResult(mask, keys[idx])
+
+    _log(f"[INFO]  Batch segmentation completed in {time.time() - t_start:.2f}s")
+    return results
+
+
+def predict_bone_mask(
+    image: np.ndarray, *, to_rgb: bool = False, profile: Optional[str] = None
+) -> np.ndarray:
+    """
+    Performs bone segmentation on an input image using simple resize preprocessing.
+    Thin wrapper over segment_frame(); prefer that when both outputs are needed.
+    
+    Args:
+        image: Input image (2D or 3D numpy array)
+        to_rgb: If True, return colored RGB image; if False, return raw mask
+        profile: Predictor profile name (defaults to the session profile)
+        
+    Returns:
+        np.ndarray:
+            - mask (1024, 256) if to_rgb=False
+            - rgb_image (1024, 256, 3) if to_rgb=True
+    """
+    result = segment_frame(image, profile=profile)
+
     # ✅ Return logic
     if to_rgb:
         _log(f"[INFO]  Converting mask to colored RGB image...")
-        rgb_result = label_mask_to_rgb(mask)
+        rgb_result = result.rgb
         _log(f"[INFO]  RGB conversion completed, shape: {rgb_result.shape}")
         return rgb_result
     else:
         _log(f"[INFO]  Returning raw segmentation mask")
-        return mask
\ No newline at end of file
+        return result.label_mask
@@ -4,6 +4,8 @@ import numpy as np
 
 from skimage.morphology import binary_dilation, disk
 
+from core.utils.otsu import otsu_threshold_stepped
+
 DICT_HOTSPOT_ID = {
     0: "background",
     1: "normal",
@@ -24,6 +26,8 @@ def normalize_image(image, range=(0, 1)):
     return ((image - imin) / (imax - imin)) * (rmax - rmin) + rmin
 
 def threshold_otsu(image, nbins=0.01):
+    # nbins is the step between candidate thresholds; all candidates are scored
+    # at once from cumulative sums (core.utils.otsu)
     if image.ndim != 2:
         print("must be a grayscale image.")
         return
@@ -31,29 +35,7 @@ def threshold_otsu(image, nbins=0.01):
         print("the image must have multiple colors")
         return
 
-    all_colors = image.flatten()
-    total_weight = len(all_colors)
-    thresholds = np.arange(np.min(image) + nbins, np.max(image) - nbins, nbins)
-
-    best_thresh = -1
-    min_variance = float('inf')
-
-    for t in thresholds:
-        bg = all_colors[all_colors < t]
-        fg = all_colors[all_colors >= t]
-
-        w_bg = len(bg) / total_weight
-        w_fg = len(fg) / total_weight
-
-        var_bg = np.var(bg) if len(bg) > 0 else 0
-        var_fg = np.var(fg) if len(fg) > 0 else 0
-
-        wcv = w_bg * var_bg + w_fg * var_fg
-        if wcv < min_variance:
-            min_variance = wcv
-            best_thresh = t
-
-    return best_thresh
+    return otsu_threshold_stepped(image, step=nbins)
 
 def color_pixels_within_bounding_boxes(img, list_bb):
     if img.ndim == 2:
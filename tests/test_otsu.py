@@ -0,0 +1,209 @@
+# tests/test_otsu.py
+"""
+Equivalence of the shared Otsu kernels (core.utils.otsu) with the two per-box
+implementations they replaced:
+
+- histogram Otsu: hotspot_processor.threshold_otsu_impl
+- threshold sweep: models/hotspot_detection/algorithm_otsu_filling.threshold_otsu
+
+Both originals are kept verbatim below as references. Thresholds must be
+identical box by box, for the single-box and the batched kernels, including
+flat, 1-pixel and uint8 wrap-around boxes.
+"""
+import numpy as np
+import pytest
+
+from core.utils.otsu import (
+    gather_box_values,
+    otsu_threshold_hist,
+    otsu_threshold_stepped,
+    otsu_thresholds_hist,
+    otsu_thresholds_stepped,
+)
+
+
+# ----------------------------------------------------------------------------- legacy references
+
+def legacy_threshold_otsu_impl(grayscale_matrix: np.ndarray, nbins: int = 256) -> float:
+    """hotspot_processor.threshold_otsu_impl before the shared kernel (kept verbatim)."""
+    hist, bin_edges = np.histogram(grayscale_matrix.ravel(), bins=nbins, range=(0, 256))
+    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+
+    total_pixels = grayscale_matrix.size
+    cumsum_hist = np.cumsum(hist)
+    cumsum_weighted = np.cumsum(hist * bin_centers)
+
+    below = cumsum_hist[:-1]
+    above = total_pixels - below
+    w0 = below / total_pixels
+    w1 = 1 - w0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu0 = cumsum_weighted[:-1] / below
+        mu1 = (cumsum_weighted[-1] - cumsum_weighted[:-1]) / above
+        variances = w0 * w1 * (mu0 - mu1) ** 2
+
+    variances[(w0 == 0) | (w1 == 0)] = 0
+
+    optimal_idx = np.argmax(variances)
+    return bin_centers[optimal_idx]
+
+
+def legacy_threshold_otsu(image, nbins=0.01):
+    """algorithm_otsu_filling.threshold_otsu before the shared kernel (kept verbatim; prints dropped, uint8 overflow warning silenced)."""
+    if image.ndim != 2:
+        return
+    if np.min(image) == np.max(image):
+        return
+
+    all_colors = image.flatten()
+    total_weight = len(all_colors)
+    with np.errstate(over='ignore'):
+        thresholds = np.arange(np.min(image) + nbins, np.max(image) - nbins, nbins)
+
+    best_thresh = -1
+    min_variance = float('inf')
+
+    for t in thresholds:
+        bg = all_colors[all_colors < t]
+        fg = all_colors[all_colors >= t]
+
+        w_bg = len(bg) / total_weight
+        w_fg = len(fg) / total_weight
+
+        var_bg = np.var(bg) if len(bg) > 0 else 0
+        var_fg = np.var(fg) if len(fg) > 0 else 0
+
+        wcv = w_bg * var_bg + w_fg * var_fg
+        if wcv < min_variance:
+            min_variance = wcv
+            best_thresh = t
+
+    return best_thresh
+
+
+# ----------------------------------------------------------------------------- synthetic data
+
+def make_boxes(rng: np.random.Generator, n_boxes: int, height: int = 512, width: int = 128):
+    """A bone-scan-like uint8 frame plus hotspot boxes (see benchmarks/bench_otsu_threshold.py)."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    frame = rng.poisson(20, size=(height, width)).astype(np.float32)
+    boxes = []
+    for _ in range(n_boxes):
+        cx, cy = int(rng.integers(10, width - 10)), int(rng.integers(10, height - 10))
+        r = rng.uniform(2, 10)
+        frame += rng.uniform(40, 230) * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2.0 * r * r))
+        half_w, half_h = int(rng.integers(1, 20)), int(rng.integers(1, 20))
+        boxes.append((max(cx - half_w, 0), max(cy - half_h, 0),
+                      min(cx + half_w, width), min(cy + half_h, height)))
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    # Degenerate boxes: flat, single pixel, near-black and near-white (uint8 wrap-around in the sweep)
+    frame[0:8, 0:8] = 77
+    frame[8:16, 0:8] = rng.integers(0, 6, size=(8, 8))
+    frame[16:24, 0:8] = rng.integers(250, 256, size=(8, 8))
+    boxes += [(0, 0, 8, 8), (0, 0, 1, 1), (0, 8, 8, 16), (0, 16, 8, 24)]
+    return frame, boxes
+
+
+@pytest.fixture(scope="module")
+def frame_boxes():
+    return make_boxes(np.random.default_rng(0), 150)
+
+
+def assert_same_thresholds(expected, actual):
+    assert len(expected) == len(actual)
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if e is None or a is None:
+            assert e is None and a is None, f"box {i}: {e} vs {a}"
+        else:
+            assert float(e) == float(a), f"box {i}: {e} vs {a}"
+
+
+# ----------------------------------------------------------------------------- histogram Otsu
+
+@pytest.mark.parametrize("nbins", [10, 256])
+def test_hist_matches_threshold_otsu_impl(frame_boxes, nbins):
+    frame, boxes = frame_boxes
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    assert_same_thresholds([legacy_threshold_otsu_impl(c, nbins) for c in crops],
+                           [otsu_threshold_hist(c, nbins) for c in crops])
+
+
+@pytest.mark.parametrize("nbins", [10, 256])
+def test_hist_batched_matches_single_box(frame_boxes, nbins):
+    frame, boxes = frame_boxes
+    values, offsets = gather_box_values(frame, boxes)
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    assert_same_thresholds([otsu_threshold_hist(c, nbins) for c in crops],
+                           list(otsu_thresholds_hist(values, offsets, nbins)))
+
+
+def test_hotspot_processor_uses_hist_kernel(frame_boxes):
+    from features.spect_viewer.logic.hotspot_processor import threshold_otsu_impl
+
+    frame, boxes = frame_boxes
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    assert_same_thresholds([legacy_threshold_otsu_impl(c, 10) for c in crops],
+                           [threshold_otsu_impl(c, nbins=10) for c in crops])
+
+
+# ----------------------------------------------------------------------------- threshold sweep
+
+@pytest.mark.parametrize("normalized, step", [(False, 10), (True, 0.01)])
+def test_stepped_matches_threshold_otsu(frame_boxes, normalized, step):
+    from models.hotspot_detection.algorithm_otsu_filling import threshold_otsu
+
+    frame, boxes = frame_boxes
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    if normalized:
+        crops = [c.astype(np.float32) / 255.0 for c in crops]
+    expected = [legacy_threshold_otsu(c, step) for c in crops]
+    assert_same_thresholds(expected, [otsu_threshold_stepped(c, step) for c in crops])
+    assert_same_thresholds(expected, [threshold_otsu(c, nbins=step) for c in crops])
+
+
+@pytest.mark.parametrize("normalized, step", [(False, 10), (True, 0.01)])
+def test_stepped_batched_matches_single_box(frame_boxes, normalized, step):
+    frame, boxes = frame_boxes
+    crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+    if normalized:
+        crops = [c.astype(np.float32) / 255.0 for c in crops]
+    _, offsets = gather_box_values(frame, boxes)
+    values = np.concatenate([c.ravel() for c in crops])
+    assert_same_thresholds([otsu_threshold_stepped(c, step) for c in crops],
+                           otsu_thresholds_stepped(values, offsets, step))
+
+
+# ----------------------------------------------------------------------------- edge cases
+
+def test_flat_box():
+    box = np.full((8, 8), 77, np.uint8)
+    assert otsu_threshold_stepped(box, 10) is None
+    assert legacy_threshold_otsu(box, 10) is None
+    assert otsu_threshold_hist(box, 10) == legacy_threshold_otsu_impl(box, 10)
+
+
+def test_single_pixel_box():
+    box = np.array([[200]], np.uint8)
+    assert otsu_threshold_stepped(box, 10) is None
+    assert otsu_threshold_hist(box, 256) == legacy_threshold_otsu_impl(box, 256)
+
+
+def test_no_candidates_returns_minus_one():
+    box = np.array([[0.50, 0.52], [0.51, 0.505]])  # max - min not above two steps
+    assert legacy_threshold_otsu(box, 0.01) == -1
+    assert otsu_threshold_stepped(box, 0.01) == -1
+
+
+@pytest.mark.parametrize("low, high", [(0, 6), (250, 256)])
+def test_uint8_wrap_around(low, high):
+    box = np.random.default_rng(1).integers(low, high, size=(8, 8)).astype(np.uint8)
+    assert_same_thresholds([legacy_threshold_otsu(box, 10)], [otsu_threshold_stepped(box, 10)])
+
+
+def test_empty_box_in_batch():
+    values = np.array([10, 200, 30, 220], np.uint8)
+    offsets = np.array([0, 0, 4])
+    assert otsu_thresholds_stepped(values, offsets, 10)[0] is None
+    assert otsu_thresholds_hist(values, offsets, 10)[1] == legacy_threshold_otsu_impl(values, 10)
@@ -0,0 +1,71 @@
+# trace_report.py
+"""
+Summarize pipeline traces recorded with PIPELINE_TRACE=true
+
+Reads the JSONL span file written by core.tracing and prints per-stage
+timings across a batch (count, studies, mean, p50/p90/p95/p99, max, total),
+slowest stage first. Can also convert the trace for chrome://tracing or
+Perfetto.
+
+Usage:
+    PIPELINE_TRACE=true python main.py                # record while working
+    python trace_report.py                            # logs/pipeline_trace.jsonl
+    python trace_report.py run.jsonl --prefix import. # only import stages
+    python trace_report.py run.jsonl --study P1_20240105
+    python trace_report.py run.jsonl --chrome run_trace.json
+    python trace_report.py run.jsonl --json > stages.json
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from core.config.paths import PIPELINE_TRACE_PATH
+from core.tracing import export_chrome_trace, format_summary, read_trace, summarize
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-stage percentile timings from a pipeline trace")
+    parser.add_argument("trace", nargs="?", type=Path, default=PIPELINE_TRACE_PATH,
+                        help=f"JSONL trace file (default: {PIPELINE_TRACE_PATH})")
+    parser.add_argument("--prefix", default="", help="Only spans whose name starts with this (e.g. import.)")
+    parser.add_argument("--study", help="Only spans of this study ID")
+    parser.add_argument("--chrome", type=Path, help="Also write a Chrome trace-event JSON here")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON instead of a table")
+    args = parser.parse_args()
+
+    if not args.trace.exists():
+        print(f"❌ Trace not found: {args.trace} (record one with PIPELINE_TRACE=true)")
+        return 1
+
+    records = [
+        r for r in read_trace(args.trace)
+        if str(r.get("name", "")).startswith(args.prefix)
+        and (args.study is None or r.get("study") == args.study)
+    ]
+    if not records:
+        print(f"❌ No matching spans in {args.trace}")
+        return 1
+
+    summary = summarize(records)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        studies = {r.get("study") for r in records} - {None}
+        print(f"Trace: {args.trace} ({len(records)} spans, {len(studies)} studies)\n")
+        print(format_summary(summary))
+
+    if args.chrome:
+        out = export_chrome_trace(records, args.chrome)
+        print(f"\n✅ Chrome trace written: {out}", file=sys.stderr if args.json else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())